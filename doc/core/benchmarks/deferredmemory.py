@@ -0,0 +1,75 @@
+# Copyright (c) Twisted Matrix Laboratories.
+# See LICENSE for details.
+
+"""
+See how much memory pending L{Deferred}s and L{DelayedCall}s take, and how
+fast the common single-callback L{Deferred} is.
+
+Each memory measurement runs in a fresh process and reports the growth in
+maximum resident set size per object kept alive, so run it before and after
+a change to compare.
+"""
+
+import os, resource, sys, time
+
+from twisted.internet.defer import Deferred
+from twisted.internet.base import DelayedCall
+
+OBJECTS = 500000
+ITERATIONS = 500000
+
+
+def noop(*args):
+    pass
+
+
+def pendingDeferred():
+    d = Deferred()
+    d.addCallback(noop)
+    return d
+
+
+def pendingDelayedCall():
+    return DelayedCall(time.time() + 60, noop, (), {}, noop, noop)
+
+
+def memory(factory):
+    """
+    Report the memory used per object by C{OBJECTS} objects from
+    C{factory}, measured in a child process.
+    """
+    pid = os.fork()
+    if pid == 0:
+        before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        objects = [factory() for i in xrange(OBJECTS)]
+        after = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        print '%-20s %6.1f bytes/object' % (
+            factory.__name__, (after - before) * 1024.0 / len(objects))
+        sys.stdout.flush()
+        os._exit(0)
+    os.waitpid(pid, 0)
+
+
+def throughput():
+    """
+    Report the time taken to create a L{Deferred}, add a callback and fire
+    it.
+    """
+    before = time.time()
+    for i in xrange(ITERATIONS):
+        d = Deferred()
+        d.addCallback(noop)
+        d.callback(None)
+    after = time.time()
+    print '%-20s %6.2f usec/Deferred' % (
+        'singleCallback', (after - before) * 1000000 / ITERATIONS)
+
+
+def main():
+    memory(pendingDeferred)
+    memory(pendingDelayedCall)
+    throughput()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,76 @@
+# Copyright (c) Twisted Matrix Laboratories.
+# See LICENSE for details.
+
+"""
+See how much errback-heavy L{Deferred} chains cost with and without
+L{Failure.lazyFrames}.
+
+Each chain is run a few dozen frames down the stack, as it would be under
+the reactor and application code.  It raises an exception from a callback a
+few frames deep, and a later errback traps it, as happens when errbacks are used for cache misses or
+cancellation.  Half of the chains are fired before the errback is added, so
+the L{Failure} is cleaned up and its frames extracted in either mode.
+"""
+
+import time
+
+from twisted.python.failure import Failure
+from twisted.internet.defer import Deferred
+
+CHAINS = 20000
+DEPTH = 10
+STACK = 40
+
+class CacheMiss(Exception):
+    pass
+
+
+def lookup(ignored, depth=DEPTH):
+    if depth:
+        return lookup(ignored, depth - 1)
+    raise CacheMiss()
+
+
+def trap(failure):
+    failure.trap(CacheMiss)
+
+
+def handledChain():
+    d = Deferred()
+    d.addCallback(lookup)
+    d.addErrback(trap)
+    d.callback(None)
+
+
+def lateChain():
+    d = Deferred()
+    d.addCallback(lookup)
+    d.callback(None)
+    d.addErrback(trap)
+
+
+def run(chain, stack=STACK):
+    if stack:
+        return run(chain, stack - 1)
+    for i in xrange(CHAINS):
+        chain()
+
+
+def benchmark(lazy, chain):
+    Failure.lazyFrames = lazy
+    before = time.time()
+    run(chain)
+    after = time.time()
+    print 'lazyFrames: %-5s %-13s %8.2f usec/chain' % (
+        lazy, chain.__name__, (after - before) * 1000000 / CHAINS)
+
+
+def main():
+    for chain in (handledChain, lateChain):
+        for lazy in (False, True):
+            benchmark(lazy, chain)
+    Failure.lazyFrames = False
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,74 @@
+# Copyright (c) Twisted Matrix Laboratories.
+# See LICENSE for details.
+
+"""
+See how many small pipelined requests per second a L{Site} with a trivial
+resource can handle with L{HTTPChannel} and with L{BlockHTTPChannel}.
+
+The requests are delivered to the channel in chunks of C{CHUNK} bytes and
+the responses are written to an in-memory transport, so only request
+parsing, dispatch and response generation are measured.
+"""
+
+import sys, time
+
+from twisted.test.proto_helpers import StringTransport
+from twisted.web import http, resource, server
+
+REQUESTS = 20000
+CHUNK = 4096
+
+REQUEST = (
+    "GET / HTTP/1.1\r\n"
+    "Host: www.example.com\r\n"
+    "User-Agent: Mozilla/5.0 (X11; Linux x86_64; rv:24.0) Gecko/20100101\r\n"
+    "Accept: text/html,application/xhtml+xml,application/xml;q=0.9\r\n"
+    "Accept-Language: en-US,en;q=0.5\r\n"
+    "Accept-Encoding: gzip, deflate\r\n"
+    "Cookie: session=0123456789abcdef\r\n"
+    "Connection: keep-alive\r\n"
+    "\r\n")
+
+
+class Hello(resource.Resource):
+    isLeaf = True
+
+    def render_GET(self, request):
+        return "Hello, world!"
+
+
+
+def benchmark(channelFactory, requests=REQUESTS):
+    site = server.Site(Hello())
+    site.protocol = channelFactory
+    data = REQUEST * requests
+    chunks = [data[i:i + CHUNK] for i in xrange(0, len(data), CHUNK)]
+    channel = site.buildProtocol(None)
+    transport = StringTransport()
+    channel.makeConnection(transport)
+
+    before = time.time()
+    for chunk in chunks:
+        channel.dataReceived(chunk)
+    elapsed = time.time() - before
+
+    channel.connectionLost(None)
+    site.stopFactory()
+    responses = transport.value().count("Hello, world!")
+    assert responses == requests, responses
+    print '%s: %d requests, %.2f seconds, %d requests/second' % (
+        channelFactory.__name__, requests, elapsed, requests / elapsed)
+
+
+
+def main(requests=REQUESTS):
+    for channelFactory in http.HTTPChannel, http.BlockHTTPChannel:
+        benchmark(channelFactory, requests)
+
+
+
+if __name__ == '__main__':
+    if len(sys.argv) > 1:
+        main(int(sys.argv[1]))
+    else:
+        main()
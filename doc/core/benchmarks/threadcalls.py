@@ -0,0 +1,75 @@
+# Copyright (c) Twisted Matrix Laboratories.
+# See LICENSE for details.
+
+"""
+See how fast threads can hand calls to the reactor with
+C{reactor.callFromThread}, and how many times the reactor is woken up to
+run them.
+
+Several threads each make C{CALLS} calls as fast as they can; the run ends
+when the reactor has run every one of them.
+"""
+
+import sys, threading, time
+
+from twisted.internet import reactor
+
+THREADS = 4
+CALLS = 100000
+
+
+class Counter(object):
+    """
+    Count the calls the reactor runs and stop it after the last one.
+    """
+    def __init__(self, total):
+        self.total = total
+        self.count = 0
+
+
+    def __call__(self):
+        self.count += 1
+        if self.count == self.total:
+            reactor.stop()
+
+
+
+def producer(counter):
+    callFromThread = reactor.callFromThread
+    for i in xrange(CALLS):
+        callFromThread(counter)
+
+
+
+def main(threads=THREADS):
+    counter = Counter(threads * CALLS)
+    wakeUps = [0]
+    originalWakeUp = reactor.wakeUp
+    def wakeUp():
+        wakeUps[0] += 1
+        originalWakeUp()
+    reactor.wakeUp = wakeUp
+
+    workers = [threading.Thread(target=producer, args=(counter,))
+               for i in range(threads)]
+    def start():
+        for worker in workers:
+            worker.start()
+    reactor.callWhenRunning(start)
+
+    before = time.time()
+    reactor.run()
+    elapsed = time.time() - before
+    for worker in workers:
+        worker.join()
+
+    print '%d threads, %d calls: %.2f seconds, %d calls/second, %d wake-ups' % (
+        threads, counter.total, elapsed, counter.total / elapsed, wakeUps[0])
+
+
+
+if __name__ == '__main__':
+    if len(sys.argv) > 1:
+        main(int(sys.argv[1]))
+    else:
+        main()
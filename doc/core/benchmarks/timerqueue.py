@@ -0,0 +1,100 @@
+# Copyright (c) Twisted Matrix Laboratories.
+# See LICENSE for details.
+
+"""
+See how the cost of timer upkeep scales with the number of pending timers for
+each of the timer queues in L{twisted.internet.timerqueue}.
+
+For each number of pending timers, a fixed number of timers is moved sooner
+(as L{DelayedCall.reset} does when a timeout is shortened), cancelled and
+replaced (as when a connection closes and another one opens), and the queue
+is then asked for its next time and drained of the calls that are due.
+
+Then, as a reactor does once per iteration, the clock is advanced by a few
+milliseconds, the calls that are due are run and the queue is asked for its
+next time, with the pending timers spread over an hour.
+"""
+
+import random, time
+
+from twisted.internet.base import DelayedCall
+from twisted.internet.timerqueue import HeapTimerQueue, TimingWheelTimerQueue
+
+OPERATIONS = 1000
+ITERATIONS = 2000
+STEP = 0.005
+
+class FakeClock(object):
+    def __init__(self):
+        self.now = 1000000.0
+
+    def seconds(self):
+        return self.now
+
+
+def schedule(queue, clock, delay):
+    call = DelayedCall(clock.now + delay, lambda: None, (), {},
+                       queue.cancel, queue.moveSooner, seconds=clock.seconds)
+    queue.add(call)
+    return call
+
+
+def benchmark(queueFactory, pending):
+    clock = FakeClock()
+    queue = queueFactory()
+    randomizer = random.Random(pending)
+    calls = [schedule(queue, clock, randomizer.uniform(30, 300))
+             for i in xrange(pending)]
+    queue.nextTime()
+
+    victims = randomizer.sample(calls, OPERATIONS)
+    before = time.time()
+    for call in victims[:OPERATIONS // 2]:
+        call.reset(randomizer.uniform(1, 30))
+    for call in victims[OPERATIONS // 2:]:
+        call.cancel()
+        schedule(queue, clock, randomizer.uniform(30, 300))
+    queue.nextTime()
+    clock.now += 30
+    for call in queue.expire(clock.now):
+        call.called = 1
+    queue.nextTime()
+    after = time.time()
+
+    print '%-24s pending: %7d  %8.2f usec/operation' % (
+        queueFactory.__name__, pending,
+        (after - before) * 1000000 / OPERATIONS)
+
+
+def expiry(queueFactory, pending):
+    clock = FakeClock()
+    queue = queueFactory()
+    randomizer = random.Random(pending)
+    for i in xrange(pending):
+        schedule(queue, clock, randomizer.uniform(0, 3600))
+    queue.nextTime()
+
+    before = time.time()
+    for i in xrange(ITERATIONS):
+        clock.now += STEP
+        for call in queue.expire(clock.now):
+            call.called = 1
+        queue.nextTime()
+    after = time.time()
+
+    print '%-24s pending: %7d  %8.2f usec/iteration' % (
+        queueFactory.__name__, pending,
+        (after - before) * 1000000 / ITERATIONS)
+
+
+def main():
+    for pending in (10000, 100000, 300000):
+        for queueFactory in (HeapTimerQueue, TimingWheelTimerQueue):
+            benchmark(queueFactory, pending)
+    for pending in (10000, 100000, 300000):
+        for queueFactory in (HeapTimerQueue, TimingWheelTimerQueue):
+            expiry(queueFactory, pending)
+
+
+if __name__ == '__main__':
+    main()
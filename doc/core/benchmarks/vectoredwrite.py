@@ -0,0 +1,93 @@
+# Copyright (c) Twisted Matrix Laboratories.
+# See LICENSE for details.
+
+"""
+See how fast data written as many small chunks, and as a few large ones, gets
+through a loopback TCP connection with and without vectored writes.
+
+Vectored writes are only available when the socket has a C{sendmsg} method
+(Python 3.3 and later); elsewhere, only the joining code path is measured.
+"""
+
+from __future__ import print_function
+
+import socket, time
+
+from twisted.internet import reactor
+from twisted.internet.defer import Deferred
+from twisted.internet.protocol import Protocol, Factory, ClientCreator
+
+TOTAL = 64 * 1024 * 1024
+
+SHAPES = [
+    ('small', 100),
+    ('large', 1024 * 1024),
+    ]
+
+
+class Sink(Protocol):
+    def connectionMade(self):
+        self.received = 0
+        self.done, self.factory.done = self.factory.done, None
+
+    def dataReceived(self, data):
+        self.received += len(data)
+        if self.received >= TOTAL and self.done is not None:
+            self.done, done = None, self.done
+            done.callback(None)
+
+
+class Source(Protocol):
+    def send(self, chunk):
+        # Write several sequences of chunks per write event, the way a
+        # protocol framing many small messages would.
+        chunks = [chunk] * (256 * 1024 // len(chunk) or 1)
+        sent = 0
+        while sent < TOTAL:
+            self.transport.writeSequence(chunks)
+            sent += len(chunk) * len(chunks)
+
+
+def benchmark(port, vectored, name, size):
+    factory = port.factory
+    factory.done = done = Deferred()
+    d = ClientCreator(reactor, Source).connectTCP(
+        '127.0.0.1', port.getHost().port)
+    def connected(proto):
+        proto.transport._vectoredWrites = vectored
+        before = time.time()
+        proto.send(b'x' * size)
+        def finished(ignored):
+            after = time.time()
+            proto.transport.loseConnection()
+            print('%-6s vectored=%-5s %8.1f MB/sec' % (
+                name, vectored, TOTAL / (after - before) / 1024 / 1024))
+        return done.addCallback(finished)
+    return d.addCallback(connected)
+
+
+def main():
+    factory = Factory()
+    factory.protocol = Sink
+    port = reactor.listenTCP(0, factory, interface='127.0.0.1')
+    modes = [False]
+    if getattr(socket.socket, 'sendmsg', None) is not None:
+        modes.append(True)
+    else:
+        print('socket.sendmsg is unavailable; vectored writes are disabled')
+
+    runs = [(vectored, name, size)
+            for (name, size) in SHAPES for vectored in modes]
+    def next(ignored=None):
+        if not runs:
+            reactor.stop()
+            return
+        d = benchmark(port, *runs.pop(0))
+        d.addCallback(next)
+        d.addErrback(lambda err: (err.printTraceback(), reactor.stop()))
+    reactor.callWhenRunning(next)
+    reactor.run()
+
+
+if __name__ == '__main__':
+    main()
@@ -33,6 +33,7 @@ modules = [
     "twisted.internet.gireactor",
     "twisted.internet._glibbase",
     "twisted.internet.gtk3reactor",
+    "twisted.internet.instrumentation",
     "twisted.internet.main",
     "twisted.internet._newtls",
     "twisted.internet.posixbase",
@@ -50,6 +51,7 @@ modules = [
     "twisted.internet.test._posixifaces",
     "twisted.internet.test.reactormixins",
     "twisted.internet.threads",
+    "twisted.internet.timerqueue",
     "twisted.internet.udp",
     "twisted.internet.util",
     "twisted.names",
@@ -73,6 +75,7 @@ modules = [
     "twisted.python.constants",
     "twisted.python.context",
     "twisted.python.deprecate",
+    "twisted.python._eventfd",
     "twisted.python.failure",
     "twisted.python.filepath",
     "twisted.python.lockfile",
@@ -132,6 +135,7 @@ testModules = [
     "twisted.internet.test.test_inlinecb",
     "twisted.internet.test.test_gireactor",
     "twisted.internet.test.test_glibbase",
+    "twisted.internet.test.test_instrumentation",
     "twisted.internet.test.test_main",
     "twisted.internet.test.test_newtls",
     "twisted.internet.test.test_posixbase",
@@ -139,6 +143,7 @@ testModules = [
     "twisted.internet.test.test_sigchld",
     "twisted.internet.test.test_tcp",
     "twisted.internet.test.test_threads",
+    "twisted.internet.test.test_timerqueue",
     "twisted.internet.test.test_tls",
     "twisted.internet.test.test_udp",
     "twisted.internet.test.test_udp_internals",
@@ -22,9 +22,17 @@ def parse(description, factory, default='tcp'):
     """
     This function is deprecated as of Twisted 10.2.
 
+    @raise ValueError: If the description has a C{reuseport} argument, which
+        L{IReactorTCP.listenTCP} does not support.
+
     @see: L{twisted.internet.endpoints.server}
     """
-    return endpoints._parseServer(description, factory, default)
+    name, args, kw = endpoints._parseServer(description, factory, default)
+    if 'reuseport' in kw:
+        raise ValueError(
+            "reuseport is not supported here; use "
+            "twisted.internet.endpoints.serverFromString: %r" % (description,))
+    return name, args, kw
 
 deprecatedModuleAttribute(
     Version("Twisted", 10, 2, 0),
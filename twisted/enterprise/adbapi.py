@@ -145,7 +145,8 @@ class ConnectionPool:
     @type _reactor: L{IReactorCore} provider
     """
 
-    CP_ARGS = "min max name noisy openfun reconnect good_sql".split()
+    CP_ARGS = ("min max name noisy openfun reconnect good_sql maxqueued"
+               .split())
 
     noisy = False # if true, generate informational log messages
     min = 3 # minimum number of connections in pool
@@ -154,6 +155,7 @@ class ConnectionPool:
     openfun = None # A function to call on new connections
     reconnect = False # reconnect when connections fail
     good_sql = 'select 1' # a query which should always succeed
+    maxqueued = None # maximum number of queued queries, or None for no limit
 
     running = False # true when the pool is operating
     connectionFactory = Connection
@@ -194,6 +196,11 @@ class ConnectionPool:
         @param cp_good_sql: an sql query which should always succeed and change
                             no state (default 'select 1')
 
+        @param cp_maxqueued: the maximum number of operations which may wait
+                             for a free connection (default None, meaning no
+                             limit).  Further operations fail with
+                             L{twisted.python.threadpool.ThreadPoolFull}.
+
         @param cp_reactor: use this reactor instead of the global reactor
             (added in Twisted 10.2).
         @type cp_reactor: L{IReactorCore} provider
@@ -232,7 +239,8 @@ class ConnectionPool:
         import thread
 
         self.threadID = thread.get_ident
-        self.threadpool = threadpool.ThreadPool(self.min, self.max)
+        self.threadpool = threadpool.ThreadPool(self.min, self.max,
+                                                maxQueued=self.maxqueued)
         self.startID = self._reactor.callWhenRunning(self._start)
 
 
@@ -472,6 +480,7 @@ class ConnectionPool:
                 'noisy': self.noisy,
                 'reconnect': self.reconnect,
                 'good_sql': self.good_sql,
+                'maxqueued': self.maxqueued,
                 'connargs': self.connargs,
                 'connkw': self.connkw}
 
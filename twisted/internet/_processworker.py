@@ -0,0 +1,66 @@
+# -*- test-case-name: twisted.internet.test.test_processpool -*-
+# Copyright (c) Twisted Matrix Laboratories.
+# See LICENSE for details.
+
+"""
+Main executable entry point for the worker processes of
+L{twisted.internet.processpool}.
+"""
+
+import os
+import sys
+import errno
+
+
+def _setupPath(environ):
+    """
+    Override C{sys.path} with what the parent passed in
+    B{TWISTED_PROCESSPOOL_PYTHONPATH}.
+
+    @see: twisted.internet.processpool.ProcessPool._spawnWorker
+    """
+    if 'TWISTED_PROCESSPOOL_PYTHONPATH' in environ:
+        sys.path[:] = environ['TWISTED_PROCESSPOOL_PYTHONPATH'].split(
+            os.pathsep)
+
+
+_setupPath(os.environ)
+
+
+from twisted.internet.protocol import FileWrapper
+from twisted.internet.processpool import WorkerProtocol
+from twisted.internet.processpool import _WORKER_AMP_STDIN, _WORKER_AMP_STDOUT
+
+
+
+def main(_fdopen=os.fdopen, _read=os.read):
+    """
+    Main function to be run if __name__ == "__main__".
+
+    Answer calls from the pool until it closes the pipe to this process.
+
+    @param _fdopen: If specified, the function to use in place of C{os.fdopen}.
+    @param _read: If specified, the function to use in place of C{os.read}.
+    """
+    workerProtocol = WorkerProtocol()
+    protocolOut = _fdopen(_WORKER_AMP_STDOUT, 'wb')
+    workerProtocol.makeConnection(FileWrapper(protocolOut))
+
+    while True:
+        try:
+            data = _read(_WORKER_AMP_STDIN, 65536)
+        except (IOError, OSError) as e:
+            if e.args[0] == errno.EINTR:
+                continue
+            raise
+        if not data:
+            break
+        workerProtocol.dataReceived(data)
+        protocolOut.flush()
+        sys.stdout.flush()
+        sys.stderr.flush()
+
+
+
+if __name__ == '__main__':
+    main()
@@ -9,6 +9,7 @@ Support for generic select()able objects.
 from __future__ import division, absolute_import
 
 from socket import AF_INET6, inet_pton, error
+from collections import deque
 
 from zope.interface import implementer
 
@@ -20,9 +21,8 @@ from twisted.internet import interfaces, main
 if _PY3:
     def _concatenate(bObj, offset, bArray):
         # Python 3 lacks the buffer() builtin and the other primitives don't
-        # help in this case.  Just do the copy.  Perhaps later these buffers can
-        # be joined and FileDescriptor can use writev().  Or perhaps bytearrays
-        # would help.
+        # help in this case.  Just do the copy.  FileDescriptor subclasses
+        # which can use sendmsg() avoid this; see _writeVectors.
         return bObj[offset:] + b"".join(bArray)
 else:
     def _concatenate(bObj, offset, bArray):
@@ -153,6 +153,45 @@ class _LogOwner(object):
 
 
 
+class ReadBuffer(object):
+    """
+    A buffer which transports read data into with C{recv_into} or
+    C{recvfrom_into}, reused for every read instead of allocating a new
+    C{bytes} object each time.
+
+    Install one with L{ReactorBase.installReadBuffer
+    <twisted.internet.base.ReactorBase.installReadBuffer>}.  Protocols
+    providing L{IMemoryViewReceiver
+    <twisted.internet.interfaces.IMemoryViewReceiver>} are then given a
+    C{memoryview} of the data which was read; other protocols are given a
+    C{bytes} copy of only that data.
+
+    @ivar _view: A C{memoryview} of the C{bytearray} which data is read into.
+    """
+
+    def __init__(self, size=2**16):
+        """
+        @param size: The initial size of the buffer, in bytes.  The buffer
+            grows if a transport asks for a larger one.
+        @type size: C{int}
+        """
+        self._view = memoryview(bytearray(size))
+
+
+    def get(self, size):
+        """
+        Get a writeable C{memoryview} at least C{size} bytes long.
+
+        @type size: C{int}
+
+        @rtype: C{memoryview}
+        """
+        if len(self._view) < size:
+            self._view = memoryview(bytearray(size))
+        return self._view
+
+
+
 @implementer(
     interfaces.IPushProducer, interfaces.IReadWriteDescriptor,
     interfaces.IConsumer, interfaces.ITransport,
@@ -164,6 +203,9 @@ class FileDescriptor(_ConsumerMixin, _LogOwner):
     This is an abstract superclass of all objects which may be notified when
     they are readable or writable; e.g. they have a file-descriptor that is
     valid to be passed to select(2).
+
+    @ivar _vectoredWrites: If C{True}, L{doWrite} hands the buffered chunks of
+        data to L{_writeSomeVectors} without joining them together first.
     """
     connected = 0
     disconnected = 0
@@ -175,6 +217,13 @@ class FileDescriptor(_ConsumerMixin, _LogOwner):
 
     SEND_LIMIT = 128*1024
 
+    # The most chunks handed to _writeSomeVectors at once.  POSIX only
+    # guarantees IOV_MAX to be at least 16, but it is 1024 on all common
+    # platforms.
+    _VECTOR_LIMIT = 1024
+
+    _vectoredWrites = False
+
     def __init__(self, reactor=None):
         """
         @param reactor: An L{IReactorFDSet} provider which this descriptor will
@@ -184,7 +233,7 @@ class FileDescriptor(_ConsumerMixin, _LogOwner):
         if not reactor:
             from twisted.internet import reactor
         self.reactor = reactor
-        self._tempDataBuffer = [] # will be added to dataBuffer in doWrite
+        self._tempDataBuffer = deque() # will be added to dataBuffer in doWrite
         self._tempDataLen = 0
 
 
@@ -221,6 +270,22 @@ class FileDescriptor(_ConsumerMixin, _LogOwner):
                                   reflect.qual(self.__class__))
 
 
+    def _writeSomeVectors(self, vectors):
+        """
+        Write as much as possible of the given chunks of data, in order, to
+        the physical connection.
+
+        Subclasses which set C{_vectoredWrites} must override this method.
+
+        @param vectors: A non-empty C{list} of bytes-like objects.
+
+        @return: The number of bytes written, or an exception if the
+            connection was lost.
+        """
+        raise NotImplementedError("%s does not implement _writeSomeVectors" %
+                                  reflect.qual(self.__class__))
+
+
     def doRead(self):
         """
         Called when data is available for reading.
@@ -240,20 +305,24 @@ class FileDescriptor(_ConsumerMixin, _LogOwner):
 
         @see: L{twisted.internet.interfaces.IWriteDescriptor.doWrite}.
         """
-        if len(self.dataBuffer) - self.offset < self.SEND_LIMIT:
-            # If there is currently less than SEND_LIMIT bytes left to send
-            # in the string, extend it with the array data.
-            self.dataBuffer = _concatenate(
-                self.dataBuffer, self.offset, self._tempDataBuffer)
-            self.offset = 0
-            self._tempDataBuffer = []
-            self._tempDataLen = 0
-
-        # Send as much data as you can.
-        if self.offset:
-            l = self.writeSomeData(lazyByteSlice(self.dataBuffer, self.offset))
+        if self._vectoredWrites:
+            l = self._writeVectors()
         else:
-            l = self.writeSomeData(self.dataBuffer)
+            if len(self.dataBuffer) - self.offset < self.SEND_LIMIT:
+                # If there is currently less than SEND_LIMIT bytes left to
+                # send in the string, extend it with the array data.
+                self.dataBuffer = _concatenate(
+                    self.dataBuffer, self.offset, self._tempDataBuffer)
+                self.offset = 0
+                self._tempDataBuffer = deque()
+                self._tempDataLen = 0
+
+            # Send as much data as you can.
+            if self.offset:
+                l = self.writeSomeData(
+                    lazyByteSlice(self.dataBuffer, self.offset))
+            else:
+                l = self.writeSomeData(self.dataBuffer)
 
         # There is no writeSomeData implementation in Twisted which returns
         # < 0, but the documentation for writeSomeData used to claim negative
@@ -261,7 +330,10 @@ class FileDescriptor(_ConsumerMixin, _LogOwner):
         # although it may be worth deprecating and removing at some point.
         if isinstance(l, Exception) or l < 0:
             return l
-        self.offset += l
+        if self._vectoredWrites:
+            self._advanceVectors(l)
+        else:
+            self.offset += l
         # If there is nothing left to send,
         if self.offset == len(self.dataBuffer) and not self._tempDataLen:
             self.dataBuffer = b""
@@ -288,6 +360,60 @@ class FileDescriptor(_ConsumerMixin, _LogOwner):
                 return result
         return None
 
+
+    def _writeVectors(self):
+        """
+        Hand the unsent part of C{dataBuffer} and as many of the chunks in
+        C{_tempDataBuffer} as fit within C{SEND_LIMIT} to
+        L{_writeSomeVectors}, without copying any of them.
+
+        @return: The result of L{_writeSomeVectors}.
+        """
+        vectors = []
+        total = len(self.dataBuffer) - self.offset
+        if self.offset:
+            vectors.append(memoryview(self.dataBuffer)[self.offset:])
+        elif total:
+            vectors.append(self.dataBuffer)
+        for chunk in self._tempDataBuffer:
+            if total >= self.SEND_LIMIT or len(vectors) >= self._VECTOR_LIMIT:
+                break
+            if chunk:
+                vectors.append(chunk)
+                total += len(chunk)
+        if not vectors:
+            return 0
+        return self._writeSomeVectors(vectors)
+
+
+    def _advanceVectors(self, written):
+        """
+        Discard the first C{written} bytes of buffered data.  The chunk which
+        was only partly written, if any, becomes C{dataBuffer}.
+
+        @param written: The number of bytes written by L{_writeSomeVectors}.
+        @type written: C{int}
+        """
+        remaining = len(self.dataBuffer) - self.offset
+        if written < remaining:
+            self.offset += written
+            return
+        written -= remaining
+        chunks = self._tempDataBuffer
+        while chunks and written >= len(chunks[0]):
+            chunk = chunks.popleft()
+            written -= len(chunk)
+            self._tempDataLen -= len(chunk)
+        if written:
+            chunk = chunks.popleft()
+            self._tempDataLen -= len(chunk)
+            self.dataBuffer = chunk
+            self.offset = written
+        else:
+            self.dataBuffer = b""
+            self.offset = 0
+
+
     def _postLoseConnection(self):
         """Called after a loseConnection(), when all data has been written.
 
@@ -13,14 +13,14 @@ from zope.interface import implementer, classImplements
 
 import sys
 import warnings
-from heapq import heappush, heappop, heapify
-
 import traceback
+from collections import deque
 
 from twisted.internet.interfaces import IReactorCore, IReactorTime, IReactorThreads
 from twisted.internet.interfaces import IResolverSimple, IReactorPluggableResolver
 from twisted.internet.interfaces import IConnector, IDelayedCall
 from twisted.internet import fdesc, main, error, abstract, defer, threads
+from twisted.internet.timerqueue import ITimerQueue, HeapTimerQueue
 from twisted.python import log, failure, _reflectpy3 as reflect
 from twisted.python.runtime import seconds as runtimeSeconds, platform
 from twisted.internet.defer import Deferred, DeferredList
@@ -31,12 +31,18 @@ from twisted.python import threadable
 
 
 @implementer(IDelayedCall)
-class DelayedCall:
+class DelayedCall(object):
+
+    # A reactor may have a great many of these pending, so keep them small.
+    # Code may still set its own attributes on them: the __dict__ is only
+    # allocated when it does.
+    __slots__ = ('time', 'func', 'args', 'kw', 'resetter', 'canceller',
+                 'seconds', 'cancelled', 'called', 'delayed_time', 'creator',
+                 '_str', '__dict__', '__weakref__')
 
     # enable .debug to record creator call stack, and it will be logged if
     # an exception occurs while the function is being run
     debug = False
-    _str = None
 
     def __init__(self, time, func, args, kw, cancel, reset,
                  seconds=runtimeSeconds):
@@ -62,6 +68,7 @@ class DelayedCall:
         self.seconds = seconds
         self.cancelled = self.called = 0
         self.delayed_time = 0
+        self._str = None
         if self.debug:
             self.creator = traceback.format_stack()[:-2]
 
@@ -460,9 +467,30 @@ class ReactorBase(object):
     @ivar _registerAsIOThread: A flag controlling whether the reactor will
         register the thread it is running in as the I/O thread when it starts.
         If C{True}, registration will be done, otherwise it will not be.
+
+    @ivar _timerQueue: The L{ITimerQueue} provider which keeps track of the
+        L{DelayedCall}s scheduled with this reactor.
+
+    @ivar _readBuffer: The L{twisted.internet.abstract.ReadBuffer} which
+        transports read data into, or C{None} if they allocate a new C{bytes}
+        object for every read.
+
+    @ivar _instrumentation: The
+        L{twisted.internet.instrumentation.ReactorInstrumentation} recording
+        where the main loop spends its time, or C{None}.
+
+    @ivar threadCallQueue: A C{deque} of C{(f, args, kw)} tuples added by
+        C{callFromThread} and run by L{runUntilCurrent}.
+
+    @ivar _threadCallWakeUpPending: A flag which is true from the time
+        C{callFromThread} wakes up the reactor until L{runUntilCurrent} starts
+        running the queued calls.  While it is set, further calls are queued
+        without waking the reactor again, so a burst of calls from threads
+        costs one wake-up rather than one each.
     """
 
     _registerAsIOThread = True
+    _threadCallWakeUpPending = False
 
     _stopped = True
     installed = False
@@ -472,11 +500,11 @@ class ReactorBase(object):
     __name__ = "twisted.internet.reactor"
 
     def __init__(self):
-        self.threadCallQueue = []
+        self.threadCallQueue = deque()
         self._eventTriggers = {}
-        self._pendingTimedCalls = []
-        self._newTimedCalls = []
-        self._cancellations = 0
+        self._timerQueue = HeapTimerQueue()
+        self._readBuffer = None
+        self._instrumentation = None
         self.running = False
         self._started = False
         self._justStopped = False
@@ -511,6 +539,55 @@ class ReactorBase(object):
         self.resolver = resolver
         return oldResolver
 
+    def installTimerQueue(self, timerQueue):
+        """
+        Set the queue used to keep track of delayed calls.
+
+        Any calls which are already scheduled are added to the new queue.
+
+        @param timerQueue: The new queue.
+        @type timerQueue: L{twisted.internet.timerqueue.ITimerQueue} provider
+
+        @return: The previously installed queue.
+        """
+        assert ITimerQueue.providedBy(timerQueue)
+        oldTimerQueue = self._timerQueue
+        for call in oldTimerQueue.getDelayedCalls():
+            timerQueue.add(call)
+        self._timerQueue = timerQueue
+        return oldTimerQueue
+
+    def installReadBuffer(self, readBuffer):
+        """
+        Set the buffer which TCP and UDP transports read data into.
+
+        @param readBuffer: The new buffer, or C{None} to have transports
+            allocate a new C{bytes} object for every read, which is the
+            default.
+        @type readBuffer: L{twisted.internet.abstract.ReadBuffer} or C{None}
+
+        @return: The previously installed buffer.
+        """
+        oldReadBuffer = self._readBuffer
+        self._readBuffer = readBuffer
+        return oldReadBuffer
+
+    def installInstrumentation(self, instrumentation):
+        """
+        Set the object which records where the main loop spends its time.
+
+        @param instrumentation: The new instrumentation, or C{None} to stop
+            recording, which is the default.
+        @type instrumentation:
+            L{twisted.internet.instrumentation.ReactorInstrumentation} or
+            C{None}
+
+        @return: The previously installed instrumentation.
+        """
+        oldInstrumentation = self._instrumentation
+        self._instrumentation = instrumentation
+        return oldInstrumentation
+
     def wakeUp(self):
         """
         Wake up the event loop.
@@ -709,31 +786,14 @@ class ReactorBase(object):
                            self._cancelCallLater,
                            self._moveCallLaterSooner,
                            seconds=self.seconds)
-        self._newTimedCalls.append(tple)
+        self._timerQueue.add(tple)
         return tple
 
     def _moveCallLaterSooner(self, tple):
-        # Linear time find: slow.
-        heap = self._pendingTimedCalls
-        try:
-            pos = heap.index(tple)
-
-            # Move elt up the heap until it rests at the right place.
-            elt = heap[pos]
-            while pos != 0:
-                parent = (pos-1) // 2
-                if heap[parent] <= elt:
-                    break
-                # move parent down
-                heap[pos] = heap[parent]
-                pos = parent
-            heap[pos] = elt
-        except ValueError:
-            # element was not found in heap - oh well...
-            pass
+        self._timerQueue.moveSooner(tple)
 
     def _cancelCallLater(self, tple):
-        self._cancellations+=1
+        self._timerQueue.cancel(tple)
 
 
     def getDelayedCalls(self):
@@ -741,16 +801,7 @@ class ReactorBase(object):
         They are returned in no particular order.
         This method is not efficient -- it is really only meant for
         test cases."""
-        return [x for x in (self._pendingTimedCalls + self._newTimedCalls) if not x.cancelled]
-
-    def _insertNewDelayedCalls(self):
-        for call in self._newTimedCalls:
-            if call.cancelled:
-                self._cancellations-=1
-            else:
-                call.activate_delay()
-                heappush(self._pendingTimedCalls, call)
-        self._newTimedCalls = []
+        return self._timerQueue.getDelayedCalls()
 
 
     def timeout(self):
@@ -762,13 +813,11 @@ class ReactorBase(object):
         @return: The maximum number of seconds the reactor may sleep.
         @rtype: L{float}
         """
-        # insert new delayed calls to make sure to include them in timeout value
-        self._insertNewDelayedCalls()
-
-        if not self._pendingTimedCalls:
+        nextTime = self._timerQueue.nextTime()
+        if nextTime is None:
             return None
 
-        delay = self._pendingTimedCalls[0].time - self.seconds()
+        delay = nextTime - self.seconds()
 
         # Pick a somewhat arbitrary maximum possible value for the timeout.
         # This value is 2 ** 31 / 1000, which is the number of seconds which can
@@ -786,42 +835,37 @@ class ReactorBase(object):
     def runUntilCurrent(self):
         """Run all pending timed calls.
         """
-        if self.threadCallQueue:
-            # Keep track of how many calls we actually make, as we're
-            # making them, in case another call is added to the queue
-            # while we're in this loop.
-            count = 0
-            total = len(self.threadCallQueue)
-            for (f, a, kw) in self.threadCallQueue:
+        instrumentation = self._instrumentation
+        # Clear the flag before looking at the queue: a call added after this
+        # point either is run below or wakes the reactor up again.
+        self._threadCallWakeUpPending = False
+        queue = self.threadCallQueue
+        if queue:
+            # Only run the calls which are already queued, in case more are
+            # added while we're in this loop; those wake the reactor up
+            # themselves.
+            total = len(queue)
+            if instrumentation is not None:
+                instrumentation.recordThreadCallQueue(total)
+            popleft = queue.popleft
+            for i in range(total):
+                f, a, kw = popleft()
                 try:
-                    f(*a, **kw)
+                    if instrumentation is None:
+                        f(*a, **kw)
+                    else:
+                        instrumentation.runThreadCall(f, a, kw)
                 except:
                     log.err()
-                count += 1
-                if count == total:
-                    break
-            del self.threadCallQueue[:count]
-            if self.threadCallQueue:
-                self.wakeUp()
-
-        # insert new delayed calls now
-        self._insertNewDelayedCalls()
 
         now = self.seconds()
-        while self._pendingTimedCalls and (self._pendingTimedCalls[0].time <= now):
-            call = heappop(self._pendingTimedCalls)
-            if call.cancelled:
-                self._cancellations-=1
-                continue
-
-            if call.delayed_time > 0:
-                call.activate_delay()
-                heappush(self._pendingTimedCalls, call)
-                continue
-
+        for call in self._timerQueue.expire(now):
             try:
                 call.called = 1
-                call.func(*call.args, **call.kw)
+                if instrumentation is None:
+                    call.func(*call.args, **call.kw)
+                else:
+                    instrumentation.runTimedCall(call.func, call.args, call.kw)
             except:
                 log.deferr()
                 if hasattr(call, "creator"):
@@ -833,14 +877,6 @@ class ReactorBase(object):
                     e += "\n"
                     log.msg(e)
 
-
-        if (self._cancellations > 50 and
-             self._cancellations > len(self._pendingTimedCalls) >> 1):
-            self._cancellations = 0
-            self._pendingTimedCalls = [x for x in self._pendingTimedCalls
-                                       if not x.cancelled]
-            heapify(self._pendingTimedCalls)
-
         if self._justStopped:
             self._justStopped = False
             self.fireSystemEvent("shutdown")
@@ -941,11 +977,15 @@ class ReactorBase(object):
             See L{twisted.internet.interfaces.IReactorThreads.callFromThread}.
             """
             assert callable(f), "%s is not callable" % (f,)
-            # lists are thread-safe in CPython, but not in Jython
+            # deques are thread-safe in CPython, but not in Jython
             # this is probably a bug in Jython, but until fixed this code
             # won't work in Jython.
             self.threadCallQueue.append((f, args, kw))
-            self.wakeUp()
+            # Only the first call since the reactor last emptied the queue
+            # needs to wake it up; see runUntilCurrent.
+            if not self._threadCallWakeUpPending:
+                self._threadCallWakeUpPending = True
+                self.wakeUp()
 
         def _initThreadPool(self):
             """
@@ -177,13 +177,38 @@ def getDebugging():
     return Deferred.debug
 
 
+
+def setProfiler(profiler):
+    """
+    Start or stop profiling L{Deferred} callbacks.
+
+    While a profiler is installed, the time spent in each callback and each
+    step of an L{inlineCallbacks} generator, and how long each waited for its
+    result, are recorded in it.  Otherwise, the only cost is a few checks
+    for C{None}.
+
+    @param profiler: A L{DeferredProfiler
+        <twisted.internet.instrumentation.DeferredProfiler>}, or C{None} to
+        stop profiling.
+    """
+    Deferred._profiler = profiler
+
+
+
+def getProfiler():
+    """
+    Return the profiler installed by L{setProfiler}, or C{None}.
+    """
+    return Deferred._profiler
+
+
 # See module docstring.
 _NO_RESULT = object()
 _CONTINUE = object()
 
 
 
-class Deferred:
+class Deferred(object):
     """
     This is a callback which will be put off until later.
 
@@ -225,23 +250,35 @@ class Deferred:
 
     @ivar _chainedTo: If this Deferred is waiting for the result of another
         Deferred, this is a reference to the other Deferred.  Otherwise, C{None}.
-    """
 
-    called = False
-    paused = 0
-    _debugInfo = None
-    _suppressAlreadyCalled = False
+    @ivar callbacks: The C{list} of pairs of callback and errback tuples
+        which have yet to run.
+
+    @ivar _callbacks: The storage for C{callbacks}: C{None} if there are no
+        callbacks, a single pair if there is just one (by far the most common
+        case, which then needs no C{list}), or the C{list} itself.
+
+    @ivar _profileCreated: If this Deferred was created while a profiler was
+        installed with L{setProfiler}, the time it was created.
+
+    @ivar _profileWait: If this Deferred was created and given its result
+        while a profiler was installed, the time between the two.
+    """
 
-    # Are we currently running a user-installed callback?  Meant to prevent
-    # recursive running of callbacks when a reentrant call to add a callback is
-    # used.
-    _runningCallbacks = False
+    # Deferreds are created in very large numbers and many are alive at once,
+    # so keep them small.  Code may still set its own attributes on them:
+    # the __dict__ is only allocated when it does.
+    __slots__ = ('called', 'paused', 'result', '_callbacks', '_canceller',
+                 '_debugInfo', '_suppressAlreadyCalled', '_runningCallbacks',
+                 '_chainedTo', '_profileCreated', '_profileWait',
+                 '__dict__', '__weakref__')
 
     # Keep this class attribute for now, for compatibility with code that
     # sets it directly.
     debug = False
 
-    _chainedTo = None
+    # See setProfiler.
+    _profiler = None
 
     def __init__(self, canceller=None):
         """
@@ -267,11 +304,52 @@ class Deferred:
         @type canceller: a 1-argument callable which takes a L{Deferred}. The
             return result is ignored.
         """
-        self.callbacks = []
+        self.called = False
+        self.paused = 0
+        self._callbacks = None
         self._canceller = canceller
+        self._suppressAlreadyCalled = False
+        # Are we currently running a user-installed callback?  Meant to
+        # prevent recursive running of callbacks when a reentrant call to add
+        # a callback is used.
+        self._runningCallbacks = False
+        self._chainedTo = None
         if self.debug:
             self._debugInfo = DebugInfo()
             self._debugInfo.creator = traceback.format_stack()[:-1]
+        else:
+            self._debugInfo = None
+        if self._profiler is not None:
+            self._profileCreated = self._profiler.seconds()
+
+
+    def _getCallbacks(self):
+        callbacks = self._callbacks
+        if callbacks is None:
+            callbacks = self._callbacks = []
+        elif type(callbacks) is tuple:
+            callbacks = self._callbacks = [callbacks]
+        return callbacks
+
+
+    def _setCallbacks(self, callbacks):
+        self._callbacks = callbacks
+
+    callbacks = property(_getCallbacks, _setCallbacks)
+
+
+    def _appendCallbacks(self, cbs):
+        """
+        Add a pair of callback and errback tuples to C{callbacks}, without
+        allocating a C{list} for the first.
+        """
+        callbacks = self._callbacks
+        if callbacks is None:
+            self._callbacks = cbs
+        elif type(callbacks) is tuple:
+            self._callbacks = [callbacks, cbs]
+        else:
+            callbacks.append(cbs)
 
 
     def addCallbacks(self, callback, errback=None,
@@ -289,7 +367,14 @@ class Deferred:
         assert errback == None or callable(errback)
         cbs = ((callback, callbackArgs, callbackKeywords),
                (errback or (passthru), errbackArgs, errbackKeywords))
-        self.callbacks.append(cbs)
+        # Inlined _appendCallbacks, since this is called so often.
+        callbacks = self._callbacks
+        if callbacks is None:
+            self._callbacks = cbs
+        elif type(callbacks) is tuple:
+            self._callbacks = [callbacks, cbs]
+        else:
+            callbacks.append(cbs)
 
         if self.called:
             self._runCallbacks()
@@ -485,11 +570,23 @@ class Deferred:
             if self._debugInfo is None:
                 self._debugInfo = DebugInfo()
             self._debugInfo.invoker = traceback.format_stack()[:-2]
+        if self._profiler is not None:
+            self._profileFired()
         self.called = True
         self.result = result
         self._runCallbacks()
 
 
+    def _profileFired(self):
+        """
+        Record how long this Deferred took to fire, if it was created while
+        profiling.
+        """
+        created = getattr(self, '_profileCreated', None)
+        if created is not None:
+            self._profileWait = self._profiler.seconds() - created
+
+
     def _continuation(self):
         """
         Build a tuple of callback and errback with L{_continue} to be used by
@@ -535,6 +632,7 @@ class Deferred:
         # and then that second Deferred being fired.  ie, if ever had _chainedTo
         # set to something other than None, you might end up on this stack.
         chain = [self]
+        profiler = self._profiler
 
         while chain:
             current = chain[-1]
@@ -547,8 +645,12 @@ class Deferred:
 
             finished = True
             current._chainedTo = None
-            while current.callbacks:
-                item = current.callbacks.pop(0)
+            while current._callbacks:
+                item = current._callbacks
+                if type(item) is tuple:
+                    current._callbacks = None
+                else:
+                    item = item.pop(0)
                 callback, args, kw = item[
                     isinstance(current.result, failure.Failure)]
                 args = args or ()
@@ -565,6 +667,8 @@ class Deferred:
                     if current._debugInfo is not None:
                         current._debugInfo.failResult = None
                     chainee.paused -= 1
+                    if profiler is not None:
+                        chainee._profileFired()
                     chain.append(chainee)
                     # Delay cleaning this Deferred and popping it from the chain
                     # until after we've dealt with chainee.
@@ -574,7 +678,18 @@ class Deferred:
                 try:
                     current._runningCallbacks = True
                     try:
-                        current.result = callback(current.result, *args, **kw)
+                        if profiler is None or callback is passthru:
+                            current.result = callback(
+                                current.result, *args, **kw)
+                        else:
+                            start = profiler.seconds()
+                            try:
+                                current.result = callback(
+                                    current.result, *args, **kw)
+                            finally:
+                                profiler.recordCallback(
+                                    callback, profiler.seconds() - start,
+                                    getattr(current, '_profileWait', None))
                         if current.result is current:
                             warnAboutFunction(
                                 callback,
@@ -601,7 +716,8 @@ class Deferred:
                             # running its callbacks right now.  Therefore we can
                             # append to the callbacks list directly instead of
                             # using addCallbacks.
-                            current.result.callbacks.append(current._continuation())
+                            current.result._appendCallbacks(
+                                current._continuation())
                             break
                         else:
                             # Yep, it did.  Steal it.
@@ -1077,9 +1193,12 @@ def returnValue(val):
 
 
 
-def _inlineCallbacks(result, g, deferred):
+def _inlineCallbacks(result, g, deferred, suspendedAt=None):
     """
     See L{inlineCallbacks}.
+
+    @param suspendedAt: If profiling, the time C{g} yielded the L{Deferred}
+        which C{result} is the result of, if it was not ready then.
     """
     # This function is complicated by the need to prevent unbounded recursion
     # arising from repeatedly yielding immediately ready deferreds.  This while
@@ -1087,16 +1206,37 @@ def _inlineCallbacks(result, g, deferred):
     # recursion.
 
     waiting = [True, # waiting for result?
-               None] # result
+               None, # result
+               None] # when we started waiting, if profiling
+
+    profiler = Deferred._profiler
 
     while 1:
         try:
             # Send the last result back as the result of the yield expression.
             isFailure = isinstance(result, failure.Failure)
-            if isFailure:
-                result = result.throwExceptionIntoGenerator(g)
+            if profiler is None:
+                if isFailure:
+                    result = result.throwExceptionIntoGenerator(g)
+                else:
+                    result = g.send(result)
             else:
-                result = g.send(result)
+                # Timed inline: an extra frame here would confuse the
+                # returnValue check below.
+                start = profiler.seconds()
+                frame = g.gi_frame
+                wait = None
+                if suspendedAt is not None:
+                    wait = start - suspendedAt
+                    suspendedAt = None
+                try:
+                    if isFailure:
+                        result = result.throwExceptionIntoGenerator(g)
+                    else:
+                        result = g.send(result)
+                finally:
+                    profiler.recordGenerator(
+                        frame, profiler.seconds() - start, wait)
         except StopIteration:
             # fell off the end, or "return" statement
             deferred.callback(None)
@@ -1152,13 +1292,15 @@ def _inlineCallbacks(result, g, deferred):
                     waiting[0] = False
                     waiting[1] = r
                 else:
-                    _inlineCallbacks(r, g, deferred)
+                    _inlineCallbacks(r, g, deferred, waiting[2])
 
             result.addBoth(gotResult)
             if waiting[0]:
                 # Haven't called back yet, set flag so that we get reinvoked
                 # and return from the loop
                 waiting[0] = False
+                if profiler is not None:
+                    waiting[2] = profiler.seconds()
                 return deferred
 
             result = waiting[1]
@@ -22,6 +22,7 @@ from zope.interface import implementer, directlyProvides
 import warnings
 
 from twisted.python.compat import _PY3
+from twisted.python.runtime import platform
 from twisted.internet import interfaces, defer, error, fdesc, threads
 from twisted.internet.protocol import (
         ClientFactory, Protocol, ProcessProtocol, Factory)
@@ -426,13 +427,88 @@ class ProcessEndpoint(object):
 
 
 
+def _soReusePort():
+    """
+    Find the value of the C{SO_REUSEPORT} socket option.
+
+    Python 2 does not define C{socket.SO_REUSEPORT}, so on Linux, where the
+    option exists since 3.9, its value is supplied here for the architectures
+    using the generic socket option numbers.  Elsewhere the option is only
+    available if the C{socket} module defines it.
+
+    @return: The option number, or C{None} if it is not supported.
+    @rtype: C{int} or C{NoneType}
+    """
+    value = getattr(socket, "SO_REUSEPORT", None)
+    if value is None and platform.isLinux():
+        # Alpha, MIPS, PA-RISC and SPARC number their socket options
+        # differently.
+        machine = os.uname()[4]
+        if not machine.startswith(("alpha", "mips", "parisc", "sparc")):
+            value = 15
+    return value
+
+_SO_REUSEPORT = _soReusePort()
+
+
+
+def _listeningSocket(addressFamily, interface, port, backlog,
+                     reusePort=False):
+    """
+    Create a listening TCP socket for a reactor to adopt with
+    L{IReactorSocket.adoptStreamPort}, possibly in another process.
+
+    @param addressFamily: L{socket.AF_INET} or L{socket.AF_INET6}.
+
+    @param interface: The address to bind to.
+    @type interface: C{str}
+
+    @param port: The port number to bind to.
+    @type port: C{int}
+
+    @param backlog: Size of the listen queue.
+    @type backlog: C{int}
+
+    @param reusePort: If true, set C{SO_REUSEPORT} on the socket, so that
+        other sockets (usually in other processes) may be bound to the same
+        address and share its incoming connections.
+    @type reusePort: C{bool}
+
+    @raise CannotListenError: If C{SO_REUSEPORT} is requested but not
+        supported, or the socket cannot be bound.
+
+    @return: A non-blocking, close-on-exec, listening L{socket.socket}.
+    """
+    if reusePort and _SO_REUSEPORT is None:
+        raise error.CannotListenError(
+            interface, port, "SO_REUSEPORT is not supported on this platform")
+    skt = socket.socket(addressFamily, socket.SOCK_STREAM)
+    try:
+        skt.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        if reusePort:
+            skt.setsockopt(socket.SOL_SOCKET, _SO_REUSEPORT, 1)
+        skt.bind((interface, port))
+        skt.listen(backlog)
+    except socket.error as e:
+        skt.close()
+        raise error.CannotListenError(interface, port, e)
+    fdesc.setNonBlocking(skt.fileno())
+    fdesc._setCloseOnExec(skt.fileno())
+    return skt
+
+
+
 @implementer(interfaces.IStreamServerEndpoint)
 class _TCPServerEndpoint(object):
     """
     A TCP server endpoint interface
+
+    @cvar _addressFamily: The address family of the sockets created when
+        C{reuseport} is set.
     """
+    _addressFamily = AF_INET
 
-    def __init__(self, reactor, port, backlog, interface):
+    def __init__(self, reactor, port, backlog, interface, reuseport=False):
         """
         @param reactor: An L{IReactorTCP} provider.
 
@@ -444,11 +520,18 @@ class _TCPServerEndpoint(object):
 
         @param interface: The hostname to bind to
         @type interface: str
+
+        @param reuseport: If true, set C{SO_REUSEPORT} on the listening
+            socket so that several processes can listen on the same port and
+            have the kernel spread connections between them.  C{reactor}
+            must then also provide L{IReactorSocket}.
+        @type reuseport: bool
         """
         self._reactor = reactor
         self._port = port
         self._backlog = backlog
         self._interface = interface
+        self._reuseport = reuseport
 
 
     def listen(self, protocolFactory):
@@ -456,6 +539,8 @@ class _TCPServerEndpoint(object):
         Implement L{IStreamServerEndpoint.listen} to listen on a TCP
         socket
         """
+        if self._reuseport:
+            return defer.execute(self._listenReusePort, protocolFactory)
         return defer.execute(self._reactor.listenTCP,
                              self._port,
                              protocolFactory,
@@ -463,12 +548,27 @@ class _TCPServerEndpoint(object):
                              interface=self._interface)
 
 
+    def _listenReusePort(self, protocolFactory):
+        """
+        Listen on a socket with C{SO_REUSEPORT} set, handing it to the
+        reactor with L{IReactorSocket.adoptStreamPort}.
+        """
+        skt = _listeningSocket(self._addressFamily, self._interface,
+                               self._port, self._backlog, reusePort=True)
+        try:
+            return self._reactor.adoptStreamPort(
+                skt.fileno(), self._addressFamily, protocolFactory)
+        finally:
+            skt.close()
+
+
 
 class TCP4ServerEndpoint(_TCPServerEndpoint):
     """
     Implements TCP server endpoint with an IPv4 configuration
     """
-    def __init__(self, reactor, port, backlog=50, interface=''):
+    def __init__(self, reactor, port, backlog=50, interface='',
+                 reuseport=False):
         """
         @param reactor: An L{IReactorTCP} provider.
 
@@ -480,8 +580,13 @@ class TCP4ServerEndpoint(_TCPServerEndpoint):
 
         @param interface: The hostname to bind to, defaults to '' (all)
         @type interface: str
+
+        @param reuseport: Whether to set C{SO_REUSEPORT} on the listening
+            socket.  See L{_TCPServerEndpoint.__init__}.
+        @type reuseport: bool
         """
-        _TCPServerEndpoint.__init__(self, reactor, port, backlog, interface)
+        _TCPServerEndpoint.__init__(self, reactor, port, backlog, interface,
+                                    reuseport)
 
 
 
@@ -489,7 +594,10 @@ class TCP6ServerEndpoint(_TCPServerEndpoint):
     """
     Implements TCP server endpoint with an IPv6 configuration
     """
-    def __init__(self, reactor, port, backlog=50, interface='::'):
+    _addressFamily = AF_INET6
+
+    def __init__(self, reactor, port, backlog=50, interface='::',
+                 reuseport=False):
         """
         @param reactor: An L{IReactorTCP} provider.
 
@@ -501,8 +609,13 @@ class TCP6ServerEndpoint(_TCPServerEndpoint):
 
         @param interface: The hostname to bind to, defaults to '' (all)
         @type interface: str
+
+        @param reuseport: Whether to set C{SO_REUSEPORT} on the listening
+            socket.  See L{_TCPServerEndpoint.__init__}.
+        @type reuseport: bool
         """
-        _TCPServerEndpoint.__init__(self, reactor, port, backlog, interface)
+        _TCPServerEndpoint.__init__(self, reactor, port, backlog, interface,
+                                    reuseport)
 
 
 
@@ -998,7 +1111,28 @@ class AdoptedStreamServerEndpoint(object):
 
 
 
-def _parseTCP(factory, port, interface="", backlog=50):
+def _parseBoolean(value):
+    """
+    Convert a strports boolean, such as C{"yes"} or C{"0"}, to a C{bool}.
+
+    @param value: One of C{"yes"}, C{"true"}, C{"1"}, C{"no"}, C{"false"} or
+        C{"0"}, in any case.
+    @type value: C{str}
+
+    @raise ValueError: If C{value} is not one of those strings.
+
+    @rtype: C{bool}
+    """
+    lowered = value.lower()
+    if lowered in ("yes", "true", "1"):
+        return True
+    if lowered in ("no", "false", "0"):
+        return False
+    raise ValueError("Invalid boolean value: %r" % (value,))
+
+
+
+def _parseTCP(factory, port, interface="", backlog=50, reuseport=None):
     """
     Internal parser function for L{_parseServer} to convert the string
     arguments for a TCP(IPv4) stream endpoint into the structured arguments.
@@ -1016,12 +1150,20 @@ def _parseTCP(factory, port, interface="", backlog=50):
     @param backlog: the length of the listen queue
     @type backlog: C{str}
 
+    @param reuseport: Whether to set C{SO_REUSEPORT} on the listening socket,
+        as a string like C{"yes"} or C{"no"}.  If given, it is included in the
+        keyword arguments; L{TCP4ServerEndpoint} accepts it but
+        L{IReactorTCP.listenTCP} does not.
+    @type reuseport: C{str}
+
     @return: a 2-tuple of (args, kwargs), describing  the parameters to
         L{IReactorTCP.listenTCP} (or, modulo argument 2, the factory, arguments
         to L{TCP4ServerEndpoint}.
     """
-    return (int(port), factory), {'interface': interface,
-                                  'backlog': int(backlog)}
+    kw = {'interface': interface, 'backlog': int(backlog)}
+    if reuseport is not None:
+        kw['reuseport'] = _parseBoolean(reuseport)
+    return (int(port), factory), kw
 
 
 
@@ -1210,6 +1352,71 @@ class _SystemdParser(object):
 
 
 
+# The environment variable naming the address families of the listening
+# sockets a process inherited from its parent, such as a twistd run with
+# --workers, at descriptors 3, 4 and so on.
+_INHERITED_SOCKETS = "TWISTED_INHERITED_SOCKETS"
+
+
+
+@implementer(IPlugin, IStreamServerEndpointStringParser)
+class _InheritedParser(object):
+    """
+    Stream server endpoint string parser for the I{inherited} endpoint type,
+    which accepts connections from a listening socket inherited from the
+    parent process.
+
+    The parent passes its listening sockets as consecutive descriptors
+    starting at 3 and names their address families, separated by commas, in
+    the I{TWISTED_INHERITED_SOCKETS} environment variable; for example
+    C{"INET,INET6"}.  C{twistd --workers} does this for each of its
+    C{--shared-port} options.
+
+    @ivar prefix: See L{IStreamServerEndpointStringParser.prefix}.
+
+    @ivar _environ: The environment to look up the inherited sockets in, or
+        C{None} to use L{os.environ}.
+    """
+    prefix = "inherited"
+    _environ = None
+    _START = 3
+
+    def _parseServer(self, reactor, index):
+        """
+        Internal parser function for L{_parseServer} to convert the string
+        arguments for an inherited server endpoint into structured arguments
+        for L{AdoptedStreamServerEndpoint}.
+
+        @param reactor: An L{IReactorSocket} provider.
+
+        @param index: The position of the socket among those inherited.
+        @type index: C{str}
+
+        @raise ValueError: If no socket was inherited at C{index}.
+
+        @return: An L{AdoptedStreamServerEndpoint}.
+        """
+        environ = self._environ
+        if environ is None:
+            environ = os.environ
+        index = int(index)
+        domains = environ.get(_INHERITED_SOCKETS, "")
+        domains = [domain for domain in domains.split(",") if domain]
+        if not 0 <= index < len(domains):
+            raise ValueError(
+                "No inherited listening socket at index %d" % (index,))
+        addressFamily = getattr(socket, 'AF_' + domains[index])
+        return AdoptedStreamServerEndpoint(
+            reactor, self._START + index, addressFamily)
+
+
+    def parseStreamServer(self, reactor, *args, **kwargs):
+        # Redirects to another function (self._parseServer), tricks zope.interface
+        # into believing the interface is correctly implemented.
+        return self._parseServer(reactor, *args, **kwargs)
+
+
+
 @implementer(IPlugin, IStreamServerEndpointStringParser)
 class _TCP6ServerParser(object):
     """
@@ -1219,7 +1426,8 @@ class _TCP6ServerParser(object):
     """
     prefix = "tcp6"     # Used in _parseServer to identify the plugin with the endpoint type
 
-    def _parseServer(self, reactor, port, backlog=50, interface='::'):
+    def _parseServer(self, reactor, port, backlog=50, interface='::',
+                     reuseport='no'):
         """
         Internal parser function for L{_parseServer} to convert the string
         arguments into structured arguments for the L{TCP6ServerEndpoint}
@@ -1234,10 +1442,15 @@ class _TCP6ServerParser(object):
 
         @param interface: The hostname to bind to
         @type interface: str
+
+        @param reuseport: Whether to set C{SO_REUSEPORT} on the listening
+            socket, for example C{"yes"} or C{"no"}.
+        @type reuseport: str
         """
         port = int(port)
         backlog = int(backlog)
-        return TCP6ServerEndpoint(reactor, port, backlog, interface)
+        return TCP6ServerEndpoint(reactor, port, backlog, interface,
+                                  _parseBoolean(reuseport))
 
 
     def parseStreamServer(self, reactor, *args, **kwargs):
@@ -1421,6 +1634,12 @@ def serverFromString(reactor, description):
 
         serverFromString(reactor, "tcp:80:interface=127.0.0.1")
 
+    Several processes can listen on the same TCP port, with the kernel
+    spreading incoming connections between them, if each of them sets
+    C{SO_REUSEPORT} on its listening socket with the C{reuseport} argument::
+
+        serverFromString(reactor, "tcp:80:reuseport=yes")
+
     SSL server endpoints may be specified with the 'ssl' prefix, and the
     private key and certificate files may be specified by the C{privateKey} and
     C{certKey} arguments::
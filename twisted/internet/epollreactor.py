@@ -54,6 +54,8 @@ class _ContinuousPolling(posixbase._PollLikeMixin,
     _POLL_DISCONNECTED = 1
     _POLL_IN = 2
     _POLL_OUT = 4
+    # Reads and writes of continuously polled files are not instrumented.
+    _instrumentation = None
 
 
     def __init__(self, reactor):
@@ -371,6 +373,9 @@ class EPollReactor(posixbase.PosixReactorBase, posixbase._PollLikeMixin):
         if timeout is None:
             timeout = -1  # Wait indefinitely.
 
+        instrumentation = self._instrumentation
+        if instrumentation is not None:
+            start = instrumentation.seconds()
         try:
             # Limit the number of events to the number of io objects we're
             # currently tracking (because that's maybe a good heuristic) and
@@ -385,6 +390,8 @@ class EPollReactor(posixbase.PosixReactorBase, posixbase._PollLikeMixin):
             # programming error on our part, so let's just announce them
             # loudly.
             raise
+        if instrumentation is not None:
+            instrumentation.recordPoll(instrumentation.seconds() - start)
 
         _drdw = self._doReadOrWrite
         for fd, event in l:
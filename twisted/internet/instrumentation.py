@@ -0,0 +1,515 @@
+# -*- test-case-name: twisted.internet.test.test_instrumentation -*-
+# Copyright (c) Twisted Matrix Laboratories.
+# See LICENSE for details.
+
+"""
+Instrumentation of the reactor's main loop and of L{Deferred
+<twisted.internet.defer.Deferred>} callbacks.
+
+A L{ReactorInstrumentation} installed with
+L{ReactorBase.installInstrumentation
+<twisted.internet.base.ReactorBase.installInstrumentation>} records where the
+reactor spends its time: waiting for events, running timed calls and calls
+from other threads, and reading from and writing to each class of
+selectable.  It can also log every callback which blocks the reactor for
+longer than a threshold::
+
+    from twisted.internet import reactor
+    from twisted.internet.instrumentation import ReactorInstrumentation
+    instrumentation = ReactorInstrumentation(slowCallThreshold=0.05)
+    reactor.installInstrumentation(instrumentation)
+    instrumentation.startLogging(reactor, 60)
+
+Poll wait time and I/O time are recorded by the epoll, poll and select
+reactors; the other counters are recorded by every reactor based on
+L{ReactorBase <twisted.internet.base.ReactorBase>}.  Nothing is recorded, and
+the reactor does no extra work, until an instrumentation is installed.
+
+A L{DeferredProfiler} installed with L{setProfiler
+<twisted.internet.defer.setProfiler>} records how long each callback
+function, and each step of each L{inlineCallbacks
+<twisted.internet.defer.inlineCallbacks>} generator, runs for and waits.
+"""
+
+from __future__ import division, absolute_import
+
+__metaclass__ = type
+
+import time
+
+from twisted.python import log
+from twisted.python._reflectpy3 import qual
+
+
+
+def _callableName(f):
+    """
+    Find the qualified name of a callable, for reporting.
+
+    @param f: A function, method or other callable.
+
+    @return: A name such as C{"twisted.internet.tcp.Port.doRead"}.
+    @rtype: C{str}
+    """
+    name = getattr(f, "__name__", None)
+    if name is None:
+        return qual(type(f))
+    self = getattr(f, "__self__", None)
+    if self is not None:
+        if isinstance(self, type):
+            return "%s.%s" % (qual(self), name)
+        return "%s.%s" % (qual(type(self)), name)
+    module = getattr(f, "__module__", None)
+    if module is None:
+        return name
+    return "%s.%s" % (module, name)
+
+
+
+class ReactorInstrumentation:
+    """
+    Counters describing how a reactor spends its time.
+
+    Times are in seconds.
+
+    @ivar iterations: The number of times the reactor polled for events.
+    @type iterations: C{int}
+
+    @ivar pollTime: The total time spent waiting for events.
+    @type pollTime: C{float}
+
+    @ivar timedCalls: The number of timed calls (from C{callLater}) run.
+    @type timedCalls: C{int}
+
+    @ivar timedCallTime: The total time spent running timed calls.
+    @type timedCallTime: C{float}
+
+    @ivar threadCalls: The number of calls from C{callFromThread} run.
+    @type threadCalls: C{int}
+
+    @ivar threadCallTime: The total time spent running calls from
+        C{callFromThread}.
+    @type threadCallTime: C{float}
+
+    @ivar threadCallQueueDepth: The number of calls which were waiting in the
+        C{callFromThread} queue the last time the reactor ran it.
+    @type threadCallQueueDepth: C{int}
+
+    @ivar maxThreadCallQueueDepth: The largest C{threadCallQueueDepth} seen.
+    @type maxThreadCallQueueDepth: C{int}
+
+    @ivar io: A C{dict} mapping 2-tuples of the qualified name of a
+        selectable's class and C{"doRead"} or C{"doWrite"} to 2-element
+        C{list}s of the number of such calls and the total time spent in
+        them.
+    @type io: C{dict}
+
+    @ivar slowCallThreshold: The time a single callback may block the reactor
+        for before it is logged, or C{None} to log none of them.
+    @type slowCallThreshold: C{float} or C{NoneType}
+
+    @ivar slowCalls: The number of callbacks which took longer than
+        C{slowCallThreshold}.
+    @type slowCalls: C{int}
+
+    @ivar _clock: A no-argument callable returning the current time.
+
+    @ivar _loggingCall: The L{LoopingCall} logging a summary periodically, or
+        C{None}.
+    """
+
+    def __init__(self, slowCallThreshold=None, clock=time.time):
+        """
+        @param slowCallThreshold: See C{slowCallThreshold}.
+
+        @param clock: A no-argument callable returning the current time in
+            seconds, used to time the reactor.
+        """
+        self.slowCallThreshold = slowCallThreshold
+        self._clock = clock
+        self._loggingCall = None
+        self.reset()
+
+
+    def reset(self):
+        """
+        Set all the counters back to zero.
+        """
+        self.iterations = 0
+        self.pollTime = 0.0
+        self.timedCalls = 0
+        self.timedCallTime = 0.0
+        self.threadCalls = 0
+        self.threadCallTime = 0.0
+        self.threadCallQueueDepth = 0
+        self.maxThreadCallQueueDepth = 0
+        self.io = {}
+        self.slowCalls = 0
+
+
+    def seconds(self):
+        """
+        Return the current time according to the clock used for timing.
+
+        Reactors call this around their poll, and pass the difference to
+        L{recordPoll}.
+
+        @rtype: C{float}
+        """
+        return self._clock()
+
+
+    def recordPoll(self, duration):
+        """
+        Record one wait for events.
+
+        @param duration: The time spent waiting.
+        @type duration: C{float}
+        """
+        self.iterations += 1
+        self.pollTime += duration
+
+
+    def recordThreadCallQueue(self, depth):
+        """
+        Record the length of the C{callFromThread} queue as the reactor is
+        about to run it.
+
+        @param depth: The number of calls in the queue.
+        @type depth: C{int}
+        """
+        self.threadCallQueueDepth = depth
+        if depth > self.maxThreadCallQueueDepth:
+            self.maxThreadCallQueueDepth = depth
+
+
+    def _checkSlow(self, name, duration):
+        """
+        Log a callback which took longer than C{slowCallThreshold}.
+        """
+        if (self.slowCallThreshold is not None and
+                duration > self.slowCallThreshold):
+            self.slowCalls += 1
+            log.msg(format="Slow callback: %(name)s blocked the reactor for "
+                           "%(milliseconds).1f ms",
+                    name=name, milliseconds=duration * 1000)
+
+
+    def runTimedCall(self, f, args, kw):
+        """
+        Run a timed call, timing it.
+
+        @param f: The function to call.
+        @param args: The positional arguments to pass to it.
+        @param kw: The keyword arguments to pass to it.
+
+        @return: The result of C{f}.
+        """
+        start = self._clock()
+        try:
+            return f(*args, **kw)
+        finally:
+            duration = self._clock() - start
+            self.timedCalls += 1
+            self.timedCallTime += duration
+            self._checkSlow(_callableName(f), duration)
+
+
+    def runThreadCall(self, f, args, kw):
+        """
+        Run a call from C{callFromThread}, timing it.
+
+        @param f: The function to call.
+        @param args: The positional arguments to pass to it.
+        @param kw: The keyword arguments to pass to it.
+
+        @return: The result of C{f}.
+        """
+        start = self._clock()
+        try:
+            return f(*args, **kw)
+        finally:
+            duration = self._clock() - start
+            self.threadCalls += 1
+            self.threadCallTime += duration
+            self._checkSlow(_callableName(f), duration)
+
+
+    def runIO(self, selectable, method):
+        """
+        Call C{doRead} or C{doWrite} on a selectable, timing it.
+
+        @param selectable: The L{IReadDescriptor} or L{IWriteDescriptor}.
+
+        @param method: C{"doRead"} or C{"doWrite"}.
+        @type method: C{str}
+
+        @return: The result of the method.
+        """
+        start = self._clock()
+        try:
+            return getattr(selectable, method)()
+        finally:
+            duration = self._clock() - start
+            name = qual(type(selectable))
+            counts = self.io.get((name, method))
+            if counts is None:
+                counts = self.io[name, method] = [0, 0.0]
+            counts[0] += 1
+            counts[1] += duration
+            self._checkSlow("%s.%s" % (name, method), duration)
+
+
+    def summary(self):
+        """
+        Describe the counters in one line of text.
+
+        @rtype: C{str}
+        """
+        parts = [
+            "%d iterations" % (self.iterations,),
+            "poll %.3fs" % (self.pollTime,),
+            "%d timed calls %.3fs" % (self.timedCalls, self.timedCallTime),
+            "%d thread calls %.3fs (queue depth max %d)" % (
+                self.threadCalls, self.threadCallTime,
+                self.maxThreadCallQueueDepth),
+            "%d slow callbacks" % (self.slowCalls,)]
+        busiest = sorted(self.io.items(), key=lambda item: -item[1][1])[:5]
+        for (name, method), (calls, duration) in busiest:
+            parts.append("%s.%s %d calls %.3fs" % (
+                name, method, calls, duration))
+        return ", ".join(parts)
+
+
+    def startLogging(self, reactor, interval):
+        """
+        Log a L{summary} of the counters every C{interval} seconds, resetting
+        them after each.
+
+        @param reactor: The L{IReactorTime} provider to schedule the logging
+            with.
+
+        @param interval: The number of seconds between summaries.
+        @type interval: C{float}
+        """
+        from twisted.internet.task import LoopingCall
+        self.stopLogging()
+        self._loggingCall = LoopingCall(self._logSummary)
+        self._loggingCall.clock = reactor
+        self._loggingCall.start(interval, now=False)
+
+
+    def stopLogging(self):
+        """
+        Stop logging summaries started by L{startLogging}.
+        """
+        if self._loggingCall is not None:
+            self._loggingCall.stop()
+            self._loggingCall = None
+
+
+    def _logSummary(self):
+        """
+        Log a summary of the counters and reset them.
+        """
+        log.msg(format="Reactor instrumentation: %(summary)s",
+                summary=self.summary())
+        self.reset()
+
+
+
+def _frameName(frame):
+    """
+    Find the qualified name of the function a frame is running, for
+    reporting.
+
+    @param frame: A frame object.
+
+    @return: A name such as C{"twisted.web.client.request"}.
+    @rtype: C{str}
+    """
+    return "%s.%s" % (frame.f_globals.get("__name__"),
+                      frame.f_code.co_name)
+
+
+
+class CallbackStats:
+    """
+    What a L{DeferredProfiler} knows about one callback function or
+    L{inlineCallbacks <twisted.internet.defer.inlineCallbacks>} generator.
+
+    @ivar name: The qualified name of the function.
+    @type name: C{str}
+
+    @ivar calls: The number of times it ran.
+    @type calls: C{int}
+
+    @ivar time: The total time it ran for.
+    @type time: C{float}
+
+    @ivar waits: The number of runs for which the wait is known: that is,
+        for which the L{Deferred <twisted.internet.defer.Deferred>} it was
+        waiting on was created and fired while profiling.
+    @type waits: C{int}
+
+    @ivar wait: The total time spent waiting for the results of those
+        L{Deferred}s, from when they were created or, for a generator, from
+        when it yielded them.
+    @type wait: C{float}
+
+    @ivar maxWait: The longest of those waits.
+    @type maxWait: C{float}
+    """
+
+    def __init__(self, name):
+        self.name = name
+        self.calls = 0
+        self.time = 0.0
+        self.waits = 0
+        self.wait = 0.0
+        self.maxWait = 0.0
+
+
+    def averageWait(self):
+        """
+        Return the average wait, or C{0.0} if no wait is known.
+
+        @rtype: C{float}
+        """
+        if self.waits:
+            return self.wait / self.waits
+        return 0.0
+
+
+
+class DeferredProfiler:
+    """
+    Profile the callbacks of L{Deferred <twisted.internet.defer.Deferred>}s
+    and the steps of L{inlineCallbacks
+    <twisted.internet.defer.inlineCallbacks>} generators.
+
+    Install with L{setProfiler <twisted.internet.defer.setProfiler>}::
+
+        from twisted.internet import defer
+        from twisted.internet.instrumentation import DeferredProfiler
+        profiler = DeferredProfiler()
+        defer.setProfiler(profiler)
+        ...
+        defer.setProfiler(None)
+        print(profiler.report(sortBy="time", limit=20))
+
+    @ivar stats: A C{dict} mapping qualified function names to
+        L{CallbackStats}.
+
+    @ivar _clock: A no-argument callable returning the current time.
+    """
+
+    _sortKeys = {
+        "calls": lambda stats: stats.calls,
+        "time": lambda stats: stats.time,
+        "wait": lambda stats: stats.averageWait(),
+        "maxWait": lambda stats: stats.maxWait,
+        }
+
+    def __init__(self, clock=time.time):
+        """
+        @param clock: A no-argument callable returning the current time in
+            seconds.
+        """
+        self._clock = clock
+        self.reset()
+
+
+    def reset(self):
+        """
+        Forget everything recorded so far.
+        """
+        self.stats = {}
+
+
+    def seconds(self):
+        """
+        Return the current time according to the clock used for profiling.
+
+        @rtype: C{float}
+        """
+        return self._clock()
+
+
+    def _record(self, name, duration, wait):
+        stats = self.stats.get(name)
+        if stats is None:
+            stats = self.stats[name] = CallbackStats(name)
+        stats.calls += 1
+        stats.time += duration
+        if wait is not None:
+            stats.waits += 1
+            stats.wait += wait
+            if wait > stats.maxWait:
+                stats.maxWait = wait
+
+
+    def recordCallback(self, f, duration, wait):
+        """
+        Record one run of a callback or errback.
+
+        @param f: The callback.
+
+        @param duration: How long it ran for.
+        @type duration: C{float}
+
+        @param wait: How long after its L{Deferred} was created the result
+            passed to it arrived, or C{None} if that is not known.
+        @type wait: C{float} or C{NoneType}
+        """
+        self._record(_callableName(f), duration, wait)
+
+
+    def recordGenerator(self, frame, duration, wait):
+        """
+        Record one step of an L{inlineCallbacks} generator: from when it is
+        resumed until it yields, returns or raises.
+
+        @param frame: The frame of the generator (its C{gi_frame}, taken
+            before the step, since a finished generator has none).
+
+        @param duration: How long the step took.
+        @type duration: C{float}
+
+        @param wait: How long the generator was waiting for the L{Deferred}
+            it last yielded, or C{None} if it did not have to wait.
+        @type wait: C{float} or C{NoneType}
+        """
+        self._record(_frameName(frame), duration, wait)
+
+
+    def report(self, sortBy="time", limit=None):
+        """
+        Describe the recorded callbacks as a table, one per line, most
+        significant first.
+
+        @param sortBy: One of C{"calls"}, C{"time"}, C{"wait"} (the average
+            wait) or C{"maxWait"}.
+
+        @param limit: The maximum number of callbacks to include, or C{None}
+            for all of them.
+
+        @rtype: C{str}
+
+        @raise ValueError: If C{sortBy} is not one of the above.
+        """
+        if sortBy not in self._sortKeys:
+            raise ValueError(
+                "sortBy must be one of %s, not %r" % (
+                    ", ".join(sorted(self._sortKeys)), sortBy))
+        ordered = sorted(self.stats.values(), key=self._sortKeys[sortBy],
+                         reverse=True)
+        if limit is not None:
+            ordered = ordered[:limit]
+        lines = ["%8s %10s %10s %10s %10s  %s" % (
+                "calls", "time", "per call", "avg wait", "max wait", "name")]
+        for stats in ordered:
+            lines.append("%8d %10.6f %10.6f %10.6f %10.6f  %s" % (
+                    stats.calls, stats.time, stats.time / stats.calls,
+                    stats.averageWait(), stats.maxWait, stats.name))
+        return "\n".join(lines) + "\n"
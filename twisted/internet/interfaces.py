@@ -1942,6 +1942,21 @@ class IFileDescriptorReceiver(Interface):
 
 
 
+class IMemoryViewReceiver(Interface):
+    """
+    Protocols may declare that they provide L{IMemoryViewReceiver} to indicate
+    that, when their transport reads into a reusable buffer (see
+    L{twisted.internet.abstract.ReadBuffer}), they accept the data passed to
+    C{dataReceived} or C{datagramReceived} as a C{memoryview} of that buffer
+    instead of as C{bytes}.
+
+    The C{memoryview} is only valid until the method it was passed to returns;
+    the buffer it refers to is overwritten by the next read.  A protocol which
+    needs to keep the data must copy it, for example with C{tobytes}.
+    """
+
+
+
 class IProtocolFactory(Interface):
     """
     Interface for protocol factories.
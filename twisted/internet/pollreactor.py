@@ -151,6 +151,9 @@ class PollReactor(posixbase.PosixReactorBase, posixbase._PollLikeMixin):
         if timeout is not None:
             timeout = int(timeout * 1000) # convert seconds to milliseconds
 
+        instrumentation = self._instrumentation
+        if instrumentation is not None:
+            start = instrumentation.seconds()
         try:
             l = self._poller.poll(timeout)
         except SelectError as e:
@@ -158,6 +161,8 @@ class PollReactor(posixbase.PosixReactorBase, posixbase._PollLikeMixin):
                 return
             else:
                 raise
+        if instrumentation is not None:
+            instrumentation.recordPoll(instrumentation.seconds() - start)
         _drdw = self._doReadOrWrite
         for fd, event in l:
             try:
@@ -11,6 +11,7 @@ from __future__ import division, absolute_import
 import socket
 import errno
 import os
+import struct
 import sys
 
 from zope.interface import implementer, classImplements
@@ -46,8 +47,14 @@ except ImportError:
 unixEnabled = (platformType == 'posix')
 
 processEnabled = False
+_eventfd = None
 if unixEnabled:
     from twisted.internet import fdesc
+    if platform.isLinux():
+        try:
+            from twisted.python import _eventfd
+        except (ImportError, OSError):
+            pass
     # Enable on Python 3 in ticket #5987:
     if not _PY3:
         from twisted.internet import process, _signals
@@ -169,7 +176,10 @@ class _UnixWaker(_FDWaker):
     This class provides a simple interface to wake up the event loop.
 
     This is used by threads or signals to wake up the event loop.
+
+    @ivar _wakeUpData: The bytes written to wake the reactor up.
     """
+    _wakeUpData = b'x'
 
     def wakeUp(self):
         """Write one byte to the pipe, and flush it.
@@ -178,7 +188,7 @@ class _UnixWaker(_FDWaker):
         # between EINTR (try again) and EAGAIN (do nothing).
         if self.o is not None:
             try:
-                util.untilConcludes(os.write, self.o, b'x')
+                util.untilConcludes(os.write, self.o, self._wakeUpData)
             except OSError as e:
                 # XXX There is no unit test for raising the exception
                 # for other errnos. See #4285.
@@ -187,7 +197,42 @@ class _UnixWaker(_FDWaker):
 
 
 
-if platformType == 'posix':
+class _EventFDWaker(_UnixWaker):
+    """
+    A L{_UnixWaker} which uses a Linux eventfd(2) object instead of a pipe.
+
+    Waking up adds one to the eventfd counter and reading resets it, so an
+    eventfd takes one file descriptor instead of two and never fills up the
+    way a pipe does when the reactor is woken up faster than it reads.
+    """
+    _wakeUpData = struct.pack('@Q', 1)
+
+    def __init__(self, reactor):
+        """Initialize.
+        """
+        self.reactor = reactor
+        self.i = self.o = _eventfd.create()
+        fdesc.setNonBlocking(self.i)
+        fdesc._setCloseOnExec(self.i)
+        self.fileno = lambda: self.i
+
+
+    def connectionLost(self, reason):
+        """Close my eventfd.
+        """
+        if self.i is None:
+            return
+        try:
+            os.close(self.i)
+        except (IOError, OSError):
+            pass
+        self.i = self.o = None
+
+
+
+if _eventfd is not None:
+    _Waker = _EventFDWaker
+elif platformType == 'posix':
     _Waker = _UnixWaker
 else:
     # Primarily Windows and Jython.
@@ -564,6 +609,8 @@ class _PollLikeMixin(object):
         lost.
       - _POLL_IN - Bitmask for events indicating there is input to read.
       - _POLL_OUT - Bitmask for events indicating output can be written.
+      - _instrumentation - The ReactorInstrumentation timing reads and
+        writes, or None.
 
     Must be mixed in to a subclass of PosixReactorBase (for
     _disconnectSelectable).
@@ -609,14 +656,21 @@ class _PollLikeMixin(object):
                     # case.
                     why = _NO_FILEDESC
                 else:
+                    instrumentation = self._instrumentation
                     if event & self._POLL_IN:
                         # Handle a read event.
-                        why = selectable.doRead()
+                        if instrumentation is None:
+                            why = selectable.doRead()
+                        else:
+                            why = instrumentation.runIO(selectable, "doRead")
                         inRead = True
                     if not why and event & self._POLL_OUT:
                         # Handle a write event, as long as doRead didn't
                         # disconnect us.
-                        why = selectable.doWrite()
+                        if instrumentation is None:
+                            why = selectable.doWrite()
+                        else:
+                            why = instrumentation.runIO(selectable, "doWrite")
                         inRead = False
             except:
                 # Any exception from application code gets logged and will
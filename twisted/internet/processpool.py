@@ -0,0 +1,547 @@
+# -*- test-case-name: twisted.internet.test.test_processpool -*-
+# Copyright (c) Twisted Matrix Laboratories.
+# See LICENSE for details.
+
+"""
+A pool of long-lived worker processes for running CPU-bound functions in
+parallel with the reactor.
+
+L{deferToProcess} is the process counterpart of
+L{twisted.internet.threads.deferToThread}: it calls a function with some
+arguments and returns a L{Deferred} which fires with the function's result.
+The function runs in a separate Python interpreter, so it is not serialized
+with the reactor by the global interpreter lock.  In exchange, the function,
+its arguments, its result and any exception it raises are all sent between
+processes with L{pickle}.  Functions are pickled by name, so they must be
+defined at the top level of an importable module.
+
+Workers are started with L{IReactorProcess.spawnProcess} and driven over
+L{AMP}, in the same way as the workers of the distributed trial runner.
+"""
+
+import os
+import sys
+
+try:
+    import cPickle as pickle
+except ImportError:
+    import pickle
+
+from zope.interface import implementer
+
+from twisted.internet.defer import Deferred, DeferredList, fail
+from twisted.internet.error import ProcessExitedAlready
+from twisted.internet.interfaces import ITransport, IAddress
+from twisted.internet.protocol import ProcessProtocol
+from twisted.protocols.amp import (
+    AMP, Argument, Boolean, Command, MAX_VALUE_LENGTH)
+from twisted.python import log
+from twisted.python.failure import Failure
+from twisted.python.modules import theSystemPath
+from twisted.python.reflect import qual
+
+
+# File descriptors numbers used to set up pipes with the worker.
+_WORKER_AMP_STDIN = 3
+
+_WORKER_AMP_STDOUT = 4
+
+# The environment variable through which workers receive the parent's
+# sys.path.  See twisted.internet._processworker._setupPath.
+_PYTHONPATH_VARIABLE = 'TWISTED_PROCESSPOOL_PYTHONPATH'
+
+
+
+class RemoteCallError(Exception):
+    """
+    A function run in a worker process raised an exception which could not
+    be pickled.  The argument describes the original exception.
+    """
+
+
+
+class _BigString(Argument):
+    """
+    A string argument which may be longer than L{MAX_VALUE_LENGTH}.
+
+    The value is split across as many keys as it needs: the key C{name} holds
+    the number of chunks and the keys C{name.0}, C{name.1} and so on hold the
+    chunks themselves.
+    """
+
+    def toBox(self, name, strings, objects, proto):
+        value = self.retrieve(objects, name, proto)
+        chunks = [value[i:i + MAX_VALUE_LENGTH]
+                  for i in range(0, len(value), MAX_VALUE_LENGTH)]
+        strings[name] = str(len(chunks))
+        for i, chunk in enumerate(chunks):
+            strings['%s.%d' % (name, i)] = chunk
+
+
+    def fromBox(self, name, strings, objects, proto):
+        count = int(self.retrieve(strings, name, proto))
+        objects[name] = ''.join([
+                self.retrieve(strings, '%s.%d' % (name, i), proto)
+                for i in range(count)])
+
+
+
+class _Call(Command):
+    """
+    Call a function in a worker process.
+
+    C{call} is a pickled C{(function, args, kwargs)} tuple.  If the function
+    returns, C{result} is its pickled return value and C{failed} is false;
+    otherwise C{result} is a pickled L{Failure} and C{failed} is true.
+    """
+    arguments = [('call', _BigString())]
+    response = [('result', _BigString()), ('failed', Boolean())]
+
+
+
+def _dumpFailure(failure):
+    """
+    Pickle a L{Failure}, replacing its exception with a L{RemoteCallError}
+    if the original one cannot be pickled.
+
+    @type failure: L{Failure}
+    @rtype: C{str}
+    """
+    failure.cleanFailure()
+    try:
+        return pickle.dumps(failure, 2)
+    except Exception:
+        return pickle.dumps(Failure(RemoteCallError(
+                    "%s: %s" % (qual(failure.type),
+                                failure.getErrorMessage()))), 2)
+
+
+
+class WorkerProtocol(AMP):
+    """
+    The worker side of the process pool protocol.  It runs in the worker
+    process, see L{twisted.internet._processworker}.
+    """
+
+    def call(self, call):
+        """
+        Unpickle and call a function, returning its pickled result.
+        """
+        try:
+            function, args, kwargs = pickle.loads(call)
+            result = pickle.dumps(function(*args, **kwargs), 2)
+        except:
+            return {'result': _dumpFailure(Failure()), 'failed': True}
+        return {'result': result, 'failed': False}
+
+    _Call.responder(call)
+
+
+
+@implementer(IAddress)
+class _WorkerAddress(object):
+    """
+    A stub address for both ends of the L{AMP} connection to a worker.
+    """
+
+
+
+@implementer(ITransport)
+class _WorkerTransport(object):
+    """
+    A transport carrying L{AMP} over the dedicated pipes of a worker process.
+    """
+
+    def __init__(self, transport):
+        self._transport = transport
+
+
+    def write(self, data):
+        """
+        Forward data to the worker.
+        """
+        self._transport.writeToChild(_WORKER_AMP_STDIN, data)
+
+
+    def writeSequence(self, sequence):
+        """
+        Forward each string in C{sequence} to the worker.
+        """
+        self.write(''.join(sequence))
+
+
+    def loseConnection(self):
+        """
+        Close the pipes to the worker, which makes it exit.
+        """
+        self._transport.closeChildFD(_WORKER_AMP_STDIN)
+        self._transport.loseConnection()
+
+
+    def getHost(self):
+        """
+        Return a L{_WorkerAddress} instance.
+        """
+        return _WorkerAddress()
+
+
+    def getPeer(self):
+        """
+        Return a L{_WorkerAddress} instance.
+        """
+        return _WorkerAddress()
+
+
+
+class _Task(object):
+    """
+    A call waiting for or running in a worker process.
+
+    @ivar call: The pickled C{(function, args, kwargs)} tuple.
+
+    @ivar deferred: The L{Deferred} returned to the caller.
+
+    @ivar worker: The L{_ProcessWorker} running the call, or C{None} while
+        the call is queued.
+    """
+    worker = None
+
+    def __init__(self, call):
+        self.call = call
+        self.deferred = None
+
+
+
+class _ProcessWorker(ProcessProtocol):
+    """
+    The pool side of a worker process.
+
+    @ivar amp: The L{AMP} protocol connected to the worker.
+
+    @ivar tasks: The number of tasks given to this worker.
+
+    @ivar task: The L{_Task} currently running in this worker, or C{None}.
+
+    @ivar ended: A L{Deferred} which fires with C{None} when the process
+        exits.
+    """
+    task = None
+
+    def __init__(self, pool):
+        self._pool = pool
+        self.amp = AMP()
+        self.tasks = 0
+        self.ended = Deferred()
+
+
+    def connectionMade(self):
+        """
+        Connect the L{AMP} protocol to the worker's pipes.
+        """
+        self.amp.makeConnection(_WorkerTransport(self.transport))
+
+
+    def childDataReceived(self, childFD, data):
+        """
+        Handle data received on the specific pipe for the L{AMP} protocol.
+        """
+        if childFD == _WORKER_AMP_STDOUT:
+            self.amp.dataReceived(data)
+        else:
+            ProcessProtocol.childDataReceived(self, childFD, data)
+
+
+    def outReceived(self, data):
+        """
+        Log anything the worker writes to its standard output.
+        """
+        log.msg(format="Process pool worker %(pid)s: %(data)s",
+                pid=self.transport.pid, data=data.rstrip('\n'))
+
+
+    errReceived = outReceived
+
+
+    def processEnded(self, reason):
+        """
+        Remove the worker from the pool and fail the task it was running, if
+        any.
+        """
+        self._pool._workerEnded(self)
+        self.amp.connectionLost(reason)
+        self.ended.callback(None)
+
+
+
+class ProcessPool(object):
+    """
+    A pool of worker processes to which function calls are dispatched.
+
+    Workers are started when there is work for them, up to L{size} at once,
+    and each runs one call at a time.  Calls made while every worker is busy
+    are queued.
+
+    @ivar size: The largest number of worker processes run at once.
+
+    @ivar maxTasksPerWorker: The number of calls after which a worker is
+        replaced with a fresh process, or C{None} to keep workers until the
+        pool is stopped.  Recycling workers limits the damage from functions
+        which leak memory or other process state.
+
+    @ivar _reactor: The L{IReactorProcess} provider used to start workers.
+
+    @ivar _workers: The L{_ProcessWorker}s which may be given work.
+
+    @ivar _idle: The members of C{_workers} which are not running a task.
+
+    @ivar _retiring: L{_ProcessWorker}s which have been told to exit but have
+        not done so yet.
+
+    @ivar _pending: The queued L{_Task}s, oldest first.
+    """
+    _childFDs = {0: 'w', 1: 'r', 2: 'r',
+                 _WORKER_AMP_STDIN: 'w', _WORKER_AMP_STDOUT: 'r'}
+
+    def __init__(self, size=None, maxTasksPerWorker=None, reactor=None):
+        """
+        @param size: The largest number of worker processes to run at once.
+            Defaults to the number of CPUs.
+
+        @param maxTasksPerWorker: The number of calls after which a worker is
+            replaced, or C{None} to never replace workers.
+
+        @param reactor: The reactor used to start workers.  Defaults to the
+            global reactor.
+        """
+        if size is None:
+            size = _cpuCount()
+        if reactor is None:
+            from twisted.internet import reactor
+        self.size = size
+        self.maxTasksPerWorker = maxTasksPerWorker
+        self._reactor = reactor
+        self._workers = []
+        self._idle = []
+        self._retiring = []
+        self._pending = []
+
+
+    def deferToProcess(self, f, *args, **kwargs):
+        """
+        Call a function in one of the pool's worker processes.
+
+        @param f: The function to call.  It must be picklable.
+        @param *args: positional arguments to pass to f.
+        @param **kwargs: keyword arguments to pass to f.
+
+        @return: A L{Deferred} which fires with the result of f, or fails with
+            the exception f raised.  It fails with L{RemoteCallError} if that
+            exception cannot be pickled and with the pickling error if the
+            call or its result cannot be pickled.  It fails with
+            L{twisted.internet.error.ProcessTerminated} if the worker exits
+            while running f.  Cancelling it while f is running kills the
+            worker process.
+        """
+        try:
+            call = pickle.dumps((f, args, kwargs), 2)
+        except:
+            return fail()
+        task = _Task(call)
+        task.deferred = Deferred(lambda d: self._cancel(task))
+        self._pending.append(task)
+        self._dispatch()
+        return task.deferred
+
+
+    def stop(self):
+        """
+        Cancel all queued and running calls and stop the worker processes.
+        The pool starts new workers if it is given more work later.
+
+        @return: A L{Deferred} which fires when all the worker processes have
+            exited.
+        """
+        while self._pending:
+            self._pending[0].deferred.cancel()
+        for worker in self._workers[:]:
+            if worker.task is None:
+                self._retire(worker)
+            else:
+                worker.task.deferred.cancel()
+        d = DeferredList([worker.ended for worker in self._retiring])
+        return d.addCallback(lambda ignored: None)
+
+
+    def _spawnWorker(self):
+        """
+        Start a new worker process.
+
+        @rtype: L{_ProcessWorker}
+        """
+        worker = _ProcessWorker(self)
+        self._workers.append(worker)
+        workerPath = theSystemPath[
+            'twisted.internet._processworker'].filePath.path
+        environ = os.environ.copy()
+        environ[_PYTHONPATH_VARIABLE] = os.pathsep.join(sys.path)
+        self._reactor.spawnProcess(
+            worker, sys.executable, args=[sys.executable, workerPath],
+            env=environ, childFDs=self._childFDs)
+        return worker
+
+
+    def _retire(self, worker):
+        """
+        Stop giving work to a worker and close its pipes so that it exits.
+        """
+        self._workers.remove(worker)
+        if worker in self._idle:
+            self._idle.remove(worker)
+        self._retiring.append(worker)
+        worker.amp.transport.loseConnection()
+
+
+    def _dispatch(self):
+        """
+        Hand queued tasks to idle workers, starting new workers if there is
+        room for them.
+        """
+        while self._pending:
+            if self._idle:
+                worker = self._idle.pop()
+            elif len(self._workers) < self.size:
+                worker = self._spawnWorker()
+            else:
+                return
+            task = self._pending.pop(0)
+            task.worker = worker
+            worker.task = task
+            worker.tasks += 1
+            d = worker.amp.callRemote(_Call, call=task.call)
+            d.addCallbacks(self._taskDone, self._taskLost,
+                           callbackArgs=(worker, task),
+                           errbackArgs=(worker, task))
+
+
+    def _taskDone(self, response, worker, task):
+        """
+        Deliver the result of a task and give its worker more work, or
+        replace the worker if it has run L{maxTasksPerWorker} tasks.
+        """
+        worker.task = None
+        if (self.maxTasksPerWorker is not None and
+                worker.tasks >= self.maxTasksPerWorker):
+            self._retire(worker)
+        else:
+            self._idle.append(worker)
+        self._dispatch()
+
+        if task.deferred.called:
+            return
+        try:
+            result = pickle.loads(response['result'])
+        except:
+            task.deferred.errback()
+        else:
+            if response['failed']:
+                task.deferred.errback(result)
+            else:
+                task.deferred.callback(result)
+
+
+    def _taskLost(self, reason, worker, task):
+        """
+        Fail a task whose worker did not answer, and get rid of the worker if
+        it is still around.
+        """
+        worker.task = None
+        if worker in self._workers:
+            self._retire(worker)
+            self._dispatch()
+        if not task.deferred.called:
+            task.deferred.errback(reason)
+
+
+    def _cancel(self, task):
+        """
+        Cancel a task, removing it from the queue or killing the worker
+        running it.
+        """
+        if task.worker is None:
+            self._pending.remove(task)
+            return
+        worker = task.worker
+        if worker.task is not task:
+            return
+        if worker in self._workers:
+            self._retire(worker)
+        try:
+            worker.transport.signalProcess('KILL')
+        except ProcessExitedAlready:
+            pass
+        self._dispatch()
+
+
+    def _workerEnded(self, worker):
+        """
+        Forget about a worker process which has exited, and start a
+        replacement if there is queued work.
+        """
+        for workers in self._workers, self._idle, self._retiring:
+            if worker in workers:
+                workers.remove(worker)
+        self._dispatch()
+
+
+
+def _cpuCount():
+    """
+    @return: The number of CPUs, or 1 if it cannot be determined.
+    """
+    try:
+        return max(1, os.sysconf('SC_NPROCESSORS_ONLN'))
+    except (AttributeError, ValueError, OSError):
+        return 1
+
+
+
+_defaultPool = None
+
+def getProcessPool():
+    """
+    Return the process pool used by L{deferToProcess}, creating it the first
+    time it is needed.  It uses the global reactor, which stops it on
+    shutdown.
+
+    @rtype: L{ProcessPool}
+    """
+    global _defaultPool
+    if _defaultPool is None:
+        from twisted.internet import reactor
+        _defaultPool = ProcessPool(reactor=reactor)
+        reactor.addSystemEventTrigger(
+            'during', 'shutdown', _defaultPool.stop)
+    return _defaultPool
+
+
+
+def deferToProcess(f, *args, **kwargs):
+    """
+    Run a function in a worker process and return the result as a Deferred.
+
+    See L{ProcessPool.deferToProcess}.
+
+    @param f: The function to call.  It must be picklable.
+    @param *args: positional arguments to pass to f.
+    @param **kwargs: keyword arguments to pass to f.
+
+    @return: A Deferred which fires a callback with the result of f,
+    or an errback with a L{twisted.python.failure.Failure} if f throws
+    an exception.
+    """
+    return getProcessPool().deferToProcess(f, *args, **kwargs)
+
+
+
+__all__ = ['ProcessPool', 'RemoteCallError', 'WorkerProtocol',
+           'deferToProcess', 'getProcessPool']
@@ -99,6 +99,9 @@ class SelectReactor(posixbase.PosixReactorBase, _extraBase):
         This will run all selectables who had input or output readiness
         waiting for them.
         """
+        instrumentation = self._instrumentation
+        if instrumentation is not None:
+            start = instrumentation.seconds()
         try:
             r, w, ignored = _select(self._reads.keys(),
                                     self._writes.keys(),
@@ -131,6 +134,8 @@ class SelectReactor(posixbase.PosixReactorBase, _extraBase):
             else:
                 # OK, I really don't know what's going on.  Blow up.
                 raise
+        if instrumentation is not None:
+            instrumentation.recordPoll(instrumentation.seconds() - start)
 
         _drdw = self._doReadOrWrite
         _logrun = log.callWithLogger
@@ -148,7 +153,10 @@ class SelectReactor(posixbase.PosixReactorBase, _extraBase):
 
     def _doReadOrWrite(self, selectable, method):
         try:
-            why = getattr(selectable, method)()
+            if self._instrumentation is None:
+                why = getattr(selectable, method)()
+            else:
+                why = self._instrumentation.runIO(selectable, method)
         except:
             why = sys.exc_info()[1]
             log.err()
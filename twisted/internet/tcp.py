@@ -180,6 +180,10 @@ class Connection(_TLSConnectionMixin, abstract.FileDescriptor, _SocketCloser,
 
     @ivar logstr: prefix used when logging events related to this connection.
     @type logstr: C{str}
+
+    @ivar _vectoredWrites: C{True} if the socket supports C{sendmsg}, in which
+        case buffered data is sent with a single C{sendmsg} call per write
+        event instead of being joined together and sent with C{send}.
     """
 
 
@@ -189,6 +193,7 @@ class Connection(_TLSConnectionMixin, abstract.FileDescriptor, _SocketCloser,
         self.socket.setblocking(0)
         self.fileno = skt.fileno
         self.protocol = protocol
+        self._vectoredWrites = getattr(skt, "sendmsg", None) is not None
 
 
     def getHandle(self):
@@ -203,7 +208,13 @@ class Connection(_TLSConnectionMixin, abstract.FileDescriptor, _SocketCloser,
         calls self.dataReceived(data) to process it.  If the connection is not
         lost through an error in the physical recv(), this function will return
         the result of the dataReceived call.
+
+        If the reactor has a L{ReadBuffer <abstract.ReadBuffer>} installed, the
+        data is read into it instead.
         """
+        readBuffer = getattr(self.reactor, "_readBuffer", None)
+        if readBuffer is not None:
+            return self._doReadInto(readBuffer)
         try:
             data = self.socket.recv(self.bufferSize)
         except socket.error as se:
@@ -215,6 +226,30 @@ class Connection(_TLSConnectionMixin, abstract.FileDescriptor, _SocketCloser,
         return self._dataReceived(data)
 
 
+    def _doReadInto(self, readBuffer):
+        """
+        Read up to C{self.bufferSize} bytes of data into C{readBuffer} and pass
+        them to the protocol: as a C{memoryview} if it provides
+        L{IMemoryViewReceiver}, or else as C{bytes}.
+
+        @type readBuffer: L{abstract.ReadBuffer}
+        """
+        view = readBuffer.get(self.bufferSize)
+        try:
+            size = self.socket.recv_into(view, self.bufferSize)
+        except socket.error as se:
+            if se.args[0] == EWOULDBLOCK:
+                return
+            else:
+                return main.CONNECTION_LOST
+
+        if interfaces.IMemoryViewReceiver.providedBy(self.protocol):
+            data = view[:size]
+        else:
+            data = view[:size].tobytes()
+        return self._dataReceived(data)
+
+
     def _dataReceived(self, data):
         if not data:
             return main.CONNECTION_DONE
@@ -252,6 +287,23 @@ class Connection(_TLSConnectionMixin, abstract.FileDescriptor, _SocketCloser,
                 return main.CONNECTION_LOST
 
 
+    def _writeSomeVectors(self, vectors):
+        """
+        Write as much as possible of the given chunks of data to this TCP
+        connection with a single C{sendmsg} call.
+
+        If the connection is lost, an exception is returned.  Otherwise, the
+        number of bytes successfully written is returned.
+        """
+        try:
+            return untilConcludes(self.socket.sendmsg, vectors)
+        except socket.error as se:
+            if se.args[0] in (EWOULDBLOCK, ENOBUFS):
+                return 0
+            else:
+                return main.CONNECTION_LOST
+
+
     def _closeWriteConnection(self):
         try:
             getattr(self.socket, self._socketShutdownMethod)(1)
@@ -888,6 +940,48 @@ class Port(base.BasePort, _SocketCloser):
         was created and initialized outside of the reactor and will be used to
         listen for connections (instead of a new socket being created by this
         L{Port}).
+
+    @ivar maxAcceptsPerWakeup: If not C{None}, the most connections accepted
+        each time the port becomes readable.  By default the number adapts to
+        the rate of incoming connections, which during a connection storm can
+        keep the reactor from serving existing connections.
+    @type maxAcceptsPerWakeup: C{int} or C{NoneType}
+
+    @ivar exhaustionBackoff: The number of seconds to stop accepting
+        connections for when C{accept(2)} fails because the process or the
+        system is out of file descriptors or memory.  The delay doubles, up
+        to C{maxExhaustionBackoff}, for each failure until a connection is
+        accepted again.  If C{0}, the port keeps trying to accept connections
+        whenever it is readable.
+    @type exhaustionBackoff: C{float}
+
+    @ivar maxExhaustionBackoff: The longest delay for C{exhaustionBackoff}.
+    @type maxExhaustionBackoff: C{float}
+
+    @ivar acceptWakeups: The number of times the port became readable and
+        tried to accept connections.
+    @type acceptWakeups: C{int}
+
+    @ivar acceptedConnections: The number of connections accepted;
+        C{acceptedConnections / acceptWakeups} is the mean number of accepts
+        per wakeup.
+    @type acceptedConnections: C{int}
+
+    @ivar exhaustionEvents: The number of times C{accept(2)} failed because
+        the process or the system was out of file descriptors or memory
+        (C{EMFILE}, C{ENFILE}, C{ENOBUFS} or C{ENOMEM}) or because the
+        connection was aborted (C{ECONNABORTED}).
+    @type exhaustionEvents: C{int}
+
+    @ivar buildProtocolTime: The total number of seconds spent in the
+        factory's C{buildProtocol}.
+    @type buildProtocolTime: C{float}
+
+    @ivar _exhaustionDelay: The current C{exhaustionBackoff} delay, or C{None}
+        if the last C{accept(2)} did not fail for lack of resources.
+
+    @ivar _resumeCall: The L{IDelayedCall} which will start accepting
+        connections again after a backoff, or C{None}.
     """
 
     socketType = socket.SOCK_STREAM
@@ -910,6 +1004,18 @@ class Port(base.BasePort, _SocketCloser):
     addressFamily = socket.AF_INET
     _addressType = address.IPv4Address
 
+    maxAcceptsPerWakeup = None
+    exhaustionBackoff = 0
+    maxExhaustionBackoff = 5.0
+
+    acceptWakeups = 0
+    acceptedConnections = 0
+    exhaustionEvents = 0
+    buildProtocolTime = 0.0
+
+    _exhaustionDelay = None
+    _resumeCall = None
+
     def __init__(self, port, factory, backlog=50, interface='', reactor=None):
         """Initialize with a numeric port to listen on.
         """
@@ -1015,9 +1121,12 @@ class Port(base.BasePort, _SocketCloser):
         This accepts a connection and calls self.protocol() to handle the
         wire-level protocol.
         """
+        self.acceptWakeups += 1
         try:
             if platformType == "posix":
                 numAccepts = self.numberAccepts
+                if self.maxAcceptsPerWakeup is not None:
+                    numAccepts = min(numAccepts, self.maxAcceptsPerWakeup)
             else:
                 # win32 event loop breaks if we do more than one accept()
                 # in an iteration of the event loop.
@@ -1056,11 +1165,18 @@ class Port(base.BasePort, _SocketCloser):
 
                         log.msg("Could not accept new connection (%s)" % (
                             errorcode[e.args[0]],))
+                        self.exhaustionEvents += 1
+                        if e.args[0] != ECONNABORTED:
+                            self._backOff()
                         break
                     raise
 
+                self.acceptedConnections += 1
+                self._exhaustionDelay = None
                 fdesc._setCloseOnExec(skt.fileno())
+                started = self.reactor.seconds()
                 protocol = self.factory.buildProtocol(self._buildAddr(addr))
+                self.buildProtocolTime += self.reactor.seconds() - started
                 if protocol is None:
                     skt.close()
                     continue
@@ -1080,6 +1196,32 @@ class Port(base.BasePort, _SocketCloser):
             # and return, so handling it here works just as well.
             log.deferr()
 
+
+    def _backOff(self):
+        """
+        Stop accepting connections for C{exhaustionBackoff} seconds, doubled
+        for each consecutive failure up to C{maxExhaustionBackoff}.
+        """
+        if not self.exhaustionBackoff:
+            return
+        if self._exhaustionDelay is None:
+            delay = self.exhaustionBackoff
+        else:
+            delay = min(self._exhaustionDelay * 2, self.maxExhaustionBackoff)
+        self._exhaustionDelay = delay
+        self.stopReading()
+        self._resumeCall = self.reactor.callLater(delay, self._resume)
+
+
+    def _resume(self):
+        """
+        Start accepting connections again after a backoff.
+        """
+        self._resumeCall = None
+        if not self.disconnecting:
+            self.startReading()
+
+
     def loseConnection(self, connDone=failure.Failure(main.CONNECTION_DONE)):
         """
         Stop accepting connections on this port.
@@ -1090,6 +1232,9 @@ class Port(base.BasePort, _SocketCloser):
         """
         self.disconnecting = True
         self.stopReading()
+        if self._resumeCall is not None:
+            self._resumeCall.cancel()
+            self._resumeCall = None
         if self.connected:
             self.deferred = deferLater(
                 self.reactor, 0, self.connectionLost, connDone)
@@ -6,6 +6,7 @@ Tests for L{twisted.internet.base}.
 """
 
 import socket
+from weakref import ref
 try:
     from Queue import Queue
 except ImportError:
@@ -270,3 +271,27 @@ class DelayedCallTests(TestCase):
         self.assertTrue(self.zero != self.one)
         self.assertFalse(self.zero != self.zero)
         self.assertFalse(self.one != self.one)
+
+
+    def test_attributes(self):
+        """
+        Arbitrary attributes can be set on L{DelayedCall} instances, and they
+        can be weakly referenced.
+        """
+        self.zero.name = "zero"
+        self.assertEqual(self.zero.name, "zero")
+        self.assertIdentical(ref(self.zero)(), self.zero)
+
+
+    def test_cancelledDebugStr(self):
+        """
+        With C{debug} set, the string representation of a L{DelayedCall} is
+        kept when it is cancelled, and includes the stack it was created
+        from.
+        """
+        self.patch(DelayedCall, "debug", True)
+        dc = DelayedCall(12, nothing, (), {}, lambda call: None, None,
+                         lambda: 1.5)
+        dc.cancel()
+        self.assertIn("traceback at creation", str(dc))
+        self.assertIn("nothing()", str(dc))
@@ -8,6 +8,7 @@ L{twisted.internet.endpoints}.
 """
 from __future__ import division, absolute_import
 
+import os
 import socket
 
 from errno import EPERM
@@ -2325,6 +2326,30 @@ class ServerStringTests(unittest.TestCase):
         self.assertEqual(server._port, 1234)
         self.assertEqual(server._backlog, 12)
         self.assertEqual(server._interface, "10.0.0.1")
+        self.assertFalse(server._reuseport)
+
+
+    def test_tcpReusePort(self):
+        """
+        The C{reuseport} argument of a TCP strports description is passed to
+        the L{TCP4ServerEndpoint} as a boolean.
+        """
+        server = endpoints.serverFromString(
+            object(), "tcp:1234:reuseport=yes")
+        self.assertTrue(server._reuseport)
+        server = endpoints.serverFromString(
+            object(), "tcp:1234:reuseport=no")
+        self.assertFalse(server._reuseport)
+
+
+    def test_tcpInvalidReusePort(self):
+        """
+        L{endpoints.serverFromString} raises C{ValueError} when the
+        C{reuseport} argument of a TCP description is not a boolean.
+        """
+        self.assertRaises(
+            ValueError, endpoints.serverFromString,
+            object(), "tcp:1234:reuseport=maybe")
 
 
     def test_ssl(self):
@@ -3049,6 +3074,246 @@ class TCP6ServerEndpointPluginTests(unittest.TestCase):
         self.assertEqual(ep._port, 8080)
         self.assertEqual(ep._backlog, 12)
         self.assertEqual(ep._interface, '::1')
+        self.assertFalse(ep._reuseport)
+
+
+    def test_stringDescriptionReusePort(self):
+        """
+        The C{reuseport} argument of a 'tcp6' description is passed to the
+        L{TCP6ServerEndpoint} as a boolean.
+        """
+        ep = endpoints.serverFromString(
+            MemoryReactor(), "tcp6:8080:reuseport=yes")
+        self.assertTrue(ep._reuseport)
+
+
+
+class FakeAdoptingReactor(object):
+    """
+    A fake L{IReactorSocket} which records the sockets passed to
+    C{adoptStreamPort}, keeping a duplicate of each open.
+
+    @ivar adopted: A C{list} of 3-tuples of the duplicated socket, the address
+        family and the factory passed to C{adoptStreamPort}.
+    """
+    def __init__(self):
+        self.adopted = []
+
+
+    def adoptStreamPort(self, fileDescriptor, addressFamily, factory):
+        skt = socket.fromfd(fileDescriptor, addressFamily, SOCK_STREAM)
+        self.adopted.append((skt, addressFamily, factory))
+        return skt
+
+
+
+class TCPServerEndpointReusePortTests(unittest.TestCase):
+    """
+    Tests for L{TCP4ServerEndpoint} and L{TCP6ServerEndpoint} listening with
+    C{SO_REUSEPORT} set.
+    """
+    if endpoints._SO_REUSEPORT is None:
+        skip = "SO_REUSEPORT is not supported on this platform"
+
+    def setUp(self):
+        self.reactor = FakeAdoptingReactor()
+        self.addCleanup(self._closeAdopted)
+
+
+    def _closeAdopted(self):
+        for skt, family, factory in self.reactor.adopted:
+            skt.close()
+
+
+    def test_adoptsSocket(self):
+        """
+        With C{reuseport} set, L{TCP4ServerEndpoint.listen} binds a listening
+        socket with C{SO_REUSEPORT} set and hands it to the reactor's
+        C{adoptStreamPort}.
+        """
+        factory = object()
+        endpoint = endpoints.TCP4ServerEndpoint(
+            self.reactor, 0, interface="127.0.0.1", reuseport=True)
+        port = self.successResultOf(endpoint.listen(factory))
+        [(skt, family, adoptedFactory)] = self.reactor.adopted
+        self.assertIs(port, skt)
+        self.assertEqual(family, AF_INET)
+        self.assertIs(adoptedFactory, factory)
+        self.assertEqual(skt.getsockname()[0], "127.0.0.1")
+        self.assertTrue(skt.getsockopt(
+            socket.SOL_SOCKET, endpoints._SO_REUSEPORT))
+
+
+    def test_sharedPort(self):
+        """
+        Several endpoints with C{reuseport} set can listen on the same port.
+        """
+        first = endpoints.TCP4ServerEndpoint(
+            self.reactor, 0, interface="127.0.0.1", reuseport=True)
+        self.successResultOf(first.listen(object()))
+        portNumber = self.reactor.adopted[0][0].getsockname()[1]
+        second = endpoints.TCP4ServerEndpoint(
+            self.reactor, portNumber, interface="127.0.0.1", reuseport=True)
+        self.successResultOf(second.listen(object()))
+        self.assertEqual(
+            self.reactor.adopted[1][0].getsockname()[1], portNumber)
+
+
+    def test_addressInUse(self):
+        """
+        L{TCP4ServerEndpoint.listen} fails with L{error.CannotListenError}
+        if the port is in use by a socket without C{SO_REUSEPORT}.
+        """
+        skt = socket.socket(AF_INET, SOCK_STREAM)
+        self.addCleanup(skt.close)
+        skt.bind(("127.0.0.1", 0))
+        skt.listen(1)
+        endpoint = endpoints.TCP4ServerEndpoint(
+            self.reactor, skt.getsockname()[1], interface="127.0.0.1",
+            reuseport=True)
+        self.failureResultOf(
+            endpoint.listen(object()), error.CannotListenError)
+
+
+    def test_ipv6(self):
+        """
+        L{TCP6ServerEndpoint} with C{reuseport} set hands an C{AF_INET6}
+        socket to the reactor.
+        """
+        if not socket.has_ipv6:
+            raise unittest.SkipTest("Platform lacks IPv6 support")
+        endpoint = endpoints.TCP6ServerEndpoint(
+            self.reactor, 0, interface="::1", reuseport=True)
+        self.successResultOf(endpoint.listen(object()))
+        self.assertEqual(self.reactor.adopted[0][1], AF_INET6)
+
+
+
+class SoReusePortTests(unittest.TestCase):
+    """
+    Tests for L{endpoints._soReusePort}.
+    """
+    def setUp(self):
+        self.socketModule = FakeSocketModule()
+        self.patch(endpoints, "socket", self.socketModule)
+        self.linux = True
+        self.patch(endpoints.platform, "isLinux", lambda: self.linux)
+        self.machine = "x86_64"
+        self.patch(os, "uname",
+                   lambda: ("Linux", "host", "3.9", "#1", self.machine))
+
+
+    def test_socketModule(self):
+        """
+        The value defined by the C{socket} module is used if there is one.
+        """
+        self.socketModule.SO_REUSEPORT = 0x200
+        self.machine = "sparc64"
+        self.assertEqual(endpoints._soReusePort(), 0x200)
+        self.linux = False
+        self.assertEqual(endpoints._soReusePort(), 0x200)
+
+
+    def test_linux(self):
+        """
+        On Linux architectures using the generic socket option numbers,
+        C{SO_REUSEPORT} is C{15}.
+        """
+        for machine in "x86_64", "i686", "armv7l", "aarch64", "ppc64le":
+            self.machine = machine
+            self.assertEqual(endpoints._soReusePort(), 15)
+
+
+    def test_otherLinuxArchitectures(self):
+        """
+        On the Linux architectures numbering socket options differently,
+        C{SO_REUSEPORT} is not supported unless the C{socket} module defines
+        it.
+        """
+        for machine in "alpha", "mips64", "parisc", "sparc64":
+            self.machine = machine
+            self.assertIdentical(endpoints._soReusePort(), None)
+
+
+    def test_otherPlatforms(self):
+        """
+        Elsewhere than on Linux, C{SO_REUSEPORT} is not supported unless the
+        C{socket} module defines it.
+        """
+        self.linux = False
+        self.assertIdentical(endpoints._soReusePort(), None)
+
+
+
+class FakeSocketModule(object):
+    """
+    A stand-in for the C{socket} module, without C{SO_REUSEPORT}.
+    """
+
+
+
+class InheritedEndpointPluginTests(unittest.TestCase):
+    """
+    Unit tests for the inherited stream server endpoint string description
+    parser.
+    """
+    _parserClass = endpoints._InheritedParser
+
+    def test_pluginDiscovery(self):
+        """
+        L{endpoints._InheritedParser} is found as a plugin for
+        L{interfaces.IStreamServerEndpointStringParser} interface.
+        """
+        parsers = list(getPlugins(
+            interfaces.IStreamServerEndpointStringParser))
+        for p in parsers:
+            if isinstance(p, self._parserClass):
+                break
+        else:
+            self.fail("Did not find inherited endpoint parser in %r" % (
+                parsers,))
+
+
+    def test_interface(self):
+        """
+        L{endpoints._InheritedParser} instances provide
+        L{interfaces.IStreamServerEndpointStringParser}.
+        """
+        parser = self._parserClass()
+        self.assertTrue(verifyObject(
+            interfaces.IStreamServerEndpointStringParser, parser))
+
+
+    def test_parseStreamServer(self):
+        """
+        L{endpoints._InheritedParser.parseStreamServer} returns an
+        L{AdoptedStreamServerEndpoint} for the descriptor at the given index,
+        counting from 3, with the address family named for it in the
+        I{TWISTED_INHERITED_SOCKETS} environment variable.
+        """
+        reactor = object()
+        parser = self._parserClass()
+        parser._environ = {"TWISTED_INHERITED_SOCKETS": "INET,INET6"}
+        first = parser.parseStreamServer(reactor, "0")
+        self.assertIsInstance(first, endpoints.AdoptedStreamServerEndpoint)
+        self.assertIs(first.reactor, reactor)
+        self.assertEqual(first.fileno, 3)
+        self.assertEqual(first.addressFamily, AF_INET)
+        second = parser.parseStreamServer(reactor, "1")
+        self.assertEqual(second.fileno, 4)
+        self.assertEqual(second.addressFamily, AF_INET6)
+
+
+    def test_noSuchSocket(self):
+        """
+        L{endpoints._InheritedParser.parseStreamServer} raises C{ValueError}
+        for an index beyond the inherited sockets.
+        """
+        parser = self._parserClass()
+        parser._environ = {"TWISTED_INHERITED_SOCKETS": "INET"}
+        self.assertRaises(ValueError, parser.parseStreamServer, object(), "1")
+        parser._environ = {}
+        self.assertRaises(ValueError, parser.parseStreamServer, object(), "0")
 
 
 
@@ -3140,5 +3405,6 @@ if _PY3:
          ServerStringTests, ClientStringTests, SSLClientStringTests,
          AdoptedStreamServerEndpointTestCase, SystemdEndpointPluginTests,
          TCP6ServerEndpointPluginTests, StandardIOEndpointPluginTests,
-         ProcessEndpointsTestCase, WrappedIProtocolTests,
+         InheritedEndpointPluginTests, ProcessEndpointsTestCase,
+         WrappedIProtocolTests,
          )
@@ -97,3 +97,123 @@ class WriteDescriptorTests(SynchronousTestCase):
         descriptor = MemoryFile()
         descriptor.write(b"hello, world")
         self.assertIs(None, descriptor.doWrite())
+
+
+
+class VectorMemoryFile(MemoryFile):
+    """
+    A L{MemoryFile} which accepts all of its buffered data at once, the way
+    descriptors which can use C{sendmsg} do.
+
+    @ivar _vectors: A C{list} with one C{list} of C{bytes} for each call to
+        L{_writeSomeVectors}, giving the chunks it was passed.
+    """
+    _vectoredWrites = True
+
+    def __init__(self):
+        MemoryFile.__init__(self)
+        self._vectors = []
+
+
+    def _writeSomeVectors(self, vectors):
+        """
+        Record C{vectors} and copy at most C{self._freeSpace} bytes from them
+        into C{self._written}.
+        """
+        chunks = [memoryview(vector).tobytes() for vector in vectors]
+        self._vectors.append(chunks)
+        return self.writeSomeData(b"".join(chunks))
+
+
+
+class VectoredWriteTests(SynchronousTestCase):
+    """
+    Tests for L{FileDescriptor.doWrite} when C{_vectoredWrites} is set.
+    """
+    def setUp(self):
+        self.descriptor = VectorMemoryFile()
+
+
+    def test_chunksNotJoined(self):
+        """
+        The chunks passed to C{write} and C{writeSequence} are passed to
+        L{FileDescriptor._writeSomeVectors} separately.
+        """
+        self.descriptor._freeSpace = 100
+        self.descriptor.write(b"hello")
+        self.descriptor.writeSequence([b", ", b"world"])
+        self.assertIs(None, self.descriptor.doWrite())
+        self.assertEqual(
+            self.descriptor._vectors, [[b"hello", b", ", b"world"]])
+        self.assertEqual(self.descriptor._written, [b"hello, world"])
+        self.assertEqual(self.descriptor.dataBuffer, b"")
+        self.assertEqual(self.descriptor._tempDataLen, 0)
+
+
+    def test_partialWrite(self):
+        """
+        If only part of the chunks is written, the rest is passed to the next
+        call to L{FileDescriptor._writeSomeVectors}, starting part of the way
+        through the chunk which was partly written.
+        """
+        self.descriptor._freeSpace = 7
+        self.descriptor.writeSequence([b"abc", b"defg", b"hij", b"kl"])
+        self.descriptor.doWrite()
+        self.descriptor._freeSpace = 2
+        self.descriptor.doWrite()
+        self.descriptor._freeSpace = 100
+        self.descriptor.doWrite()
+        self.assertEqual(
+            self.descriptor._vectors,
+            [[b"abc", b"defg", b"hij", b"kl"], [b"hij", b"kl"], [b"j", b"kl"]])
+        self.assertEqual(
+            b"".join(self.descriptor._written), b"abcdefghijkl")
+        self.assertEqual(self.descriptor._tempDataLen, 0)
+
+
+    def test_emptyChunksSkipped(self):
+        """
+        Empty chunks are not passed to L{FileDescriptor._writeSomeVectors}.
+        """
+        self.descriptor._freeSpace = 100
+        self.descriptor.writeSequence([b"a", b"", b"b"])
+        self.descriptor.doWrite()
+        self.assertEqual(self.descriptor._vectors, [[b"a", b"b"]])
+
+
+    def test_sendLimit(self):
+        """
+        No more chunks are passed to L{FileDescriptor._writeSomeVectors} once
+        C{SEND_LIMIT} bytes have been gathered.
+        """
+        self.descriptor.SEND_LIMIT = 4
+        self.descriptor._freeSpace = 100
+        self.descriptor.writeSequence([b"ab", b"cd", b"ef"])
+        self.descriptor.doWrite()
+        self.descriptor.doWrite()
+        self.assertEqual(
+            self.descriptor._vectors, [[b"ab", b"cd"], [b"ef"]])
+
+
+    def test_vectorLimit(self):
+        """
+        At most C{_VECTOR_LIMIT} chunks are passed to
+        L{FileDescriptor._writeSomeVectors} at once.
+        """
+        self.descriptor._VECTOR_LIMIT = 2
+        self.descriptor._freeSpace = 100
+        self.descriptor.writeSequence([b"a", b"b", b"c"])
+        self.descriptor.doWrite()
+        self.descriptor.doWrite()
+        self.assertEqual(
+            self.descriptor._vectors, [[b"a", b"b"], [b"c"]])
+
+
+    def test_kernelBufferFull(self):
+        """
+        When L{FileDescriptor._writeSomeVectors} returns C{0},
+        L{FileDescriptor.doWrite} returns C{None} and keeps the data.
+        """
+        self.descriptor.write(b"hello, world")
+        self.assertIs(None, self.descriptor.doWrite())
+        self.assertEqual(self.descriptor._tempDataLen, 12)
@@ -0,0 +1,595 @@
+# Copyright (c) Twisted Matrix Laboratories.
+# See LICENSE for details.
+
+"""
+Tests for L{twisted.internet.instrumentation}.
+"""
+
+from __future__ import division, absolute_import
+
+import os
+
+from twisted.trial.unittest import SynchronousTestCase
+from twisted.python import log
+from twisted.internet.task import Clock
+from twisted.internet import defer
+from twisted.internet.instrumentation import (
+    ReactorInstrumentation, DeferredProfiler, CallbackStats, _callableName)
+from twisted.internet.test.reactormixins import ReactorBuilder
+from twisted.internet.test.test_posixbase import TimeoutReportReactor
+
+
+
+class FakeClock(object):
+    """
+    A clock which moves forward only when told to.
+
+    @ivar now: The current time.
+    """
+    now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+
+class Selectable(object):
+    """
+    A selectable whose C{doRead} and C{doWrite} take C{duration} seconds of
+    C{clock} time.
+    """
+    def __init__(self, clock, duration):
+        self.clock = clock
+        self.duration = duration
+
+
+    def doRead(self):
+        self.clock.now += self.duration
+        return "read"
+
+
+    def doWrite(self):
+        self.clock.now += self.duration
+        return "write"
+
+
+
+class ReactorInstrumentationTests(SynchronousTestCase):
+    """
+    Tests for L{ReactorInstrumentation}.
+    """
+
+    def setUp(self):
+        self.clock = FakeClock()
+        self.instrumentation = ReactorInstrumentation(clock=self.clock)
+        self.messages = []
+        log.addObserver(self.messages.append)
+        self.addCleanup(log.removeObserver, self.messages.append)
+
+
+    def advance(self, duration, result=None):
+        """
+        Move the fake clock forward by C{duration} seconds and return
+        C{result}, like a callback which takes that long.
+        """
+        self.clock.now += duration
+        return result
+
+
+    def slowMessages(self):
+        """
+        Return the text of the slow callback messages logged.
+        """
+        return [log.textFromEventDict(event) for event in self.messages
+                if "Slow callback" in (log.textFromEventDict(event) or "")]
+
+
+    def test_recordPoll(self):
+        """
+        L{ReactorInstrumentation.recordPoll} counts iterations and adds up
+        the time spent polling.
+        """
+        self.instrumentation.recordPoll(0.5)
+        self.instrumentation.recordPoll(0.25)
+        self.assertEqual(self.instrumentation.iterations, 2)
+        self.assertEqual(self.instrumentation.pollTime, 0.75)
+
+
+    def test_runTimedCall(self):
+        """
+        L{ReactorInstrumentation.runTimedCall} calls the function with the
+        arguments given, returns its result and adds up the time spent.
+        """
+        result = self.instrumentation.runTimedCall(
+            self.advance, (0.5,), {"result": "x"})
+        self.assertEqual(result, "x")
+        self.instrumentation.runTimedCall(self.advance, (0.25,), {})
+        self.assertEqual(self.instrumentation.timedCalls, 2)
+        self.assertEqual(self.instrumentation.timedCallTime, 0.75)
+
+
+    def test_runTimedCallRaises(self):
+        """
+        A timed call which raises an exception is still counted, and the
+        exception propagates.
+        """
+        def fail():
+            self.clock.now += 1
+            raise ZeroDivisionError()
+        self.assertRaises(
+            ZeroDivisionError, self.instrumentation.runTimedCall, fail, (), {})
+        self.assertEqual(self.instrumentation.timedCalls, 1)
+        self.assertEqual(self.instrumentation.timedCallTime, 1)
+
+
+    def test_runThreadCall(self):
+        """
+        L{ReactorInstrumentation.runThreadCall} counts calls from
+        C{callFromThread} separately from timed calls.
+        """
+        self.instrumentation.runThreadCall(self.advance, (2,), {})
+        self.assertEqual(self.instrumentation.threadCalls, 1)
+        self.assertEqual(self.instrumentation.threadCallTime, 2)
+        self.assertEqual(self.instrumentation.timedCalls, 0)
+
+
+    def test_recordThreadCallQueue(self):
+        """
+        L{ReactorInstrumentation.recordThreadCallQueue} keeps the latest and
+        the largest queue depth.
+        """
+        self.instrumentation.recordThreadCallQueue(3)
+        self.instrumentation.recordThreadCallQueue(1)
+        self.assertEqual(self.instrumentation.threadCallQueueDepth, 1)
+        self.assertEqual(self.instrumentation.maxThreadCallQueueDepth, 3)
+
+
+    def test_runIO(self):
+        """
+        L{ReactorInstrumentation.runIO} calls the named method of the
+        selectable and adds up calls and time per selectable class and
+        method.
+        """
+        selectable = Selectable(self.clock, 0.5)
+        self.assertEqual(
+            self.instrumentation.runIO(selectable, "doRead"), "read")
+        self.instrumentation.runIO(selectable, "doRead")
+        self.instrumentation.runIO(selectable, "doWrite")
+        name = __name__ + ".Selectable"
+        self.assertEqual(self.instrumentation.io, {
+                (name, "doRead"): [2, 1.0],
+                (name, "doWrite"): [1, 0.5]})
+
+
+    def test_slowCall(self):
+        """
+        A call which takes longer than C{slowCallThreshold} is counted and
+        logged with its qualified name.
+        """
+        self.instrumentation.slowCallThreshold = 0.1
+        self.instrumentation.runTimedCall(self.advance, (0.05,), {})
+        self.assertEqual(self.slowMessages(), [])
+        self.instrumentation.runTimedCall(self.advance, (0.25,), {})
+        self.assertEqual(self.instrumentation.slowCalls, 1)
+        self.assertEqual(self.slowMessages(), [
+                "Slow callback: %s.ReactorInstrumentationTests.advance blocked "
+                "the reactor for 250.0 ms" % (__name__,)])
+
+
+    def test_slowIO(self):
+        """
+        A C{doRead} or C{doWrite} call which takes longer than
+        C{slowCallThreshold} is logged with the name of the selectable's
+        class and the method.
+        """
+        self.instrumentation.slowCallThreshold = 0.1
+        self.instrumentation.runIO(Selectable(self.clock, 0.5), "doWrite")
+        self.assertEqual(self.slowMessages(), [
+                "Slow callback: %s.Selectable.doWrite blocked the reactor for "
+                "500.0 ms" % (__name__,)])
+
+
+    def test_noThreshold(self):
+        """
+        No calls are logged if C{slowCallThreshold} is C{None}.
+        """
+        self.instrumentation.runTimedCall(self.advance, (100,), {})
+        self.assertEqual(self.instrumentation.slowCalls, 0)
+        self.assertEqual(self.slowMessages(), [])
+
+
+    def test_reset(self):
+        """
+        L{ReactorInstrumentation.reset} sets the counters back to zero.
+        """
+        self.instrumentation.recordPoll(1)
+        self.instrumentation.runIO(Selectable(self.clock, 1), "doRead")
+        self.instrumentation.reset()
+        self.assertEqual(self.instrumentation.iterations, 0)
+        self.assertEqual(self.instrumentation.pollTime, 0)
+        self.assertEqual(self.instrumentation.io, {})
+
+
+    def test_summary(self):
+        """
+        L{ReactorInstrumentation.summary} describes the counters.
+        """
+        self.instrumentation.recordPoll(1.5)
+        self.instrumentation.runIO(Selectable(self.clock, 0.25), "doRead")
+        summary = self.instrumentation.summary()
+        self.assertIn("1 iterations", summary)
+        self.assertIn("poll 1.500s", summary)
+        self.assertIn(
+            "%s.Selectable.doRead 1 calls 0.250s" % (__name__,), summary)
+
+
+    def test_startLogging(self):
+        """
+        L{ReactorInstrumentation.startLogging} logs a summary and resets the
+        counters every interval until L{ReactorInstrumentation.stopLogging}
+        is called.
+        """
+        clock = Clock()
+        self.instrumentation.startLogging(clock, 10)
+        self.instrumentation.recordPoll(1)
+        clock.advance(10)
+        summaries = [event for event in self.messages
+                     if "Reactor instrumentation" in
+                     (log.textFromEventDict(event) or "")]
+        self.assertEqual(len(summaries), 1)
+        self.assertIn("1 iterations", log.textFromEventDict(summaries[0]))
+        self.assertEqual(self.instrumentation.iterations, 0)
+        self.instrumentation.stopLogging()
+        self.assertEqual(clock.getDelayedCalls(), [])
+
+
+
+class CallableNameTests(SynchronousTestCase):
+    """
+    Tests for L{_callableName}.
+    """
+
+    def test_function(self):
+        """
+        The name of a function includes its module.
+        """
+        self.assertEqual(_callableName(_callableName),
+                         "twisted.internet.instrumentation._callableName")
+
+
+    def test_method(self):
+        """
+        The name of a bound method includes the qualified name of the class
+        of its instance.
+        """
+        self.assertEqual(
+            _callableName(ReactorInstrumentation().reset),
+            "twisted.internet.instrumentation.ReactorInstrumentation.reset")
+
+
+    def test_other(self):
+        """
+        A callable without a name is described by its type.
+        """
+        self.assertEqual(_callableName(FakeClock()),
+                         __name__ + ".FakeClock")
+
+
+
+class InstallInstrumentationTests(SynchronousTestCase):
+    """
+    Tests for L{ReactorBase.installInstrumentation}.
+    """
+
+    def setUp(self):
+        self.reactor = TimeoutReportReactor()
+        self.instrumentation = ReactorInstrumentation()
+
+
+    def test_installInstrumentation(self):
+        """
+        L{ReactorBase.installInstrumentation} returns the previously
+        installed instrumentation.
+        """
+        self.assertIdentical(
+            self.reactor.installInstrumentation(self.instrumentation), None)
+        self.assertIdentical(
+            self.reactor.installInstrumentation(None), self.instrumentation)
+
+
+    def test_runUntilCurrent(self):
+        """
+        L{ReactorBase.runUntilCurrent} records the timed calls and the calls
+        from C{callFromThread} it runs, and the depth of the
+        C{callFromThread} queue.
+        """
+        self.reactor.installInstrumentation(self.instrumentation)
+        called = []
+        self.reactor.callLater(1, called.append, "a")
+        self.reactor.callFromThread(called.append, "b")
+        self.reactor.callFromThread(called.append, "c")
+        self.reactor.now += 1
+        self.reactor.runUntilCurrent()
+        self.assertEqual(called, ["b", "c", "a"])
+        self.assertEqual(self.instrumentation.timedCalls, 1)
+        self.assertEqual(self.instrumentation.threadCalls, 2)
+        self.assertEqual(self.instrumentation.threadCallQueueDepth, 2)
+
+
+    def test_notInstalled(self):
+        """
+        Nothing is recorded once the instrumentation is uninstalled.
+        """
+        self.reactor.installInstrumentation(self.instrumentation)
+        self.reactor.installInstrumentation(None)
+        self.reactor.callLater(0, lambda: None)
+        self.reactor.runUntilCurrent()
+        self.assertEqual(self.instrumentation.timedCalls, 0)
+
+
+
+class DeferredProfilerTests(SynchronousTestCase):
+    """
+    Tests for L{DeferredProfiler} and L{defer.setProfiler}.
+    """
+
+    def setUp(self):
+        self.clock = FakeClock()
+        self.profiler = DeferredProfiler(clock=self.clock)
+        defer.setProfiler(self.profiler)
+        self.addCleanup(defer.setProfiler, None)
+
+
+    def slow(self, result, duration):
+        """
+        A callback which takes C{duration} seconds of fake time.
+        """
+        self.clock.now += duration
+        return result
+
+
+    def test_getProfiler(self):
+        """
+        L{defer.getProfiler} returns the profiler installed by
+        L{defer.setProfiler}.
+        """
+        self.assertIdentical(defer.getProfiler(), self.profiler)
+        defer.setProfiler(None)
+        self.assertIdentical(defer.getProfiler(), None)
+
+
+    def test_callback(self):
+        """
+        The time each callback runs for is recorded under its qualified
+        name, along with how long its L{defer.Deferred} took to fire.
+        """
+        d = defer.Deferred()
+        d.addCallback(self.slow, 2)
+        self.clock.now += 5
+        d.callback(None)
+        d.addCallback(self.slow, 1)
+        [stats] = self.profiler.stats.values()
+        self.assertEqual(
+            stats.name,
+            __name__ + ".DeferredProfilerTests.slow")
+        self.assertEqual(
+            (stats.calls, stats.time, stats.waits, stats.wait, stats.maxWait),
+            (2, 3, 2, 10, 5))
+
+
+    def test_errback(self):
+        """
+        Errbacks are recorded, and the placeholder callbacks passing results
+        past them are not.
+        """
+        def handle(reason):
+            reason.trap(ZeroDivisionError)
+        d = defer.Deferred()
+        d.addErrback(handle)
+        d.addCallback(lambda result: 1 // 0)
+        d.addErrback(handle)
+        d.callback(None)
+        self.assertEqual(
+            sorted((name.split(".")[-1], stats.calls)
+                   for name, stats in self.profiler.stats.items()),
+            [("<lambda>", 1), ("handle", 1)])
+
+
+    def test_createdBeforeProfiling(self):
+        """
+        The wait of a L{defer.Deferred} created before profiling started is
+        not known.
+        """
+        defer.setProfiler(None)
+        d = defer.Deferred()
+        defer.setProfiler(self.profiler)
+        d.addCallback(self.slow, 1)
+        d.callback(None)
+        [stats] = self.profiler.stats.values()
+        self.assertEqual((stats.calls, stats.waits), (1, 0))
+
+
+    def test_chained(self):
+        """
+        When a callback returns a L{defer.Deferred}, the callbacks after it
+        are recorded as waiting from the creation of their own
+        L{defer.Deferred} until the result of the returned one arrived.
+        """
+        inner = defer.Deferred()
+        self.clock.now += 1
+        outer = defer.Deferred()
+        outer.addCallback(lambda result: inner)
+        outer.addCallback(self.slow, 0)
+        outer.callback(None)
+        self.clock.now += 3
+        inner.callback(None)
+        stats = self.profiler.stats[
+            __name__ + ".DeferredProfilerTests.slow"]
+        self.assertEqual((stats.calls, stats.wait), (1, 3))
+
+
+    def test_notProfiling(self):
+        """
+        Nothing is recorded once L{defer.setProfiler} is called with
+        C{None}.
+        """
+        defer.setProfiler(None)
+        d = defer.succeed(None)
+        d.addCallback(self.slow, 1)
+        self.assertEqual(self.profiler.stats, {})
+
+
+    def test_inlineCallbacks(self):
+        """
+        Each step of an L{defer.inlineCallbacks} generator is recorded under
+        the generator's qualified name, with how long it waited for the
+        L{defer.Deferred}s it yielded which were not ready.
+        """
+        waiting = defer.Deferred()
+        @defer.inlineCallbacks
+        def generator():
+            self.clock.now += 1
+            yield defer.succeed(None)
+            self.clock.now += 2
+            yield waiting
+            self.clock.now += 4
+            defer.returnValue("done")
+        result = generator()
+        self.clock.now += 10
+        waiting.callback(None)
+        self.assertEqual(self.successResultOf(result), "done")
+        stats = self.profiler.stats[__name__ + ".generator"]
+        self.assertEqual(
+            (stats.calls, stats.time, stats.waits, stats.wait),
+            (3, 7, 1, 10))
+
+
+    def test_inlineCallbacksFailure(self):
+        """
+        A step of an L{defer.inlineCallbacks} generator which raises is
+        recorded, and the exception still fails the result.
+        """
+        @defer.inlineCallbacks
+        def generator():
+            self.clock.now += 1
+            yield defer.fail(ZeroDivisionError())
+        self.failureResultOf(generator(), ZeroDivisionError)
+        stats = self.profiler.stats[__name__ + ".generator"]
+        self.assertEqual((stats.calls, stats.time), (2, 1))
+
+
+    def test_report(self):
+        """
+        L{DeferredProfiler.report} describes the callbacks in a table sorted
+        as requested, most significant first.
+        """
+        def quick(result):
+            return result
+        d = defer.Deferred()
+        d.addCallback(quick)
+        d.addCallback(quick)
+        d.addCallback(self.slow, 5)
+        d.callback(None)
+        byTime = self.profiler.report().splitlines()
+        self.assertEqual(byTime[0].split(),
+                         ["calls", "time", "per", "call", "avg", "wait",
+                          "max", "wait", "name"])
+        self.assertTrue(byTime[1].endswith(".slow"))
+        self.assertTrue(byTime[2].endswith(".quick"))
+        byCalls = self.profiler.report(sortBy="calls", limit=1).splitlines()
+        self.assertEqual(len(byCalls), 2)
+        self.assertTrue(byCalls[1].endswith(".quick"))
+
+
+    def test_reportInvalidSort(self):
+        """
+        L{DeferredProfiler.report} raises L{ValueError} for an unknown sort
+        key.
+        """
+        self.assertRaises(ValueError, self.profiler.report, sortBy="name")
+
+
+    def test_reset(self):
+        """
+        L{DeferredProfiler.reset} forgets everything recorded.
+        """
+        defer.succeed(None).addCallback(self.slow, 1)
+        self.profiler.reset()
+        self.assertEqual(self.profiler.stats, {})
+
+
+    def test_averageWait(self):
+        """
+        L{CallbackStats.averageWait} is the total wait divided by the number
+        of known waits, or zero.
+        """
+        stats = CallbackStats("f")
+        self.assertEqual(stats.averageWait(), 0.0)
+        stats.waits, stats.wait = 4, 2.0
+        self.assertEqual(stats.averageWait(), 0.5)
+
+
+
+class PipeReader(object):
+    """
+    A reader of the read end of a pipe which stops the reactor once it has
+    read something.
+    """
+    def __init__(self, reactor, fd):
+        self.reactor = reactor
+        self.fd = fd
+
+
+    def fileno(self):
+        return self.fd
+
+
+    def logPrefix(self):
+        return "PipeReader"
+
+
+    def doRead(self):
+        os.read(self.fd, 1)
+        self.reactor.removeReader(self)
+        self.reactor.stop()
+
+
+    def connectionLost(self, reason):
+        pass
+
+
+
+class InstrumentedIterationTestsBuilder(ReactorBuilder):
+    """
+    Builder for tests of the instrumentation recorded by the C{doIteration}
+    of the epoll, poll and select reactors.
+    """
+    _reactors = ["twisted.internet.selectreactor.SelectReactor",
+                 "twisted.internet.pollreactor.PollReactor",
+                 "twisted.internet.epollreactor.EPollReactor"]
+
+    def test_pollAndIO(self):
+        """
+        The reactor records each poll and the time spent in C{doRead} for
+        each class of reader.
+        """
+        reactor = self.buildReactor()
+        instrumentation = ReactorInstrumentation()
+        reactor.installInstrumentation(instrumentation)
+        r, w = os.pipe()
+        self.addCleanup(os.close, r)
+        self.addCleanup(os.close, w)
+        reader = PipeReader(reactor, r)
+        reactor.addReader(reader)
+        os.write(w, b"x")
+        self.runReactor(reactor)
+        self.assertTrue(instrumentation.iterations >= 1)
+        [(calls, duration)] = [
+            counts for ((name, method), counts) in instrumentation.io.items()
+            if name == __name__ + ".PipeReader"]
+        self.assertEqual(calls, 1)
+        self.assertTrue(duration >= 0)
+
+
+
+globals().update(InstrumentedIterationTestsBuilder.makeTestCaseClasses())
@@ -7,10 +7,14 @@ Tests for L{twisted.internet.posixbase} and supporting code.
 
 from __future__ import division, absolute_import
 
+import os
+import select
+
 from twisted.python.compat import _PY3
 from twisted.trial.unittest import TestCase
 from twisted.internet.defer import Deferred
 from twisted.internet.posixbase import PosixReactorBase, _Waker
+from twisted.internet.posixbase import _UnixWaker, _EventFDWaker, _eventfd
 from twisted.internet.protocol import ServerFactory
 
 skipSockets = None
@@ -105,6 +109,130 @@ class PosixReactorBaseTests(TestCase):
         self.assertNotIn(writer, reactor._writers)
 
 
+    def _countWakeUps(self, reactor):
+        """
+        Replace C{reactor.wakeUp} with a function which counts its calls.
+
+        @return: A C{list} which gets an element for each call.
+        """
+        wakeUps = []
+        reactor.wakeUp = lambda: wakeUps.append(None)
+        return wakeUps
+
+
+    def test_callFromThreadWakesUpOnce(self):
+        """
+        Only the first of several calls to
+        L{PosixReactorBase.callFromThread} made before the reactor runs the
+        queued calls wakes the reactor up.
+        """
+        reactor = TrivialReactor()
+        wakeUps = self._countWakeUps(reactor)
+        calls = []
+        for i in range(3):
+            reactor.callFromThread(calls.append, i)
+        self.assertEqual(len(wakeUps), 1)
+
+        reactor.runUntilCurrent()
+        self.assertEqual(calls, [0, 1, 2])
+        self.assertEqual(len(reactor.threadCallQueue), 0)
+
+        reactor.callFromThread(calls.append, 3)
+        self.assertEqual(len(wakeUps), 2)
+
+
+    def test_callFromThreadWhileRunningCalls(self):
+        """
+        A call queued while L{PosixReactorBase.runUntilCurrent} runs the
+        queued calls wakes the reactor up again and is run by the next call
+        to L{PosixReactorBase.runUntilCurrent}.
+        """
+        reactor = TrivialReactor()
+        wakeUps = self._countWakeUps(reactor)
+        calls = []
+
+        def first():
+            calls.append("first")
+            reactor.callFromThread(calls.append, "second")
+
+        reactor.callFromThread(first)
+        reactor.runUntilCurrent()
+        self.assertEqual(calls, ["first"])
+        self.assertEqual(len(wakeUps), 2)
+
+        reactor.runUntilCurrent()
+        self.assertEqual(calls, ["first", "second"])
+
+
+
+class WakerTestsMixin(object):
+    """
+    Tests for a waker implementation, which subclasses provide as
+    C{wakerFactory}.
+    """
+
+    def _readable(self, waker):
+        """
+        Determine whether the waker's file descriptor is readable.
+        """
+        readable, writable, exceptional = select.select(
+            [waker.fileno()], [], [], 0)
+        return bool(readable)
+
+
+    def test_wakeUp(self):
+        """
+        After C{wakeUp} the waker is readable until C{doRead} is called, no
+        matter how many times the waker was woken up.
+        """
+        waker = self.wakerFactory(None)
+        self.addCleanup(waker.connectionLost, None)
+        self.assertFalse(self._readable(waker))
+        for i in range(3):
+            waker.wakeUp()
+        self.assertTrue(self._readable(waker))
+        waker.doRead()
+        self.assertFalse(self._readable(waker))
+
+
+    def test_connectionLost(self):
+        """
+        C{connectionLost} closes the waker's file descriptors.
+        """
+        waker = self.wakerFactory(None)
+        fds = set([waker.i, waker.o])
+        waker.connectionLost(None)
+        for fd in fds:
+            self.assertRaises(OSError, os.fstat, fd)
+
+
+
+class UnixWakerTests(WakerTestsMixin, TestCase):
+    """
+    Tests for L{_UnixWaker}.
+    """
+    wakerFactory = _UnixWaker
+
+
+
+class EventFDWakerTests(WakerTestsMixin, TestCase):
+    """
+    Tests for L{_EventFDWaker}.
+    """
+    wakerFactory = _EventFDWaker
+    if _eventfd is None:
+        skip = "eventfd is not available on this platform"
+
+
+    def test_singleDescriptor(self):
+        """
+        L{_EventFDWaker} reads and writes the same file descriptor.
+        """
+        waker = _EventFDWaker(None)
+        self.addCleanup(waker.connectionLost, None)
+        self.assertEqual(waker.i, waker.o)
+
+
 
 class TCPPortTests(TestCase):
     """
@@ -0,0 +1,298 @@
+# Copyright (c) Twisted Matrix Laboratories.
+# See LICENSE for details.
+
+"""
+Tests for L{twisted.internet.processpool}.
+"""
+
+import os
+import time
+
+try:
+    import cPickle as pickle
+except ImportError:
+    import pickle
+
+from twisted.trial.unittest import TestCase
+from twisted.internet import reactor
+from twisted.internet.defer import CancelledError
+from twisted.internet.error import ProcessTerminated
+from twisted.internet.interfaces import IReactorProcess
+from twisted.internet.processpool import (
+    ProcessPool, RemoteCallError, _BigString)
+from twisted.protocols.amp import MAX_VALUE_LENGTH
+from twisted.python.runtime import platform
+
+
+# Functions called in the worker processes; they are pickled by name, so
+# they have to be defined at module level.
+
+def _add(a, b=0):
+    return a + b
+
+
+def _pid():
+    return os.getpid()
+
+
+def _raise(message):
+    raise ValueError(message)
+
+
+def _sleep(seconds):
+    time.sleep(seconds)
+    return os.getpid()
+
+
+def _exit():
+    os._exit(3)
+
+
+def _unpicklableResult():
+    return lambda: None
+
+
+class _UnpicklableError(Exception):
+    def __reduce__(self):
+        raise TypeError("not picklable")
+
+
+def _raiseUnpicklable():
+    raise _UnpicklableError("oops")
+
+
+
+class BigStringTests(TestCase):
+    """
+    Tests for L{_BigString}.
+    """
+
+    def test_roundTrip(self):
+        """
+        A value longer than L{MAX_VALUE_LENGTH} is split over several keys
+        by L{_BigString.toBox} and reassembled by L{_BigString.fromBox}.
+        """
+        value = 'x' * (MAX_VALUE_LENGTH * 2) + 'y'
+        strings = {}
+        _BigString().toBox('data', strings, {'data': value}, None)
+        self.assertEqual(strings['data'], '3')
+        for chunk in strings['data.0'], strings['data.1'], strings['data.2']:
+            self.assertTrue(len(chunk) <= MAX_VALUE_LENGTH)
+        objects = {}
+        _BigString().fromBox('data', strings, objects, None)
+        self.assertEqual(objects, {'data': value})
+
+
+    def test_empty(self):
+        """
+        The empty string is encoded with no chunks at all.
+        """
+        strings = {}
+        _BigString().toBox('data', strings, {'data': ''}, None)
+        self.assertEqual(strings, {'data': '0'})
+        objects = {}
+        _BigString().fromBox('data', strings, objects, None)
+        self.assertEqual(objects, {'data': ''})
+
+
+
+class ProcessPoolTests(TestCase):
+    """
+    Tests for L{ProcessPool} using real worker processes.
+    """
+    if not IReactorProcess.providedBy(reactor):
+        skip = "Process pools need a reactor which can spawn processes."
+    elif platform.isWindows():
+        skip = "Process pools need extra child file descriptors."
+
+    def makePool(self, **kwargs):
+        """
+        Create a L{ProcessPool} which is stopped at the end of the test.
+        """
+        pool = ProcessPool(**kwargs)
+        self.addCleanup(pool.stop)
+        return pool
+
+
+    def test_result(self):
+        """
+        L{ProcessPool.deferToProcess} calls the function with the positional
+        and keyword arguments given and fires with its result.
+        """
+        pool = self.makePool(size=1)
+        d = pool.deferToProcess(_add, 3, b=4)
+        d.addCallback(self.assertEqual, 7)
+        return d
+
+
+    def test_otherProcess(self):
+        """
+        The function runs in a different process.
+        """
+        pool = self.makePool(size=1)
+        d = pool.deferToProcess(_pid)
+        d.addCallback(self.assertNotEqual, os.getpid())
+        return d
+
+
+    def test_largeResult(self):
+        """
+        Arguments and results longer than the largest L{AMP} value are sent
+        intact.
+        """
+        pool = self.makePool(size=1)
+        value = 'a' * (MAX_VALUE_LENGTH * 3)
+        d = pool.deferToProcess(_add, value, 'b')
+        d.addCallback(self.assertEqual, value + 'b')
+        return d
+
+
+    def test_exception(self):
+        """
+        If the function raises an exception, the L{Deferred} fails with it.
+        """
+        pool = self.makePool(size=1)
+        d = pool.deferToProcess(_raise, "bad value")
+        d = self.assertFailure(d, ValueError)
+        d.addCallback(
+            lambda exc: self.assertEqual(exc.args, ("bad value",)))
+        return d
+
+
+    def test_unpicklableException(self):
+        """
+        If the function raises an exception which cannot be pickled, the
+        L{Deferred} fails with a L{RemoteCallError} describing it.
+        """
+        pool = self.makePool(size=1)
+        d = pool.deferToProcess(_raiseUnpicklable)
+        d = self.assertFailure(d, RemoteCallError)
+        d.addCallback(lambda exc: self.assertIn(
+                "_UnpicklableError: oops", exc.args[0]))
+        return d
+
+
+    def test_unpicklableCall(self):
+        """
+        If the call cannot be pickled, the L{Deferred} fails at once and no
+        worker is started.
+        """
+        pool = self.makePool(size=1)
+        d = pool.deferToProcess(lambda: None)
+        self.assertEqual(pool._workers, [])
+        return self.assertFailure(d, pickle.PicklingError)
+
+
+    def test_unpicklableResult(self):
+        """
+        If the result of the function cannot be pickled, the L{Deferred}
+        fails with the pickling error.
+        """
+        pool = self.makePool(size=1)
+        d = pool.deferToProcess(_unpicklableResult)
+        return self.assertFailure(d, pickle.PicklingError)
+
+
+    def test_parallel(self):
+        """
+        Calls are spread over up to C{size} workers.
+        """
+        pool = self.makePool(size=2)
+        d1 = pool.deferToProcess(_sleep, 0.5)
+        d2 = pool.deferToProcess(_sleep, 0.5)
+        self.assertEqual(len(pool._workers), 2)
+        d3 = pool.deferToProcess(_sleep, 0)
+        self.assertEqual(len(pool._workers), 2)
+        self.assertEqual(len(pool._pending), 1)
+        pids = []
+        for d in d1, d2, d3:
+            d.addCallback(pids.append)
+
+        d = d3.addCallback(lambda ignored: d1).addCallback(lambda ign: d2)
+        d.addCallback(lambda ignored: self.assertEqual(len(set(pids)), 2))
+        return d
+
+
+    def test_recycle(self):
+        """
+        A worker which has run C{maxTasksPerWorker} calls is replaced by a new
+        process.
+        """
+        pool = self.makePool(size=1, maxTasksPerWorker=2)
+        pids = []
+
+        def call(ignored=None):
+            d = pool.deferToProcess(_pid)
+            return d.addCallback(pids.append)
+
+        d = call().addCallback(call).addCallback(call)
+
+        def check(ignored):
+            self.assertEqual(pids[0], pids[1])
+            self.assertNotEqual(pids[1], pids[2])
+        return d.addCallback(check)
+
+
+    def test_cancelQueued(self):
+        """
+        Cancelling the L{Deferred} of a queued call removes it from the queue.
+        """
+        pool = self.makePool(size=1)
+        running = pool.deferToProcess(_add, 1, 2)
+        queued = pool.deferToProcess(_add, 3, 4)
+        queued.cancel()
+        self.assertEqual(pool._pending, [])
+        self.failureResultOf(queued, CancelledError)
+        running.addCallback(self.assertEqual, 3)
+        return running
+
+
+    def test_cancelRunning(self):
+        """
+        Cancelling the L{Deferred} of a running call kills its worker, and a
+        new worker is started for later calls.
+        """
+        pool = self.makePool(size=1)
+        running = pool.deferToProcess(_sleep, 60)
+        worker = pool._workers[0]
+        running.cancel()
+        self.failureResultOf(running, CancelledError)
+        self.assertEqual(pool._workers, [])
+
+        d = worker.ended.addCallback(
+            lambda ignored: pool.deferToProcess(_add, 1, 2))
+        d.addCallback(self.assertEqual, 3)
+        return d
+
+
+    def test_workerDied(self):
+        """
+        If the worker exits while running a call, the L{Deferred} fails with
+        L{ProcessTerminated} and later calls run in a new worker.
+        """
+        pool = self.makePool(size=1)
+        d = self.assertFailure(pool.deferToProcess(_exit), ProcessTerminated)
+        d.addCallback(lambda exc: self.assertEqual(exc.exitCode, 3))
+        d.addCallback(lambda ignored: pool.deferToProcess(_add, 1, 2))
+        d.addCallback(self.assertEqual, 3)
+        return d
+
+
+    def test_stop(self):
+        """
+        L{ProcessPool.stop} cancels queued calls and returns a L{Deferred}
+        which fires when all the workers have exited.
+        """
+        pool = ProcessPool(size=1)
+        running = pool.deferToProcess(_sleep, 60)
+        queued = pool.deferToProcess(_add, 1, 2)
+        worker = pool._workers[0]
+        d = pool.stop()
+        self.failureResultOf(queued, CancelledError)
+        self.failureResultOf(running, CancelledError)
+
+        def stopped(ignored):
+            self.assertTrue(worker.ended.called)
+            self.assertEqual(pool._workers, [])
+            self.assertEqual(pool._retiring, [])
+        return d.addCallback(stopped)
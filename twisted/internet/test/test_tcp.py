@@ -41,11 +41,14 @@ from twisted.internet.defer import (
 from twisted.internet.endpoints import TCP4ServerEndpoint, TCP4ClientEndpoint
 from twisted.internet.protocol import ServerFactory, ClientFactory, Protocol
 from twisted.internet.interfaces import (
-    IPushProducer, IPullProducer, IHalfCloseableProtocol)
+    IPushProducer, IPullProducer, IHalfCloseableProtocol, IMemoryViewReceiver)
+from twisted.internet.abstract import ReadBuffer
+from twisted.internet.main import CONNECTION_DONE
 from twisted.internet.tcp import Connection, Server, _resolveIPv6
 from twisted.internet.test.test_core import ObjectModelIntegrationMixin
 from twisted.test.test_tcp import MyClientFactory, MyServerFactory
 from twisted.test.test_tcp import ClosingFactory, ClientStartStopFactory
+from twisted.test.proto_helpers import AccumulatingProtocol
 
 try:
     from OpenSSL import SSL
@@ -133,6 +136,16 @@ class FakeSocket(object):
     def recv(self, size):
         return self.data
 
+    def recv_into(self, buffer, size):
+        """
+        Copy at most C{size} bytes of C{self.data} into C{buffer}.
+
+        @return: The number of bytes copied.
+        """
+        data = self.data[:size]
+        buffer[:len(data)] = data
+        return len(data)
+
     def send(self, bytes):
         """
         I{Send} all of C{bytes} by accumulating it into C{self.sendBuffer}.
@@ -178,6 +191,31 @@ class FakeSocket(object):
 
 
 
+class FakeSendmsgSocket(FakeSocket):
+    """
+    A L{FakeSocket} which also has a C{sendmsg} method, like the sockets of
+    Python 3.3 and later.
+
+    @ivar vectors: A C{list} of the C{list}s of C{bytes} passed to
+        L{FakeSendmsgSocket.sendmsg}.
+    """
+    def __init__(self, data):
+        FakeSocket.__init__(self, data)
+        self.vectors = []
+
+
+    def sendmsg(self, buffers):
+        """
+        I{Send} all of C{buffers} by accumulating them into C{self.vectors}.
+
+        @return: The total length of C{buffers}.
+        """
+        buffers = [memoryview(buf).tobytes() for buf in buffers]
+        self.vectors.append(buffers)
+        return sum(map(len, buffers))
+
+
+
 class TestFakeSocket(TestCase):
     """
     Test that the FakeSocket can be used by the doRead method of L{Connection}
@@ -352,6 +390,83 @@ class TCPConnectionTests(TestCase):
         self.assertEqual(len(warnings), 1)
 
 
+    def test_vectoredWritesWithSendmsg(self):
+        """
+        If its socket has a C{sendmsg} method, L{Connection} sends the chunks
+        of data written to it with a single call to that method.
+        """
+        skt = FakeSendmsgSocket(b"")
+        conn = Connection(skt, Protocol(), reactor=_FakeFDSetReactor())
+        conn.connected = True
+        conn.write(b"hello")
+        conn.writeSequence([b", ", b"world"])
+        conn.doWrite()
+        self.assertEqual(skt.vectors, [[b"hello", b", ", b"world"]])
+        self.assertEqual(skt.sendBuffer, [])
+
+
+    def test_noVectoredWritesWithoutSendmsg(self):
+        """
+        If its socket has no C{sendmsg} method, L{Connection} joins the chunks
+        of data written to it and sends them with C{send}.
+        """
+        skt = FakeSocket(b"")
+        conn = Connection(skt, Protocol(), reactor=_FakeFDSetReactor())
+        conn.connected = True
+        conn.write(b"hello")
+        conn.writeSequence([b", ", b"world"])
+        conn.doWrite()
+        self.assertEqual(
+            [bytes(chunk) for chunk in skt.sendBuffer], [b"hello, world"])
+
+
+    def test_readIntoBuffer(self):
+        """
+        If the reactor has a L{ReadBuffer} installed, L{Connection.doRead}
+        reads into it and passes a C{bytes} copy of the data which was read to
+        a protocol which does not provide L{IMemoryViewReceiver}.
+        """
+        reactor = _FakeFDSetReactor()
+        reactor._readBuffer = ReadBuffer(16)
+        protocol = AccumulatingProtocol()
+        conn = Connection(FakeSocket(b"someData"), protocol, reactor=reactor)
+        conn.doRead()
+        self.assertEqual(protocol.data, b"someData")
+        self.assertIsInstance(protocol.data, bytes)
+        self.assertEqual(reactor._readBuffer.get(0)[:8].tobytes(), b"someData")
+
+
+    def test_readIntoBufferMemoryView(self):
+        """
+        If the reactor has a L{ReadBuffer} installed, a protocol which
+        provides L{IMemoryViewReceiver} is passed a C{memoryview} of the part
+        of the buffer which was read into.
+        """
+        @implementer(IMemoryViewReceiver)
+        class ViewProtocol(Protocol):
+            def dataReceived(self, data):
+                self.received = data
+
+        reactor = _FakeFDSetReactor()
+        reactor._readBuffer = ReadBuffer(16)
+        protocol = ViewProtocol()
+        conn = Connection(FakeSocket(b"someData"), protocol, reactor=reactor)
+        conn.doRead()
+        self.assertIsInstance(protocol.received, memoryview)
+        self.assertEqual(protocol.received.tobytes(), b"someData")
+
+
+    def test_readIntoBufferConnectionDone(self):
+        """
+        If the reactor has a L{ReadBuffer} installed and nothing is read,
+        L{Connection.doRead} returns L{CONNECTION_DONE}.
+        """
+        reactor = _FakeFDSetReactor()
+        reactor._readBuffer = ReadBuffer(16)
+        conn = Connection(FakeSocket(b""), Protocol(), reactor=reactor)
+        self.assertIs(conn.doRead(), CONNECTION_DONE)
+
+
     def test_noTLSBeforeStartTLS(self):
         """
         The C{TLS} attribute of a L{Connection} instance is C{False} before
@@ -0,0 +1,405 @@
+# Copyright (c) Twisted Matrix Laboratories.
+# See LICENSE for details.
+
+"""
+Tests for L{twisted.internet.timerqueue}.
+"""
+
+from __future__ import division, absolute_import
+
+import random
+
+from zope.interface.verify import verifyObject
+
+from twisted.trial.unittest import SynchronousTestCase
+from twisted.internet.base import DelayedCall
+from twisted.internet.timerqueue import (
+    ITimerQueue, HeapTimerQueue, TimingWheelTimerQueue)
+from twisted.internet.test.test_posixbase import TimeoutReportReactor
+
+
+
+class TimerQueueTestsMixin:
+    """
+    Tests for L{ITimerQueue} implementations.
+
+    @ivar now: The current time of the fake clock used by the calls created
+        by L{schedule}.
+    """
+
+    def createQueue(self):
+        """
+        Create the L{ITimerQueue} provider to test.
+        """
+        raise NotImplementedError()
+
+
+    def setUp(self):
+        self.now = 1000.0
+        self.queue = self.createQueue()
+
+
+    def seconds(self):
+        return self.now
+
+
+    def schedule(self, delay, name=None):
+        """
+        Create a L{DelayedCall} hooked up to C{self.queue} the same way
+        L{ReactorBase.callLater} does it, and add it to the queue.
+
+        @param name: A value by which the call can be identified in the
+            results of L{runDue}.
+        """
+        call = DelayedCall(
+            self.now + delay, lambda: None, (), {}, self.queue.cancel,
+            self.queue.moveSooner, seconds=self.seconds)
+        call.name = name
+        self.queue.add(call)
+        return call
+
+
+    def runDue(self):
+        """
+        Run every call in the queue which is due, and return their names.
+        """
+        names = []
+        for call in self.queue.expire(self.now):
+            call.called = 1
+            names.append(call.name)
+        return names
+
+
+    def test_interface(self):
+        """
+        The queue provides L{ITimerQueue}.
+        """
+        self.assertTrue(verifyObject(ITimerQueue, self.queue))
+
+
+    def test_empty(self):
+        """
+        An empty queue has no next time and no calls to expire.
+        """
+        self.assertIdentical(self.queue.nextTime(), None)
+        self.assertEqual(self.runDue(), [])
+        self.assertEqual(self.queue.getDelayedCalls(), [])
+
+
+    def test_nextTime(self):
+        """
+        L{ITimerQueue.nextTime} returns the time of the earliest call.
+        """
+        self.schedule(50)
+        self.schedule(10.5)
+        self.schedule(100)
+        self.assertEqual(self.queue.nextTime(), 1010.5)
+
+
+    def test_expire(self):
+        """
+        L{ITimerQueue.expire} returns the calls scheduled at or before the
+        given time, earliest first, and does not return them again.
+        """
+        self.schedule(3, "c")
+        self.schedule(1, "a")
+        self.schedule(5, "e")
+        self.schedule(2, "b")
+        self.now += 3
+        self.assertEqual(self.runDue(), ["a", "b", "c"])
+        self.assertEqual(self.runDue(), [])
+        self.assertEqual(self.queue.nextTime(), 1005)
+        self.now += 2
+        self.assertEqual(self.runDue(), ["e"])
+        self.assertIdentical(self.queue.nextTime(), None)
+
+
+    def test_expireExcludesNewCalls(self):
+        """
+        Calls added while the result of L{ITimerQueue.expire} is being
+        consumed are not included in it, even if they are due.
+        """
+        self.schedule(1, "a")
+        self.schedule(1, "b")
+        self.now += 1
+        names = []
+        for call in self.queue.expire(self.now):
+            names.append(call.name)
+            self.schedule(0, "new")
+        self.assertEqual(names, ["a", "b"])
+        self.assertEqual(self.runDue(), ["new", "new"])
+
+
+    def test_cancel(self):
+        """
+        A cancelled call is not returned by L{ITimerQueue.expire} or
+        L{ITimerQueue.getDelayedCalls}.
+        """
+        self.schedule(1, "a")
+        call = self.schedule(2, "b")
+        call.cancel()
+        self.assertEqual(
+            [c.name for c in self.queue.getDelayedCalls()], ["a"])
+        self.now += 2
+        self.assertEqual(self.runDue(), ["a"])
+        self.assertIdentical(self.queue.nextTime(), None)
+
+
+    def test_cancelWhileExpiring(self):
+        """
+        A call cancelled by a call which runs before it in the same pass is
+        not returned.
+        """
+        self.schedule(1, "a")
+        later = self.schedule(2, "b")
+        self.now += 2
+        names = []
+        for call in self.queue.expire(self.now):
+            names.append(call.name)
+            later.cancel()
+        self.assertEqual(names, ["a"])
+
+
+    def test_moveSooner(self):
+        """
+        A call reset to an earlier time runs at that time.
+        """
+        self.schedule(5, "a")
+        call = self.schedule(100, "b")
+        call.reset(2)
+        self.assertEqual(self.queue.nextTime(), 1002)
+        self.now += 2
+        self.assertEqual(self.runDue(), ["b"])
+
+
+    def test_delay(self):
+        """
+        A call reset to a later time is not returned by L{ITimerQueue.expire}
+        until that time.
+        """
+        call = self.schedule(1, "a")
+        call.reset(10)
+        self.now += 5
+        self.assertEqual(self.runDue(), [])
+        self.assertEqual(self.queue.nextTime(), 1010)
+        self.now += 5
+        self.assertEqual(self.runDue(), ["a"])
+
+
+    def test_manyCalls(self):
+        """
+        Many calls with assorted delays are each returned once, no sooner
+        than their time and in time order.
+        """
+        randomizer = random.Random(1234)
+        calls = [self.schedule(randomizer.uniform(0, 3000))
+                 for i in range(2000)]
+        for call in calls[::7]:
+            call.cancel()
+        for call in calls[1::7]:
+            call.reset(randomizer.uniform(0, 3000))
+        expected = [call for call in calls if call.active()]
+
+        seen = []
+        while self.queue.nextTime() is not None:
+            self.now = max(self.now, self.queue.nextTime())
+            self.now += randomizer.uniform(0, 5)
+            for call in self.queue.expire(self.now):
+                self.assertTrue(call.getTime() <= self.now)
+                call.called = 1
+                seen.append(call)
+        self.assertEqual(len(seen), len(expected))
+        self.assertEqual(set(seen), set(expected))
+        times = [call.time for call in seen]
+        self.assertEqual(times, sorted(times))
+
+
+
+class HeapTimerQueueTests(TimerQueueTestsMixin, SynchronousTestCase):
+    """
+    Tests for L{HeapTimerQueue}.
+    """
+
+    def createQueue(self):
+        return HeapTimerQueue()
+
+
+
+class TimingWheelTimerQueueTests(TimerQueueTestsMixin, SynchronousTestCase):
+    """
+    Tests for L{TimingWheelTimerQueue}.
+    """
+
+    def createQueue(self):
+        return TimingWheelTimerQueue()
+
+
+    def test_slotsPowerOfTwo(self):
+        """
+        L{TimingWheelTimerQueue} raises L{ValueError} if the number of slots
+        is not a power of two.
+        """
+        self.assertRaises(ValueError, TimingWheelTimerQueue, slots=100)
+
+
+    def test_cancelEarliest(self):
+        """
+        Cancelling the earliest call changes the next time to that of the
+        earliest remaining call.
+        """
+        first = self.schedule(1)
+        self.schedule(7)
+        self.assertEqual(self.queue.nextTime(), 1001)
+        first.cancel()
+        self.assertEqual(self.queue.nextTime(), 1007)
+
+
+    def test_sameTimeOrder(self):
+        """
+        Calls scheduled for the same time are returned in the order they
+        were added.
+        """
+        for name in range(20):
+            self.schedule(1, name)
+        self.now += 1
+        self.assertEqual(self.runDue(), list(range(20)))
+
+
+    def test_subTickPrecision(self):
+        """
+        A call is not returned before its time, even if that time is part of
+        the way through the current tick.
+        """
+        self.queue = TimingWheelTimerQueue(resolution=10)
+        self.now = 1000.0
+        self.schedule(5, "a")
+        self.now += 4
+        self.assertEqual(self.runDue(), [])
+        self.now += 1
+        self.assertEqual(self.runDue(), ["a"])
+
+
+    def test_cascade(self):
+        """
+        Calls filed in the higher levels of the wheel are returned at their
+        time.
+        """
+        self.queue = TimingWheelTimerQueue(resolution=1, slots=4, levels=2)
+        self.schedule(3, "a")
+        self.schedule(9, "b")
+        self.schedule(14, "c")
+        self.now += 9
+        self.assertEqual(self.runDue(), ["a", "b"])
+        self.assertEqual(self.queue.nextTime(), 1014)
+        self.now += 5
+        self.assertEqual(self.runDue(), ["c"])
+
+
+    def test_overflow(self):
+        """
+        Calls beyond the span of the wheel are returned at their time.
+        """
+        self.queue = TimingWheelTimerQueue(resolution=1, slots=4, levels=2)
+        self.schedule(100, "b")
+        self.schedule(17, "a")
+        self.schedule(2 ** 128, "never")
+        self.assertEqual(self.queue.nextTime(), 1017)
+        self.now += 99
+        self.assertEqual(self.runDue(), ["a"])
+        self.assertEqual(self.queue.nextTime(), 1100)
+        self.now += 1
+        self.assertEqual(self.runDue(), ["b"])
+        self.assertEqual(self.queue.nextTime(), 1000.0 + 2 ** 128)
+
+
+    def test_clockSetBack(self):
+        """
+        If the clock is set back, calls are still returned at their time.
+        """
+        self.schedule(50, "a")
+        self.now -= 100
+        self.schedule(10, "b")
+        self.now += 10
+        self.assertEqual(self.runDue(), ["b"])
+        self.now += 140
+        self.assertEqual(self.runDue(), ["a"])
+
+
+    def test_manyCallsSmallWheel(self):
+        """
+        Many calls are each returned once and in time order from a wheel small
+        enough that most of them cascade or overflow.
+        """
+        self.queue = TimingWheelTimerQueue(resolution=0.5, slots=8, levels=2)
+        self.test_manyCalls()
+
+
+    def test_nextTimeSmallWheel(self):
+        """
+        The next time is that of the earliest call, wherever the calls are
+        filed in the wheel, as calls are added, moved sooner, cancelled and
+        expired.
+        """
+        self.queue = TimingWheelTimerQueue(resolution=0.5, slots=4, levels=3)
+        randomizer = random.Random(4321)
+        calls = []
+        for i in range(3000):
+            operation = randomizer.random()
+            if operation < 0.4 or not calls:
+                calls.append(self.schedule(randomizer.uniform(0, 200)))
+            elif operation < 0.5:
+                call = randomizer.choice(calls)
+                call.reset(randomizer.uniform(0, call.getTime() - self.now))
+            elif operation < 0.6:
+                call = randomizer.choice(calls)
+                call.cancel()
+                calls.remove(call)
+            else:
+                self.now += randomizer.uniform(0, 3)
+                for call in self.queue.expire(self.now):
+                    call.called = 1
+                    calls.remove(call)
+            if calls:
+                expected = min(call.getTime() for call in calls)
+            else:
+                expected = None
+            self.assertEqual(self.queue.nextTime(), expected)
+
+
+
+class InstallTimerQueueTests(SynchronousTestCase):
+    """
+    Tests for L{ReactorBase.installTimerQueue}.
+    """
+
+    def test_installTimerQueue(self):
+        """
+        L{ReactorBase.installTimerQueue} returns the previously installed queue
+        and adds the calls which were already scheduled to the new one.
+        """
+        reactor = TimeoutReportReactor()
+        call = reactor.callLater(10, lambda: None)
+        queue = TimingWheelTimerQueue()
+        old = reactor.installTimerQueue(queue)
+        self.assertIsInstance(old, HeapTimerQueue)
+        self.assertEqual(queue.getDelayedCalls(), [call])
+        self.assertEqual(reactor.getDelayedCalls(), [call])
+        self.assertEqual(reactor.timeout(), 10)
+
+
+    def test_runUntilCurrent(self):
+        """
+        Calls scheduled with a reactor using a L{TimingWheelTimerQueue} are
+        run by L{ReactorBase.runUntilCurrent} once they are due.
+        """
+        reactor = TimeoutReportReactor()
+        reactor.installTimerQueue(TimingWheelTimerQueue())
+        called = []
+        reactor.callLater(1, called.append, "a")
+        reactor.callLater(3, called.append, "c")
+        reactor.callLater(2, called.append, "b").cancel()
+        reactor.callLater(5, called.append, "d").reset(2)
+        reactor.now += 2
+        reactor.runUntilCurrent()
+        self.assertEqual(called, ["a", "d"])
+        self.assertEqual(reactor.timeout(), 1)
@@ -16,6 +16,7 @@ else:
     import queue as Queue
 
 from twisted.python import failure
+from twisted.python.threadpool import ThreadPoolFull
 from twisted.internet import defer
 
 
@@ -40,7 +41,9 @@ def deferToThreadPool(reactor, threadpool, f, *args, **kwargs):
 
     @return: A Deferred which fires a callback with the result of f, or an
         errback with a L{twisted.python.failure.Failure} if f throws an
-        exception.
+        exception.  If C{threadpool} has a bounded queue which is full, the
+        Deferred fails immediately with
+        L{twisted.python.threadpool.ThreadPoolFull}.
     """
     d = defer.Deferred()
 
@@ -50,7 +53,10 @@ def deferToThreadPool(reactor, threadpool, f, *args, **kwargs):
         else:
             reactor.callFromThread(d.errback, result)
 
-    threadpool.callInThreadWithCallback(onResult, f, *args, **kwargs)
+    try:
+        threadpool.callInThreadWithCallback(onResult, f, *args, **kwargs)
+    except ThreadPoolFull:
+        return defer.fail()
 
     return d
 
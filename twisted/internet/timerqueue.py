@@ -0,0 +1,569 @@
+# -*- test-case-name: twisted.internet.test.test_timerqueue -*-
+# Copyright (c) Twisted Matrix Laboratories.
+# See LICENSE for details.
+
+"""
+Timer queues which keep track of the L{DelayedCall}s scheduled with a
+reactor.
+
+L{ReactorBase} uses a L{HeapTimerQueue} by default.  A different queue can be
+installed with L{ReactorBase.installTimerQueue}; for example, applications
+which keep a very large number of timers which are frequently rescheduled or
+cancelled may prefer L{TimingWheelTimerQueue}::
+
+    from twisted.internet import reactor
+    from twisted.internet.timerqueue import TimingWheelTimerQueue
+    reactor.installTimerQueue(TimingWheelTimerQueue())
+"""
+
+from __future__ import division, absolute_import
+
+__metaclass__ = type
+
+from heapq import heappush, heappop, heapify
+from itertools import count
+
+from zope.interface import Interface, implementer
+
+
+
+class ITimerQueue(Interface):
+    """
+    A collection of L{twisted.internet.base.DelayedCall} instances which can
+    efficiently report which of them are due to run.
+
+    A timer queue is driven by a reactor: L{add} is called by C{callLater},
+    L{cancel} and L{moveSooner} are called by the L{DelayedCall} itself, and
+    L{nextTime} and L{expire} are called from the reactor's main loop.
+    """
+
+    def add(call):
+        """
+        Begin tracking a newly scheduled call.
+
+        @param call: The L{DelayedCall} to track.  It is neither cancelled nor
+            called.
+        """
+
+
+    def cancel(call):
+        """
+        Stop tracking a call which is being cancelled.
+
+        @param call: The L{DelayedCall} which is being cancelled.  It may
+            already have been handed out by L{expire}, in which case this
+            should do nothing.
+        """
+
+
+    def moveSooner(call):
+        """
+        Note that the time of a tracked call has been decreased.
+
+        @param call: The L{DelayedCall} which was rescheduled.  It may already
+            have been handed out by L{expire}, in which case this should do
+            nothing.
+        """
+
+
+    def nextTime():
+        """
+        Determine when the earliest tracked call is scheduled to run.
+
+        Calls which have been delayed (see L{DelayedCall.delay}) may be
+        reported at their original time; they are rescheduled by L{expire}.
+        Likewise, cancelled calls may still be taken into account.
+
+        @return: The time at which the earliest call is to run, or C{None} if
+            no calls are being tracked.
+        @rtype: C{float} or C{NoneType}
+        """
+
+
+    def expire(now):
+        """
+        Stop tracking the calls which are due to run and return them.
+
+        Calls which were delayed are rescheduled rather than returned, and
+        cancelled calls are never returned.
+
+        @param now: The current time.
+        @type now: C{float}
+
+        @return: An iterable of the L{DelayedCall}s scheduled at or before
+            C{now}, in the order they are to be run.  Calls added while this
+            iterable is being consumed are not included in it.
+        """
+
+
+    def getDelayedCalls():
+        """
+        @return: A C{list} of all tracked calls which have not been cancelled,
+            in no particular order.
+        """
+
+
+
+@implementer(ITimerQueue)
+class HeapTimerQueue:
+    """
+    A timer queue which keeps calls in a binary heap ordered by their time.
+
+    Adding and expiring calls takes logarithmic time.  Cancelled calls are
+    left in the heap until they reach its top or until enough of them
+    accumulate to be worth removing, and moving a call sooner requires a
+    linear search of the heap.
+
+    @ivar _pendingTimedCalls: The heap of scheduled calls.
+    @ivar _newTimedCalls: Calls added since the heap was last updated.  They
+        are moved into the heap by L{nextTime} and L{expire}.
+    @ivar _cancellations: The number of cancelled calls in
+        C{_pendingTimedCalls} and C{_newTimedCalls}.
+    """
+
+    def __init__(self):
+        self._pendingTimedCalls = []
+        self._newTimedCalls = []
+        self._cancellations = 0
+
+
+    def add(self, call):
+        """
+        Add C{call} to the calls which will be moved into the heap later.
+        """
+        self._newTimedCalls.append(call)
+
+
+    def cancel(self, call):
+        """
+        Count C{call} as one more cancelled call left in the heap.
+        """
+        self._cancellations += 1
+
+
+    def moveSooner(self, call):
+        """
+        Move C{call} up the heap until it rests at the right place.
+        """
+        # Linear time find: slow.
+        heap = self._pendingTimedCalls
+        try:
+            pos = heap.index(call)
+
+            # Move elt up the heap until it rests at the right place.
+            elt = heap[pos]
+            while pos != 0:
+                parent = (pos-1) // 2
+                if heap[parent] <= elt:
+                    break
+                # move parent down
+                heap[pos] = heap[parent]
+                pos = parent
+            heap[pos] = elt
+        except ValueError:
+            # element was not found in heap - oh well...
+            pass
+
+
+    def _insertNewDelayedCalls(self):
+        for call in self._newTimedCalls:
+            if call.cancelled:
+                self._cancellations -= 1
+            else:
+                call.activate_delay()
+                heappush(self._pendingTimedCalls, call)
+        self._newTimedCalls = []
+
+
+    def nextTime(self):
+        """
+        Return the time of the call at the top of the heap.
+        """
+        self._insertNewDelayedCalls()
+        if not self._pendingTimedCalls:
+            return None
+        return self._pendingTimedCalls[0].time
+
+
+    def expire(self, now):
+        """
+        Pop the calls which are due off the heap one at a time, and then
+        discard cancelled calls if there are many of them.
+        """
+        self._insertNewDelayedCalls()
+
+        while self._pendingTimedCalls and (
+                self._pendingTimedCalls[0].time <= now):
+            call = heappop(self._pendingTimedCalls)
+            if call.cancelled:
+                self._cancellations -= 1
+                continue
+
+            if call.delayed_time > 0:
+                call.activate_delay()
+                heappush(self._pendingTimedCalls, call)
+                continue
+
+            yield call
+
+        if (self._cancellations > 50 and
+             self._cancellations > len(self._pendingTimedCalls) >> 1):
+            self._cancellations = 0
+            self._pendingTimedCalls = [x for x in self._pendingTimedCalls
+                                       if not x.cancelled]
+            heapify(self._pendingTimedCalls)
+
+
+    def getDelayedCalls(self):
+        """
+        Return the calls in the heap and the calls not yet added to it which
+        have not been cancelled.
+        """
+        return [x for x in (self._pendingTimedCalls + self._newTimedCalls)
+                if not x.cancelled]
+
+
+
+# A marker for an unknown earliest time, distinct from None which means that
+# there are no calls at all.
+_UNKNOWN = object()
+
+
+
+@implementer(ITimerQueue)
+class TimingWheelTimerQueue:
+    """
+    A timer queue which keeps calls in a hierarchical timing wheel.
+
+    Time is divided into ticks of C{resolution} seconds.  The first level of
+    the wheel has one slot for each of the next C{slots} ticks, and each
+    further level has C{slots} slots which each span all of the slots of the
+    level below.  Calls are filed in the lowest level which covers their time
+    and are moved down one level ("cascaded") each time the wheel turns past
+    the span of the slot they are in.  Calls beyond the span of the highest
+    level are kept in an overflow slot which is refiled each time the highest
+    level turns.
+
+    Adding, cancelling and moving a call sooner take constant time, whatever
+    the number of calls in the queue.  Calls still run at exactly their
+    scheduled time, not at the boundary of their tick; calls scheduled for the
+    same time run in the order they were added.
+
+    @ivar _resolution: The length of a tick in seconds.
+    @ivar _bits: The base two logarithm of the number of slots in a level.
+    @ivar _levels: A C{list} of levels, each a C{list} of slots.  A slot is a
+        C{dict} mapping each call filed in it to the sequence number it was
+        given when it was added.
+    @ivar _overflow: The slot for calls beyond the span of the last level.
+    @ivar _counts: A C{list} giving the number of calls filed in each level,
+        followed by the number of calls in the overflow slot.
+    @ivar _locations: A C{dict} mapping each call in the wheel to a C{tuple}
+        of the index of the level it is filed in (the number of levels for the
+        overflow slot) and the slot itself.
+    @ivar _current: The tick the wheel has turned to, or C{None} if it has
+        never held a call.  Every call filed in a tick before C{_current} has
+        been expired.
+    @ivar _next: The time of the earliest call in the wheel, C{None} if the
+        wheel is empty, or L{_UNKNOWN} if it needs to be computed.
+    @ivar _sequence: An iterator of sequence numbers for added calls.
+    """
+
+    def __init__(self, resolution=0.01, slots=256, levels=4):
+        """
+        @param resolution: The length in seconds of a tick of the wheel.
+        @type resolution: C{float}
+
+        @param slots: The number of slots in each level of the wheel.  This
+            must be a power of two.
+        @type slots: C{int}
+
+        @param levels: The number of levels in the wheel.
+        @type levels: C{int}
+        """
+        if slots < 2 or slots & (slots - 1):
+            raise ValueError("slots must be a power of two, not %r" % (slots,))
+        self._resolution = resolution
+        self._bits = slots.bit_length() - 1
+        self._levels = [[{} for i in range(slots)] for j in range(levels)]
+        self._counts = [0] * (levels + 1)
+        self._overflow = {}
+        self._locations = {}
+        self._current = None
+        self._next = None
+        self._sequence = count()
+
+
+    def _file(self, call, sequence):
+        """
+        File C{call} in the slot covering its time.
+        """
+        bits = self._bits
+        mask = (1 << bits) - 1
+        current = self._current
+        position = call.time / self._resolution
+        delta = position - current
+        for level in range(len(self._levels)):
+            if delta < 1 << (bits * (level + 1)):
+                tick = max(int(position), current)
+                slot = self._levels[level][(tick >> (bits * level)) & mask]
+                break
+        else:
+            level = len(self._levels)
+            slot = self._overflow
+        slot[call] = sequence
+        self._counts[level] += 1
+        self._locations[call] = (level, slot)
+
+
+    def _unfile(self, call):
+        """
+        Remove C{call} from the slot it is filed in.
+
+        @return: C{True} if C{call} was in the wheel, otherwise C{False}.
+        """
+        location = self._locations.pop(call, None)
+        if location is None:
+            return False
+        level, slot = location
+        del slot[call]
+        self._counts[level] -= 1
+        return True
+
+
+    def add(self, call):
+        """
+        File C{call} in the wheel.
+        """
+        if not self._locations:
+            # Nothing is filed relative to the current tick, so catch it up
+            # with the clock (or back, if the clock was set back).
+            self._current = int(call.seconds() / self._resolution)
+        call.activate_delay()
+        self._file(call, next(self._sequence))
+        if self._next is None or (
+                self._next is not _UNKNOWN and call.time < self._next):
+            self._next = call.time
+
+
+    def cancel(self, call):
+        """
+        Remove C{call} from the wheel.
+        """
+        if self._unfile(call) and self._next is not _UNKNOWN and (
+                call.time <= self._next):
+            self._next = _UNKNOWN
+
+
+    def moveSooner(self, call):
+        """
+        Refile C{call} in the slot covering its new time.
+        """
+        location = self._locations.get(call)
+        if location is not None:
+            sequence = location[1][call]
+            self._unfile(call)
+            self._file(call, sequence)
+            if self._next is not _UNKNOWN and call.time < self._next:
+                self._next = call.time
+
+
+    def nextTime(self):
+        """
+        Find the earliest call in the first non-empty slot of each level, and
+        in the overflow slot, until the earliest found so far is known to be
+        before any call in the levels left.
+        """
+        if self._next is _UNKNOWN:
+            self._next = self._computeNextTime()
+        return self._next
+
+
+    def _computeNextTime(self):
+        if not self._locations:
+            return None
+        bits = self._bits
+        slots = 1 << bits
+        mask = slots - 1
+        earliest = None
+        for level, wheel in enumerate(self._levels):
+            if earliest is not None and self._before(earliest, level):
+                return earliest
+            if not self._counts[level]:
+                continue
+            index = self._current >> (bits * level)
+            # The current slot of the lowest level holds calls due now; the
+            # current slot of any other level has already been cascaded and
+            # holds calls due a whole turn of that level from now.
+            start = 0 if level == 0 else 1
+            for offset in range(start, start + slots):
+                slot = wheel[(index + offset) & mask]
+                if slot:
+                    first = min(call.time for call in slot)
+                    if earliest is None or first < earliest:
+                        earliest = first
+                    break
+        if self._overflow and not (
+                earliest is not None and
+                self._before(earliest, len(self._levels))):
+            first = min(call.time for call in self._overflow)
+            if earliest is None or first < earliest:
+                earliest = first
+        return earliest
+
+
+    def _before(self, time, level):
+        """
+        Determine whether C{time} is before every call filed in the given
+        level (or the overflow slot, for the number of levels) and above.
+
+        Those calls are all due no sooner than the end of the current slot of
+        that level: calls due before it are filed in lower levels, and calls
+        filed in the current slot itself are due a whole turn later.  The
+        slots of the higher levels span whole numbers of these slots.
+        """
+        shift = self._bits * level
+        boundary = ((self._current >> shift) + 1) << shift
+        return time / self._resolution < boundary
+
+
+    def _take(self, slot, due):
+        """
+        Move every call in C{slot} to C{due}.
+        """
+        locations = self._locations
+        for call, sequence in slot.items():
+            del locations[call]
+            due.append((call.time, sequence, call))
+        slot.clear()
+
+
+    def _refile(self, level, slot):
+        """
+        File each call in C{slot}, a slot of the given level, again.
+        """
+        self._counts[level] -= len(slot)
+        for call, sequence in slot.items():
+            del self._locations[call]
+            self._file(call, sequence)
+
+
+    def _cascade(self):
+        """
+        Refile the calls in the slots whose span begins at the current tick.
+        """
+        bits = self._bits
+        mask = (1 << bits) - 1
+        for level in range(1, len(self._levels)):
+            index = (self._current >> (bits * level)) & mask
+            slot = self._levels[level][index]
+            if slot:
+                self._levels[level][index] = {}
+                self._refile(level, slot)
+            if index:
+                break
+        else:
+            slot = self._overflow
+            if slot:
+                self._overflow = {}
+                self._refile(len(self._levels), slot)
+
+
+    def _rewind(self, tick):
+        """
+        Refile every call relative to an earlier current tick.
+        """
+        calls = [(call, slot[call])
+                 for (call, (level, slot)) in self._locations.items()]
+        for wheel in self._levels:
+            for slot in wheel:
+                slot.clear()
+        self._overflow = {}
+        self._counts = [0] * len(self._counts)
+        self._locations = {}
+        self._current = tick
+        for call, sequence in calls:
+            self._file(call, sequence)
+
+
+    def expire(self, now):
+        """
+        Turn the wheel to the tick containing C{now}, collecting the calls
+        from the slots it passes, and then the calls in the slot for that tick
+        which are due.
+        """
+        if not self._locations:
+            return []
+        if self._next is not _UNKNOWN and self._next > now:
+            return []
+
+        bits = self._bits
+        mask = (1 << bits) - 1
+        levels = len(self._levels)
+        counts = self._counts
+        wheel = self._levels[0]
+        nowTick = int(now / self._resolution)
+        if nowTick < self._current:
+            # The clock was set back.
+            self._rewind(nowTick)
+
+        due = []
+        while self._current < nowTick:
+            if counts[0]:
+                slot = wheel[self._current & mask]
+                if slot:
+                    counts[0] -= len(slot)
+                    self._take(slot, due)
+                self._current += 1
+            else:
+                # Skip straight to the next tick at which a non-empty level
+                # (or the overflow slot) cascades.
+                for level in range(1, levels + 1):
+                    if counts[level]:
+                        break
+                else:
+                    self._current = nowTick
+                    break
+                span = 1 << (bits * level)
+                target = (self._current // span + 1) * span
+                if target > nowTick:
+                    self._current = nowTick
+                    break
+                self._current = target
+            if not self._current & mask:
+                self._cascade()
+
+        slot = wheel[self._current & mask]
+        if slot:
+            for call, sequence in list(slot.items()):
+                if call.time <= now:
+                    del slot[call]
+                    del self._locations[call]
+                    counts[0] -= 1
+                    due.append((call.time, sequence, call))
+
+        self._next = _UNKNOWN
+        due.sort(key=lambda entry: entry[:2])
+        return self._run([call for (time, sequence, call) in due], now)
+
+
+    def _run(self, calls, now):
+        """
+        Yield each of C{calls} which is still due to run, rescheduling those
+        which were delayed.
+        """
+        for call in calls:
+            if call.cancelled:
+                continue
+            if call.delayed_time > 0:
+                call.activate_delay()
+                if call.time > now:
+                    self.add(call)
+                    continue
+            yield call
+
+
+    def getDelayedCalls(self):
+        """
+        Return every call filed in the wheel.
+        """
+        return list(self._locations)
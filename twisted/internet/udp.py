@@ -214,7 +214,13 @@ class Port(base.BasePort):
     def doRead(self):
         """
         Called when my socket is ready for reading.
+
+        If the reactor has a L{ReadBuffer <abstract.ReadBuffer>} installed,
+        datagrams are read into it instead.
         """
+        readBuffer = getattr(self.reactor, "_readBuffer", None)
+        if readBuffer is not None:
+            return self._doReadInto(readBuffer)
         read = 0
         while read < self.maxThroughput:
             try:
@@ -236,6 +242,41 @@ class Port(base.BasePort):
                     log.err()
 
 
+    def _doReadInto(self, readBuffer):
+        """
+        Read datagrams into C{readBuffer} and pass them to the protocol: as a
+        C{memoryview} if it provides L{IMemoryViewReceiver
+        <interfaces.IMemoryViewReceiver>}, or else as C{bytes}.
+
+        @type readBuffer: L{abstract.ReadBuffer}
+        """
+        view = readBuffer.get(self.maxPacketSize)
+        read = 0
+        while read < self.maxThroughput:
+            try:
+                size, addr = self.socket.recvfrom_into(
+                    view, self.maxPacketSize)
+            except socket.error as se:
+                no = se.args[0]
+                if no in _sockErrReadIgnore:
+                    return
+                if no in _sockErrReadRefuse:
+                    if self._connectedAddr:
+                        self.protocol.connectionRefused()
+                    return
+                raise
+            else:
+                read += size
+                if interfaces.IMemoryViewReceiver.providedBy(self.protocol):
+                    data = view[:size]
+                else:
+                    data = view[:size].tobytes()
+                try:
+                    self.protocol.datagramReceived(data, addr)
+                except:
+                    log.err()
+
+
     def write(self, datagram, addr=None):
         """
         Write a datagram.
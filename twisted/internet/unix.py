@@ -146,6 +146,19 @@ class _SendmsgMixin(object):
             return result
 
 
+    def _writeSomeVectors(self, vectors):
+        """
+        Send as much of C{vectors} as possible.  If there are file descriptors
+        to send, only the first chunk is sent, together with them.
+        """
+        if self._sendmsgQueue:
+            data = vectors[0]
+            if isinstance(data, memoryview):
+                data = data.tobytes()
+            return self.writeSomeData(data)
+        return self._writeSomeDataBase._writeSomeVectors(self, vectors)
+
+
     def doRead(self):
         """
         Calls L{IFileDescriptorReceiver.fileDescriptorReceived} and
@@ -10,7 +10,10 @@ Basic protocols, such as line-oriented, netstring, and int prefixed strings.
 from __future__ import absolute_import, division
 
 # System imports
+import os
 import re
+import stat
+from errno import EAGAIN, EWOULDBLOCK, EINTR
 from struct import pack, unpack, calcsize
 from io import BytesIO
 import math
@@ -20,7 +23,19 @@ from zope.interface import implementer
 # Twisted imports
 from twisted.python.compat import _PY3
 from twisted.internet import protocol, defer, interfaces, error
-from twisted.python import log
+from twisted.internet.abstract import FileDescriptor
+from twisted.python import log, failure
+from twisted.python.runtime import platform
+
+
+# os.sendfile is only available on Python 3.3 and later; elsewhere, call
+# sendfile(2) through ctypes on Linux.
+_sendfile = getattr(os, "sendfile", None)
+if _sendfile is None and platform.isLinux():
+    try:
+        from twisted.python._sendfile import sendfile as _sendfile
+    except (ImportError, OSError):
+        pass
 
 
 # Unfortunately we cannot use regular string formatting on Python 3; see
@@ -918,11 +933,33 @@ class FileSender:
         self.consumer = consumer
         self.transform = transform
 
+        if transform is None and canSendfile(file, consumer):
+            return self._beginSendfile()
+
         self.deferred = deferred = defer.Deferred()
         self.consumer.registerProducer(self, False)
         return deferred
 
 
+    def _beginSendfile(self):
+        """
+        Send the rest of C{self.file} to C{self.consumer} with a
+        L{SendfileProducer}.  Afterwards, the file's position is at its end,
+        as though it had been read.
+
+        @return: See L{beginFileTransfer}.
+        """
+        offset = self.file.tell()
+        producer = SendfileProducer(self.file, self.consumer, offset)
+        def cbSent(sent):
+            if sent:
+                self.file.seek(offset + sent - 1)
+                self.lastSent = self.file.read(1)
+            self.file = None
+            return self.lastSent
+        return producer.beginFileTransfer(self.consumer).addCallback(cbSent)
+
+
     def resumeProducing(self):
         chunk = ''
         if self.file:
@@ -950,3 +987,148 @@ class FileSender:
             self.deferred.errback(
                 Exception("Consumer asked us to stop producing"))
             self.deferred = None
+
+
+
+def canSendfile(fileObject, transport):
+    """
+    Determine whether data from C{fileObject} can be written to C{transport}
+    with a L{SendfileProducer}.
+
+    This requires C{os.sendfile} (or, on Linux, sendfile(2) through ctypes),
+    C{fileObject} to be a regular file with a file descriptor, and
+    C{transport} to be a plain TCP or UNIX connection whose bytes are written
+    to its socket unchanged, ie. not one using TLS.
+
+    @rtype: C{bool}
+    """
+    if _sendfile is None:
+        return False
+    if not isinstance(transport, FileDescriptor):
+        return False
+    if not (interfaces.ITCPTransport.providedBy(transport) or
+            interfaces.IUNIXTransport.providedBy(transport)):
+        return False
+    if getattr(transport, "TLS", False):
+        return False
+    try:
+        mode = os.fstat(fileObject.fileno()).st_mode
+    except (AttributeError, ValueError, EnvironmentError):
+        return False
+    return stat.S_ISREG(mode)
+
+
+
+@implementer(interfaces.IPullProducer)
+class SendfileProducer(object):
+    """
+    A producer which sends part of a file to a transport with C{os.sendfile},
+    so that the kernel copies the data from the file to the socket without it
+    ever being read into this process.
+
+    Only use this when L{canSendfile} returns C{True}.  The file data is sent
+    only once the transport has no other data waiting to be written, so data
+    written before L{beginFileTransfer} is called is sent first.
+
+    @ivar fileObject: The file to send data from.
+    @ivar transport: The L{FileDescriptor} the data is sent to.
+    @ivar offset: The offset in C{fileObject} of the next byte to send.
+    @ivar remaining: The number of bytes left to send, or C{None} to send
+        everything up to the end of the file.
+    @ivar sent: The number of bytes sent so far.
+    @ivar deferred: The L{Deferred} returned by L{beginFileTransfer}, or
+        C{None} once it has fired.
+    """
+
+    CHUNK_SIZE = 2 ** 20
+
+    deferred = None
+
+    def __init__(self, fileObject, transport, offset=0, count=None):
+        """
+        @param fileObject: See L{SendfileProducer.fileObject}.
+        @param transport: See L{SendfileProducer.transport}.
+        @param offset: The offset in C{fileObject} to start sending from.
+        @param count: The number of bytes to send, or C{None} to send
+            everything up to the end of the file.
+        """
+        self.fileObject = fileObject
+        self.transport = transport
+        self.offset = offset
+        self.remaining = count
+        self.sent = 0
+
+
+    def beginFileTransfer(self, consumer):
+        """
+        Begin sending the file.
+
+        @param consumer: The L{IConsumer} to register this producer with:
+            C{self.transport} or an object which registers its producers with
+            C{self.transport}, such as a L{twisted.web.http.Request}.
+
+        @rtype: L{Deferred}
+        @return: A L{Deferred} which fires with the number of bytes sent when
+            all of them have been sent, or fails if sending them fails.
+        """
+        self.consumer = consumer
+        self.deferred = deferred = defer.Deferred()
+        consumer.registerProducer(self, False)
+        return deferred
+
+
+    def resumeProducing(self):
+        """
+        Send the next chunk of the file if the transport has no data of its own
+        left to write.
+        """
+        if self.deferred is None:
+            return
+        transport = self.transport
+        if len(transport.dataBuffer) - transport.offset or \
+                transport._tempDataLen:
+            # The transport calls this method again once that data is written.
+            return
+
+        size = self.CHUNK_SIZE
+        if self.remaining is not None:
+            size = min(size, self.remaining)
+        try:
+            sent = _sendfile(transport.fileno(), self.fileObject.fileno(),
+                             self.offset, size)
+        except EnvironmentError as e:
+            if e.errno not in (EAGAIN, EWOULDBLOCK, EINTR):
+                self._finished(failure.Failure())
+                return
+        else:
+            self.offset += sent
+            self.sent += sent
+            if self.remaining is not None:
+                self.remaining -= sent
+            if not sent or self.remaining == 0:
+                # Either everything was sent, or the file is shorter than
+                # expected.
+                self._finished(self.sent)
+                return
+        # Ask to be resumed once the socket can accept more data.
+        transport.startWriting()
+
+
+    def stopProducing(self):
+        """
+        Stop sending the file, because the connection was lost.
+        """
+        if self.deferred is not None:
+            deferred, self.deferred = self.deferred, None
+            deferred.errback(
+                Exception("Consumer asked us to stop producing"))
+
+
+    def _finished(self, result):
+        """
+        Unregister from the consumer and fire C{self.deferred} with C{result},
+        the number of bytes sent or a L{failure.Failure}.
+        """
+        deferred, self.deferred = self.deferred, None
+        self.consumer.unregisterProducer()
+        deferred.callback(result)
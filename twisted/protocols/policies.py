@@ -12,13 +12,14 @@ from __future__ import division, absolute_import
 
 # system imports
 import sys
+import math
 
-from zope.interface import directlyProvides, providedBy
+from zope.interface import directlyProvides, providedBy, implementer
 
 # twisted imports
 from twisted.internet.protocol import ServerFactory, Protocol, ClientFactory
 from twisted.internet import error
-from twisted.internet.interfaces import ILoggingContext
+from twisted.internet.interfaces import ILoggingContext, IDelayedCall
 from twisted.python import log
 
 
@@ -456,6 +457,209 @@ class LimitTotalConnectionsFactory(ServerFactory):
 
 
 
+@implementer(IDelayedCall)
+class _IdleTimeout(object):
+    """
+    A timeout kept by an L{IdleTimeoutTracker}.
+
+    @ivar time: The time at which C{func} is to be called.
+    @ivar func: The function to call when the timeout expires.
+    @ivar _tracker: The L{IdleTimeoutTracker} which keeps this timeout.
+    @ivar _index: The index of the bucket this timeout is filed in.
+    @ivar _bucket: The bucket this timeout is filed in, or C{None} if it is
+        not filed.
+    """
+    called = cancelled = False
+    _index = _bucket = None
+
+    def __init__(self, tracker, time, func):
+        self._tracker = tracker
+        self.time = time
+        self.func = func
+
+
+    def getTime(self):
+        """
+        See L{IDelayedCall.getTime}.
+        """
+        return self.time
+
+
+    def cancel(self):
+        """
+        See L{IDelayedCall.cancel}.
+        """
+        if self.cancelled:
+            raise error.AlreadyCancelled()
+        elif self.called:
+            raise error.AlreadyCalled()
+        self._tracker._unfile(self)
+        self.cancelled = True
+
+
+    def reset(self, secondsFromNow):
+        """
+        See L{IDelayedCall.reset}.
+        """
+        if self.cancelled:
+            raise error.AlreadyCancelled()
+        elif self.called:
+            raise error.AlreadyCalled()
+        self._move(self._tracker._clock.seconds() + secondsFromNow)
+
+
+    def delay(self, secondsLater):
+        """
+        See L{IDelayedCall.delay}.
+        """
+        if self.cancelled:
+            raise error.AlreadyCancelled()
+        elif self.called:
+            raise error.AlreadyCalled()
+        self._move(self.time + secondsLater)
+
+
+    def _move(self, time):
+        """
+        Change the time of this timeout.  Moving it later only records the new
+        time; the tracker refiles it when its current bucket is swept.
+        """
+        sooner = time < self.time
+        self.time = time
+        if sooner:
+            self._tracker._unfile(self)
+            self._tracker._file(self)
+
+
+    def active(self):
+        """
+        See L{IDelayedCall.active}.
+        """
+        return not (self.cancelled or self.called)
+
+
+
+class IdleTimeoutTracker(object):
+    """
+    Coarse-grained timeouts for many idle connections.
+
+    L{TimeoutMixin} and L{TimeoutProtocol} normally schedule one reactor timer
+    per connection and reschedule it whenever the connection is active.  An
+    L{IdleTimeoutTracker} instead groups timeouts into buckets of
+    C{granularity} seconds and schedules one reactor timer per non-empty
+    bucket.  Resetting a timeout to a later time only records the new time;
+    the timeout is moved to a later bucket when its current one is swept.  In
+    exchange, a timeout may expire up to C{granularity} seconds late.
+
+    Protocols using L{TimeoutMixin}, such as
+    L{twisted.web.http.HTTPChannel} and
+    L{twisted.protocols.memcache.MemCacheProtocol}, use a tracker when their
+    C{timeoutTracker} attribute is set to one::
+
+        tracker = IdleTimeoutTracker()
+        HTTPChannel.timeoutTracker = tracker
+
+    and L{TimeoutFactory} uses one when it is passed as its C{timeoutTracker}
+    argument.
+
+    @ivar granularity: The length in seconds of a bucket.
+    @type granularity: C{float}
+
+    @ivar _clock: The L{IReactorTime} provider used to schedule sweeps.
+    @ivar _buckets: A C{dict} mapping bucket indexes to C{set}s of the
+        L{_IdleTimeout}s filed in them.
+    @ivar _sweeps: A C{dict} mapping bucket indexes to the L{IDelayedCall}
+        which will sweep that bucket.
+    """
+
+    def __init__(self, granularity=1.0, clock=None):
+        """
+        @param granularity: The length in seconds of a bucket.
+        @type granularity: C{float}
+
+        @param clock: The L{IReactorTime} provider to use.  Defaults to the
+            global reactor.
+        """
+        if clock is None:
+            from twisted.internet import reactor as clock
+        self.granularity = granularity
+        self._clock = clock
+        self._buckets = {}
+        self._sweeps = {}
+
+
+    def callLater(self, period, func):
+        """
+        Arrange for C{func} to be called once C{period} seconds have passed.
+
+        @param period: The number of seconds to wait.
+        @type period: C{float}
+
+        @param func: A no-argument callable.
+
+        @return: An L{IDelayedCall} provider which can be used to reset or
+            cancel the timeout.
+        """
+        timeout = _IdleTimeout(self, self._clock.seconds() + period, func)
+        self._file(timeout)
+        return timeout
+
+
+    def _file(self, timeout):
+        """
+        Put C{timeout} in the bucket which is swept at or just after its time.
+        """
+        index = int(math.ceil(timeout.time / self.granularity))
+        bucket = self._buckets.get(index)
+        if bucket is None:
+            bucket = self._buckets[index] = set()
+            delay = max(0, index * self.granularity - self._clock.seconds())
+            self._sweeps[index] = self._clock.callLater(
+                delay, self._sweep, index)
+        bucket.add(timeout)
+        timeout._index = index
+        timeout._bucket = bucket
+
+
+    def _unfile(self, timeout):
+        """
+        Take C{timeout} out of its bucket, cancelling the sweep of the bucket
+        if it is left empty.
+        """
+        bucket = timeout._bucket
+        if bucket is None:
+            return
+        timeout._bucket = None
+        bucket.discard(timeout)
+        if not bucket and self._buckets.get(timeout._index) is bucket:
+            del self._buckets[timeout._index]
+            self._sweeps.pop(timeout._index).cancel()
+
+
+    def _sweep(self, index):
+        """
+        Expire the timeouts in a bucket, or move them to a later bucket if
+        their time was reset.
+        """
+        bucket = self._buckets.pop(index)
+        del self._sweeps[index]
+        now = self._clock.seconds()
+        for timeout in list(bucket):
+            if timeout._bucket is not bucket:
+                # Cancelled or moved by an earlier timeout in this sweep.
+                continue
+            if timeout.time > now:
+                self._file(timeout)
+            else:
+                timeout._bucket = None
+                timeout.called = True
+                try:
+                    timeout.func()
+                except:
+                    log.err(None, "Unhandled error in idle timeout")
+
+
+
 class TimeoutProtocol(ProtocolWrapper):
     """
     Protocol that automatically disconnects when the connection is idle.
@@ -546,12 +750,18 @@ class TimeoutProtocol(ProtocolWrapper):
 class TimeoutFactory(WrappingFactory):
     """
     Factory for TimeoutWrapper.
+
+    @ivar timeoutTracker: An L{IdleTimeoutTracker} which keeps the timeouts
+        of the protocols built by this factory, or C{None} to give each of
+        them its own reactor timer.
     """
     protocol = TimeoutProtocol
 
 
-    def __init__(self, wrappedFactory, timeoutPeriod=30*60):
+    def __init__(self, wrappedFactory, timeoutPeriod=30*60,
+                 timeoutTracker=None):
         self.timeoutPeriod = timeoutPeriod
+        self.timeoutTracker = timeoutTracker
         WrappingFactory.__init__(self, wrappedFactory)
 
 
@@ -563,7 +773,11 @@ class TimeoutFactory(WrappingFactory):
     def callLater(self, period, func):
         """
         Wrapper around L{reactor.callLater} for test purpose.
+
+        If C{timeoutTracker} is set, it is used instead of the reactor.
         """
+        if self.timeoutTracker is not None:
+            return self.timeoutTracker.callLater(period, func)
         from twisted.internet import reactor
         return reactor.callLater(period, func)
 
@@ -674,15 +888,23 @@ class TimeoutMixin:
     default, closes the connection.
 
     @cvar timeOut: The number of seconds after which to timeout the connection.
+
+    @cvar timeoutTracker: An L{IdleTimeoutTracker} to keep the timeout with,
+        or C{None} to schedule it directly with the reactor.
     """
     timeOut = None
+    timeoutTracker = None
 
     __timeoutCall = None
 
     def callLater(self, period, func):
         """
         Wrapper around L{reactor.callLater} for test purpose.
+
+        If C{timeoutTracker} is set, it is used instead of the reactor.
         """
+        if self.timeoutTracker is not None:
+            return self.timeoutTracker.callLater(period, func)
         from twisted.internet import reactor
         return reactor.callLater(period, func)
 
@@ -0,0 +1,48 @@
+# -*- test-case-name: twisted.internet.test.test_posixbase -*-
+# Copyright (c) Twisted Matrix Laboratories.
+# See LICENSE for details.
+
+"""
+Very low-level ctypes-based interface to Linux eventfd(2).
+
+ctypes and a version of libc which supports the eventfd system call are
+required.
+"""
+
+from __future__ import division, absolute_import
+
+import ctypes
+import os
+
+
+
+def create():
+    """
+    Create an eventfd object with a counter of zero and return the
+    associated file descriptor.  The descriptor is blocking and is inherited
+    by child processes; callers change that with L{twisted.internet.fdesc}.
+    """
+    fd = libc.eventfd(0, 0)
+    if fd < 0:
+        errno = ctypes.get_errno()
+        raise OSError(errno, os.strerror(errno))
+    return fd
+
+
+
+def initializeModule(libc):
+    """
+    Intialize the module, checking if the expected API exists and setting the
+    argtypes and restype for C{eventfd}.
+    """
+    if getattr(libc, "eventfd", None) is None:
+        raise ImportError("libc6 2.8 or higher needed")
+    libc.eventfd.argtypes = [ctypes.c_uint, ctypes.c_int]
+    libc.eventfd.restype = ctypes.c_int
+
+
+
+# The symbols of the C library are already loaded into the process, so look
+# them up there rather than searching the filesystem for it.
+libc = ctypes.CDLL(None, use_errno=True)
+initializeModule(libc)
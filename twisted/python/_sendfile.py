@@ -0,0 +1,62 @@
+# -*- test-case-name: twisted.test.test_tpfile -*-
+# Copyright (c) Twisted Matrix Laboratories.
+# See LICENSE for details.
+
+"""
+Very low-level ctypes-based interface to Linux sendfile(2), for Pythons
+without C{os.sendfile}.
+
+ctypes and a version of libc which provides the sendfile system call are
+required.
+"""
+
+from __future__ import division, absolute_import
+
+import ctypes
+import os
+
+
+
+def sendfile(outFD, inFD, offset, count):
+    """
+    Copy up to C{count} bytes from offset C{offset} of the file descriptor
+    C{inFD} to the file descriptor C{outFD}, like C{os.sendfile} on Linux.
+
+    @return: The number of bytes copied, which is zero at the end of the
+        file.
+    @raise OSError: If the system call fails.
+    """
+    position = ctypes.c_int64(offset)
+    sent = _sendfile(outFD, inFD, ctypes.byref(position), count)
+    if sent < 0:
+        errno = ctypes.get_errno()
+        raise OSError(errno, os.strerror(errno))
+    return sent
+
+
+
+def initializeModule(libc):
+    """
+    Initialize the module, checking if the expected API exists and setting
+    the argtypes and restype for C{sendfile}.
+
+    The 64-bit version is used where there is one, so that offsets past 2GB
+    work on 32-bit systems too.
+    """
+    global _sendfile
+    function = getattr(libc, "sendfile64", None)
+    if function is None:
+        function = getattr(libc, "sendfile", None)
+    if function is None:
+        raise ImportError("libc with sendfile needed")
+    function.argtypes = [ctypes.c_int, ctypes.c_int,
+                         ctypes.POINTER(ctypes.c_int64), ctypes.c_size_t]
+    function.restype = ctypes.c_ssize_t
+    _sendfile = function
+
+
+
+# The symbols of the C library are already loaded into the process, so look
+# them up there rather than searching the filesystem for it.
+libc = ctypes.CDLL(None, use_errno=True)
+initializeModule(libc)
@@ -142,6 +142,35 @@ class _Code(object):
         self.co_filename = filename
 
 
+class _LazyFrames(object):
+    """
+    Descriptor for L{Failure.frames} and L{Failure.stack} which extracts them
+    from the traceback the first time either is looked up on a L{Failure}
+    created with L{Failure.lazyFrames} set.
+
+    Once extracted, both are in the instance dictionary, which takes
+    precedence over this non-data descriptor.
+
+    @ivar name: The name of the attribute, C{"frames"} or C{"stack"}.
+    @ivar default: The value for a L{Failure} with no frames to extract.
+    """
+
+    def __init__(self, name, default):
+        self.name = name
+        self.default = default
+
+
+    def __get__(self, oself, type=None):
+        if oself is None:
+            return self.default
+        pending = oself.__dict__.pop('_pendingFrames', None)
+        if pending is None:
+            return self.default
+        oself._extractFrames(*pending)
+        return oself.__dict__[self.name]
+
+
+
 class Failure:
     """
     A basic abstraction for an error that has occurred.
@@ -159,10 +188,25 @@ class Failure:
     @ivar type: The exception's class.
     @ivar stack: list of frames, innermost last, excluding C{Failure.__init__}.
     @ivar frames: list of frames, innermost first.
+
+    @cvar lazyFrames: If set, a L{Failure} created without C{captureVars}
+        only keeps the traceback object, and extracts C{frames} and C{stack}
+        from it the first time either is used, for instance by
+        L{printTraceback}, L{getTracebackObject} or L{cleanFailure}.  This
+        makes L{Failure}s which are trapped and discarded, as is common in
+        errback chains, much cheaper to create.  The line numbers in
+        C{stack} are then those at the time of extraction rather than
+        creation, if the calling functions have moved on since.
+    @type lazyFrames: C{bool}
+
+    @ivar _pendingFrames: With C{lazyFrames}, until they are extracted, a
+        2-tuple of the innermost frame of C{stack} and the traceback.
     """
 
     pickled = 0
-    stack = None
+    lazyFrames = False
+    frames = _LazyFrames('frames', None)
+    stack = _LazyFrames('stack', None)
 
     # The opcode of "yield" in Python bytecode. We need this in _findFailure in
     # order to identify whether an exception was thrown by a
@@ -231,9 +275,6 @@ class Failure:
             elif _PY3:
                 tb = self.value.__traceback__
 
-        frames = self.frames = []
-        stack = self.stack = []
-
         # added 2003-06-23 by Chris Armstrong. Yes, I actually have a
         # use case where I need this traceback object, and I've made
         # sure that it'll be cleaned up.
@@ -253,6 +294,29 @@ class Failure:
             f = f.f_back
             stackOffset -= 1
 
+        if self.lazyFrames and not captureVars:
+            self._pendingFrames = (f, tb)
+        else:
+            self._extractFrames(f, tb)
+
+        if inspect.isclass(self.type) and issubclass(self.type, Exception):
+            parentCs = getmro(self.type)
+            self.parents = list(map(reflect.qual, parentCs))
+        else:
+            self.parents = [self.type]
+
+
+    def _extractFrames(self, f, tb):
+        """
+        Fill in C{frames} and C{stack}.
+
+        @param f: The innermost frame of C{stack}, or C{None}.
+        @param tb: The traceback to build C{frames} from, or C{None}.
+        """
+        captureVars = self.captureVars
+        frames = self.frames = []
+        stack = self.stack = []
+
         # Keeps the *full* stack.  Formerly in spread.pb.print_excFullStack:
         #
         #   The need for this function arises from the fact that several
@@ -307,11 +371,7 @@ class Failure:
                 globalz,
                 ))
             tb = tb.tb_next
-        if inspect.isclass(self.type) and issubclass(self.type, Exception):
-            parentCs = getmro(self.type)
-            self.parents = list(map(reflect.qual, parentCs))
-        else:
-            self.parents = [self.type]
+
 
     def trap(self, *errorTypes):
         """Trap this failure if its type is in a predetermined list.
@@ -458,6 +518,7 @@ class Failure:
         """
         if self.pickled:
             return self.__dict__
+        frames = self.frames
         c = self.__dict__.copy()
 
         c['frames'] = [
@@ -465,7 +526,7 @@ class Failure:
                 v[0], v[1], v[2],
                 _safeReprVars(v[3]),
                 _safeReprVars(v[4]),
-            ] for v in self.frames
+            ] for v in frames
         ]
 
         # added 2003-06-23. See comment above in __init__
@@ -11,8 +11,13 @@ from __future__ import division, absolute_import
 import sys
 import time
 import warnings
+import threading
 from datetime import datetime
 import logging
+try:
+    from Queue import Queue, Full, Empty
+except ImportError:
+    from queue import Queue, Full, Empty
 
 from zope.interface import Interface
 
@@ -325,8 +330,12 @@ class FileLogObserver:
 
     @type timeFormat: C{str} or C{NoneType}
     @ivar timeFormat: If not C{None}, the format string passed to strftime().
+
+    @ivar _timeCache: The L{util._SecondCache} through which L{formatEvent}
+        calls L{formatTime}.
     """
     timeFormat = None
+    _timeCache = None
 
     def __init__(self, f):
         self.write = f.write
@@ -379,16 +388,52 @@ class FileLogObserver:
             when.hour, when.minute, when.second,
             tzSign, tzHour, tzMin)
 
-    def emit(self, eventDict):
+    def _formatEventTime(self, when):
+        """
+        Format the time of an event with L{formatTime}, calling it only once
+        for all the events logged in the same second.
+
+        @type when: C{int} or C{float}
+        @param when: POSIX (ie, UTC) timestamp of the event.
+
+        @rtype: C{str}
+        """
+        timeFormat = self.timeFormat
+        if timeFormat is not None and '%f' in timeFormat:
+            # Microseconds change within a second.
+            return self.formatTime(when)
+        if self._timeCache is None:
+            self._timeCache = util._SecondCache()
+        return self._timeCache.format(when, self.formatTime, timeFormat)
+
+
+    def formatEvent(self, eventDict):
+        """
+        Format an event as the line L{emit} writes for it.
+
+        @param eventDict: The event to format.
+        @type eventDict: C{dict}
+
+        @return: The formatted event, ending with a newline, or C{None} if
+            the event has no text.
+        @rtype: C{str} or C{NoneType}
+        """
         text = textFromEventDict(eventDict)
         if text is None:
-            return
+            return None
 
-        timeStr = self.formatTime(eventDict['time'])
+        timeStr = self._formatEventTime(eventDict['time'])
         fmtDict = {'system': eventDict['system'], 'text': text.replace("\n", "\n\t")}
         msgStr = _safeFormat("[%(system)s] %(text)s\n", fmtDict)
+        return timeStr + " " + msgStr
+
+
+    def emit(self, eventDict):
+        line = self.formatEvent(eventDict)
+        if line is None:
+            return
 
-        util.untilConcludes(self.write, timeStr + " " + msgStr)
+        util.untilConcludes(self.write, line)
         util.untilConcludes(self.flush)  # Hoorj!
 
     def start(self):
@@ -404,6 +449,155 @@ class FileLogObserver:
         removeObserver(self.emit)
 
 
+class ThreadedFileLogObserver(FileLogObserver):
+    """
+    Log observer that writes to a file-like object from a background thread.
+
+    L{emit} only puts events on a queue.  A thread takes them off in batches,
+    formats them as L{FileLogObserver} does and writes each batch with a
+    single C{write} and C{flush}, so that logging does not block the thread
+    which logs, usually the reactor thread, on the file.
+
+    Events are formatted after L{emit} returns, so objects referred to by an
+    event should not be changed after it is logged.
+
+    @ivar maxQueued: The number of events which may wait to be written.
+
+    @ivar block: If C{True}, L{emit} waits for room when the queue is full.
+        If C{False}, events which do not fit are dropped.
+
+    @ivar maxBatch: The largest number of events written at once.
+
+    @ivar dropped: The number of events dropped because the queue was full.
+
+    @ivar _queue: The L{Queue} of events waiting to be written.
+
+    @ivar _thread: The L{threading.Thread} writing events, or C{None} if the
+        observer is not started.
+
+    @ivar _reactor: The reactor whose shutdown stops the observer.
+
+    @ivar _shutdownID: The ID of the system event trigger which stops the
+        observer, or C{None}.
+    """
+    dropped = 0
+    _thread = None
+    _reactor = None
+    _shutdownID = None
+
+    # Put on the queue to make the writer thread exit.
+    _stopWriting = object()
+
+    def __init__(self, f, maxQueued=10000, block=False, maxBatch=1000):
+        """
+        @param f: The file-like object to write to.
+        @param maxQueued: The number of events which may wait to be written.
+        @param block: Whether L{emit} waits for room in a full queue instead
+            of dropping the event.
+        @param maxBatch: The largest number of events written at once.
+        """
+        FileLogObserver.__init__(self, f)
+        self.maxQueued = maxQueued
+        self.block = block
+        self.maxBatch = maxBatch
+        self._queue = Queue(maxQueued)
+
+
+    def emit(self, eventDict):
+        """
+        Queue an event to be written, or drop it if the queue is full and
+        L{block} is C{False}.
+        """
+        try:
+            self._queue.put(eventDict, self.block)
+        except Full:
+            self.dropped += 1
+
+
+    def _writeEvents(self):
+        """
+        Write queued events until L{stop} is called.  This runs in the writer
+        thread.
+        """
+        queue = self._queue
+        while True:
+            events = [queue.get()]
+            try:
+                while len(events) < self.maxBatch:
+                    events.append(queue.get_nowait())
+            except Empty:
+                pass
+
+            lines = []
+            stopping = False
+            for eventDict in events:
+                if eventDict is self._stopWriting:
+                    stopping = True
+                    continue
+                try:
+                    line = self.formatEvent(eventDict)
+                except:
+                    # There is nowhere to report this; skip the event.
+                    continue
+                if line is not None:
+                    lines.append(line)
+            if lines:
+                try:
+                    util.untilConcludes(self.write, "".join(lines))
+                    util.untilConcludes(self.flush)
+                except:
+                    # Nor this; lose the batch but keep writing.
+                    pass
+            if stopping:
+                return
+
+
+    def start(self, reactor=None):
+        """
+        Start the writer thread and observing log events.
+
+        The observer stops itself, writing out any queued events, after the
+        reactor shuts down.
+
+        @param reactor: The reactor whose shutdown stops the observer.
+            Defaults to the global reactor.
+        """
+        if reactor is None:
+            from twisted.internet import reactor
+        self._reactor = reactor
+        self._thread = threading.Thread(
+            target=self._writeEvents, name="ThreadedFileLogObserver")
+        self._thread.setDaemon(True)
+        self._thread.start()
+        self._shutdownID = reactor.addSystemEventTrigger(
+            'after', 'shutdown', self._reactorShutdown)
+        FileLogObserver.start(self)
+
+
+    def _reactorShutdown(self):
+        """
+        Stop the observer when the reactor shuts down.
+        """
+        self._shutdownID = None
+        self.stop()
+
+
+    def stop(self):
+        """
+        Stop observing log events and wait for the writer thread to write
+        the events which are already queued.
+        """
+        FileLogObserver.stop(self)
+        if self._shutdownID is not None:
+            self._reactor.removeSystemEventTrigger(self._shutdownID)
+            self._shutdownID = None
+        if self._thread is not None:
+            self._queue.put(self._stopWriting)
+            self._thread.join()
+            self._thread = None
+
+
+
 class PythonLoggingObserver(object):
     """
     Output twisted messages to Python standard library L{logging} module.
@@ -8,20 +8,45 @@ A rotating, browsable log file.
 """
 
 # System Imports
-import os, glob, time, stat
+import os, glob, time, stat, bisect, json, gzip, shutil, threading
 
-from twisted.python import threadable
+from twisted.python import threadable, log, failure
 
 
 
 class BaseLogFile:
     """
     The base class for a log file that can be rotated.
+
+    Rotating a log file only moves it aside and opens a new file; the rest
+    of the work (renaming older logs, compressing and pruning them) is done
+    by L{_finishRotation}, in a thread if C{threaded} is true so that
+    writes to the new file are not held up by a slow disk.  The rotation
+    thread does not log: logging may write to this very file, whose lock is
+    held while waiting for the thread.  Its errors are logged by the next
+    L{write} instead.
+
+    @ivar compress: If true, rotated files are compressed with gzip, and
+        have a C{".gz"} suffix.
+    @ivar maxAge: If not C{None}, rotated files last modified more than
+        this many seconds ago are removed.
+    @ivar maxRotatedFiles: If not C{None}, the maximum number of rotated
+        files to keep; the oldest ones are removed.
+    @ivar threaded: If true, rotated files are renamed, compressed and
+        pruned in a thread.
     """
 
     synchronized = ["write", "rotate"]
 
-    def __init__(self, name, directory, defaultMode=None):
+    compress = False
+    maxAge = None
+    maxRotatedFiles = None
+    threaded = False
+    _rotation = None
+    _rotationFailure = None
+
+    def __init__(self, name, directory, defaultMode=None, compress=False,
+                 maxAge=None, threaded=False):
         """
         Create a log file.
 
@@ -29,6 +54,10 @@ class BaseLogFile:
         @param directory: directory holding the file
         @param defaultMode: permissions used to create the file. Default to
         current permissions of the file if the file exists.
+        @param compress: whether to compress rotated files.
+        @param maxAge: the age in seconds past which rotated files are
+        removed, or C{None} to keep them.
+        @param threaded: whether to finish rotations in a thread.
         """
         self.directory = directory
         self.name = name
@@ -37,6 +66,9 @@ class BaseLogFile:
             self.defaultMode = stat.S_IMODE(os.stat(self.path)[stat.ST_MODE])
         else:
             self.defaultMode = defaultMode
+        self.compress = compress
+        self.maxAge = maxAge
+        self.threaded = threaded
         self._openFile()
 
     def fromFullPath(cls, filename, *args, **kwargs):
@@ -83,6 +115,8 @@ class BaseLogFile:
     def __getstate__(self):
         state = self.__dict__.copy()
         del state["_file"]
+        state.pop("_rotation", None)
+        state.pop("_rotationFailure", None)
         return state
 
     def __setstate__(self, state):
@@ -93,6 +127,7 @@ class BaseLogFile:
         """
         Write some data to the file.
         """
+        self._reportRotationFailure()
         if self.shouldRotate():
             self.flush()
             self.rotate()
@@ -134,6 +169,152 @@ class BaseLogFile:
         return LogReader(self.path)
 
 
+    def getEvents(self, start=None, end=None):
+        """
+        Read the events written by a L{JSONLogObserver} to this log file and
+        its rotated files, oldest first.
+
+        @see: L{readEvents}
+        """
+        return readEvents(self._rotatedPaths() + [self.path], start, end)
+
+
+    def waitForRotation(self):
+        """
+        Wait for the rotation running in a thread, if any, to finish, and log
+        the error it failed with, if any.
+        """
+        self._joinRotation()
+        self._reportRotationFailure()
+
+
+    def _joinRotation(self):
+        """
+        Wait for the rotation running in a thread, if any, to finish.
+        """
+        rotation = self._rotation
+        if rotation is not None:
+            rotation.join()
+            self._rotation = None
+
+
+    def _reportRotationFailure(self):
+        """
+        Log the error a rotation failed with, if any.
+        """
+        reason = self._rotationFailure
+        if reason is not None:
+            self._rotationFailure = None
+            log.err(reason, "Error rotating %s" % (self.path,))
+
+
+    def _rotated(self, path):
+        """
+        Finish a rotation which moved the log file to C{path}, in a thread if
+        C{threaded} is true.
+        """
+        if self.threaded:
+            self._rotation = threading.Thread(
+                target=self._finishRotationInThread, args=(path,),
+                name="%s rotation" % (self.path,))
+            self._rotation.start()
+        else:
+            self._finishRotation(path)
+
+
+    def _finishRotationInThread(self, path):
+        """
+        Finish a rotation in the rotation thread, recording any error for
+        L{_reportRotationFailure}.
+        """
+        try:
+            self._finishRotation(path)
+        except:
+            self._rotationFailure = failure.Failure()
+
+
+    def _finishRotation(self, path):
+        """
+        Compress and prune the rotated log files, after the log file was
+        moved to C{path}.
+        """
+        if self.compress:
+            self._compressLog(path)
+        self._pruneLogs()
+
+
+    def _compressLog(self, path):
+        """
+        Replace the rotated log file C{path} with a gzip compressed copy.
+        """
+        compressedPath = path + ".gz"
+        temporaryPath = compressedPath + ".tmp"
+        source = open(path, "rb")
+        try:
+            compressed = gzip.open(temporaryPath, "wb")
+            try:
+                shutil.copyfileobj(source, compressed)
+            finally:
+                compressed.close()
+        finally:
+            source.close()
+        st = os.stat(path)
+        os.utime(temporaryPath, (st.st_atime, st.st_mtime))
+        if self.defaultMode is not None:
+            os.chmod(temporaryPath, self.defaultMode)
+        os.rename(temporaryPath, compressedPath)
+        os.remove(path)
+        _moveIndex(path, None)
+
+
+    def _pruneLogs(self):
+        """
+        Remove the rotated files beyond C{maxRotatedFiles} or older than
+        C{maxAge}.
+        """
+        paths = self._rotatedPaths()
+        if self.maxRotatedFiles is not None:
+            excess = max(len(paths) - self.maxRotatedFiles, 0)
+            for path in paths[:excess]:
+                self._removeLog(path)
+            paths = paths[excess:]
+        if self.maxAge is not None:
+            oldest = time.time() - self.maxAge
+            for path in paths:
+                if os.stat(path).st_mtime < oldest:
+                    self._removeLog(path)
+
+
+    def _removeLog(self, path):
+        """
+        Remove the rotated file C{path} and its index.
+        """
+        os.remove(path)
+        _moveIndex(path, None)
+
+
+    def _rotatedPaths(self):
+        """
+        Override with a method returning the paths of the rotated files,
+        oldest first.
+        """
+        raise NotImplementedError
+
+
+
+def _existingLog(path):
+    """
+    Return C{path}, or its compressed version if only that exists, or
+    C{None} if neither exists.
+    """
+    if os.path.exists(path):
+        return path
+    if os.path.exists(path + ".gz"):
+        return path + ".gz"
+    return None
+
+
+
 class LogFile(BaseLogFile):
     """
     A log file that can be rotated.
@@ -141,7 +322,8 @@ class LogFile(BaseLogFile):
     A rotateLength of None disables automatic log rotation.
     """
     def __init__(self, name, directory, rotateLength=1000000, defaultMode=None,
-                 maxRotatedFiles=None):
+                 maxRotatedFiles=None, compress=False, maxAge=None,
+                 threaded=False):
         """
         Create a log file rotating on length.
 
@@ -157,8 +339,17 @@ class LogFile(BaseLogFile):
         @param maxRotatedFiles: if not None, max number of log files the class
             creates. Warning: it removes all log files above this number.
         @type maxRotatedFiles: C{int}
-        """
-        BaseLogFile.__init__(self, name, directory, defaultMode)
+        @param compress: whether to compress rotated files with gzip.
+        @type compress: C{bool}
+        @param maxAge: if not None, the age in seconds past which rotated files
+            are removed.
+        @type maxAge: C{int}
+        @param threaded: whether to rename, compress and remove rotated files
+            in a thread.
+        @type threaded: C{bool}
+        """
+        BaseLogFile.__init__(self, name, directory, defaultMode, compress,
+                             maxAge, threaded)
         self.rotateLength = rotateLength
         self.maxRotatedFiles = maxRotatedFiles
 
@@ -176,8 +367,8 @@ class LogFile(BaseLogFile):
         """
         Given an integer, return a LogReader for an old log file.
         """
-        filename = "%s.%d" % (self.path, identifier)
-        if not os.path.exists(filename):
+        filename = _existingLog("%s.%d" % (self.path, identifier))
+        if filename is None:
             raise ValueError, "no such logfile exists"
         return LogReader(filename)
 
@@ -192,36 +383,75 @@ class LogFile(BaseLogFile):
         """
         Rotate the file and create a new one.
 
+        The log file is moved to a C{.0} suffix and a new one opened; renaming
+        the older log files happens afterwards, in a thread if C{threaded} is
+        true.  A C{.0} file left by an earlier rotation which failed is
+        renamed first; if that fails again, the error is logged and the log
+        file is not rotated.
+
         If it's not possible to open new logfile, this will fail silently,
         and continue logging to old logfile.
         """
         if not (os.access(self.directory, os.W_OK) and os.access(self.path, os.W_OK)):
             return
+        self._joinRotation()
+        pending = "%s.0" % self.path
+        if os.path.exists(pending):
+            try:
+                self._finishRotation(pending)
+            except:
+                self._rotationFailure = failure.Failure()
+                return
+        self._file.close()
+        os.rename(self.path, pending)
+        _moveIndex(self.path, pending)
+        self._openFile()
+        self._rotated(pending)
+
+    def _finishRotation(self, path):
+        """
+        Shift the old log files up by one, then move the log file rotated to
+        C{path} to C{.1}, and compress and prune the rotated files.
+        """
         logs = self.listLogs()
         logs.reverse()
         for i in logs:
+            old = _existingLog("%s.%d" % (self.path, i))
             if self.maxRotatedFiles is not None and i >= self.maxRotatedFiles:
-                os.remove("%s.%d" % (self.path, i))
+                self._removeLog(old)
             else:
-                os.rename("%s.%d" % (self.path, i), "%s.%d" % (self.path, i + 1))
-        self._file.close()
-        os.rename(self.path, "%s.1" % self.path)
-        self._openFile()
+                new = "%s.%d%s" % (self.path, i + 1,
+                                   old[len("%s.%d" % (self.path, i)):])
+                os.rename(old, new)
+                _moveIndex(old, new)
+        first = "%s.1" % self.path
+        os.rename(path, first)
+        _moveIndex(path, first)
+        BaseLogFile._finishRotation(self, first)
 
     def listLogs(self):
         """
         Return sorted list of integers - the old logs' identifiers.
         """
-        result = []
+        result = set()
         for name in glob.glob("%s.*" % self.path):
+            suffix = name[len(self.path) + 1:]
+            if suffix.endswith(".gz"):
+                suffix = suffix[:-len(".gz")]
             try:
-                counter = int(name.split('.')[-1])
+                counter = int(suffix)
                 if counter:
-                    result.append(counter)
+                    result.add(counter)
             except ValueError:
                 pass
-        result.sort()
-        return result
+        return sorted(result)
+
+    def _rotatedPaths(self):
+        """
+        Return the paths of the numbered log files, oldest first.
+        """
+        return [_existingLog("%s.%d" % (self.path, i))
+                for i in reversed(self.listLogs())]
 
     def __getstate__(self):
         state = BaseLogFile.__getstate__(self)
@@ -234,6 +464,22 @@ threadable.synchronize(LogFile)
 class DailyLogFile(BaseLogFile):
     """A log file that is rotated daily (at or after midnight localtime)
     """
+    def __init__(self, name, directory, defaultMode=None,
+                 maxRotatedFiles=None, compress=False, maxAge=None,
+                 threaded=False):
+        """
+        Create a log file rotating every day.
+
+        @param maxRotatedFiles: if not None, the number of days of rotated
+            files to keep; older ones are removed.
+        @type maxRotatedFiles: C{int}
+
+        @see: L{BaseLogFile.__init__} for the other parameters.
+        """
+        BaseLogFile.__init__(self, name, directory, defaultMode, compress,
+                             maxAge, threaded)
+        self.maxRotatedFiles = maxRotatedFiles
+
     def _openFile(self):
         BaseLogFile._openFile(self)
         self.lastDate = self.toDate(os.stat(self.path)[8])
@@ -264,8 +510,8 @@ class DailyLogFile(BaseLogFile):
         """Given a unix time, return a LogReader for an old log file."""
         if self.toDate(identifier) == self.lastDate:
             return self.getCurrentLog()
-        filename = "%s.%s" % (self.path, self.suffix(identifier))
-        if not os.path.exists(filename):
+        filename = _existingLog("%s.%s" % (self.path, self.suffix(identifier)))
+        if filename is None:
             raise ValueError, "no such logfile exists"
         return LogReader(filename)
 
@@ -280,17 +526,40 @@ class DailyLogFile(BaseLogFile):
     def rotate(self):
         """Rotate the file and create a new one.
 
+        Compressing and pruning the rotated files happens afterwards, in a
+        thread if C{threaded} is true.
+
         If it's not possible to open new logfile, this will fail silently,
         and continue logging to old logfile.
         """
         if not (os.access(self.directory, os.W_OK) and os.access(self.path, os.W_OK)):
             return
+        self._joinRotation()
         newpath = "%s.%s" % (self.path, self.suffix(self.lastDate))
-        if os.path.exists(newpath):
+        if _existingLog(newpath) is not None:
             return
         self._file.close()
         os.rename(self.path, newpath)
+        _moveIndex(self.path, newpath)
         self._openFile()
+        self._rotated(newpath)
+
+    def _rotatedPaths(self):
+        """
+        Return the paths of the dated log files, oldest first.
+        """
+        dated = []
+        for name in glob.glob("%s.*" % self.path):
+            suffix = name[len(self.path) + 1:]
+            if suffix.endswith(".gz"):
+                suffix = suffix[:-len(".gz")]
+            try:
+                date = tuple(map(int, suffix.split('_')))
+            except ValueError:
+                continue
+            dated.append((date, name))
+        dated.sort()
+        return [name for (ignored, name) in dated]
 
     def __getstate__(self):
         state = BaseLogFile.__getstate__(self)
@@ -301,10 +570,10 @@ threadable.synchronize(DailyLogFile)
 
 
 class LogReader:
-    """Read from a log file."""
+    """Read from a log file, which may be compressed with gzip."""
 
     def __init__(self, name):
-        self._file = file(name, "r")
+        self._file = _openLog(name)
 
     def readLines(self, lines=10):
         """Read a list of lines from the log file.
@@ -321,3 +590,253 @@ class LogReader:
 
     def close(self):
         self._file.close()
+
+
+
+def _openLog(name):
+    """
+    Open a log file for reading, decompressing it if its name ends with
+    C{".gz"}.
+    """
+    if name.endswith(".gz"):
+        return gzip.open(name, "rb")
+    return open(name, "rb")
+
+
+_TIME_PREFIX = '{"time": '
+
+
+def _eventTime(line):
+    """
+    Get the time of an event line written by L{JSONLogObserver}.
+
+    Lines start with the time so that it can be read without decoding the
+    whole line.
+
+    @return: The time of the event as a C{float}, or C{None} if C{line} is
+        not an event.
+    """
+    if line.startswith(_TIME_PREFIX):
+        try:
+            return float(line[len(_TIME_PREFIX):line.index(',')])
+        except ValueError:
+            pass
+    try:
+        return float(json.loads(line)['time'])
+    except (ValueError, KeyError, TypeError):
+        return None
+
+
+
+class JSONLogObserver(log.FileLogObserver):
+    """
+    Log observer writing one JSON object per line for each event, with the
+    keys C{"time"}, C{"system"}, C{"isError"} and C{"text"}.
+
+    Files written by this observer can be searched by time with
+    L{JSONLogReader} and L{readEvents} without decoding every event.
+    """
+
+    def formatEvent(self, eventDict):
+        """
+        Format an event as a line of JSON.
+
+        @return: The line, or C{None} if the event has no text.
+        """
+        text = log.textFromEventDict(eventDict)
+        if text is None:
+            return None
+        if isinstance(text, str):
+            text = text.decode('utf-8', 'replace')
+        system = eventDict['system']
+        if not isinstance(system, unicode):
+            system = str(system).decode('utf-8', 'replace')
+        return '%s%r, "system": %s, "isError": %d, "text": %s}\n' % (
+            _TIME_PREFIX, float(eventDict['time']), json.dumps(system),
+            bool(eventDict['isError']), json.dumps(text))
+
+
+
+class JSONLogReader(object):
+    """
+    Read the events of a file written by L{JSONLogObserver}, using an index
+    to find the events of a time range without reading the whole file.
+
+    The index holds the offset of the first event of every
+    C{indexInterval} seconds.  It is kept next to the log file, named after
+    it with L{indexSuffix} appended, and extended with the events written
+    since it was last used; if the index cannot be written it is only kept
+    in memory.  Events are expected to be written in time order.  Files
+    compressed by log rotation are decompressed as they are read.
+
+    @ivar name: The path of the log file.
+    @ivar indexInterval: The number of seconds of events between entries of
+        a new index.
+    """
+    indexSuffix = ".index"
+
+    def __init__(self, name, indexInterval=60):
+        self.name = name
+        self.indexInterval = indexInterval
+        self._times = []
+        self._offsets = []
+        self._identity = None
+
+
+    def _fileIdentity(self):
+        """
+        Identify the log file so that an index is not used for another file
+        which was later given the same name.
+        """
+        st = os.stat(self.name)
+        return "%d %d" % (st.st_dev, st.st_ino)
+
+
+    def _loadIndex(self, identity):
+        """
+        Read the index file if it was made for this log file.
+        """
+        self._times, self._offsets = [], []
+        self._identity = identity
+        try:
+            f = open(self.name + self.indexSuffix, "rb")
+        except IOError:
+            return
+        try:
+            header = f.readline().split()
+            if header[2:] != identity.split():
+                return
+            self.indexInterval = float(header[1])
+            for line in f:
+                if not line.endswith("\n"):
+                    break
+                when, offset = line.split()
+                self._times.append(float(when))
+                self._offsets.append(int(offset))
+        except ValueError:
+            del self._times[:], self._offsets[:]
+        finally:
+            f.close()
+
+
+    def _saveIndex(self, first):
+        """
+        Write the index entries starting at C{first} to the index file,
+        starting a new index file if C{first} is C{0}.
+        """
+        try:
+            if first:
+                f = open(self.name + self.indexSuffix, "ab")
+            else:
+                f = open(self.name + self.indexSuffix, "wb")
+                f.write("twisted-log-index %r %s\n" % (
+                        float(self.indexInterval), self._identity))
+            try:
+                for i in range(first, len(self._times)):
+                    f.write("%r %d\n" % (self._times[i], self._offsets[i]))
+            finally:
+                f.close()
+        except (IOError, OSError):
+            pass
+
+
+    def updateIndex(self):
+        """
+        Index the events written since the index was last updated.
+        """
+        identity = self._fileIdentity()
+        if identity != self._identity:
+            self._loadIndex(identity)
+        known = len(self._times)
+        if known:
+            offset, last = self._offsets[-1], self._times[-1]
+        else:
+            offset, last = 0, None
+        f = _openLog(self.name)
+        try:
+            f.seek(offset)
+            for line in f:
+                if not line.endswith("\n"):
+                    break
+                when = _eventTime(line)
+                if when is not None and (
+                        last is None or when >= last + self.indexInterval):
+                    self._times.append(when)
+                    self._offsets.append(offset)
+                    last = when
+                offset += len(line)
+        finally:
+            f.close()
+        if len(self._times) > known or not known:
+            self._saveIndex(known)
+
+
+    def readEvents(self, start=None, end=None):
+        """
+        Read the events logged at or after C{start} and before C{end}.
+
+        @param start: The earliest time of the events to read, or C{None}
+            to read from the first event.
+        @param end: The time at which to stop reading events, or C{None} to
+            read up to the last event.
+
+        @return: An iterator of event C{dict}s, with the keys written by
+            L{JSONLogObserver}.
+        """
+        f = _openLog(self.name)
+        try:
+            if end is not None:
+                # Do not index a file which only has later events.
+                when = _eventTime(f.readline())
+                if when is not None and when >= end:
+                    return
+            self.updateIndex()
+            offset = 0
+            if start is not None:
+                i = bisect.bisect_right(self._times, start) - 1
+                if i >= 0:
+                    offset = self._offsets[i]
+            f.seek(offset)
+            for line in f:
+                if not line.endswith("\n"):
+                    break
+                when = _eventTime(line)
+                if when is None or (start is not None and when < start):
+                    continue
+                if end is not None and when >= end:
+                    break
+                yield json.loads(line)
+        finally:
+            f.close()
+
+
+
+def readEvents(paths, start=None, end=None):
+    """
+    Read the events written by L{JSONLogObserver} to several log files in
+    a time range.
+
+    @param paths: The paths of the log files, oldest first.
+    @param start: The earliest time of the events to read, or C{None}.
+    @param end: The time at which to stop reading events, or C{None}.
+
+    @return: An iterator of event C{dict}s.
+    """
+    for path in paths:
+        for event in JSONLogReader(path).readEvents(start, end):
+            yield event
+
+
+
+def _moveIndex(path, newPath):
+    """
+    Rename the L{JSONLogReader} index of a log file along with the log file,
+    or remove it if C{newPath} is C{None}.
+    """
+    indexPath = path + JSONLogReader.indexSuffix
+    if not os.path.exists(indexPath):
+        return
+    if newPath is None:
+        os.remove(indexPath)
+    else:
+        os.rename(indexPath, newPath + JSONLogReader.indexSuffix)
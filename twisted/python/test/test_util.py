@@ -149,6 +149,58 @@ class UntilConcludesTests(unittest.TestCase):
 
 
 
+class SecondCacheTests(unittest.SynchronousTestCase):
+    """
+    Tests for L{util._SecondCache}.
+    """
+
+    def setUp(self):
+        self.cache = util._SecondCache()
+        self.calls = []
+
+
+    def formatter(self, when):
+        """
+        Record and format a timestamp.
+        """
+        self.calls.append(when)
+        return "formatted %r" % (when,)
+
+
+    def test_sameSecond(self):
+        """
+        L{util._SecondCache.format} calls the formatter with the whole second
+        of the timestamp, and returns the same result without calling it
+        again for other timestamps in that second.
+        """
+        first = self.cache.format(10.2, self.formatter)
+        second = self.cache.format(10.9, self.formatter)
+        self.assertEqual(first, "formatted 10")
+        self.assertIdentical(first, second)
+        self.assertEqual(self.calls, [10])
+
+
+    def test_newSecond(self):
+        """
+        The formatter is called again when the second changes.
+        """
+        self.cache.format(10.9, self.formatter)
+        self.assertEqual(self.cache.format(11.0, self.formatter),
+                         "formatted 11")
+        self.assertEqual(self.calls, [10, 11])
+
+
+    def test_newKey(self):
+        """
+        The formatter is called again when the key changes.
+        """
+        self.cache.format(10, self.formatter, "a")
+        self.cache.format(10, self.formatter, "a")
+        self.cache.format(10, self.formatter, "b")
+        self.assertEqual(self.calls, [10, 10])
+
+
+
 class SwitchUIDTest(unittest.TestCase):
     """
     Tests for L{util.switchUID}.
@@ -12,12 +12,13 @@ instead of creating a thread pool directly.
 from __future__ import division, absolute_import
 
 try:
-    from Queue import Queue
+    from Queue import Queue, Empty
 except ImportError:
-    from queue import Queue
+    from queue import Queue, Empty
 import contextlib
 import threading
 import copy
+import time
 
 from twisted.python import log, context, failure
 
@@ -25,6 +26,14 @@ from twisted.python import log, context, failure
 WorkerStop = object()
 
 
+
+class ThreadPoolFull(Exception):
+    """
+    Work was submitted to a L{ThreadPool} whose queue already holds
+    L{ThreadPool.maxQueued} pending tasks.
+    """
+
+
 class ThreadPool:
     """
     This class (hopefully) generalizes the functionality of a pool of
@@ -33,6 +42,30 @@ class ThreadPool:
     L{callInThread} and L{stop} should only be called from
     a single thread, unless you make a subclass where L{stop} and
     L{_startSomeWorkers} are synchronized.
+
+    @ivar maxQueued: The largest number of tasks allowed to wait in the queue
+        for a free worker, or C{None} for no limit.  Submissions beyond this
+        raise L{ThreadPoolFull}.
+
+    @ivar idleTimeout: The number of seconds a worker above L{min} waits for
+        a task before exiting, or C{None} to keep workers until L{stop}.
+
+    @ivar rejected: The number of submissions refused with L{ThreadPoolFull}.
+
+    @ivar tasksCompleted: The number of tasks which have been run.
+
+    @ivar totalWaitTime: The total number of seconds tasks spent queued
+        before a worker picked them up.
+
+    @ivar maxWaitTime: The longest number of seconds a task spent queued.
+
+    @ivar totalRunTime: The total number of seconds spent running tasks.
+
+    @ivar maxRunTime: The longest number of seconds spent running one task.
+
+    @ivar _lock: A L{threading.RLock} protecting L{workers} and the task
+        statistics, which idle and finishing workers update from their own
+        threads.
     """
     min = 5
     max = 20
@@ -40,26 +73,45 @@ class ThreadPool:
     started = False
     workers = 0
     name = None
+    maxQueued = None
+    idleTimeout = None
+
+    rejected = 0
+    tasksCompleted = 0
+    totalWaitTime = 0.0
+    maxWaitTime = 0.0
+    totalRunTime = 0.0
+    maxRunTime = 0.0
 
     threadFactory = threading.Thread
     currentThread = staticmethod(threading.currentThread)
+    seconds = staticmethod(time.time)
 
-    def __init__(self, minthreads=5, maxthreads=20, name=None):
+    def __init__(self, minthreads=5, maxthreads=20, name=None,
+                 maxQueued=None, idleTimeout=None):
         """
         Create a new threadpool.
 
         @param minthreads: minimum number of threads in the pool
         @param maxthreads: maximum number of threads in the pool
+        @param maxQueued: maximum number of tasks waiting for a worker, or
+            C{None} for no limit
+        @param idleTimeout: seconds after which idle workers above
+            C{minthreads} exit, or C{None} to never shrink the pool
         """
         assert minthreads >= 0, 'minimum is negative'
         assert minthreads <= maxthreads, 'minimum is greater than maximum'
+        assert maxQueued is None or maxQueued >= 0, 'maxQueued is negative'
         self.q = Queue(0)
         self.min = minthreads
         self.max = maxthreads
         self.name = name
+        self.maxQueued = maxQueued
+        self.idleTimeout = idleTimeout
         self.waiters = []
         self.threads = []
         self.working = []
+        self._lock = threading.RLock()
 
 
     def start(self):
@@ -73,27 +125,34 @@ class ThreadPool:
 
 
     def startAWorker(self):
-        self.workers += 1
-        name = "PoolThread-%s-%s" % (self.name or id(self), self.workers)
-        newThread = self.threadFactory(target=self._worker, name=name)
-        self.threads.append(newThread)
+        with self._lock:
+            self.workers += 1
+            name = "PoolThread-%s-%s" % (self.name or id(self), self.workers)
+            newThread = self.threadFactory(target=self._worker, name=name)
+            self.threads.append(newThread)
         newThread.start()
 
 
     def stopAWorker(self):
-        self.q.put(WorkerStop)
-        self.workers -= 1
+        with self._lock:
+            self.q.put(WorkerStop)
+            self.workers -= 1
 
 
     def __setstate__(self, state):
         self.__dict__ = state
-        ThreadPool.__init__(self, self.min, self.max)
+        ThreadPool.__init__(self, self.min, self.max, None,
+                            state.get('maxQueued'), state.get('idleTimeout'))
 
 
     def __getstate__(self):
         state = {}
         state['min'] = self.min
         state['max'] = self.max
+        if self.maxQueued is not None:
+            state['maxQueued'] = self.maxQueued
+        if self.idleTimeout is not None:
+            state['idleTimeout'] = self.idleTimeout
         return state
 
 
@@ -104,6 +163,49 @@ class ThreadPool:
             self.startAWorker()
 
 
+    def isFull(self):
+        """
+        Determine whether a submission would currently be refused.
+
+        @return: C{True} if L{maxQueued} tasks are already waiting for a
+            worker, C{False} otherwise.
+        """
+        return (self.maxQueued is not None and
+                self.q.qsize() >= self.maxQueued)
+
+
+    def queueDepth(self):
+        """
+        @return: The number of tasks waiting for a worker.
+        """
+        return self.q.qsize()
+
+
+    def stats(self):
+        """
+        Summarize the current state of the pool and the tasks it has run.
+
+        @return: A C{dict} with the keys C{"queued"}, C{"workers"},
+            C{"working"}, C{"waiting"}, C{"rejected"}, C{"completed"},
+            C{"averageWait"}, C{"maxWait"}, C{"averageRun"} and C{"maxRun"}.
+            Times are in seconds.
+        """
+        with self._lock:
+            completed = self.tasksCompleted
+            return {
+                "queued": self.q.qsize(),
+                "workers": self.workers,
+                "working": len(self.working),
+                "waiting": len(self.waiters),
+                "rejected": self.rejected,
+                "completed": completed,
+                "averageWait": self.totalWaitTime / (completed or 1),
+                "maxWait": self.maxWaitTime,
+                "averageRun": self.totalRunTime / (completed or 1),
+                "maxRun": self.maxRunTime,
+                }
+
+
     def callInThread(self, func, *args, **kw):
         """
         Call a callable object in a separate thread.
@@ -146,14 +248,23 @@ class ThreadPool:
         @param *args: positional arguments to be passed to C{func}
 
         @param **kwargs: keyword arguments to be passed to C{func}
+
+        @raise ThreadPoolFull: If L{maxQueued} tasks are already waiting for
+            a worker.
         """
         if self.joined:
             return
+        if self.isFull():
+            with self._lock:
+                self.rejected += 1
+            raise ThreadPoolFull(
+                "%d tasks already queued" % (self.maxQueued,))
         ctx = context.theContextTracker.currentContext().contexts[-1]
-        o = (ctx, func, args, kw, onResult)
+        o = (ctx, func, args, kw, onResult, self.seconds())
         self.q.put(o)
         if self.started:
-            self._startSomeWorkers()
+            with self._lock:
+                self._startSomeWorkers()
 
 
     @contextlib.contextmanager
@@ -174,6 +285,46 @@ class ThreadPool:
             stateList.remove(workerThread)
 
 
+    def _getTask(self):
+        """
+        Wait for the next task for a worker.
+
+        If L{idleTimeout} is set, a worker above L{min} which sees no work for
+        that long gives up its place in the pool instead.
+
+        @return: The next queued task, or L{WorkerStop} if this worker should
+            exit.
+        """
+        if self.idleTimeout is None:
+            return self.q.get()
+        while True:
+            try:
+                return self.q.get(timeout=self.idleTimeout)
+            except Empty:
+                with self._lock:
+                    # Anything queued while we timed out was counted against
+                    # this worker, so only leave if the queue is still empty.
+                    if self.workers > self.min and self.q.empty():
+                        self.workers -= 1
+                        return WorkerStop
+
+
+    def _taskFinished(self, queuedAt, startedAt, finishedAt):
+        """
+        Record the wait and run time of a task which has just been run.
+        """
+        waited = startedAt - queuedAt
+        ran = finishedAt - startedAt
+        with self._lock:
+            self.tasksCompleted += 1
+            self.totalWaitTime += waited
+            self.totalRunTime += ran
+            if waited > self.maxWaitTime:
+                self.maxWaitTime = waited
+            if ran > self.maxRunTime:
+                self.maxRunTime = ran
+
+
     def _worker(self):
         """
         Method used as target of the created threads: retrieve a task to run
@@ -181,12 +332,13 @@ class ThreadPool:
         threadpool is stopped.
         """
         ct = self.currentThread()
-        o = self.q.get()
+        o = self._getTask()
         while o is not WorkerStop:
             with self._workerState(self.working, ct):
-                ctx, function, args, kwargs, onResult = o
+                ctx, function, args, kwargs, onResult, queuedAt = o
                 del o
 
+                startedAt = self.seconds()
                 try:
                     result = context.call(ctx, function, *args, **kwargs)
                     success = True
@@ -197,6 +349,7 @@ class ThreadPool:
                         result = None
                     else:
                         result = failure.Failure()
+                self._taskFinished(queuedAt, startedAt, self.seconds())
 
                 del function, args, kwargs
 
@@ -209,7 +362,7 @@ class ThreadPool:
             del ctx, onResult, result
 
             with self._workerState(self.waiters, ct):
-                o = self.q.get()
+                o = self._getTask()
 
         self.threads.remove(ct)
 
@@ -219,10 +372,11 @@ class ThreadPool:
         Shutdown the threads in the threadpool.
         """
         self.joined = True
-        threads = copy.copy(self.threads)
-        while self.workers:
-            self.q.put(WorkerStop)
-            self.workers -= 1
+        with self._lock:
+            threads = copy.copy(self.threads)
+            while self.workers:
+                self.q.put(WorkerStop)
+                self.workers -= 1
 
         # and let's just make sure
         # FIXME: threads that have died before calling stop() are not joined.
@@ -251,7 +405,8 @@ class ThreadPool:
         while self.workers < self.min:
             self.startAWorker()
         # Start some threads if there is a need.
-        self._startSomeWorkers()
+        with self._lock:
+            self._startSomeWorkers()
 
 
     def dumpStats(self):
@@ -259,3 +414,7 @@ class ThreadPool:
         log.msg('waiters: %s' % self.waiters)
         log.msg('workers: %s' % self.working)
         log.msg('total: %s'   % self.threads)
+        stats = self.stats()
+        log.msg('completed: %(completed)s rejected: %(rejected)s '
+                'wait: %(averageWait).6f/%(maxWait).6f '
+                'run: %(averageRun).6f/%(maxRun).6f' % stats)
@@ -1066,6 +1066,48 @@ def runWithWarningsSuppressed(suppressedWarnings, f, *args, **kwargs):
 
 
 
+class _SecondCache(object):
+    """
+    Remember the formatted form of the most recently formatted second.
+
+    Formatting a timestamp costs much more than comparing two integers, and a
+    busy process formats the same second over and over, for log lines and
+    for the I{Date} header of HTTP responses.  Formatters whose output only
+    depends on the whole second go through a L{_SecondCache} so that they
+    run at most once per second.
+
+    @ivar _cached: A C{(second, key, value)} tuple for the last value
+        formatted.  It is replaced as a whole so that threads sharing a cache
+        never see a value paired with the wrong second.
+    """
+    _cached = (None, None, None)
+
+    def format(self, when, formatter, key=None):
+        """
+        Format the whole second of a timestamp.
+
+        @param when: A POSIX timestamp.
+        @type when: C{int} or C{float}
+
+        @param formatter: A one-argument callable which formats a POSIX
+            timestamp.  It is called with the whole second of C{when} if the
+            cached value is for a different second or C{key}.
+
+        @param key: Anything else the result depends on, such as a format
+            string.  Changing it invalidates the cached value.
+
+        @return: The value C{formatter} returned for the whole second of
+            C{when}.
+        """
+        second = int(when // 1)
+        cachedSecond, cachedKey, value = self._cached
+        if second != cachedSecond or key != cachedKey:
+            value = formatter(second)
+            self._cached = (second, key, value)
+        return value
+
+
+
 __all__ = [
     "uniquify", "padTo", "getPluginDirs", "addPluginDir", "sibpath",
     "getPassword", "println", "makeStatBar", "OrderedDict",
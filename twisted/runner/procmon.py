@@ -91,6 +91,10 @@ class ProcessMonitor(service.Service):
     @ivar _reactor: A provider of L{IReactorProcess} and L{IReactorTime}
         which will be used to spawn processes and register delayed calls.
 
+    @type _childFDs: C{dict}
+    @ivar _childFDs: A mapping from process names to the C{childFDs} argument
+        to pass to L{IReactorProcess.spawnProcess} when starting them, for
+        processes added with one.
     """
     threshold = 1
     killTime = 5
@@ -107,6 +111,7 @@ class ProcessMonitor(service.Service):
         self.timeStarted = {}
         self.murder = {}
         self.restart = {}
+        self._childFDs = {}
 
 
     def __getstate__(self):
@@ -120,7 +125,8 @@ class ProcessMonitor(service.Service):
         return dct
 
 
-    def addProcess(self, name, args, uid=None, gid=None, env={}):
+    def addProcess(self, name, args, uid=None, gid=None, env={},
+                   childFDs=None):
         """
         Add a new monitored process and start it immediately if the
         L{ProcessMonitor} service is running.
@@ -142,12 +148,19 @@ class ProcessMonitor(service.Service):
         @param env: The environment to give to the launched process. See
             L{IReactorProcess.spawnProcess}'s C{env} parameter.
         @type env: C{dict}
+        @param childFDs: The file descriptors to give to the launched process.
+            See L{IReactorProcess.spawnProcess}'s C{childFDs} parameter.  If
+            C{None}, the process's standard input, output and error are
+            connected to the monitor.
+        @type childFDs: C{dict}
         @raises: C{KeyError} if a process with the given name already
             exists
         """
         if name in self.processes:
             raise KeyError("remove %s first" % (name,))
         self.processes[name] = args, uid, gid, env
+        if childFDs is not None:
+            self._childFDs[name] = childFDs
         self.delay[name] = self.minRestartDelay
         if self.running:
             self.startProcess(name)
@@ -163,6 +176,7 @@ class ProcessMonitor(service.Service):
         """
         self.stopProcess(name)
         del self.processes[name]
+        self._childFDs.pop(name, None)
 
 
     def startService(self):
@@ -249,7 +263,8 @@ class ProcessMonitor(service.Service):
         self.protocols[name] = proto
         self.timeStarted[name] = self._reactor.seconds()
         self._reactor.spawnProcess(proto, args[0], args, uid=uid,
-                                          gid=gid, env=env)
+                                          gid=gid, env=env,
+                                          childFDs=self._childFDs.get(name))
 
 
     def _forceStopProcess(self, proc):
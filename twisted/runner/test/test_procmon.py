@@ -186,6 +186,21 @@ class ProcmonTests(unittest.TestCase):
             self.reactor.spawnedProcesses[0]._environment, fakeEnv)
 
 
+    def test_addProcessChildFDs(self):
+        """
+        L{ProcessMonitor.addProcess} takes a C{childFDs} parameter that is
+        passed to L{IReactorProcess.spawnProcess}.
+        """
+        childFDs = {0: "w", 1: "r", 2: "r", 3: 7}
+        self.pm.startService()
+        self.pm.addProcess("foo", ["foo"], childFDs=childFDs)
+        self.pm.addProcess("bar", ["bar"])
+        self.reactor.advance(0)
+        spawned = dict((process._args[0], process._childFDs)
+                       for process in self.reactor.spawnedProcesses)
+        self.assertEqual(spawned, {"foo": childFDs, "bar": None})
+
+
     def test_removeProcess(self):
         """
         L{ProcessMonitor.removeProcess} removes the process from the public
@@ -2,12 +2,14 @@
 # Copyright (c) Twisted Matrix Laboratories.
 # See LICENSE for details.
 
-import os, errno, sys
+import os, errno, sys, signal, socket
 
 from twisted.python import log, syslog, logfile, usage
 from twisted.python.util import (
     switchUID, uidFromString, gidFromString, untilConcludes)
 from twisted.application import app, service
+from twisted.internet import endpoints
+from twisted.internet.abstract import isIPv6Address
 from twisted.internet.interfaces import IReactorDaemonize
 from twisted import copyright
 
@@ -16,6 +18,28 @@ def _umask(value):
     return int(value, 8)
 
 
+
+# The environment variable set in the worker processes started by --workers,
+# holding the index of the worker.
+_WORKER_ENVIRONMENT = "TWISTD_WORKER"
+
+
+
+def _sharedPortFamily(interface):
+    """
+    Choose the address family of a --shared-port socket.
+
+    @param interface: The address the socket will be bound to.
+    @type interface: C{str}
+
+    @return: A 2-tuple of the address family and its name without the
+        C{"AF_"} prefix, as used by the C{inherited} endpoint.
+    """
+    if isIPv6Address(interface):
+        return socket.AF_INET6, 'INET6'
+    return socket.AF_INET, 'INET'
+
+
 class ServerOptions(app.ServerOptions):
     synopsis = "Usage: twistd [options]"
 
@@ -42,6 +66,11 @@ class ServerOptions(app.ServerOptions):
                      ['gid', 'g', None, "The gid to run as.", gidFromString],
                      ['umask', None, None,
                       "The (octal) file creation mask to apply.", _umask],
+                     ['workers', None, 0,
+                      "Run the application in this many worker processes, "
+                      "restarting them when they exit.  Listen on ports "
+                      "with reuseport=yes so that every worker can bind "
+                      "them, or see --shared-port.", int],
                     ]
 
     compData = usage.Completions(
@@ -53,6 +82,29 @@ class ServerOptions(app.ServerOptions):
                     },
         )
 
+    def __init__(self, *a, **kw):
+        self['shared_ports'] = []
+        app.ServerOptions.__init__(self, *a, **kw)
+
+
+    def opt_shared_port(self, description):
+        """
+        Listen on a TCP port (a strports description like tcp:8080) in this
+        process and pass the socket to every worker started by --workers.
+        Workers listen on the Nth shared port, counting from 0, with the
+        endpoint inherited:N.  May be given more than once.
+        """
+        try:
+            name, args, kw = endpoints._parseServer(
+                description, None, endpoints._NO_DEFAULT)
+        except ValueError as e:
+            raise usage.UsageError(str(e))
+        if name != 'TCP':
+            raise usage.UsageError(
+                "--shared-port only supports tcp descriptions")
+        self['shared_ports'].append((args[0], kw['interface'], kw['backlog']))
+
+
     def opt_version(self):
         """Print version information and exit.
         """
@@ -63,6 +115,21 @@ class ServerOptions(app.ServerOptions):
 
     def postOptions(self):
         app.ServerOptions.postOptions(self)
+        if self['workers'] < 0:
+            raise usage.UsageError("--workers must not be negative")
+        if self['workers'] and self['chroot'] is not None:
+            raise usage.UsageError("--workers cannot be used with --chroot")
+        if self['shared_ports'] and not self['workers']:
+            raise usage.UsageError("--shared-port requires --workers")
+        if _WORKER_ENVIRONMENT in os.environ:
+            # This is a worker started by a twistd run with --workers: the
+            # supervisor owns the pidfile and daemonization, and logs what
+            # the worker writes to stdout.
+            self['workers'] = 0
+            self['shared_ports'] = []
+            self['nodaemon'] = True
+            self['pidfile'] = ''
+            self['logfile'] = '-'
         if self['pidfile']:
             self['pidfile'] = os.path.abspath(self['pidfile'])
 
@@ -177,6 +244,13 @@ class UnixApplicationRunner(app.ApplicationRunner):
         Do pre-application-creation setup.
         """
         checkPID(self.config['pidfile'])
+        if self.config.get('shared_ports'):
+            # The application is created here as well as in the workers, so
+            # let any inherited endpoints in it find the sockets the workers
+            # will be given.
+            os.environ[endpoints._INHERITED_SOCKETS] = ','.join([
+                _sharedPortFamily(interface)[1]
+                for (port, interface, backlog) in self.config['shared_ports']])
         self.config['nodaemon'] = (self.config['nodaemon']
                                    or self.config['debug'])
         self.oldstdout = sys.stdout
@@ -373,11 +447,21 @@ class UnixApplicationRunner(app.ApplicationRunner):
         process = service.IProcess(application)
         if not self.config['originalname']:
             launchWithName(process.processName)
+        if self.config['workers']:
+            # Work out how to run the workers before setupEnvironment changes
+            # the working directory.
+            workerArguments = [sys.executable, os.path.abspath(sys.argv[0])]
+            workerArguments.extend(sys.argv[1:])
         self.setupEnvironment(
             self.config['chroot'], self.config['rundir'],
             self.config['nodaemon'], self.config['umask'],
             self.config['pidfile'])
 
+        if self.config['workers']:
+            self.startWorkers(self.config['workers'], workerArguments,
+                              self.config['shared_ports'])
+            return
+
         service.IService(application).privilegedStartService()
 
         uid, gid = self.config['uid'], self.config['gid']
@@ -388,3 +472,64 @@ class UnixApplicationRunner(app.ApplicationRunner):
 
         self.shedPrivileges(self.config['euid'], uid, gid)
         app.startApplication(application, not self.config['no_save'])
+
+
+    def startWorkers(self, workers, arguments, sharedPorts=()):
+        """
+        Run the application in worker processes instead of in this one.
+
+        A L{ProcessMonitor} runs C{workers} copies of this twistd, restarting
+        them when they exit, and logs their output.  Each worker runs the
+        application in the foreground, with no pidfile, logging to its
+        standard output.  The workers share their listening ports either by
+        listening with C{reuseport=yes} (see
+        L{twisted.internet.endpoints.serverFromString}) or by accepting
+        connections from sockets this process listens on and passes to them,
+        one for each of C{sharedPorts}.  Workers find those sockets with the
+        C{inherited} endpoint.
+
+        Since this process keeps listening on the shared ports, connections
+        made while a worker restarts wait to be accepted rather than being
+        refused; C{SIGHUP} restarts all of the workers.
+
+        @param workers: The number of worker processes to run.
+        @type workers: C{int}
+
+        @param arguments: The argument list with which to run a worker.
+        @type arguments: C{list} of C{str}
+
+        @param sharedPorts: The ports to listen on and pass to the workers.
+        @type sharedPorts: C{list} of 3-tuples of port number, interface and
+            backlog
+
+        @return: The L{ProcessMonitor} running the workers.
+        """
+        from twisted.runner.procmon import ProcessMonitor
+        from twisted.internet import reactor
+        self._sharedSockets = []
+        domains = []
+        childFDs = {0: 'w', 1: 'r', 2: 'r'}
+        for port, interface, backlog in sharedPorts:
+            addressFamily, domain = _sharedPortFamily(interface)
+            skt = endpoints._listeningSocket(
+                addressFamily, interface, port, backlog)
+            childFDs[len(childFDs)] = skt.fileno()
+            self._sharedSockets.append(skt)
+            domains.append(domain)
+
+        monitor = ProcessMonitor(reactor)
+        for index in range(workers):
+            environment = os.environ.copy()
+            environment[_WORKER_ENVIRONMENT] = str(index)
+            if domains:
+                environment[endpoints._INHERITED_SOCKETS] = ','.join(domains)
+            monitor.addProcess(
+                "worker-%d" % (index,), arguments, env=environment,
+                childFDs=domains and childFDs or None)
+        monitor.startService()
+        reactor.addSystemEventTrigger(
+            'before', 'shutdown', monitor.stopService)
+        signal.signal(
+            signal.SIGHUP,
+            lambda signum, frame: reactor.callFromThread(monitor.restartAll))
+        return monitor
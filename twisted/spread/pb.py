@@ -415,6 +415,7 @@ class CopyableFailure(failure.Failure, Copyable):
         state which cannot reasonably be serialized.
         """
         state = self.__dict__.copy()
+        state.pop('_pendingFrames', None)
         state['tb'] = None
         state['frames'] = []
         state['stack'] = []
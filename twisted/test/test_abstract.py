@@ -9,7 +9,8 @@ from __future__ import division, absolute_import
 
 from twisted.trial.unittest import TestCase
 
-from twisted.internet.abstract import isIPAddress
+from twisted.internet.abstract import isIPAddress, ReadBuffer
+from twisted.internet.test.test_posixbase import TimeoutReportReactor
 
 
 class AddressTests(TestCase):
@@ -83,3 +84,46 @@ class AddressTests(TestCase):
         self.assertFalse(isIPAddress('0.0.256.0'))
         self.assertFalse(isIPAddress('0.0.0.256'))
         self.assertFalse(isIPAddress('256.256.256.256'))
+
+
+
+class ReadBufferTests(TestCase):
+    """
+    Tests for L{ReadBuffer}.
+    """
+    def test_reused(self):
+        """
+        L{ReadBuffer.get} returns the same writeable buffer each time it is
+        asked for one no larger than it.
+        """
+        readBuffer = ReadBuffer(16)
+        view = readBuffer.get(16)
+        view[:3] = b"abc"
+        self.assertEqual(len(view), 16)
+        self.assertIs(readBuffer.get(4), view)
+        self.assertEqual(readBuffer.get(8)[:3].tobytes(), b"abc")
+
+
+    def test_grow(self):
+        """
+        L{ReadBuffer.get} returns a larger buffer if it is asked for one
+        larger than the current one.
+        """
+        readBuffer = ReadBuffer(16)
+        view = readBuffer.get(32)
+        self.assertEqual(len(view), 32)
+        self.assertIs(readBuffer.get(16), view)
+
+
+    def test_installReadBuffer(self):
+        """
+        L{ReactorBase.installReadBuffer} makes the given L{ReadBuffer} the one
+        transports read into and returns the previously installed one, which
+        is initially C{None}.
+        """
+        reactor = TimeoutReportReactor()
+        readBuffer = ReadBuffer()
+        self.assertIs(reactor.installReadBuffer(readBuffer), None)
+        self.assertIs(reactor._readBuffer, readBuffer)
+        self.assertIs(reactor.installReadBuffer(None), readBuffer)
+        self.assertIs(reactor._readBuffer, None)
@@ -817,3 +817,17 @@ class ConnectionPoolTestCase(unittest.TestCase):
         pool.close()
         # But not anymore.
         self.assertFalse(reactor.triggers)
+
+
+    def test_maxQueued(self):
+        """
+        The C{cp_maxqueued} argument to L{ConnectionPool} limits the queue of
+        the pool's threadpool.
+        """
+        reactor = EventReactor(False)
+        pool = ConnectionPool('twisted.test.test_adbapi', cp_reactor=reactor,
+                              cp_maxqueued=4)
+        self.assertEqual(pool.maxqueued, 4)
+        self.assertEqual(pool.threadpool.maxQueued, 4)
+        self.assertNotIn('cp_maxqueued', pool.connkw)
+        pool.close()
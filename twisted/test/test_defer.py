@@ -9,6 +9,7 @@ from __future__ import division, absolute_import
 
 import warnings
 import gc, traceback
+import weakref
 import re
 
 from twisted.python import failure, log
@@ -1342,6 +1343,76 @@ class DeferredTestCase(unittest.SynchronousTestCase, ImmediateFailureMixin):
         self.assertNotEquals([], globalz)
 
 
+    def test_attributes(self):
+        """
+        Arbitrary attributes can be set on L{defer.Deferred} instances, and
+        they can be weakly referenced.
+        """
+        d = defer.Deferred()
+        d.reqid = 12
+        self.assertEqual(d.reqid, 12)
+        self.assertIdentical(weakref.ref(d)(), d)
+
+
+    def test_singleCallbackNoList(self):
+        """
+        A L{defer.Deferred} with a single pair of callbacks does not allocate
+        a C{list} for it, but still presents it in C{callbacks}.
+        """
+        d = defer.Deferred()
+        self.assertIdentical(d._callbacks, None)
+        d.addCallback(defer.passthru)
+        self.assertIsInstance(d._callbacks, tuple)
+        self.assertEqual(
+            d.callbacks,
+            [((defer.passthru, (), {}), (defer.passthru, None, None))])
+        d.addErrback(defer.passthru)
+        self.assertEqual(len(d.callbacks), 2)
+
+
+    def test_callbacksList(self):
+        """
+        Callbacks added to the C{list} returned by C{callbacks}, or to a
+        C{list} assigned to it, run in order with those added by
+        L{defer.Deferred.addCallbacks}.
+        """
+        called = []
+        d = defer.Deferred()
+        d.addCallback(lambda result: called.append(1))
+        d.callbacks.append(
+            ((lambda result: called.append(2), None, None),
+             (defer.passthru, None, None)))
+        d.addCallback(lambda result: called.append(3))
+        d.callback(None)
+        self.assertEqual(called, [1, 2, 3])
+        self.assertEqual(d.callbacks, [])
+
+        d = defer.Deferred()
+        d.callbacks = [
+            ((called.append, None, None), (defer.passthru, None, None))]
+        d.callback(4)
+        self.assertEqual(called, [1, 2, 3, 4])
+
+
+    def test_errorInCallbackLazyFrames(self):
+        """
+        With L{failure.Failure.lazyFrames} set, a Failure created for an
+        error raised by a callback and trapped by a later errback does not
+        extract its frames.
+        """
+        self.patch(failure.Failure, "lazyFrames", True)
+        defer.setDebugging(False)
+        d = defer.Deferred()
+        def raiseError(ignored):
+            raise GenericError("Bang")
+        d.addCallback(raiseError)
+        l = []
+        d.addErrback(l.append)
+        d.callback(None)
+        self.assertNotIn("frames", l[0].__dict__)
+        self.assertEqual(l[0].frames[-1][0], "raiseError")
+
+
     def test_inlineCallbacksTracebacks(self):
         """
         L{defer.inlineCallbacks} that re-raise tracebacks into their deferred
@@ -797,6 +797,98 @@ class TestFrameAttributes(SynchronousTestCase):
 
 
 
+class LazyFramesTests(SynchronousTestCase):
+    """
+    Tests for L{failure.Failure.lazyFrames}.
+    """
+
+    def setUp(self):
+        self.patch(failure.Failure, "lazyFrames", True)
+
+
+    def test_notExtracted(self):
+        """
+        With C{lazyFrames} set, a L{failure.Failure} does not extract its
+        frames when it is created.
+        """
+        f = getDivisionFailure()
+        self.assertNotIn("frames", f.__dict__)
+        self.assertNotIn("stack", f.__dict__)
+
+
+    def test_frames(self):
+        """
+        The C{frames} and C{stack} extracted lazily are the same as those
+        extracted when the L{failure.Failure} is created, except for the line
+        numbers of calling functions which have moved on.
+        """
+        lazy = getDivisionFailure()
+        self.patch(failure.Failure, "lazyFrames", False)
+        eager = getDivisionFailure()
+        self.assertEqual(lazy.frames, eager.frames)
+        self.assertEqual([frame[:2] for frame in lazy.stack],
+                         [frame[:2] for frame in eager.stack])
+        self.assertIn("frames", lazy.__dict__)
+
+
+    def test_captureVars(self):
+        """
+        A L{failure.Failure} created with C{captureVars} extracts its frames,
+        with their variables, when it is created.
+        """
+        f = getDivisionFailure(captureVars=True)
+        self.assertIn("frames", f.__dict__)
+        self.assertNotEqual(f.frames[0][3], ())
+
+
+    def test_printTraceback(self):
+        """
+        A lazy L{failure.Failure} prints the same traceback as one which
+        extracted its frames when it was created.
+        """
+        lazy = getDivisionFailure()
+        self.patch(failure.Failure, "lazyFrames", False)
+        eager = getDivisionFailure()
+        self.assertEqual(
+            lazy.getTraceback(elideFrameworkCode=True, detail="brief"),
+            eager.getTraceback(elideFrameworkCode=True, detail="brief"))
+
+
+    def test_cleanFailure(self):
+        """
+        L{failure.Failure.cleanFailure} extracts the frames of a lazy
+        L{failure.Failure} before it drops the traceback.
+        """
+        f = getDivisionFailure()
+        expected = traceback.extract_tb(f.getTracebackObject())
+        f.cleanFailure()
+        self.assertIdentical(f.tb, None)
+        self.assertNotIn("_pendingFrames", f.__dict__)
+        self.assertEqual(
+            traceback.extract_tb(f.getTracebackObject()), expected)
+
+
+    def test_getstate(self):
+        """
+        The state of a lazy L{failure.Failure} includes its frames and no
+        frame objects.
+        """
+        f = getDivisionFailure()
+        state = f.__getstate__()
+        self.assertNotIn("_pendingFrames", state)
+        self.assertEqual(len(state["frames"]), 1)
+
+
+    def test_withoutTraceback(self):
+        """
+        A lazy L{failure.Failure} created without a traceback has no frames.
+        """
+        f = failure.Failure(Exception("some error"))
+        self.assertEqual((f.frames, f.stack), ([], []))
+        self.assertEqual(f.getTracebackObject(), None)
+
+
+
 class TestDebugMode(SynchronousTestCase):
     """
     Failure's debug mode should allow jumping into the debugger.
@@ -468,6 +468,58 @@ class FileObserverTestCase(LogPublisherTestCaseMixin, unittest.SynchronousTestCa
         self.assertEqual("600000", self.flo.formatTime(12345.6))
 
 
+    def _emitAt(self, when):
+        """
+        Emit a message event with the given time directly to the observer;
+        L{LogPublisher.msg} always uses the current time.
+        """
+        self.flo.emit({'message': ('hello',), 'isError': 0, 'system': '-',
+                       'time': when})
+
+
+    def test_formatTimeOncePerSecond(self):
+        """
+        L{FileLogObserver.formatEvent} calls L{FileLogObserver.formatTime}
+        with the whole second of the event time, once for all the events in
+        the same second.
+        """
+        calls = []
+        def formatTime(when):
+            calls.append(when)
+            return "time %d" % (when,)
+        self.flo.formatTime = formatTime
+
+        for when in 100.1, 100.7, 101.2:
+            self._emitAt(when)
+        self.assertEqual(calls, [100, 101])
+        self.assertTrue(self.out[0].startswith("time 100 "))
+        self.assertTrue(self.out[1].startswith("time 100 "))
+        self.assertTrue(self.out[2].startswith("time 101 "))
+
+
+    def test_timeFormatChangeInvalidatesCache(self):
+        """
+        Changing C{timeFormat} changes the time written for later events in
+        the same second.
+        """
+        self._emitAt(100)
+        self.flo.timeFormat = '%Y'
+        self._emitAt(100)
+        self.assertTrue(self.out[1].startswith("1970 "))
+
+
+    def test_microsecondTimestampsNotCached(self):
+        """
+        If C{timeFormat} includes C{"%f"}, the time of each event is
+        formatted separately.
+        """
+        self.flo.timeFormat = '%f'
+        self._emitAt(12345.6)
+        self._emitAt(12345.7)
+        self.assertTrue(self.out[0].startswith("600000 "))
+        self.assertTrue(self.out[1].startswith("700000 "))
+
+
     def test_loggingAnObjectWithBroken__str__(self):
         #HELLO, MCFLY
         self.lp.msg(EvilStr())
@@ -607,6 +659,164 @@ class FileObserverTestCase(LogPublisherTestCaseMixin, unittest.SynchronousTestCa
 
 
 
+class FakeShutdownReactor(object):
+    """
+    A reactor which only keeps track of system event triggers.
+
+    @ivar triggers: A C{dict} mapping trigger IDs to C{(phase, eventType,
+        callable)} tuples.
+    """
+    def __init__(self):
+        self.triggers = {}
+
+
+    def addSystemEventTrigger(self, phase, eventType, f, *args, **kw):
+        triggerID = object()
+        self.triggers[triggerID] = (phase, eventType, f)
+        return triggerID
+
+
+    def removeSystemEventTrigger(self, triggerID):
+        del self.triggers[triggerID]
+
+
+
+class ThreadedFileLogObserverTestCase(unittest.SynchronousTestCase):
+    """
+    Tests for L{log.ThreadedFileLogObserver}.
+    """
+
+    def setUp(self):
+        self.out = FakeFile()
+        self.reactor = FakeShutdownReactor()
+
+
+    def event(self, message):
+        """
+        Make a log event with the given message.
+        """
+        return {'message': (message,), 'isError': 0, 'system': '-',
+                'time': 1234567890.0}
+
+
+    def start(self, observer):
+        """
+        Start C{observer} with C{self.reactor}, making sure it is stopped at
+        the end of the test.
+        """
+        observer.start(self.reactor)
+        self.addCleanup(lambda: observer._thread and observer.stop())
+
+
+    def test_emitQueues(self):
+        """
+        L{log.ThreadedFileLogObserver.emit} queues the event instead of
+        writing it.
+        """
+        observer = log.ThreadedFileLogObserver(self.out)
+        observer.emit(self.event("hello"))
+        self.assertEqual(self.out, [])
+        self.assertEqual(observer._queue.qsize(), 1)
+
+
+    def test_dropWhenFull(self):
+        """
+        Events emitted while C{maxQueued} events are already queued are
+        dropped and counted.
+        """
+        observer = log.ThreadedFileLogObserver(self.out, maxQueued=2)
+        for i in range(3):
+            observer.emit(self.event("hello"))
+        self.assertEqual(observer._queue.qsize(), 2)
+        self.assertEqual(observer.dropped, 1)
+
+
+    def test_writeInBatches(self):
+        """
+        Queued events are formatted as L{log.FileLogObserver} formats them
+        and written in batches of up to C{maxBatch} events.
+        """
+        observer = log.ThreadedFileLogObserver(self.out, maxBatch=2)
+        for message in "one", "two", "three":
+            observer.emit(self.event(message))
+        self.start(observer)
+        observer.stop()
+
+        lines = [observer.formatEvent(self.event(message))
+                 for message in ("one", "two", "three")]
+        self.assertEqual(self.out, [lines[0] + lines[1], lines[2]])
+
+
+    def test_skipEventsWithoutText(self):
+        """
+        Events for which L{log.FileLogObserver.formatEvent} returns C{None}
+        are not written.
+        """
+        observer = log.ThreadedFileLogObserver(self.out)
+        event = self.event("hello")
+        event['message'] = ()
+        self.assertIdentical(observer.formatEvent(event), None)
+        observer.emit(event)
+        self.start(observer)
+        observer.stop()
+        self.assertEqual(self.out, [])
+
+
+    def test_blockWhenFull(self):
+        """
+        With C{block} set, events emitted while the queue is full wait for
+        the writer thread and are all written.
+        """
+        observer = log.ThreadedFileLogObserver(
+            self.out, maxQueued=1, block=True)
+        self.start(observer)
+        for i in range(20):
+            observer.emit(self.event("message %d" % (i,)))
+        observer.stop()
+        self.assertEqual(observer.dropped, 0)
+        self.assertEqual("".join(self.out).count("message"), 20)
+
+
+    def test_startObserves(self):
+        """
+        L{log.ThreadedFileLogObserver.start} adds the observer to the global
+        log publisher, and L{log.ThreadedFileLogObserver.stop} removes it.
+        """
+        observer = log.ThreadedFileLogObserver(self.out)
+        self.start(observer)
+        self.assertIn(observer.emit, log.theLogPublisher.observers)
+        observer.stop()
+        self.assertNotIn(observer.emit, log.theLogPublisher.observers)
+
+
+    def test_stopOnShutdown(self):
+        """
+        The observer stops itself, writing out queued events, after the
+        reactor shuts down.
+        """
+        observer = log.ThreadedFileLogObserver(self.out)
+        observer.emit(self.event("goodbye"))
+        self.start(observer)
+        [(phase, eventType, trigger)] = self.reactor.triggers.values()
+        self.assertEqual((phase, eventType), ('after', 'shutdown'))
+        trigger()
+        self.assertIdentical(observer._thread, None)
+        self.assertNotIn(observer.emit, log.theLogPublisher.observers)
+        self.assertIn("goodbye", "".join(self.out))
+
+
+    def test_stopRemovesTrigger(self):
+        """
+        L{log.ThreadedFileLogObserver.stop} removes the shutdown trigger
+        added by L{log.ThreadedFileLogObserver.start}.
+        """
+        observer = log.ThreadedFileLogObserver(self.out)
+        self.start(observer)
+        observer.stop()
+        self.assertEqual(self.reactor.triggers, {})
+
+
+
 class PythonLoggingObserverTestCase(unittest.SynchronousTestCase):
     """
     Test the bridge with python logging module.
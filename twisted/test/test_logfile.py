@@ -1,10 +1,11 @@
 # Copyright (c) Twisted Matrix Laboratories.
 # See LICENSE for details.
 
-import os, time, stat, errno
+import os, time, stat, errno, json, gzip, threading
 
 from twisted.trial import unittest
 from twisted.python import logfile, runtime
+from twisted.python import log as twistedlog
 
 
 class LogFileTestCase(unittest.TestCase):
@@ -318,3 +319,491 @@ class DailyLogFileTestCase(unittest.TestCase):
         log.write("3")
         self.assert_(not os.path.exists(days[2]))
 
+
+
+
+class JSONLogTestCase(unittest.TestCase):
+    """
+    Tests for L{logfile.JSONLogObserver}, L{logfile.JSONLogReader} and
+    L{logfile.readEvents}.
+    """
+
+    def setUp(self):
+        self.dir = self.mktemp()
+        os.makedirs(self.dir)
+        self.name = "test.log"
+        self.path = os.path.join(self.dir, self.name)
+
+
+    def writeEvents(self, f, times, system="-"):
+        """
+        Write an event for each time in C{times} to C{f} with a
+        L{logfile.JSONLogObserver}.
+        """
+        observer = logfile.JSONLogObserver(f)
+        for when in times:
+            observer.emit({'message': ("event %r" % (when,),), 'isError': 0,
+                           'system': system, 'time': when})
+
+
+    def test_format(self):
+        """
+        L{logfile.JSONLogObserver} writes one JSON object per line, starting
+        with the time of the event.
+        """
+        f = open(self.path, "w")
+        observer = logfile.JSONLogObserver(f)
+        observer.emit({'message': ("hello\n\xe2\x98\x83",), 'isError': 1,
+                       'system': "sys", 'time': 12.5})
+        observer.emit({'message': (), 'isError': 0, 'system': "-",
+                       'time': 13})
+        f.close()
+        lines = open(self.path).readlines()
+        self.assertEqual(len(lines), 1)
+        self.assertTrue(lines[0].startswith('{"time": 12.5, '))
+        self.assertEqual(json.loads(lines[0]),
+                         {"time": 12.5, "system": "sys", "isError": 1,
+                          "text": u"hello\n\u2603"})
+
+
+    def test_readEvents(self):
+        """
+        L{logfile.JSONLogReader.readEvents} returns the events of the file in
+        the given time range.
+        """
+        f = open(self.path, "w")
+        self.writeEvents(f, range(0, 1000, 10))
+        f.close()
+        reader = logfile.JSONLogReader(self.path, indexInterval=100)
+        times = [e["time"] for e in reader.readEvents(205, 300)]
+        self.assertEqual(times, range(210, 300, 10))
+        self.assertEqual(len(list(reader.readEvents())), 100)
+
+
+    def test_index(self):
+        """
+        The index of a log file records the offset of the first event of
+        every C{indexInterval} seconds, and is saved next to the log file.
+        """
+        f = open(self.path, "w")
+        self.writeEvents(f, [0, 50, 100, 150, 200, 250])
+        f.close()
+        reader = logfile.JSONLogReader(self.path, indexInterval=100)
+        reader.updateIndex()
+        self.assertEqual(reader._times, [0, 100, 200])
+        lines = open(self.path).readlines()
+        self.assertEqual(reader._offsets, [0, len(lines[0] + lines[1]),
+                                           len("".join(lines[:4]))])
+        self.assertTrue(os.path.exists(self.path + ".index"))
+
+        other = logfile.JSONLogReader(self.path)
+        other.updateIndex()
+        self.assertEqual(other.indexInterval, 100)
+        self.assertEqual(other._times, [0, 100, 200])
+        self.assertEqual(other._offsets, reader._offsets)
+
+
+    def test_indexUsed(self):
+        """
+        L{logfile.JSONLogReader.readEvents} starts reading at the index entry
+        before the start of the range, skipping the earlier lines.
+        """
+        f = open(self.path, "w")
+        self.writeEvents(f, [0, 100, 200])
+        f.close()
+        reader = logfile.JSONLogReader(self.path, indexInterval=100)
+        reader.updateIndex()
+        # Earlier events are not read at all, even if they look later.
+        f = open(self.path, "r+")
+        f.write('{"time": 150')
+        f.close()
+        times = [e["time"] for e in reader.readEvents(100)]
+        self.assertEqual(times, [100, 200])
+
+
+    def test_indexExtended(self):
+        """
+        Events written after the index was made are added to it.
+        """
+        f = open(self.path, "w")
+        self.writeEvents(f, [0, 100])
+        f.flush()
+        reader = logfile.JSONLogReader(self.path, indexInterval=100)
+        reader.updateIndex()
+        self.writeEvents(f, [150, 200])
+        f.close()
+        self.assertEqual([e["time"] for e in reader.readEvents(190)], [200])
+        self.assertEqual(reader._times, [0, 100, 200])
+        other = logfile.JSONLogReader(self.path)
+        other.updateIndex()
+        self.assertEqual(other._times, [0, 100, 200])
+
+
+    def test_partialLine(self):
+        """
+        A partially written last line is neither indexed nor read.
+        """
+        f = open(self.path, "w")
+        self.writeEvents(f, [0, 100])
+        f.write('{"time": 200, "sys')
+        f.close()
+        reader = logfile.JSONLogReader(self.path, indexInterval=100)
+        self.assertEqual([e["time"] for e in reader.readEvents()], [0, 100])
+        self.assertEqual(reader._times, [0, 100])
+
+
+    def test_otherFileIndexIgnored(self):
+        """
+        An index made for another file which had the same name is not used.
+        """
+        f = open(self.path, "w")
+        self.writeEvents(f, [0, 100, 200])
+        f.close()
+        logfile.JSONLogReader(self.path, indexInterval=100).updateIndex()
+        os.rename(self.path, self.path + ".old")
+        f = open(self.path, "w")
+        self.writeEvents(f, [300])
+        f.close()
+        reader = logfile.JSONLogReader(self.path, indexInterval=100)
+        self.assertEqual([e["time"] for e in reader.readEvents()], [300])
+        self.assertEqual(reader._times, [300])
+
+
+    def test_unwritableIndex(self):
+        """
+        If the index cannot be saved, it is still used.
+        """
+        f = open(self.path, "w")
+        self.writeEvents(f, [0, 100])
+        f.close()
+        os.mkdir(self.path + ".index")
+        reader = logfile.JSONLogReader(self.path, indexInterval=100)
+        self.assertEqual([e["time"] for e in reader.readEvents(50)], [100])
+        self.assertEqual(reader._times, [0, 100])
+
+
+    def test_laterFileNotIndexed(self):
+        """
+        A file whose first event is after the end of the range is not
+        indexed.
+        """
+        f = open(self.path, "w")
+        self.writeEvents(f, [500, 600])
+        f.close()
+        reader = logfile.JSONLogReader(self.path)
+        self.assertEqual(list(reader.readEvents(0, 500)), [])
+        self.assertFalse(os.path.exists(self.path + ".index"))
+
+
+    def test_logFileEvents(self):
+        """
+        L{logfile.LogFile.getEvents} reads the events of the rotated files
+        and the current file in time order, and the index of a file is
+        rotated with it.
+        """
+        log = logfile.LogFile(self.name, self.dir, rotateLength=None)
+        self.addCleanup(log.close)
+        self.writeEvents(log, [0, 100])
+        self.assertEqual([e["time"] for e in log.getEvents()], [0, 100])
+        log.rotate()
+        self.assertTrue(os.path.exists(self.path + ".1.index"))
+        self.assertFalse(os.path.exists(self.path + ".index"))
+        self.writeEvents(log, [200, 300])
+        log.rotate()
+        self.writeEvents(log, [400])
+        self.assertEqual([e["time"] for e in log.getEvents(50, 350)],
+                         [100, 200, 300])
+        self.assertEqual(log.listLogs(), [1, 2])
+
+
+    def test_maxRotatedFilesRemovesIndex(self):
+        """
+        When L{logfile.LogFile} removes an old log file, it removes its index
+        too.
+        """
+        log = logfile.LogFile(self.name, self.dir, rotateLength=None,
+                              maxRotatedFiles=1)
+        self.addCleanup(log.close)
+        self.writeEvents(log, [0])
+        list(log.getEvents())
+        log.rotate()
+        log.write("x\n")
+        log.rotate()
+        self.assertFalse(os.path.exists(self.path + ".2.index"))
+        self.assertFalse(os.path.exists(self.path + ".1.index"))
+
+
+    def test_dailyLogFileEvents(self):
+        """
+        L{logfile.DailyLogFile.getEvents} reads the events of the rotated
+        files and the current file in date order.
+        """
+        log = RiggedDailyLogFile(self.name, self.dir)
+        self.addCleanup(log.close)
+        for day in 0, 1, 10:
+            log._clock = day * 86400
+            self.writeEvents(log, [day * 86400])
+        self.assertEqual([e["time"] for e in log.getEvents()],
+                         [0, 86400, 864000])
+
+
+
+class RotationTestCase(unittest.TestCase):
+    """
+    Tests for compressing and pruning rotated files, and for finishing
+    rotations in a thread.
+    """
+
+    def setUp(self):
+        self.dir = self.mktemp()
+        os.makedirs(self.dir)
+        self.name = "test.log"
+        self.path = os.path.join(self.dir, self.name)
+
+
+    def read(self, path):
+        """
+        Return the contents of the file at C{path}, decompressing it if it
+        ends with C{".gz"}.
+        """
+        if path.endswith(".gz"):
+            f = gzip.open(path)
+        else:
+            f = open(path)
+        try:
+            return f.read()
+        finally:
+            f.close()
+
+
+    def test_compress(self):
+        """
+        With C{compress} set, rotated files are compressed, and shifted and
+        read like uncompressed ones.
+        """
+        log = logfile.LogFile(self.name, self.dir, rotateLength=None,
+                              compress=True)
+        self.addCleanup(log.close)
+        log.write("first\n")
+        log.rotate()
+        self.assertFalse(os.path.exists(self.path + ".1"))
+        self.assertEqual(self.read(self.path + ".1.gz"), "first\n")
+        log.write("second\n")
+        log.rotate()
+        self.assertEqual(log.listLogs(), [1, 2])
+        self.assertEqual(self.read(self.path + ".2.gz"), "first\n")
+        self.assertEqual(self.read(self.path + ".1.gz"), "second\n")
+        reader = log.getLog(2)
+        self.addCleanup(reader.close)
+        self.assertEqual(reader.readLines(), ["first\n"])
+        self.assertEqual(os.listdir(self.dir).count("test.log.1.gz.tmp"), 0)
+
+
+    def test_compressKeepsModificationTime(self):
+        """
+        The compressed file has the modification time of the rotated file,
+        so that it is pruned by age as it would have been.
+        """
+        log = logfile.LogFile(self.name, self.dir, rotateLength=None,
+                              compress=True)
+        self.addCleanup(log.close)
+        log.write("first\n")
+        log.flush()
+        os.utime(self.path, (1000, 1000))
+        log.rotate()
+        self.assertEqual(os.stat(self.path + ".1.gz").st_mtime, 1000)
+
+
+    def test_compressedEvents(self):
+        """
+        L{logfile.LogFile.getEvents} reads the events of compressed files.
+        """
+        log = logfile.LogFile(self.name, self.dir, rotateLength=None,
+                              compress=True)
+        self.addCleanup(log.close)
+        observer = logfile.JSONLogObserver(log)
+        for when in 100, 200:
+            observer.emit({'message': ("event",), 'isError': 0,
+                           'system': "-", 'time': when})
+            log.rotate()
+        self.assertEqual([e["time"] for e in log.getEvents(150)], [200])
+
+
+    def test_maxAge(self):
+        """
+        With C{maxAge} set, rotated files last modified longer ago than that
+        are removed when the log is rotated.
+        """
+        log = logfile.LogFile(self.name, self.dir, rotateLength=None,
+                              maxAge=3600)
+        self.addCleanup(log.close)
+        for content in "old\n", "new\n":
+            log.write(content)
+            log.rotate()
+        os.utime(self.path + ".2", (0, 0))
+        log.write("current\n")
+        log.rotate()
+        self.assertEqual(log.listLogs(), [1, 2])
+        self.assertEqual(self.read(self.path + ".2"), "new\n")
+        self.assertEqual(self.read(self.path + ".1"), "current\n")
+
+
+    def test_threaded(self):
+        """
+        With C{threaded} set, L{logfile.LogFile.rotate} opens the new file at
+        once and finishes the rotation in another thread;
+        L{logfile.BaseLogFile.waitForRotation} waits for it to be done.
+        """
+        log = logfile.LogFile(self.name, self.dir, rotateLength=None,
+                              compress=True, threaded=True)
+        self.addCleanup(log.close)
+        threads = []
+        finishRotation = log._finishRotation
+        def recordThread(path):
+            threads.append(threading.currentThread())
+            finishRotation(path)
+        log._finishRotation = recordThread
+
+        log.write("first\n")
+        log.rotate()
+        log.write("second\n")
+        log.waitForRotation()
+        self.assertEqual(len(threads), 1)
+        self.assertNotIdentical(threads[0], threading.currentThread())
+        self.assertIdentical(log._rotation, None)
+        self.assertEqual(self.read(self.path + ".1.gz"), "first\n")
+        log.flush()
+        self.assertEqual(self.read(self.path), "second\n")
+
+
+    def test_threadedRotationWaitsForPrevious(self):
+        """
+        A threaded rotation does not start before the previous one is done.
+        """
+        log = logfile.LogFile(self.name, self.dir, rotateLength=None,
+                              threaded=True)
+        self.addCleanup(log.close)
+        for content in "first\n", "second\n":
+            log.write(content)
+            log.rotate()
+        log.waitForRotation()
+        self.assertEqual(self.read(self.path + ".2"), "first\n")
+        self.assertEqual(self.read(self.path + ".1"), "second\n")
+
+
+    def test_threadedRotationError(self):
+        """
+        An error finishing a rotation in a thread is logged.
+        """
+        log = logfile.LogFile(self.name, self.dir, rotateLength=None,
+                              threaded=True)
+        self.addCleanup(log.close)
+        def fail(path):
+            raise RuntimeError("disk on fire")
+        log._finishRotation = fail
+        log.rotate()
+        log.waitForRotation()
+        self.assertEqual(len(self.flushLoggedErrors(RuntimeError)), 1)
+
+
+    def test_threadedRotationErrorLoggedByWriter(self):
+        """
+        An error finishing a rotation in a thread is not logged from that
+        thread, which could then wait for the lock of the log file it logs
+        to, but by the next write.
+        """
+        log = logfile.LogFile(self.name, self.dir, rotateLength=None,
+                              threaded=True)
+        self.addCleanup(log.close)
+        threads = []
+        def observer(event):
+            if event["isError"]:
+                threads.append(threading.currentThread())
+                log.write("%s\n" % (event["why"],))
+        twistedlog.addObserver(observer)
+        self.addCleanup(twistedlog.removeObserver, observer)
+
+        def fail(path):
+            raise RuntimeError("disk on fire")
+        log._finishRotation = fail
+        log.rotate()
+        log._joinRotation()
+        self.assertEqual(threads, [])
+        log.write("next\n")
+        self.assertEqual(threads, [threading.currentThread()])
+        log.flush()
+        self.assertEqual(
+            self.read(self.path),
+            "Error rotating %s\nnext\n" % (self.path,))
+        self.assertEqual(len(self.flushLoggedErrors(RuntimeError)), 1)
+
+
+    def test_leftoverRotatedFile(self):
+        """
+        A C{.0} file left by a rotation which failed is renamed before the
+        next rotation, rather than overwritten.
+        """
+        with open(self.path + ".0", "w") as f:
+            f.write("leftover\n")
+        log = logfile.LogFile(self.name, self.dir, rotateLength=None)
+        self.addCleanup(log.close)
+        log.write("current\n")
+        log.rotate()
+        self.assertEqual(log.listLogs(), [1, 2])
+        self.assertFalse(os.path.exists(self.path + ".0"))
+        self.assertEqual(self.read(self.path + ".2"), "leftover\n")
+        self.assertEqual(self.read(self.path + ".1"), "current\n")
+
+
+    def test_leftoverRotatedFileError(self):
+        """
+        If a C{.0} file left by a rotation which failed cannot be renamed,
+        the log file is not rotated and the error is logged.
+        """
+        with open(self.path + ".0", "w") as f:
+            f.write("leftover\n")
+        log = logfile.LogFile(self.name, self.dir, rotateLength=None)
+        self.addCleanup(log.close)
+        def fail(path):
+            raise RuntimeError("disk on fire")
+        log._finishRotation = fail
+        log.write("current\n")
+        log.rotate()
+        log.write("more\n")
+        log.flush()
+        self.assertEqual(self.read(self.path + ".0"), "leftover\n")
+        self.assertEqual(self.read(self.path), "current\nmore\n")
+        self.assertEqual(len(self.flushLoggedErrors(RuntimeError)), 1)
+
+
+    def test_pickleWithRotation(self):
+        """
+        The thread of a rotation is not pickled.
+        """
+        log = logfile.LogFile(self.name, self.dir, rotateLength=None,
+                              threaded=True)
+        self.addCleanup(log.close)
+        log.rotate()
+        state = log.__getstate__()
+        log.waitForRotation()
+        self.assertNotIn("_rotation", state)
+        self.assertTrue(state["threaded"])
+
+
+    def test_dailyCompressAndMaxRotatedFiles(self):
+        """
+        L{logfile.DailyLogFile} compresses its rotated files and keeps at
+        most C{maxRotatedFiles} of them.
+        """
+        log = RiggedDailyLogFile(self.name, self.dir, maxRotatedFiles=2,
+                                 compress=True)
+        self.addCleanup(log.close)
+        for day in range(4):
+            log._clock = day * 86400
+            log.write("day %d\n" % (day,))
+        self.assertEqual(
+            sorted(os.listdir(self.dir)),
+            ["test.log", "test.log.1970_1_2.gz", "test.log.1970_1_3.gz"])
+        reader = log.getLog(86400)
+        self.addCleanup(reader.close)
+        self.assertEqual(reader.readLines(), ["day 1\n"])
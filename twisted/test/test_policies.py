@@ -8,13 +8,15 @@ Test code for policies.
 from __future__ import division, absolute_import
 
 from zope.interface import Interface, implementer, implementedBy
+from zope.interface.verify import verifyObject
 
 from twisted.python.compat import NativeStringIO, _PY3
 from twisted.trial import unittest
 from twisted.test.proto_helpers import StringTransport
 from twisted.test.proto_helpers import StringTransportWithDisconnection
 
-from twisted.internet import protocol, reactor, address, defer, task
+from twisted.internet import protocol, reactor, address, defer, task, error
+from twisted.internet.interfaces import IDelayedCall
 from twisted.protocols import policies
 
 
@@ -737,6 +739,207 @@ class TestTimeout(unittest.TestCase):
 
 
 
+class IdleTimeoutTrackerTests(unittest.TestCase):
+    """
+    Tests for L{policies.IdleTimeoutTracker}.
+    """
+
+    def setUp(self):
+        self.clock = task.Clock()
+        self.tracker = policies.IdleTimeoutTracker(1, self.clock)
+        self.expired = []
+
+
+    def test_interface(self):
+        """
+        The objects returned by L{policies.IdleTimeoutTracker.callLater}
+        provide L{IDelayedCall}.
+        """
+        timeout = self.tracker.callLater(3, lambda: None)
+        self.assertTrue(verifyObject(IDelayedCall, timeout))
+        self.assertEqual(timeout.getTime(), 3)
+        self.assertTrue(timeout.active())
+
+
+    def test_expire(self):
+        """
+        A timeout expires at the end of the bucket containing its time.
+        """
+        timeout = self.tracker.callLater(
+            2.5, lambda: self.expired.append("a"))
+        self.clock.advance(2.9)
+        self.assertEqual(self.expired, [])
+        self.clock.advance(0.1)
+        self.assertEqual(self.expired, ["a"])
+        self.assertFalse(timeout.active())
+        self.assertRaises(error.AlreadyCalled, timeout.cancel)
+
+
+    def test_oneTimerPerBucket(self):
+        """
+        Timeouts which fall into the same bucket share a single timer.
+        """
+        for i in range(10):
+            self.tracker.callLater(1.5 + i / 100, lambda: None)
+        self.tracker.callLater(5, lambda: None)
+        self.assertEqual(len(self.clock.getDelayedCalls()), 2)
+
+
+    def test_resetLater(self):
+        """
+        Resetting a timeout to a later time does not reschedule any timer,
+        and the timeout expires at its new time.
+        """
+        timeout = self.tracker.callLater(
+            2, lambda: self.expired.append("a"))
+        calls = self.clock.getDelayedCalls()
+        self.clock.advance(1)
+        timeout.reset(3)
+        self.assertEqual(self.clock.getDelayedCalls(), calls)
+        self.clock.advance(1)
+        self.assertEqual(self.expired, [])
+        self.assertEqual(len(self.clock.getDelayedCalls()), 1)
+        self.clock.advance(2)
+        self.assertEqual(self.expired, ["a"])
+
+
+    def test_resetSooner(self):
+        """
+        Resetting a timeout to an earlier time makes it expire at that time.
+        """
+        timeout = self.tracker.callLater(
+            10, lambda: self.expired.append("a"))
+        timeout.reset(2)
+        self.clock.advance(2)
+        self.assertEqual(self.expired, ["a"])
+        self.assertEqual(self.clock.getDelayedCalls(), [])
+
+
+    def test_delay(self):
+        """
+        Delaying a timeout makes it expire later by that amount.
+        """
+        timeout = self.tracker.callLater(
+            2, lambda: self.expired.append("a"))
+        timeout.delay(2)
+        self.assertEqual(timeout.getTime(), 4)
+        self.clock.advance(3)
+        self.assertEqual(self.expired, [])
+        self.clock.advance(1)
+        self.assertEqual(self.expired, ["a"])
+
+
+    def test_cancel(self):
+        """
+        A cancelled timeout does not expire, and the timer of its bucket is
+        cancelled once the bucket is empty.
+        """
+        timeout = self.tracker.callLater(
+            2, lambda: self.expired.append("a"))
+        timeout.cancel()
+        self.assertEqual(self.clock.getDelayedCalls(), [])
+        self.assertFalse(timeout.active())
+        self.assertRaises(error.AlreadyCancelled, timeout.cancel)
+        self.assertRaises(error.AlreadyCancelled, timeout.reset, 1)
+        self.clock.advance(5)
+        self.assertEqual(self.expired, [])
+
+
+    def test_cancelDuringSweep(self):
+        """
+        A timeout cancelled by another timeout expiring in the same sweep
+        does not expire.
+        """
+        timeouts = []
+        def expire(name):
+            self.expired.append(name)
+            for timeout in timeouts:
+                if timeout.active():
+                    timeout.cancel()
+        for name in range(5):
+            timeouts.append(self.tracker.callLater(
+                1, lambda name=name: expire(name)))
+        self.clock.advance(1)
+        self.assertEqual(len(self.expired), 1)
+
+
+    def test_error(self):
+        """
+        An exception raised by an expiring timeout is logged, and the other
+        timeouts in the bucket still expire.
+        """
+        self.tracker.callLater(1, lambda: 1 // 0)
+        self.tracker.callLater(1, lambda: self.expired.append("a"))
+        self.clock.advance(1)
+        self.assertEqual(self.expired, ["a"])
+        self.assertEqual(len(self.flushLoggedErrors(ZeroDivisionError)), 1)
+
+
+    def test_timeoutMixin(self):
+        """
+        A L{policies.TimeoutMixin} whose C{timeoutTracker} is set keeps its
+        timeout with the tracker.
+        """
+        proto = TrackedTimeoutTester()
+        proto.timeoutTracker = self.tracker
+        proto.makeConnection(StringTransport())
+        self.clock.advance(2)
+        proto.dataReceived(b'hello')
+        self.clock.advance(2)
+        self.assertFalse(proto.timedOut)
+        self.clock.advance(1)
+        self.assertTrue(proto.timedOut)
+
+
+    def test_timeoutMixinCancel(self):
+        """
+        Setting the timeout of a L{policies.TimeoutMixin} using a tracker to
+        C{None} cancels it.
+        """
+        proto = TrackedTimeoutTester()
+        proto.timeoutTracker = self.tracker
+        proto.makeConnection(StringTransport())
+        proto.setTimeout(None)
+        self.assertEqual(self.clock.getDelayedCalls(), [])
+
+
+    def test_timeoutFactory(self):
+        """
+        L{policies.TimeoutFactory} keeps the timeouts of the protocols it
+        builds with the tracker it is given.
+        """
+        wrappedFactory = protocol.ServerFactory()
+        wrappedFactory.protocol = SimpleProtocol
+        factory = policies.TimeoutFactory(
+            wrappedFactory, 3, timeoutTracker=self.tracker)
+        proto = factory.buildProtocol(
+            address.IPv4Address('TCP', '127.0.0.1', 12345))
+        transport = StringTransportWithDisconnection()
+        transport.protocol = proto
+        proto.makeConnection(transport)
+
+        self.clock.advance(2)
+        proto.dataReceived(b'bytes')
+        self.clock.advance(2)
+        self.assertFalse(proto.wrappedProtocol.disconnected)
+        self.clock.advance(1)
+        self.assertTrue(proto.wrappedProtocol.disconnected)
+
+
+
+class TrackedTimeoutTester(TimeoutTester):
+    """
+    A L{TimeoutTester} which schedules its timeout the way
+    L{policies.TimeoutMixin} does by default.
+    """
+
+    def __init__(self):
+        pass
+
+    callLater = policies.TimeoutMixin.callLater
+
+
+
 class LimitTotalConnectionsFactoryTestCase(unittest.TestCase):
     """Tests for policies.LimitTotalConnectionsFactory"""
     def testConnectionCounting(self):
@@ -48,6 +48,33 @@ class DeprecatedParseTestCase(ParserTestCase):
                          ('TCP', (80, self.f), {'interface':'', 'backlog':50}))
 
 
+    def test_reuseport(self):
+        """
+        A C{reuseport} argument is rejected, since
+        L{IReactorTCP.listenTCP} does not support it.
+        """
+        exc = self.assertRaises(
+            ValueError, strports.parse, 'tcp:80:reuseport=yes', self.f)
+        self.assertIn("serverFromString", str(exc))
+        self.flushWarnings()
+
+
+
+class ListenTestCase(TestCase):
+    """
+    Tests for L{strports.listen}.
+    """
+
+    def test_reuseport(self):
+        """
+        L{strports.listen} raises L{ValueError} for a description with a
+        C{reuseport} argument rather than passing it to
+        L{IReactorTCP.listenTCP}.
+        """
+        self.assertRaises(ValueError, strports.listen,
+                          'tcp:0:reuseport=yes', Factory())
+
+
 
 class ServiceTestCase(TestCase):
     """
@@ -23,6 +23,7 @@ from twisted.internet.protocol import ServerFactory
 from twisted.python.runtime import platform
 from twisted.internet.defer import maybeDeferred, gatherResults
 from twisted.internet import reactor, interfaces
+from twisted.internet.task import Clock
 
 
 class PlatformAssumptionsTestCase(TestCase):
@@ -253,3 +254,180 @@ if not interfaces.IReactorFDSet.providedBy(reactor):
     PlatformAssumptionsTestCase.skip = skipMsg
     SelectReactorTestCase.skip = skipMsg
 
+
+
+
+class FakeSelectReactor(Clock):
+    """
+    A fake reactor which keeps track of the readers added to it.
+
+    @ivar readers: The L{IReadDescriptor}s added and not removed.
+    @type readers: C{set}
+    """
+    def __init__(self):
+        Clock.__init__(self)
+        self.readers = set()
+
+
+    def addReader(self, reader):
+        self.readers.add(reader)
+
+
+    def removeReader(self, reader):
+        self.readers.discard(reader)
+
+
+
+class FakeListeningSocket(object):
+    """
+    A listening socket from which C{accept} returns new sockets, or raises the
+    errors given to it.
+
+    @ivar results: A C{list} of the errno values to raise from each call to
+        C{accept}, or C{None} to return a new socket.  Once it is empty,
+        C{accept} raises C{EAGAIN}.
+    @ivar accepts: The number of calls to C{accept}.
+    """
+    def __init__(self, results):
+        self.results = list(results)
+        self.accepts = 0
+
+
+    def accept(self):
+        self.accepts += 1
+        if not self.results:
+            raise socket.error(errno.EAGAIN, os.strerror(errno.EAGAIN))
+        result = self.results.pop(0)
+        if result is not None:
+            raise socket.error(result, os.strerror(result))
+        return socket.socket(), ('127.0.0.1', 12345)
+
+
+
+class NullFactory(ServerFactory):
+    """
+    A factory which refuses every connection, taking C{duration} seconds of
+    C{clock} time to do so.
+    """
+    def __init__(self, clock, duration=0):
+        self.clock = clock
+        self.duration = duration
+
+
+    def buildProtocol(self, addr):
+        self.clock.advance(self.duration)
+        return None
+
+
+
+class AcceptTuningTests(TestCase):
+    """
+    Tests for the accept loop limits, backoff and counters of L{Port}.
+    """
+    def setUp(self):
+        self.reactor = FakeSelectReactor()
+        self.factory = NullFactory(self.reactor)
+        self.port = Port(0, self.factory, reactor=self.reactor)
+        self.port.numberAccepts = 100
+        self.port.startReading()
+
+
+    def test_counters(self):
+        """
+        L{Port.doRead} counts its calls, the connections it accepts and the
+        time spent building protocols for them.
+        """
+        self.factory.duration = 0.25
+        self.port.socket = FakeListeningSocket([None, None])
+        self.port.doRead()
+        self.port.socket = FakeListeningSocket([None])
+        self.port.doRead()
+        self.assertEqual(self.port.acceptWakeups, 2)
+        self.assertEqual(self.port.acceptedConnections, 3)
+        self.assertEqual(self.port.buildProtocolTime, 0.75)
+        self.assertEqual(self.port.exhaustionEvents, 0)
+
+
+    def test_maxAcceptsPerWakeup(self):
+        """
+        L{Port.doRead} accepts at most C{maxAcceptsPerWakeup} connections.
+        """
+        self.port.maxAcceptsPerWakeup = 2
+        listening = self.port.socket = FakeListeningSocket([None] * 5)
+        self.port.doRead()
+        self.assertEqual(listening.accepts, 2)
+        self.assertEqual(self.port.acceptedConnections, 2)
+        self.port.doRead()
+        self.assertEqual(listening.accepts, 4)
+
+
+    def test_exhaustionWithoutBackoff(self):
+        """
+        By default, L{Port.doRead} counts an C{EMFILE} failure and keeps
+        reading.
+        """
+        self.port.socket = FakeListeningSocket([EMFILE])
+        self.port.doRead()
+        self.assertEqual(self.port.exhaustionEvents, 1)
+        self.assertIn(self.port, self.reactor.readers)
+        self.assertEqual(self.reactor.getDelayedCalls(), [])
+
+
+    def test_exhaustionBackoff(self):
+        """
+        With C{exhaustionBackoff} set, L{Port.doRead} stops reading for that
+        many seconds after an C{EMFILE} failure, doubling the delay for each
+        consecutive failure up to C{maxExhaustionBackoff}.
+        """
+        self.port.exhaustionBackoff = 1
+        self.port.maxExhaustionBackoff = 3
+        self.port.socket = FakeListeningSocket([EMFILE, ENFILE, EMFILE])
+        delays = []
+        for i in range(3):
+            self.port.doRead()
+            self.assertNotIn(self.port, self.reactor.readers)
+            [call] = self.reactor.getDelayedCalls()
+            delays.append(call.getTime() - self.reactor.seconds())
+            self.reactor.advance(delays[-1])
+            self.assertIn(self.port, self.reactor.readers)
+        self.assertEqual(delays, [1, 2, 3])
+        self.assertEqual(self.port.exhaustionEvents, 3)
+
+
+    def test_backoffReset(self):
+        """
+        The backoff delay starts again from C{exhaustionBackoff} once a
+        connection is accepted.
+        """
+        self.port.exhaustionBackoff = 1
+        self.port.socket = FakeListeningSocket([EMFILE])
+        self.port.doRead()
+        self.reactor.advance(1)
+        self.port.socket = FakeListeningSocket([None, EMFILE])
+        self.port.doRead()
+        [call] = self.reactor.getDelayedCalls()
+        self.assertEqual(call.getTime() - self.reactor.seconds(), 1)
+
+
+    def test_connectionAbortedDoesNotBackOff(self):
+        """
+        C{ECONNABORTED} is counted, but does not stop the port reading.
+        """
+        self.port.exhaustionBackoff = 1
+        self.port.socket = FakeListeningSocket([ECONNABORTED])
+        self.port.doRead()
+        self.assertEqual(self.port.exhaustionEvents, 1)
+        self.assertIn(self.port, self.reactor.readers)
+
+
+    def test_stopListeningCancelsBackoff(self):
+        """
+        L{Port.stopListening} cancels a pending restart of reading after a
+        backoff.
+        """
+        self.port.exhaustionBackoff = 1
+        self.port.socket = FakeListeningSocket([EMFILE])
+        self.port.doRead()
+        self.port.stopListening()
+        self.assertEqual(self.reactor.getDelayedCalls(), [])
+        self.assertNotIn(self.port, self.reactor.readers)
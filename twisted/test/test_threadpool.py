@@ -544,6 +544,129 @@ class ThreadPoolTestCase(unittest.SynchronousTestCase):
 
 
 
+class BoundedThreadPoolTestCase(unittest.SynchronousTestCase):
+    """
+    Tests for the queue limit, idle shrinking and statistics of
+    L{threadpool.ThreadPool}.
+    """
+
+    def test_maxQueuedRejects(self):
+        """
+        Once C{maxQueued} tasks are waiting for a worker,
+        L{ThreadPool.callInThreadWithCallback} raises
+        L{threadpool.ThreadPoolFull} and counts the rejection.
+        """
+        pool = threadpool.ThreadPool(0, 1, maxQueued=2)
+        pool.callInThread(lambda: None)
+        self.assertFalse(pool.isFull())
+        pool.callInThread(lambda: None)
+        self.assertTrue(pool.isFull())
+        self.assertRaises(
+            threadpool.ThreadPoolFull, pool.callInThread, lambda: None)
+        self.assertEqual(pool.queueDepth(), 2)
+        self.assertEqual(pool.rejected, 1)
+
+
+    def test_unbounded(self):
+        """
+        By default a L{ThreadPool} accepts any number of queued tasks.
+        """
+        pool = threadpool.ThreadPool(0, 1)
+        for i in range(100):
+            pool.callInThread(lambda: None)
+        self.assertFalse(pool.isFull())
+        self.assertEqual(pool.queueDepth(), 100)
+
+
+    def test_queueDrains(self):
+        """
+        Submissions are accepted again once workers take tasks off a full
+        queue.
+        """
+        pool = threadpool.ThreadPool(0, 1, maxQueued=1)
+        self.addCleanup(pool.stop)
+        done = threading.Event()
+        pool.callInThread(done.set)
+        self.assertTrue(pool.isFull())
+        pool.start()
+        done.wait(5)
+        self.assertTrue(done.isSet())
+        done.clear()
+        pool.callInThread(done.set)
+        done.wait(5)
+        self.assertTrue(done.isSet())
+
+
+    def test_statistics(self):
+        """
+        Each task run by the pool is counted and its wait and run time, as
+        measured by L{ThreadPool.seconds}, are recorded.
+        """
+        now = [10.0]
+        pool = threadpool.ThreadPool(0, 1)
+        pool.seconds = lambda: now[0]
+        self.addCleanup(pool.stop)
+        done = threading.Event()
+
+        def work():
+            now[0] += 3.0
+
+        def onResult(success, result):
+            done.set()
+
+        pool.callInThreadWithCallback(onResult, work)
+        now[0] += 2.0
+        pool.start()
+        done.wait(5)
+
+        stats = pool.stats()
+        self.assertEqual(stats["completed"], 1)
+        self.assertEqual(stats["averageWait"], 2.0)
+        self.assertEqual(stats["maxWait"], 2.0)
+        self.assertEqual(stats["averageRun"], 3.0)
+        self.assertEqual(stats["maxRun"], 3.0)
+        self.assertEqual(stats["queued"], 0)
+        self.assertEqual(stats["rejected"], 0)
+
+
+    def test_idleWorkersExit(self):
+        """
+        With C{idleTimeout} set, workers above the minimum exit after waiting
+        that long for work, leaving the minimum number running.
+        """
+        pool = threadpool.ThreadPool(1, 3, idleTimeout=0.01)
+        pool.start()
+        self.addCleanup(pool.stop)
+        release = threading.Event()
+        for i in range(3):
+            pool.callInThread(release.wait)
+        self.assertEqual(pool.workers, 3)
+        release.set()
+        for i in range(500):
+            if len(pool.threads) == 1:
+                break
+            time.sleep(0.01)
+        self.assertEqual(pool.workers, 1)
+        self.assertEqual(len(pool.threads), 1)
+
+        # The pool grows again on demand.
+        done = threading.Event()
+        pool.callInThread(done.set)
+        done.wait(5)
+        self.assertTrue(done.isSet())
+
+
+    def test_persistenceOfLimits(self):
+        """
+        C{maxQueued} and C{idleTimeout} survive pickling.
+        """
+        pool = threadpool.ThreadPool(1, 2, maxQueued=5, idleTimeout=30)
+        copy = pickle.loads(pickle.dumps(pool))
+        self.assertEqual(copy.maxQueued, 5)
+        self.assertEqual(copy.idleTimeout, 30)
+
+
+
 class RaceConditionTestCase(unittest.SynchronousTestCase):
 
     def getTimeout(self):
@@ -327,6 +327,18 @@ class DeferToThreadPoolTestCase(unittest.TestCase):
         return self.assertFailure(d, NewError)
 
 
+    def test_fullThreadPool(self):
+        """
+        If the threadpool's queue is full, L{threads.deferToThreadPool}
+        returns a L{Deferred} which has already failed with
+        L{threadpool.ThreadPoolFull} and the function is not called.
+        """
+        tp = threadpool.ThreadPool(0, 1, maxQueued=0)
+        d = threads.deferToThreadPool(reactor, tp, self.fail, "called")
+        self.assertEqual(tp.rejected, 1)
+        return self.assertFailure(d, threadpool.ThreadPoolFull)
+
+
 
 _callBeforeStartupProgram = """
 import time
@@ -1,12 +1,21 @@
-
 # Copyright (c) Twisted Matrix Laboratories.
 # See LICENSE for details.
 
 
+import os
+import errno
+import socket
+
 from twisted.trial import unittest
 from twisted.protocols import loopback
 from twisted.protocols import basic
-from twisted.internet import protocol, abstract
+from twisted.internet import protocol, abstract, tcp
+from twisted.python.runtime import platform
+
+try:
+    from twisted.python import _sendfile
+except (ImportError, OSError):
+    _sendfile = None
 
 import StringIO
 
@@ -50,3 +59,313 @@ class FileSenderTestCase(unittest.TestCase):
         self.failUnless(d.called, 
                         'producer unregistered with deferred being called')
 
+
+
+class FakeSendfile(object):
+    """
+    A stand-in for C{os.sendfile}, which is not available on all versions of
+    Python, that reads the data and writes it to the output descriptor.
+
+    @ivar calls: A C{list} of the arguments of each call.
+    @ivar failures: A C{list} of C{errno} values to fail the next calls with.
+    """
+    def __init__(self):
+        self.calls = []
+        self.failures = []
+
+
+    def __call__(self, outFD, inFD, offset, count):
+        self.calls.append((outFD, inFD, offset, count))
+        if self.failures:
+            raise OSError(self.failures.pop(0), "Fake failure")
+        os.lseek(inFD, offset, os.SEEK_SET)
+        return os.write(outFD, os.read(inFD, count))
+
+
+
+class SendingClient(protocol.Protocol):
+    """
+    A protocol which sends a file with a L{basic.SendfileProducer} once it is
+    connected, after writing C{prefix} itself.
+    """
+    prefix = ''
+
+    def __init__(self, f, offset, count):
+        self.f = f
+        self.offset = offset
+        self.count = count
+
+
+    def connectionMade(self):
+        self.transport.write(self.prefix)
+        producer = basic.SendfileProducer(
+            self.f, self.transport, self.offset, self.count)
+        self.result = producer.beginFileTransfer(self.transport)
+        self.result.addBoth(self.done)
+
+
+    def done(self, result):
+        self.transport.loseConnection()
+        return result
+
+
+
+class SendfileTestsMixin:
+    """
+    Helpers for tests which use a fake C{os.sendfile}.
+    """
+    def setUp(self):
+        self.sendfile = FakeSendfile()
+        self.patch(basic, "_sendfile", self.sendfile)
+        self.content = ''.join(chr(i % 256) for i in range(200000))
+        path = self.mktemp()
+        with open(path, 'wb') as f:
+            f.write(self.content)
+        self.f = open(path, 'rb')
+        self.addCleanup(self.f.close)
+
+
+
+class CanSendfileTests(SendfileTestsMixin, unittest.TestCase):
+    """
+    Tests for L{basic.canSendfile}.
+    """
+    def connection(self):
+        """
+        Make a L{tcp.Connection} which is not connected to anything.
+        """
+        class FakeSocket(object):
+            def setblocking(self, blocking):
+                pass
+            def fileno(self):
+                return -1
+        return tcp.Connection(FakeSocket(), None, reactor=object())
+
+
+    def test_tcp(self):
+        """
+        A regular file can be sent to a TCP connection.
+        """
+        self.assertTrue(basic.canSendfile(self.f, self.connection()))
+
+
+    def test_noSendfile(self):
+        """
+        Nothing can be sent if C{os.sendfile} is not available.
+        """
+        self.patch(basic, "_sendfile", None)
+        self.assertFalse(basic.canSendfile(self.f, self.connection()))
+
+
+    def test_tls(self):
+        """
+        Nothing can be sent to a connection using TLS.
+        """
+        connection = self.connection()
+        connection.TLS = True
+        self.assertFalse(basic.canSendfile(self.f, connection))
+
+
+    def test_notTransport(self):
+        """
+        Nothing can be sent to a consumer other than a TCP or UNIX connection.
+        """
+        self.assertFalse(
+            basic.canSendfile(self.f, abstract.FileDescriptor(object())))
+        self.assertFalse(basic.canSendfile(self.f, BufferingServer()))
+
+
+    def test_notRegularFile(self):
+        """
+        Nothing can be sent from a file-like object which is not a regular
+        file.
+        """
+        self.assertFalse(
+            basic.canSendfile(StringIO.StringIO('x'), self.connection()))
+        readFD, writeFD = os.pipe()
+        self.addCleanup(os.close, writeFD)
+        pipe = os.fdopen(readFD)
+        self.addCleanup(pipe.close)
+        self.assertFalse(basic.canSendfile(pipe, self.connection()))
+
+
+
+class SendfileProducerTests(SendfileTestsMixin, unittest.TestCase):
+    """
+    Tests for L{basic.SendfileProducer}.
+    """
+    def send(self, client):
+        """
+        Connect C{client} to a L{BufferingServer} and return a L{Deferred}
+        firing with the server once the connection is closed.
+        """
+        server = BufferingServer()
+        d = loopback.loopbackTCP(server, client)
+        return d.addCallback(lambda ignored: server)
+
+
+    def test_wholeFile(self):
+        """
+        Without a count, the file is sent from the offset to its end with
+        C{os.sendfile}, and the L{Deferred} returned by
+        L{basic.SendfileProducer.beginFileTransfer} fires with the number of
+        bytes sent.
+        """
+        client = SendingClient(self.f, 10, None)
+        def check(server):
+            self.assertEqual(server.buffer, self.content[10:])
+            self.assertTrue(self.sendfile.calls)
+            return client.result.addCallback(
+                self.assertEqual, len(self.content) - 10)
+        return self.send(client).addCallback(check)
+
+
+    def test_range(self):
+        """
+        With a count, only that many bytes are sent.
+        """
+        client = SendingClient(self.f, 1000, 150000)
+        def check(server):
+            self.assertEqual(server.buffer, self.content[1000:151000])
+            return client.result.addCallback(self.assertEqual, 150000)
+        return self.send(client).addCallback(check)
+
+
+    def test_bufferedDataFirst(self):
+        """
+        Data written to the transport before the file is sent first.
+        """
+        client = SendingClient(self.f, 0, 100)
+        client.prefix = 'x' * 1000000
+        def check(server):
+            self.assertEqual(server.buffer, client.prefix + self.content[:100])
+        return self.send(client).addCallback(check)
+
+
+    def test_wouldBlock(self):
+        """
+        If C{os.sendfile} fails with C{EAGAIN}, it is tried again once the
+        socket is writeable.
+        """
+        self.sendfile.failures = [errno.EAGAIN]
+        client = SendingClient(self.f, 0, None)
+        def check(server):
+            self.assertEqual(server.buffer, self.content)
+            self.assertEqual(self.sendfile.calls[0][2:], (0, 2 ** 20))
+            self.assertEqual(self.sendfile.calls[1][2:], (0, 2 ** 20))
+        return self.send(client).addCallback(check)
+
+
+    def test_error(self):
+        """
+        If C{os.sendfile} fails for any other reason, the L{Deferred} returned
+        by L{basic.SendfileProducer.beginFileTransfer} fails with the error.
+        """
+        self.sendfile.failures = [errno.EPIPE]
+        client = SendingClient(self.f, 0, None)
+        def check(server):
+            self.assertEqual(server.buffer, '')
+            return self.assertFailure(client.result, OSError)
+        return self.send(client).addCallback(check)
+
+
+    def test_stopProducing(self):
+        """
+        L{basic.SendfileProducer.stopProducing} makes the L{Deferred} returned
+        by L{basic.SendfileProducer.beginFileTransfer} fail.
+        """
+        consumer = abstract.FileDescriptor(object())
+        consumer.disconnected = True
+        producer = basic.SendfileProducer(self.f, consumer)
+        d = producer.beginFileTransfer(consumer)
+        self.assertEqual(self.sendfile.calls, [])
+        return self.assertFailure(d, Exception)
+
+
+    def test_fileSender(self):
+        """
+        L{basic.FileSender} sends a file with a L{basic.SendfileProducer} if it
+        has no transform and the consumer is a transport which supports it.
+        Afterwards, the file is positioned at its end and the L{Deferred}
+        fires with the last byte.
+        """
+        self.f.seek(5)
+        class Client(protocol.Protocol):
+            def connectionMade(client):
+                d = basic.FileSender().beginFileTransfer(
+                    self.f, client.transport)
+                d.addCallback(lambda last: setattr(client, "lastSent", last))
+                d.addBoth(lambda ign: client.transport.loseConnection())
+        client = Client()
+        def check(server):
+            self.assertEqual(server.buffer, self.content[5:])
+            self.assertTrue(self.sendfile.calls)
+            self.assertEqual(client.lastSent, self.content[-1])
+            self.assertEqual(self.f.tell(), len(self.content))
+        return self.send(client).addCallback(check)
+
+
+
+class CtypesSendfileTests(unittest.TestCase):
+    """
+    Tests for L{twisted.python._sendfile}, the ctypes binding of sendfile(2)
+    used when C{os.sendfile} is not available.
+    """
+    if not platform.isLinux():
+        skip = "sendfile(2) is only bound on Linux."
+    elif _sendfile is None:
+        skip = "The C library does not provide sendfile(2)."
+
+    def setUp(self):
+        self.content = ''.join(chr(i % 256) for i in range(1000))
+        path = self.mktemp()
+        with open(path, 'wb') as f:
+            f.write(self.content)
+        self.f = open(path, 'rb')
+        self.addCleanup(self.f.close)
+        self.server, self.client = socket.socketpair()
+        self.addCleanup(self.server.close)
+        self.addCleanup(self.client.close)
+
+
+    def test_sendfile(self):
+        """
+        L{_sendfile.sendfile} copies C{count} bytes from the given offset of
+        the input file descriptor to the output one, returns how many it
+        copied, and does not move the file position of the input.
+        """
+        sent = _sendfile.sendfile(
+            self.server.fileno(), self.f.fileno(), 100, 500)
+        self.assertEqual(sent, 500)
+        self.assertEqual(self.client.recv(1000), self.content[100:600])
+        self.assertEqual(os.lseek(self.f.fileno(), 0, os.SEEK_CUR), 0)
+
+
+    def test_endOfFile(self):
+        """
+        L{_sendfile.sendfile} returns C{0} at the end of the file.
+        """
+        self.assertEqual(
+            _sendfile.sendfile(self.server.fileno(), self.f.fileno(),
+                               len(self.content), 10), 0)
+
+
+    def test_error(self):
+        """
+        L{_sendfile.sendfile} raises L{OSError} with the C{errno} of a
+        failed call.
+        """
+        exc = self.assertRaises(
+            OSError, _sendfile.sendfile, -1, self.f.fileno(), 0, 10)
+        self.assertEqual(exc.errno, errno.EBADF)
+
+
+    def test_used(self):
+        """
+        L{basic.SendfileProducer} uses L{_sendfile.sendfile} when there is no
+        C{os.sendfile}.
+        """
+        if getattr(os, "sendfile", None) is None:
+            self.assertIdentical(basic._sendfile, _sendfile.sendfile)
+        else:
+            self.assertIdentical(basic._sendfile, os.sendfile)
@@ -38,6 +38,7 @@ from twisted.python.usage import UsageError
 from twisted.python.log import ILogObserver
 from twisted.python.components import Componentized
 from twisted.internet.defer import Deferred
+from twisted.internet.task import Clock
 from twisted.internet.interfaces import IReactorDaemonize
 from twisted.internet.test.modulehelpers import AlternateReactor
 from twisted.python.fakepwd import UserDatabase
@@ -324,6 +325,109 @@ class ServerOptionsTest(unittest.TestCase):
         test_defaultUmask.skip = test_umask.skip = test_invalidUmask.skip = msg
 
 
+    def test_workers(self):
+        """
+        The value given for the C{workers} option is parsed as an integer,
+        defaulting to C{0}.
+        """
+        config = twistd.ServerOptions()
+        config.parseOptions([])
+        self.assertEqual(config['workers'], 0)
+        config.parseOptions(['--workers', '4'])
+        self.assertEqual(config['workers'], 4)
+
+
+    def test_negativeWorkers(self):
+        """
+        L{ServerOptions.parseOptions} raises L{UsageError} if a negative
+        number of workers is given.
+        """
+        config = twistd.ServerOptions()
+        self.assertRaises(UsageError, config.parseOptions,
+                          ['--workers', '-1'])
+
+
+    def test_workersWithChroot(self):
+        """
+        L{ServerOptions.parseOptions} raises L{UsageError} if both
+        C{workers} and C{chroot} are given.
+        """
+        config = twistd.ServerOptions()
+        self.assertRaises(UsageError, config.parseOptions,
+                          ['--workers', '2', '--chroot', '/foo'])
+
+
+    def test_workerProcess(self):
+        """
+        In a worker process started by C{--workers}, identified by the
+        I{TWISTD_WORKER} environment variable, L{ServerOptions} ignores
+        C{workers}, does not daemonize or write a pidfile, and logs to
+        standard output.
+        """
+        self.patch(os, 'environ', {'TWISTD_WORKER': '1'})
+        config = twistd.ServerOptions()
+        config.parseOptions(['--workers', '4', '--pidfile', 'foo.pid',
+                             '--logfile', 'foo.log'])
+        self.assertEqual(config['workers'], 0)
+        self.assertTrue(config['nodaemon'])
+        self.assertEqual(config['pidfile'], '')
+        self.assertEqual(config['logfile'], '-')
+
+
+
+    def test_sharedPort(self):
+        """
+        Each C{shared-port} option is parsed as a TCP strports description
+        into a port number, interface and backlog.
+        """
+        config = twistd.ServerOptions()
+        config.parseOptions(['--workers', '2',
+                             '--shared-port', 'tcp:8080',
+                             '--shared-port', 'tcp:8443:interface=\\:\\:1'])
+        self.assertEqual(config['shared_ports'],
+                         [(8080, '', 50), (8443, '::1', 50)])
+
+
+    def test_sharedPortNotTCP(self):
+        """
+        L{ServerOptions.parseOptions} raises L{UsageError} if a C{shared-port}
+        is not a TCP description.
+        """
+        config = twistd.ServerOptions()
+        self.assertRaises(UsageError, config.parseOptions,
+                          ['--workers', '2', '--shared-port', 'unix:/foo'])
+        self.assertRaises(UsageError, config.parseOptions,
+                          ['--workers', '2', '--shared-port', '8080'])
+
+
+    def test_sharedPortWithoutWorkers(self):
+        """
+        L{ServerOptions.parseOptions} raises L{UsageError} if C{shared-port}
+        is given without C{workers}.
+        """
+        config = twistd.ServerOptions()
+        self.assertRaises(UsageError, config.parseOptions,
+                          ['--shared-port', 'tcp:8080'])
+
+
+    def test_workerProcessSharedPorts(self):
+        """
+        A worker process started by C{--workers} ignores C{shared-port}, since
+        its supervisor listens on those ports.
+        """
+        self.patch(os, 'environ', {'TWISTD_WORKER': '0'})
+        config = twistd.ServerOptions()
+        config.parseOptions(['--workers', '2', '--shared-port', 'tcp:8080'])
+        self.assertEqual(config['shared_ports'], [])
+
+    if _twistd_unix is None:
+        test_workers.skip = test_negativeWorkers.skip = msg
+        test_workersWithChroot.skip = test_workerProcess.skip = msg
+        test_sharedPort.skip = test_sharedPortNotTCP.skip = msg
+        test_sharedPortWithoutWorkers.skip = msg
+        test_workerProcessSharedPorts.skip = msg
+
+
     def test_unimportableConfiguredLogObserver(self):
         """
         C{--logger} with an unimportable module raises a L{UsageError}.
@@ -788,6 +892,153 @@ class UnixApplicationRunnerStartApplicationTests(unittest.TestCase):
 
 
 
+class FakeWorkerReactor(Clock):
+    """
+    A fake reactor recording the processes spawned and the system event
+    triggers added.
+
+    @ivar spawned: A C{list} of 4-tuples of the executable, arguments,
+        environment and child file descriptors of each spawned process.
+    @ivar triggers: A C{list} of 3-tuples of the phase, event type and
+        callable of each trigger added.
+    """
+    def __init__(self):
+        Clock.__init__(self)
+        self.spawned = []
+        self.triggers = []
+
+
+    def spawnProcess(self, processProtocol, executable, args=(), env={},
+                     path=None, uid=None, gid=None, usePTY=0, childFDs=None):
+        self.spawned.append((executable, args, env, childFDs))
+
+
+    def addSystemEventTrigger(self, phase, eventType, callable, *args, **kw):
+        self.triggers.append((phase, eventType, callable))
+
+
+
+class UnixApplicationRunnerWorkersTests(unittest.TestCase):
+    """
+    Tests for the C{workers} option of L{UnixApplicationRunner}.
+    """
+    if _twistd_unix is None:
+        skip = "twistd unix not available"
+
+    def setUp(self):
+        self.reactor = FakeWorkerReactor()
+        self.patch(sys, 'argv', ['twistd', '--workers', '2', 'web'])
+        self.patch(UnixApplicationRunner, 'setupEnvironment',
+                   lambda *a, **kw: None)
+        self.started = []
+        self.patch(app, 'startApplication',
+                   lambda *a, **kw: self.started.append(a))
+        self.signals = []
+        self.patch(signal, 'signal',
+                   lambda signum, handler: self.signals.append(
+                       (signum, handler)))
+        options = twistd.ServerOptions()
+        options.parseOptions(['--originalname', '--workers', '2'])
+        self.runner = UnixApplicationRunner(options)
+
+
+    def test_startsWorkers(self):
+        """
+        With C{workers} set, L{UnixApplicationRunner.startApplication} runs
+        that many copies of twistd, each with the I{TWISTD_WORKER} environment
+        variable set to its index, instead of starting the application.
+        """
+        with AlternateReactor(self.reactor):
+            self.runner.startApplication(service.Application("test"))
+        self.assertEqual(self.started, [])
+        arguments = [sys.executable, os.path.abspath('twistd'),
+                     '--workers', '2', 'web']
+        self.assertEqual(
+            sorted([(executable, args, env['TWISTD_WORKER'])
+                    for (executable, args, env, childFDs)
+                    in self.reactor.spawned]),
+            [(sys.executable, arguments, '0'),
+             (sys.executable, arguments, '1')])
+
+
+    def test_stopsWorkersOnShutdown(self):
+        """
+        The workers are stopped before the reactor shuts down.
+        """
+        with AlternateReactor(self.reactor):
+            monitor = self.runner.startWorkers(1, ['twistd'])
+        self.assertEqual(self.reactor.triggers,
+                         [('before', 'shutdown', monitor.stopService)])
+        self.assertTrue(monitor.running)
+
+
+    def test_restartWorkersOnSIGHUP(self):
+        """
+        A C{SIGHUP} handler is installed which restarts the workers from the
+        reactor thread.
+        """
+        calls = []
+        with AlternateReactor(self.reactor):
+            monitor = self.runner.startWorkers(1, ['twistd'])
+        self.patch(monitor, 'restartAll', lambda: calls.append('restart'))
+        self.reactor.callFromThread = lambda f, *a: f(*a)
+        [(signum, handler)] = self.signals
+        self.assertEqual(signum, signal.SIGHUP)
+        handler(signum, None)
+        self.assertEqual(calls, ['restart'])
+
+
+    def test_sharedPorts(self):
+        """
+        L{UnixApplicationRunner.startWorkers} listens on each shared port and
+        passes the sockets to every worker as descriptors 3, 4 and so on,
+        naming their address families in the I{TWISTED_INHERITED_SOCKETS}
+        environment variable.
+        """
+        with AlternateReactor(self.reactor):
+            self.runner.startWorkers(
+                2, ['twistd'], [(0, '127.0.0.1', 5), (0, '127.0.0.1', 5)])
+        sockets = self.runner._sharedSockets
+        for skt in sockets:
+            self.addCleanup(skt.close)
+        self.assertEqual(len(sockets), 2)
+        self.assertEqual(sockets[0].getsockname()[0], '127.0.0.1')
+        expectedFDs = {0: 'w', 1: 'r', 2: 'r',
+                       3: sockets[0].fileno(), 4: sockets[1].fileno()}
+        self.assertEqual(len(self.reactor.spawned), 2)
+        for executable, args, env, childFDs in self.reactor.spawned:
+            self.assertEqual(childFDs, expectedFDs)
+            self.assertEqual(env['TWISTED_INHERITED_SOCKETS'], 'INET,INET')
+
+
+    def test_preApplicationSharedPorts(self):
+        """
+        With shared ports, L{UnixApplicationRunner.preApplication} names their
+        address families in the I{TWISTED_INHERITED_SOCKETS} environment
+        variable, so that the application can be created in the supervising
+        process as well as in the workers.
+        """
+        self.patch(os, 'environ', {})
+        options = twistd.ServerOptions()
+        options.parseOptions(['--pidfile', '', '--workers', '2',
+                              '--shared-port', 'tcp:8080',
+                              '--shared-port', 'tcp:8081:interface=\\:\\:'])
+        UnixApplicationRunner(options).preApplication()
+        self.assertEqual(os.environ, {'TWISTED_INHERITED_SOCKETS': 'INET,INET6'})
+
+
+    def test_noSharedPorts(self):
+        """
+        Without shared ports, the workers get the default descriptors.
+        """
+        with AlternateReactor(self.reactor):
+            self.runner.startWorkers(1, ['twistd'])
+        [(executable, args, env, childFDs)] = self.reactor.spawned
+        self.assertIdentical(childFDs, None)
+        self.assertNotIn('TWISTED_INHERITED_SOCKETS', env)
+
+
+
 class UnixApplicationRunnerRemovePID(unittest.TestCase):
     """
     Tests for L{UnixApplicationRunner.removePID}.
@@ -8,12 +8,18 @@ Tests for implementations of L{IReactorUDP} and L{IReactorMulticast}.
 
 from __future__ import division, absolute_import
 
+import socket
+
+from zope.interface import implementer
+
 from twisted.trial import unittest
 
 from twisted.python.compat import intToBytes
 from twisted.internet.defer import Deferred, gatherResults, maybeDeferred
 from twisted.internet import protocol, reactor, error, defer, interfaces, udp
 from twisted.python import runtime
+from twisted.internet.abstract import ReadBuffer
+from twisted.internet.task import Clock
 
 
 class Mixin:
@@ -449,6 +455,82 @@ class UDPTestCase(unittest.TestCase):
 
 
 
+class FakeDatagramSocket(object):
+    """
+    A fake for the C{recvfrom_into} method of L{socket.socket} objects.
+
+    @ivar datagrams: A C{list} of C{(bytes, address)} tuples giving the
+        datagrams which will be received, after which C{recvfrom_into} raises
+        C{EAGAIN}.
+    """
+    def __init__(self, datagrams):
+        self.datagrams = datagrams
+
+
+    def recvfrom_into(self, buffer, size):
+        if not self.datagrams:
+            raise socket.error(udp.EAGAIN, None)
+        data, addr = self.datagrams.pop(0)
+        data = data[:size]
+        buffer[:len(data)] = data
+        return len(data), addr
+
+
+
+class ReadBufferTests(unittest.TestCase):
+    """
+    Tests for reading datagrams into a L{ReadBuffer}.
+    """
+    def readDatagrams(self, protocol):
+        """
+        Have a L{udp.Port} with a L{ReadBuffer} installed in its reactor read
+        two datagrams and pass them to C{protocol}.
+        """
+        fakeReactor = Clock()
+        fakeReactor._readBuffer = ReadBuffer(4)
+        port = udp.Port(0, protocol, maxPacketSize=16, reactor=fakeReactor)
+        port.socket = FakeDatagramSocket([
+            (b"hello", ("127.0.0.1", 1234)),
+            (b"bye", ("127.0.0.1", 4321))])
+        port.doRead()
+
+
+    def test_readIntoBuffer(self):
+        """
+        L{udp.Port.doRead} passes a C{bytes} copy of each datagram read into
+        the reactor's L{ReadBuffer} to a protocol which does not provide
+        L{interfaces.IMemoryViewReceiver}.
+        """
+        server = Server()
+        self.readDatagrams(server)
+        self.assertEqual(
+            server.packets,
+            [(b"hello", ("127.0.0.1", 1234)), (b"bye", ("127.0.0.1", 4321))])
+        self.assertIsInstance(server.packets[0][0], bytes)
+
+
+    def test_readIntoBufferMemoryView(self):
+        """
+        L{udp.Port.doRead} passes a C{memoryview} of each datagram read into
+        the reactor's L{ReadBuffer} to a protocol which provides
+        L{interfaces.IMemoryViewReceiver}.
+        """
+        @implementer(interfaces.IMemoryViewReceiver)
+        class ViewServer(Server):
+            def datagramReceived(self, data, addr):
+                Server.datagramReceived(self, data.tobytes(), addr)
+                self.packetTypes.append(type(data))
+
+        server = ViewServer()
+        server.packetTypes = []
+        self.readDatagrams(server)
+        self.assertEqual(
+            server.packets,
+            [(b"hello", ("127.0.0.1", 1234)), (b"bye", ("127.0.0.1", 4321))])
+        self.assertEqual(server.packetTypes, [memoryview, memoryview])
+
+
+
 class ReactorShutdownInteraction(unittest.TestCase):
     """Test reactor shutdown interaction"""
 
@@ -1338,6 +1338,9 @@ class HTTP11ClientProtocol(Protocol):
 
     @ivar _abortDeferreds: A list of C{Deferred} instances that will fire when
         the connection is lost.
+
+    @ivar _lostCallback: Called with this protocol once its connection is
+        lost, used by L{HTTPConnectionPool} to track the connections in use.
     """
     _state = 'QUIESCENT'
     _parser = None
@@ -1347,8 +1350,10 @@ class HTTP11ClientProtocol(Protocol):
     _responseDeferred = None
 
 
-    def __init__(self, quiescentCallback=lambda c: None):
+    def __init__(self, quiescentCallback=lambda c: None,
+                 lostCallback=lambda c: None):
         self._quiescentCallback = quiescentCallback
+        self._lostCallback = lostCallback
         self._abortDeferreds = []
 
 
@@ -1524,9 +1529,17 @@ class HTTP11ClientProtocol(Protocol):
     def connectionLost(self, reason):
         """
         The underlying transport went away.  If appropriate, notify the parser
-        object.
+        object, then call the lost callback.
+        """
+        self._connectionLost(reason)
+        self._lostCallback(self)
+
+
+    def _connectionLost(self, reason):
+        """
+        Handle the loss of the connection according to the current state.
         """
-    connectionLost = makeStatefulDispatcher('connectionLost', connectionLost)
+    _connectionLost = makeStatefulDispatcher('connectionLost', _connectionLost)
 
 
     def _connectionLost_QUIESCENT(self, reason):
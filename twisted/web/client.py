@@ -910,14 +910,21 @@ class _HTTP11ClientFactory(protocol.Factory):
     @ivar _quiescentCallback: The quiescent callback to be passed to protocol
         instances, used to return them to the connection pool.
 
+    @ivar _lostCallback: The callback to be passed to protocol instances,
+        called when their connection is lost, or C{None}.
+
     @since: 11.1
     """
-    def __init__(self, quiescentCallback):
+    def __init__(self, quiescentCallback, lostCallback=None):
         self._quiescentCallback = quiescentCallback
+        self._lostCallback = lostCallback
 
 
     def buildProtocol(self, addr):
-        return HTTP11ClientProtocol(self._quiescentCallback)
+        if self._lostCallback is None:
+            return HTTP11ClientProtocol(self._quiescentCallback)
+        return HTTP11ClientProtocol(
+            self._quiescentCallback, self._lostCallback)
 
 
 
@@ -989,6 +996,8 @@ class HTTPConnectionPool(object):
     Features:
      - Cached connections will eventually time out.
      - Limits on maximum number of persistent connections.
+     - Optionally, limits on the number of connections in use, with requests
+       for more waiting in line.
 
     Connections are stored using keys, which should be chosen such that any
     connections stored under a given key can be used interchangeably.
@@ -1010,6 +1019,27 @@ class HTTPConnectionPool(object):
     @ivar retryAutomatically: C{boolean} indicating whether idempotent
         requests should be retried once if no response was received.
 
+    @ivar maxActivePerHost: The maximum number of connections in use or being
+        made for a C{host:port} destination, or C{None} for no limit.  Past
+        it, L{getConnection} waits in line, first come first served, for a
+        connection to be returned to the pool or closed.  With a limit, the
+        most recently cached connection is reused first, and connections must
+        be made by the pool's own factory.  Set it before using the pool.
+    @type maxActivePerHost: C{int}
+
+    @ivar waitTimeout: The number of seconds L{getConnection} waits in line
+        before failing with L{defer.TimeoutError}, or C{None} to wait for as
+        long as it takes.
+
+    @ivar hits: The number of connections retrieved from the cache.
+
+    @ivar misses: The number of new connections made.
+
+    @ivar waits: The number of times L{getConnection} waited in line.
+
+    @ivar evictions: The number of cached connections closed because they
+        timed out or there were more than C{maxPersistentPerHost}.
+
     @ivar _factory: The factory used to connect to the proxy.
 
     @ivar _connections: Map (scheme, host, port) to lists of
@@ -1018,6 +1048,16 @@ class HTTPConnectionPool(object):
     @ivar _timeouts: Map L{HTTP11ClientProtocol} instances to a
         C{IDelayedCall} instance of their timeout.
 
+    @ivar _active: Map keys to the number of connections in use or being made,
+        when C{maxActivePerHost} is set.
+
+    @ivar _inUse: Map the L{HTTP11ClientProtocol} instances in use to their
+        key, when C{maxActivePerHost} is set.
+
+    @ivar _waiting: Map keys to lists of C{(deferred, proceed, timeoutCall)}
+        tuples, for the calls waiting in line, oldest first.  C{proceed} is
+        called without arguments once the call may go ahead.
+
     @since: 12.1
     """
 
@@ -1025,12 +1065,21 @@ class HTTPConnectionPool(object):
     maxPersistentPerHost = 2
     cachedConnectionTimeout = 240
     retryAutomatically = True
+    maxActivePerHost = None
+    waitTimeout = None
 
     def __init__(self, reactor, persistent=True):
         self._reactor = reactor
         self.persistent = persistent
         self._connections = {}
         self._timeouts = {}
+        self._active = {}
+        self._inUse = {}
+        self._waiting = {}
+        self.hits = 0
+        self.misses = 0
+        self.waits = 0
+        self.evictions = 0
 
 
     def getConnection(self, key, endpoint):
@@ -1054,16 +1103,40 @@ class HTTPConnectionPool(object):
         @return: A C{Deferred} that will fire with a L{HTTP11ClientProtocol}
            (or a wrapper) that can be used to send a single HTTP request.
         """
+        if self.maxActivePerHost is None:
+            return self._getConnection(key, endpoint)
+        return self._acquire(key, endpoint, self._getConnection)
+
+
+    def _getConnection(self, key, endpoint):
+        """
+        Supply a connection from the cache, or a new one.
+
+        This implements L{getConnection} once a connection may be used.
+        """
         # Try to get cached version:
         connections = self._connections.get(key)
         while connections:
-            connection = connections.pop(0)
+            if self.maxActivePerHost is None:
+                connection = connections.pop(0)
+            else:
+                # The most recently used connection is the least likely to
+                # have been closed by the server.
+                connection = connections.pop()
             # Cancel timeout:
             self._timeouts[connection].cancel()
             del self._timeouts[connection]
             if connection.state == "QUIESCENT":
+                self.hits += 1
+                if self.maxActivePerHost is not None:
+                    self._inUse[connection] = key
                 if self.retryAutomatically:
-                    newConnection = lambda: self._newConnection(key, endpoint)
+                    if self.maxActivePerHost is None:
+                        newConnection = lambda: self._newConnection(
+                            key, endpoint)
+                    else:
+                        newConnection = lambda: self._acquire(
+                            key, endpoint, self._newConnection)
                     connection = _RetryingHTTP11ClientProtocol(
                         connection, newConnection)
                 return defer.succeed(connection)
@@ -1077,16 +1150,110 @@ class HTTPConnectionPool(object):
 
         This implements the new connection code path for L{getConnection}.
         """
+        self.misses += 1
         def quiescentCallback(protocol):
             self._putConnection(key, protocol)
-        factory = self._factory(quiescentCallback)
-        return endpoint.connect(factory)
+        if self.maxActivePerHost is None:
+            factory = self._factory(quiescentCallback)
+            return endpoint.connect(factory)
+
+        def lostCallback(protocol):
+            if self._inUse.pop(protocol, None) is not None:
+                self._release(key)
+        factory = self._factory(quiescentCallback, lostCallback)
+
+        def cbConnected(protocol):
+            self._inUse[protocol] = key
+            return protocol
+        def ebConnectFailed(reason):
+            self._release(key)
+            return reason
+        d = endpoint.connect(factory)
+        return d.addCallbacks(cbConnected, ebConnectFailed)
+
+
+    def _acquire(self, key, endpoint, get):
+        """
+        Call C{get} with C{key} and C{endpoint} once fewer than
+        C{maxActivePerHost} connections for C{key} are in use.
+
+        @return: A L{Deferred} firing with the result of C{get}.
+        """
+        active = self._active.get(key, 0)
+        if active < self.maxActivePerHost:
+            self._active[key] = active + 1
+            return get(key, endpoint)
+
+        self.waits += 1
+        waiting = self._waiting.setdefault(key, [])
+        # Once out of the line, the result of get is chained to d, and
+        # cancelling d cancels it.
+        proceeding = []
+        def proceed():
+            result = self._acquire(key, endpoint, get)
+            proceeding.append(result)
+            result.chainDeferred(d)
+        def cancel(d):
+            if proceeding:
+                proceeding[0].cancel()
+            else:
+                self._stopWaiting(key, waiter)
+        d = defer.Deferred(cancel)
+        timeoutCall = None
+        if self.waitTimeout is not None:
+            timeoutCall = self._reactor.callLater(
+                self.waitTimeout, self._waitTimedOut, key, d)
+        waiter = (d, proceed, timeoutCall)
+        waiting.append(waiter)
+        return d
+
+
+    def _stopWaiting(self, key, waiter):
+        """
+        Remove C{waiter} from the line for C{key}, if it is still there.
+        """
+        waiting = self._waiting.get(key, [])
+        if waiter in waiting:
+            waiting.remove(waiter)
+            if not waiting:
+                del self._waiting[key]
+        timeoutCall = waiter[2]
+        if timeoutCall is not None and timeoutCall.active():
+            timeoutCall.cancel()
+
+
+    def _waitTimedOut(self, key, d):
+        """
+        Fail the L{Deferred} of a call which waited in line too long.
+        """
+        for waiter in self._waiting[key]:
+            if waiter[0] is d:
+                self._stopWaiting(key, waiter)
+                break
+        d.errback(defer.TimeoutError(
+            "Timed out waiting for a connection to %r" % (key,)))
+
+
+    def _release(self, key):
+        """
+        Record that a connection for C{key} is no longer in use, and let the
+        first call waiting in line for one proceed.
+        """
+        self._active[key] -= 1
+        if not self._active[key]:
+            del self._active[key]
+        waiting = self._waiting.get(key)
+        if waiting:
+            waiter = waiting[0]
+            self._stopWaiting(key, waiter)
+            waiter[1]()
 
 
     def _removeConnection(self, key, connection):
         """
         Remove a connection from the cache and disconnect it.
         """
+        self.evictions += 1
         connection.transport.loseConnection()
         self._connections[key].remove(connection)
         del self._timeouts[connection]
@@ -1107,6 +1274,7 @@ class HTTPConnectionPool(object):
             return
         connections = self._connections.setdefault(key, [])
         if len(connections) == self.maxPersistentPerHost:
+            self.evictions += 1
             dropped = connections.pop(0)
             dropped.transport.loseConnection()
             self._timeouts[dropped].cancel()
@@ -1116,6 +1284,12 @@ class HTTPConnectionPool(object):
                                       self._removeConnection,
                                       key, connection)
         self._timeouts[connection] = cid
+        if self._inUse.pop(connection, None) is not None:
+            # This is called while the connection is still handling the
+            # response which made it quiescent: a call waiting in line must
+            # not be handed the connection, and make a request with it, until
+            # that is done.
+            self._reactor.callLater(0, self._release, key)
 
 
     def closeCachedConnections(self):
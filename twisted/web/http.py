@@ -51,7 +51,8 @@ __all__ = [
     'stringToDatetime', 'toChunk', 'fromChunk', 'parseContentRange',
 
     'StringTransport', 'HTTPClient', 'NO_BODY_CODES', 'Request',
-    'PotentialDataLoss', 'HTTPChannel', 'HTTPFactory',
+    'PotentialDataLoss', 'FrozenHeaders', 'HTTPChannel', 'BlockHTTPChannel',
+    'HTTPFactory',
     ]
 
 
@@ -92,8 +93,10 @@ from twisted.python.compat import (_PY3, unicode, intToBytes, networkString,
                                    nativeString)
 from twisted.internet import interfaces, reactor, protocol, address
 from twisted.internet.defer import Deferred
+from twisted.internet.error import ConnectionDone, ConnectionLost
 from twisted.protocols import policies, basic
-from twisted.python import log
+from twisted.python import log, util
+from twisted.python.failure import Failure
 
 from twisted.web.http_headers import _DictHeaders, Headers
 
@@ -196,14 +199,24 @@ def parse_qs(qs, keep_blank_values=0, strict_parsing=0):
 
 
 
+# Caches of the current time formatted by datetimeToString and
+# datetimeToLogString.
+_currentDateTime = util._SecondCache()
+_currentLogDateTime = util._SecondCache()
+
+
+
 def datetimeToString(msSinceEpoch=None):
     """
     Convert seconds since epoch to HTTP datetime string.
 
+    If no time is given, the current time is used and its string is reused
+    until the second changes.
+
     @rtype: C{bytes}
     """
     if msSinceEpoch == None:
-        msSinceEpoch = time.time()
+        return _currentDateTime.format(time.time(), datetimeToString)
     year, month, day, hh, mm, ss, wd, y, z = time.gmtime(msSinceEpoch)
     s = networkString("%s, %02d %3s %4d %02d:%02d:%02d GMT" % (
             weekdayname[wd],
@@ -217,10 +230,13 @@ def datetimeToLogString(msSinceEpoch=None):
     """
     Convert seconds since epoch to log datetime string.
 
+    If no time is given, the current time is used and its string is reused
+    until the second changes.
+
     @rtype: C{str}
     """
     if msSinceEpoch == None:
-        msSinceEpoch = time.time()
+        return _currentLogDateTime.format(time.time(), datetimeToLogString)
     year, month, day, hh, mm, ss, wd, y, z = time.gmtime(msSinceEpoch)
     s = "[%02d/%3s/%4d:%02d:%02d:%02d +0000]" % (
         day, monthname[month], year,
@@ -526,6 +542,267 @@ class HTTPClient(basic.LineReceiver):
 NO_BODY_CODES = (204, 304)
 
 
+# The largest number of status lines and header names cached by
+# _statusLine and _appendHeaderLines; past it, new ones are encoded every
+# time they are used.
+_MAX_CACHED_ENCODINGS = 1000
+
+# Encoded status lines, keyed by version, code and message.
+_statusLines = {}
+
+# The encoded start of each header line, keyed by lowercased header name,
+# for the header capitalization of Headers.
+_headerPrefixes = {}
+
+
+
+def _statusLine(version, code, message):
+    """
+    Encode the status line of a response, reusing the line encoded for the
+    same version, code and message.
+
+    @type version: C{bytes}
+    @type code: C{int}
+    @type message: native C{str}
+
+    @rtype: C{bytes}
+    @return: The status line, including its line delimiter.
+    """
+    key = (version, code, message)
+    line = _statusLines.get(key)
+    if line is None:
+        line = (version + b" " + intToBytes(code) + b" " +
+                networkString(message) + b"\r\n")
+        if len(_statusLines) < _MAX_CACHED_ENCODINGS:
+            _statusLines[key] = line
+    return line
+
+
+
+def _appendHeaderLines(headers, lines, exclude=()):
+    """
+    Append the encoded lines of some headers to a list.
+
+    @type headers: L{Headers}
+
+    @type lines: C{list} of C{bytes}
+    @param lines: The list to append the encoded lines to.
+
+    @param exclude: Lowercased names of headers not to append.
+    """
+    if type(headers) is Headers:
+        prefixes = _headerPrefixes
+    else:
+        # It may capitalize header names differently.
+        prefixes = {}
+    for name, values in headers._rawHeaders.items():
+        if name in exclude:
+            continue
+        prefix = prefixes.get(name)
+        if prefix is None:
+            prefix = headers._canonicalNameCaps(name) + b": "
+            if len(prefixes) < _MAX_CACHED_ENCODINGS:
+                prefixes[name] = prefix
+        for value in values:
+            if not isinstance(value, bytes):
+                warnings.warn(
+                    "Passing non-bytes header values is deprecated "
+                    "since Twisted 12.3. Pass only bytes instead.",
+                    category=DeprecationWarning, stacklevel=3)
+                # Backward compatible cast for non-bytes values
+                value = networkString('%s' % (value,))
+            lines.extend((prefix, value, b"\r\n"))
+
+
+
+class FrozenHeaders(object):
+    """
+    A set of response headers encoded once, to be sent with many responses.
+
+    Responses which always carry the same headers can share a
+    L{FrozenHeaders} set with L{Request.setFrozenHeaders} instead of setting
+    each header in C{responseHeaders}.
+
+    @ivar names: The lowercased names of the headers.
+    @type names: C{frozenset} of C{bytes}
+
+    @ivar encoded: The header lines, as sent in responses.
+    @type encoded: C{bytes}
+    """
+
+    def __init__(self, headers):
+        """
+        @param headers: The headers, as a L{Headers} instance or a C{dict}
+            mapping header names to C{list}s of values.
+        """
+        if not isinstance(headers, Headers):
+            headers = Headers(headers)
+        lines = []
+        _appendHeaderLines(headers, lines)
+        self.names = frozenset(
+            name.lower() for name, values in headers.getAllRawHeaders())
+        self.encoded = b"".join(lines)
+
+
+    def __repr__(self):
+        return '<%s %r>' % (self.__class__.__name__, self.encoded)
+
+
+@implementer(interfaces.IPushProducer)
+class _RequestBodyStream(object):
+    """
+    Deliver the body of a L{Request} to a protocol as it is received, and
+    stop reading from the connection while the protocol is paused.
+
+    This is the transport of the protocol given to L{Request.deliverBody}.
+    Until then, the body received is buffered and reading is paused.
+
+    @ivar _channel: The L{HTTPChannel} the request was received on, paused
+        and resumed as the producer of the body.
+
+    @ivar _protocol: The protocol the body is delivered to, or C{None}.
+
+    @ivar _buffer: The C{list} of chunks of the body received before
+        L{deliverBody} was called.
+
+    @ivar _reason: The L{Failure} to deliver to the protocol once the body
+        has ended, or C{None} while it has not.
+
+    @ivar _protocolPaused: Whether the protocol asked for the body to be
+        paused.
+
+    @ivar _channelPaused: Whether this paused the channel.
+
+    @ivar _finished: Whether the end of the body was delivered, or the body
+        discarded.
+    """
+
+    def __init__(self, channel):
+        self._channel = channel
+        self._protocol = None
+        self._buffer = []
+        self._reason = None
+        self._protocolPaused = False
+        self._channelPaused = False
+        self._finished = False
+
+
+    def _pauseChannel(self):
+        if not self._channelPaused:
+            self._channelPaused = True
+            self._channel.pauseProducing()
+
+
+    def _resumeChannel(self):
+        if self._channelPaused:
+            self._channelPaused = False
+            self._channel.resumeProducing()
+
+
+    def deliverBody(self, protocol):
+        """
+        Start delivering the body to C{protocol}.
+
+        @see: L{Request.deliverBody}
+        """
+        if self._protocol is not None or self._finished:
+            raise RuntimeError("The request body was already delivered.")
+        self._protocol = protocol
+        protocol.makeConnection(self)
+        buffered, self._buffer = self._buffer, []
+        for data in buffered:
+            if self._protocol is None:
+                return
+            protocol.dataReceived(data)
+        if self._protocol is None:
+            return
+        if self._reason is not None:
+            self._finish()
+        elif not self._protocolPaused:
+            self._resumeChannel()
+
+
+    def dataReceived(self, data):
+        """
+        Deliver or buffer a chunk of the body.
+        """
+        if self._finished:
+            return
+        if self._protocol is None:
+            self._buffer.append(data)
+            self._pauseChannel()
+        else:
+            self._protocol.dataReceived(data)
+
+
+    def bodyReceived(self):
+        """
+        Deliver the end of the body, once it has all been received.
+        """
+        self._end(Failure(ConnectionDone("Request body received.")))
+
+
+    def connectionLost(self, reason):
+        """
+        Deliver the loss of the connection before the end of the body.
+        """
+        self._end(reason)
+
+
+    def _end(self, reason):
+        if self._reason is not None:
+            return
+        self._reason = reason
+        if self._protocol is not None:
+            self._finish()
+        else:
+            self._resumeChannel()
+
+
+    def _finish(self):
+        protocol, self._protocol = self._protocol, None
+        self._finished = True
+        self._resumeChannel()
+        protocol.connectionLost(self._reason)
+
+
+    def pauseProducing(self):
+        """
+        Stop reading the body from the connection.
+        """
+        self._protocolPaused = True
+        if self._reason is None:
+            self._pauseChannel()
+
+
+    def resumeProducing(self):
+        """
+        Resume reading the body from the connection.
+        """
+        self._protocolPaused = False
+        if self._protocol is not None:
+            self._resumeChannel()
+
+
+    def stopProducing(self):
+        """
+        Discard the rest of the body.  The protocol, if any, is told the
+        connection was lost unless the whole body was received already.
+        """
+        if self._finished:
+            return
+        self._buffer = []
+        if self._reason is None:
+            self._reason = Failure(
+                ConnectionLost("The rest of the request body was discarded."))
+        if self._protocol is not None:
+            self._finish()
+        else:
+            self._finished = True
+            self._resumeChannel()
+
+
+
 @implementer(interfaces.IConsumer)
 class Request:
     """
@@ -567,6 +844,21 @@ class Request:
         which this request was received is closed and which is C{True} after
         that.
     @type _disconnected: C{bool}
+
+    @ivar content: A file-like object holding the request body once it has
+        been received, or C{None} if the body is streamed instead; see
+        L{deliverBody}.
+
+    @ivar _frozenHeaders: The pre-encoded headers set by L{setFrozenHeaders},
+        or C{None}.
+    @type _frozenHeaders: L{FrozenHeaders}
+
+    @ivar _bodyStream: The L{_RequestBodyStream} delivering the request body
+        if it is streamed, or C{None}.
+
+    @ivar _receivingBody: Whether the request body is streamed and has not
+        all been received yet.  Until then, the channel is not told that the
+        request is done even if the response is finished.
     """
     producer = None
     finished = 0
@@ -585,6 +877,9 @@ class Request:
     content = None
     _forceSSL = 0
     _disconnected = False
+    _frozenHeaders = None
+    _bodyStream = None
+    _receivingBody = False
 
     def __init__(self, channel, queued):
         """
@@ -670,16 +965,20 @@ class Request:
         """
         Called when have finished responding and are no longer queued.
         """
+        if self._receivingBody:
+            # Called again by requestReceived once the body has ended.
+            return
         if self.producer:
             log.err(RuntimeError("Producer was not unregistered for %s" % self.uri))
             self.unregisterProducer()
         self.channel.requestDone(self)
         del self.channel
-        try:
-            self.content.close()
-        except OSError:
-            # win32 suckiness, no idea why it does this
-            pass
+        if self.content is not None:
+            try:
+                self.content.close()
+            except OSError:
+                # win32 suckiness, no idea why it does this
+                pass
         del self.content
         for d in self.notifications:
             d.callback(None)
@@ -724,7 +1023,9 @@ class Request:
             request headers.  C{None} if the request headers do not indicate a
             length.
         """
-        if length is not None and length < 100000:
+        if self._bodyStream is not None:
+            self.content = None
+        elif length is not None and length < 100000:
             self.content = StringIO()
         else:
             self.content = tempfile.TemporaryFile()
@@ -758,26 +1059,17 @@ class Request:
 
         This method is not intended for users.
         """
-        self.content.write(data)
+        if self._bodyStream is not None:
+            self._bodyStream.dataReceived(data)
+        else:
+            self.content.write(data)
 
 
-    def requestReceived(self, command, path, version):
+    def _setRequestLine(self, command, path, version):
         """
-        Called by channel when all data has been received.
-
-        This method is not intended for users.
-
-        @type command: C{bytes}
-        @param command: The HTTP verb of this request.  This has the case
-            supplied by the client (eg, it maybe "get" rather than "GET").
-
-        @type path: C{bytes}
-        @param path: The URI of this request.
-
-        @type version: C{bytes}
-        @param version: The HTTP version of this request.
+        Set the method, URI, path, query arguments and protocol version of
+        this request, and the addresses of its connection.
         """
-        self.content.seek(0,0)
         self.args = {}
         self.stack = []
 
@@ -796,6 +1088,92 @@ class Request:
         self.client = self.channel.transport.getPeer()
         self.host = self.channel.transport.getHost()
 
+
+    def headersReceived(self, command, path, version):
+        """
+        Called by channel when the request line and headers have been
+        received, before the body.
+
+        The method, URI, path, query arguments and protocol version are set,
+        and the body may be streamed to the code handling the request by
+        calling L{_startStreaming} here.
+
+        This method is not intended for users.
+
+        @type command: C{bytes}
+        @param command: The HTTP verb of this request.
+
+        @type path: C{bytes}
+        @param path: The URI of this request.
+
+        @type version: C{bytes}
+        @param version: The HTTP version of this request.
+        """
+        self._setRequestLine(command, path, version)
+
+
+    def _startStreaming(self):
+        """
+        Deliver the body of this request to the protocol given to
+        L{deliverBody} as it is received, instead of collecting it in
+        C{content}.  Must be called before L{gotLength}.
+        """
+        self._bodyStream = _RequestBodyStream(self.channel)
+        self._receivingBody = True
+
+
+    def deliverBody(self, protocol):
+        """
+        Deliver the body of this request to C{protocol} as it is received.
+
+        This is only possible for requests whose body is streamed, which
+        have a C{content} of C{None}; see L{twisted.web.server.Site}.
+
+        C{protocol} is connected to an L{IPushProducer} which pauses reading
+        from the connection when asked to.  The body is given to its
+        C{dataReceived} method, and the end of the body to its
+        C{connectionLost} method, with a L{ConnectionDone} failure if the
+        whole body was received or another failure if it was not.  Once the
+        response is finished, the rest of the body is discarded.
+
+        @type protocol: L{IProtocol} provider
+        @param protocol: The protocol to deliver the body to.
+
+        @raise RuntimeError: If the body of this request is not streamed, or
+            was already delivered.
+        """
+        if self._bodyStream is None:
+            raise RuntimeError("The body of this request is not streamed.")
+        self._bodyStream.deliverBody(protocol)
+
+
+    def requestReceived(self, command, path, version):
+        """
+        Called by channel when all data has been received.
+
+        This method is not intended for users.
+
+        @type command: C{bytes}
+        @param command: The HTTP verb of this request.  This has the case
+            supplied by the client (eg, it maybe "get" rather than "GET").
+
+        @type path: C{bytes}
+        @param path: The URI of this request.
+
+        @type version: C{bytes}
+        @param version: The HTTP version of this request.
+        """
+        if self._bodyStream is not None:
+            # The request is already being processed.
+            self._bodyStream.bodyReceived()
+            self._receivingBody = False
+            if self.finished and not self.queued:
+                self._cleanup()
+            return
+
+        self.content.seek(0,0)
+        self._setRequestLine(command, path, version)
+
         # Argument processing
         args = self.args
         ctype = self.requestHeaders.getRawHeaders(b'content-type')
@@ -945,6 +1323,8 @@ class Request:
             self.channel.factory.log(self)
 
         self.finished = 1
+        if self._bodyStream is not None:
+            self._bodyStream.stopProducing()
         if not self.queued:
             self._cleanup()
 
@@ -963,17 +1343,19 @@ class Request:
         if not self.startedWriting:
             self.startedWriting = 1
             version = self.clientproto
-            l = []
-            l.append(
-                version + b" " +
-                intToBytes(self.code) + b" " +
-                networkString(self.code_message) + b"\r\n")
+            frozen = self._frozenHeaders
+            if frozen is None:
+                frozenNames = ()
+            else:
+                frozenNames = frozen.names
+            l = [_statusLine(version, self.code, self.code_message)]
 
             # if we don't have a content length, we send data in
             # chunked mode, so that we can support pipelining in
             # persistent connections.
             if ((version == b"HTTP/1.1") and
                 (self.responseHeaders.getRawHeaders(b'content-length') is None) and
+                b'content-length' not in frozenNames and
                 self.method != b"HEAD" and self.code not in NO_BODY_CODES):
                 l.append(b'Transfer-Encoding: chunked\r\n')
                 self.chunked = 1
@@ -990,16 +1372,9 @@ class Request:
             if self.etag is not None:
                 self.responseHeaders.setRawHeaders(b'ETag', [self.etag])
 
-            for name, values in self.responseHeaders.getAllRawHeaders():
-                for value in values:
-                    if not isinstance(value, bytes):
-                        warnings.warn(
-                            "Passing non-bytes header values is deprecated "
-                            "since Twisted 12.3. Pass only bytes instead.",
-                            category=DeprecationWarning, stacklevel=2)
-                        # Backward compatible cast for non-bytes values
-                        value = networkString('%s' % (value,))
-                    l.extend([name, b": ", value, b"\r\n"])
+            _appendHeaderLines(self.responseHeaders, l, frozenNames)
+            if frozen is not None:
+                l.append(frozen.encoded)
 
             for cookie in self.cookies:
                 l.append(networkString('Set-Cookie: %s\r\n' % (cookie,)))
@@ -1025,6 +1400,19 @@ class Request:
             else:
                 self.transport.write(data)
 
+    def setFrozenHeaders(self, frozenHeaders):
+        """
+        Send a set of pre-encoded headers with the response.
+
+        The frozen headers take the place of any C{responseHeaders} with the
+        same names.  Call this before the first call to L{write}.
+
+        @type frozenHeaders: L{FrozenHeaders}
+        @param frozenHeaders: The headers to send, or C{None} to send none.
+        """
+        self._frozenHeaders = frozenHeaders
+
+
     def addCookie(self, k, v, expires=None, domain=None, path=None, max_age=None, comment=None, secure=None):
         """
         Set an outgoing HTTP cookie.
@@ -1342,6 +1730,8 @@ class Request:
         """
         self._disconnected = True
         self.channel = None
+        if self._bodyStream is not None:
+            self._bodyStream.connectionLost(reason)
         if self.content is not None:
             self.content.close()
         for d in self.notifications:
@@ -1680,6 +2070,34 @@ class HTTPChannel(basic.LineReceiver, policies.TimeoutMixin):
         header, data = line.split(b':', 1)
         header = header.lower()
         data = data.strip()
+        if not self._checkBodyHeader(header, data):
+            return
+        reqHeaders = self.requests[-1].requestHeaders
+        values = reqHeaders.getRawHeaders(header)
+        if values is not None:
+            values.append(data)
+        else:
+            reqHeaders.setRawHeaders(header, [data])
+
+        self._receivedHeaderCount += 1
+        if self._receivedHeaderCount > self.maxHeaders:
+            self.transport.write(b"HTTP/1.1 400 Bad Request\r\n\r\n")
+            self.transport.loseConnection()
+
+
+    def _checkBodyHeader(self, header, data):
+        """
+        Set up the decoding of the request body if C{header} describes it.
+
+        @type header: C{bytes}
+        @param header: The lowercased name of a request header.
+
+        @type data: C{bytes}
+        @param data: The stripped value of the header.
+
+        @return: C{False} if the header is invalid and a I{Bad Request}
+            response was sent, C{True} otherwise.
+        """
         if header == b'content-length':
             try:
                 self.length = int(data)
@@ -1687,7 +2105,7 @@ class HTTPChannel(basic.LineReceiver, policies.TimeoutMixin):
                 self.transport.write(b"HTTP/1.1 400 Bad Request\r\n\r\n")
                 self.length = None
                 self.transport.loseConnection()
-                return
+                return False
             self._transferDecoder = _IdentityTransferDecoder(
                 self.length, self.requests[-1].handleContentChunk, self._finishRequestBody)
         elif header == b'transfer-encoding' and data.lower() == b'chunked':
@@ -1696,17 +2114,7 @@ class HTTPChannel(basic.LineReceiver, policies.TimeoutMixin):
             self.length = None
             self._transferDecoder = _ChunkedTransferDecoder(
                 self.requests[-1].handleContentChunk, self._finishRequestBody)
-        reqHeaders = self.requests[-1].requestHeaders
-        values = reqHeaders.getRawHeaders(header)
-        if values is not None:
-            values.append(data)
-        else:
-            reqHeaders.setRawHeaders(header, [data])
-
-        self._receivedHeaderCount += 1
-        if self._receivedHeaderCount > self.maxHeaders:
-            self.transport.write(b"HTTP/1.1 400 Bad Request\r\n\r\n")
-            self.transport.loseConnection()
+        return True
 
 
     def allContentReceived(self):
@@ -1743,13 +2151,14 @@ class HTTPChannel(basic.LineReceiver, policies.TimeoutMixin):
         req = self.requests[-1]
         req.parseCookies()
         self.persistent = self.checkPersistence(req, self._version)
-        req.gotLength(self.length)
         # Handle 'Expect: 100-continue' with automated 100 response code,
         # a simplistic implementation of RFC 2686 8.2.3:
         expectContinue = req.requestHeaders.getRawHeaders(b'expect')
         if (expectContinue and expectContinue[0].lower() == b'100-continue' and
             self._version == b'HTTP/1.1'):
             req.transport.write(b"HTTP/1.1 100 Continue\r\n\r\n")
+        req.headersReceived(self._command, self._path, self._version)
+        req.gotLength(self.length)
 
 
     def checkPersistence(self, request, version):
@@ -1823,6 +2232,158 @@ class HTTPChannel(basic.LineReceiver, policies.TimeoutMixin):
             request.connectionLost(reason)
 
 
+
+class BlockHTTPChannel(HTTPChannel):
+    """
+    A receiver for HTTP requests which parses the request line and headers
+    of each request as a block, instead of line by line.
+
+    Once the blank line ending the headers has been received, the header
+    lines are split in one scan, and each header name is set on the
+    request's C{requestHeaders} once, with all its values.  The limits on
+    the number of headers (C{maxHeaders}) and on the length of each line
+    (C{MAX_LENGTH}) are the same as for L{HTTPChannel}, as is the handling
+    of request bodies and pipelined requests.
+
+    @ivar _emptyLineAllowed: Whether a single empty line may precede the
+        next request line.  Some clients send one after a request body.
+    """
+
+    _emptyLineAllowed = True
+
+    def dataReceived(self, data):
+        """
+        Parse blocks of request headers, or pass request bodies to the
+        transfer decoder.
+        """
+        if self._busyReceiving:
+            self._buffer += data
+            return
+
+        self.resetTimeout()
+        try:
+            self._busyReceiving = True
+            self._buffer += data
+            while self._buffer and not self.paused:
+                if self.line_mode:
+                    if not self._headerBlockReceived():
+                        return
+                else:
+                    data = self._buffer
+                    self._buffer = b''
+                    self.rawDataReceived(data)
+                if self.transport and self.transport.disconnecting:
+                    return
+        finally:
+            self._busyReceiving = False
+
+
+    def _badRequest(self):
+        """
+        Respond with I{Bad Request} and close the connection.
+        """
+        self.transport.write(b"HTTP/1.1 400 Bad Request\r\n\r\n")
+        self.transport.loseConnection()
+
+
+    def _headerBlockReceived(self):
+        """
+        Handle the request line and headers at the start of the buffer.
+
+        @return: C{True} if a request line and headers were handled and
+            removed from the buffer, C{False} if more data is needed or the
+            connection is being closed.
+        """
+        if not self.persistent:
+            # Drop any data which the client (illegally) sent after the last
+            # request.
+            self._buffer = b''
+            self.dataReceived = lambda data: None
+            return False
+
+        buf = self._buffer
+        if self._emptyLineAllowed and buf.startswith(b'\r\n'):
+            self._emptyLineAllowed = False
+            buf = self._buffer = buf[2:]
+
+        if buf.startswith(b'\r\n'):
+            # An empty request line.
+            self._badRequest()
+            return False
+
+        end = buf.find(b'\r\n\r\n')
+        if end == -1:
+            # Check what can be checked before the end of the headers; in
+            # particular, HTTP/0.9 requests have no headers at all.
+            last = buf.rfind(b'\r\n')
+            if len(buf) - last - 2 > self.MAX_LENGTH:
+                self._buffer = b''
+                self.lineLengthExceeded(buf)
+            elif last != -1 and (
+                    len(buf[:buf.find(b'\r\n')].split()) != 3 or
+                    buf.count(b'\r\n') > self.maxHeaders + 1):
+                self._badRequest()
+            return False
+        self._buffer = buf[end + 4:]
+        lines = buf[:end].split(b'\r\n')
+        for line in lines:
+            if len(line) > self.MAX_LENGTH:
+                self.lineLengthExceeded(buf)
+                return False
+
+        request = self.requestFactory(self, len(self.requests))
+        self.requests.append(request)
+        parts = lines[0].split()
+        if len(parts) != 3:
+            self._badRequest()
+            return False
+        self._command, self._path, self._version = parts
+
+        # Join continuation lines to the header they continue.
+        headerLines = []
+        for line in lines[1:]:
+            if headerLines and line[:1] in (b' ', b'\t'):
+                headerLines[-1] += b'\n' + line
+            else:
+                headerLines.append(line)
+        if len(headerLines) > self.maxHeaders:
+            self._badRequest()
+            return False
+
+        headers = {}
+        for line in headerLines:
+            try:
+                header, data = line.split(b':', 1)
+            except ValueError:
+                self._badRequest()
+                return False
+            header = header.lower()
+            data = data.strip()
+            if not self._checkBodyHeader(header, data):
+                return False
+            values = headers.get(header)
+            if values is None:
+                headers[header] = [data]
+            else:
+                values.append(data)
+        setRawHeaders = request.requestHeaders.setRawHeaders
+        for header, values in headers.items():
+            setRawHeaders(header, values)
+
+        self.allHeadersReceived()
+        if self.length == 0:
+            self.allContentReceived()
+        else:
+            self.setRawMode()
+        return True
+
+
+    def allContentReceived(self):
+        self._emptyLineAllowed = True
+        HTTPChannel.allContentReceived(self)
+
+
+
 class HTTPFactory(protocol.ServerFactory):
     """
     Factory for HTTP server.
@@ -17,16 +17,73 @@ and returns the result.
 
 Normally, a Proxy is used on the client end of an Internet connection, while a
 ReverseProxy is used on the server end.
+
+L{PooledReverseProxyResource} is a reverse proxy which keeps persistent
+connections to one or more proxied servers, and balances requests between
+them.
 """
 
 import urlparse
 from urllib import quote as urlquote
 
+from zope.interface import implementer
+
 from twisted.internet import reactor
-from twisted.internet.protocol import ClientFactory
-from twisted.web.resource import Resource
+from twisted.internet.defer import Deferred
+from twisted.internet.error import ConnectionDone
+from twisted.internet.protocol import ClientFactory, Protocol
+from twisted.internet.task import LoopingCall
+from twisted.python import log
+from twisted.python.constants import NamedConstant, Names
+from twisted.web.client import (
+    Agent, FileBodyProducer, HTTPConnectionPool, ResponseDone, readBody)
+from twisted.web.http_headers import Headers
+from twisted.web.iweb import IBodyProducer, UNKNOWN_LENGTH
+from twisted.web.resource import Resource, IStreamingResource
 from twisted.web.server import NOT_DONE_YET
-from twisted.web.http import HTTPClient, Request, HTTPChannel
+from twisted.web.http import HTTPClient, Request, HTTPChannel, toChunk
+from twisted.web.http import BAD_GATEWAY, SERVICE_UNAVAILABLE
+from twisted.web.http import PotentialDataLoss
+
+
+
+class _ProxyBodyForwarder(Protocol):
+    """
+    Forward a streamed request body to the proxied server as it is received,
+    reading from the client only as fast as the proxied server accepts it.
+
+    @ivar _proxyTransport: The transport connected to the proxied server.
+
+    @ivar _chunked: Whether the body is sent with the chunked transfer
+        encoding, as the original request was.
+    """
+
+    def __init__(self, proxyTransport, chunked):
+        self._proxyTransport = proxyTransport
+        self._chunked = chunked
+
+
+    def connectionMade(self):
+        self._proxyTransport.registerProducer(self.transport, True)
+
+
+    def dataReceived(self, data):
+        if self._chunked:
+            self._proxyTransport.writeSequence(toChunk(data))
+        else:
+            self._proxyTransport.write(data)
+
+
+    def connectionLost(self, reason):
+        """
+        Finish sending the body, or close the connection to the proxied server
+        if the whole body was not received.
+        """
+        self._proxyTransport.unregisterProducer()
+        if not reason.check(ConnectionDone):
+            self._proxyTransport.loseConnection()
+        elif self._chunked:
+            self._proxyTransport.write(b"0\r\n\r\n")
 
 
 
@@ -34,6 +91,9 @@ class ProxyClient(HTTPClient):
     """
     Used by ProxyClientFactory to implement a simple web proxy.
 
+    @ivar data: The body of the request to send, or C{None} to stream the
+        body of C{father} instead; see L{Request.deliverBody}.
+
     @ivar _finished: A flag which indicates whether or not the original request
         has been finished yet.
     """
@@ -56,7 +116,12 @@ class ProxyClient(HTTPClient):
         for header, value in self.headers.items():
             self.sendHeader(header, value)
         self.endHeaders()
-        self.transport.write(self.data)
+        if self.data is None:
+            chunked = self.headers.get("transfer-encoding", "").lower()
+            self.father.deliverBody(
+                _ProxyBodyForwarder(self.transport, chunked == "chunked"))
+        else:
+            self.transport.write(self.data)
 
 
     def handleStatus(self, version, code, message):
@@ -227,12 +292,14 @@ class ReverseProxy(HTTPChannel):
 
 
 
+@implementer(IStreamingResource)
 class ReverseProxyResource(Resource):
     """
     Resource that renders the results gotten from another server
 
     Put this resource in the tree to cause everything below it to be relayed
-    to a different server.
+    to a different server.  On a L{twisted.web.server.Site} which streams
+    request bodies, the body is relayed as it is received.
 
     @ivar proxyClientFactoryClass: a proxy client factory class, used to create
         new connections.
@@ -290,7 +357,11 @@ class ReverseProxyResource(Resource):
         else:
             host = "%s:%d" % (self.host, self.port)
         request.requestHeaders.setRawHeaders(b"host", [host])
-        request.content.seek(0, 0)
+        if request.content is None:
+            data = None
+        else:
+            request.content.seek(0, 0)
+            data = request.content.read()
         qs = urlparse.urlparse(request.uri)[4]
         if qs:
             rest = self.path + '?' + qs
@@ -298,6 +369,502 @@ class ReverseProxyResource(Resource):
             rest = self.path
         clientFactory = self.proxyClientFactoryClass(
             request.method, rest, request.clientproto,
-            request.getAllHeaders(), request.content.read(), request)
+            request.getAllHeaders(), data, request)
         self.reactor.connectTCP(self.host, self.port, clientFactory)
         return NOT_DONE_YET
+
+
+
+# Headers which only apply to a single connection, and are not forwarded.
+_HOP_BY_HOP_HEADERS = frozenset([
+    'connection', 'keep-alive', 'proxy-authenticate', 'proxy-authorization',
+    'proxy-connection', 'te', 'trailers', 'transfer-encoding', 'upgrade'])
+
+# Request headers the agent sets itself.
+_AGENT_HEADERS = frozenset(['host', 'content-length'])
+
+
+
+def _forwardedHeaders(headers, exclude):
+    """
+    Copy the headers to forward to the next hop.
+
+    @param headers: The L{Headers} received.
+
+    @param exclude: A C{frozenset} of lowercase names of headers not to copy,
+        in addition to the hop-by-hop headers and those named by the
+        I{Connection} header.
+
+    @return: A C{list} of C{(name, values)} tuples.
+    """
+    exclude = exclude | _HOP_BY_HOP_HEADERS
+    for value in headers.getRawHeaders('connection', []):
+        exclude = exclude | frozenset([
+            token.strip().lower() for token in value.split(',')])
+    return [(name, values) for (name, values) in headers.getAllRawHeaders()
+            if name.lower() not in exclude]
+
+
+
+class LoadBalancing(Names):
+    """
+    Ways for L{PooledReverseProxyResource} to choose the server a request is
+    proxied to.
+
+    @cvar LEAST_CONNECTIONS: The healthy server with the fewest requests in
+        progress, taking servers in turn among those with as few.
+
+    @cvar ROUND_ROBIN: Each healthy server in turn.
+    """
+    LEAST_CONNECTIONS = NamedConstant()
+    ROUND_ROBIN = NamedConstant()
+
+
+
+class ProxyUpstream(object):
+    """
+    A server proxied by L{PooledReverseProxyResource}, and statistics about
+    the requests proxied to it.
+
+    @ivar host: The host of the server.
+    @type host: C{str}
+
+    @ivar port: The port of the server.
+    @type port: C{int}
+
+    @ivar healthy: Whether requests are proxied to this server.  Set by the
+        health checks of L{PooledReverseProxyResource.startHealthChecks}.
+
+    @ivar active: The number of requests in progress.
+
+    @ivar requests: The number of requests proxied.
+
+    @ivar failures: The number of requests which got no complete response.
+
+    @ivar responses: The number of responses received.
+
+    @ivar totalLatency: The sum of the seconds between sending each request
+        and receiving the headers of its response.
+
+    @ivar maxLatency: The most seconds between sending a request and receiving
+        the headers of its response.
+
+    @ivar lastLatency: The seconds between sending the last request which got
+        a response and receiving its headers, or C{None}.
+    """
+
+    def __init__(self, host, port):
+        self.host = host
+        self.port = port
+        self.healthy = True
+        self.active = 0
+        self.requests = 0
+        self.failures = 0
+        self.responses = 0
+        self.totalLatency = 0.0
+        self.maxLatency = 0.0
+        self.lastLatency = None
+
+
+    def __repr__(self):
+        return '<ProxyUpstream %s:%d>' % (self.host, self.port)
+
+
+    def averageLatency(self):
+        """
+        @return: The average seconds between sending a request and receiving
+            the headers of its response, or C{None} if no response was
+            received yet.
+        """
+        if not self.responses:
+            return None
+        return self.totalLatency / self.responses
+
+
+    def getMetrics(self):
+        """
+        @return: A C{dict} of the statistics about this server.
+        """
+        return {
+            'healthy': self.healthy,
+            'active': self.active,
+            'requests': self.requests,
+            'failures': self.failures,
+            'responses': self.responses,
+            'averageLatency': self.averageLatency(),
+            'maxLatency': self.maxLatency,
+            'lastLatency': self.lastLatency}
+
+
+    def _requestStarted(self):
+        self.active += 1
+        self.requests += 1
+
+
+    def _responseReceived(self, latency):
+        self.responses += 1
+        self.totalLatency += latency
+        self.maxLatency = max(self.maxLatency, latency)
+        self.lastLatency = latency
+
+
+    def _requestFinished(self, failed):
+        self.active -= 1
+        if failed:
+            self.failures += 1
+
+
+
+@implementer(IBodyProducer)
+class _StreamedBodyProducer(Protocol):
+    """
+    Produce the request body streamed by L{Request.deliverBody} for a request
+    made with an agent, pausing reading from the client when the proxied
+    server does not accept more.
+
+    @ivar length: The length of the body, or L{UNKNOWN_LENGTH}.
+
+    @ivar _request: The request whose body is produced.
+
+    @ivar _consumer: The consumer the body is written to.
+
+    @ivar _finished: The L{Deferred} returned by L{startProducing}, or C{None}
+        once it has fired or the producer has been stopped.
+    """
+
+    def __init__(self, request, length):
+        self._request = request
+        self.length = length
+        self._consumer = None
+        self._finished = None
+
+
+    def startProducing(self, consumer):
+        self._consumer = consumer
+        finished = self._finished = Deferred()
+        self._request.deliverBody(self)
+        return finished
+
+
+    def dataReceived(self, data):
+        self._consumer.write(data)
+
+
+    def connectionLost(self, reason):
+        finished, self._finished = self._finished, None
+        if finished is None:
+            return
+        if reason.check(ConnectionDone):
+            finished.callback(None)
+        else:
+            finished.errback(reason)
+
+
+    def pauseProducing(self):
+        if self.transport is not None:
+            self.transport.pauseProducing()
+
+
+    def resumeProducing(self):
+        if self.transport is not None:
+            self.transport.resumeProducing()
+
+
+    def stopProducing(self):
+        self._finished = None
+        if self.transport is not None:
+            self.transport.stopProducing()
+
+
+
+class _ProxiedRequest(Protocol):
+    """
+    Proxy a request to an upstream with an agent, and stream the response
+    back, pausing reading from the upstream when the client does not accept
+    more.  This is the protocol the response body is delivered to.
+
+    @ivar _request: The L{twisted.web.server.Request} proxied.
+
+    @ivar _upstream: The L{ProxyUpstream} it is proxied to.
+
+    @ivar _clock: The L{IReactorTime} provider used to measure latency.
+
+    @ivar _started: When the request was sent.
+
+    @ivar _responseDeferred: The L{Deferred} of the request made with the
+        agent, while waiting for the response, or C{None}.
+
+    @ivar _clientDisconnected: Whether the client connection was lost before
+        the response was finished.
+    """
+    _responseDeferred = None
+    _clientDisconnected = False
+
+    def __init__(self, request, upstream, clock):
+        self._request = request
+        self._upstream = upstream
+        self._clock = clock
+
+
+    def start(self, agent, uri, headers, bodyProducer):
+        """
+        Send the request to the upstream.
+        """
+        self._upstream._requestStarted()
+        self._started = self._clock.seconds()
+        self._request.notifyFinish().addErrback(self._clientGone)
+        self._responseDeferred = agent.request(
+            self._request.method, uri, headers, bodyProducer)
+        self._responseDeferred.addCallbacks(
+            self._gotResponse, self._requestFailed)
+        self._responseDeferred.addErrback(log.err)
+
+
+    def _gotResponse(self, response):
+        self._responseDeferred = None
+        self._upstream._responseReceived(self._clock.seconds() - self._started)
+        if not self._clientDisconnected:
+            request = self._request
+            request.setResponseCode(response.code, response.phrase)
+            # The upstream is entirely in control of response headers.
+            request.defaultContentType = None
+            for name, values in _forwardedHeaders(
+                    response.headers, frozenset()):
+                request.responseHeaders.setRawHeaders(name, values)
+        response.deliverBody(self)
+
+
+    def _requestFailed(self, reason):
+        self._responseDeferred = None
+        self._upstream._requestFinished(not self._clientDisconnected)
+        if self._clientDisconnected:
+            return
+        request = self._request
+        request.setResponseCode(BAD_GATEWAY)
+        request.setHeader('content-type', 'text/html')
+        request.write("<H1>Could not connect</H1>")
+        request.finish()
+
+
+    def _clientGone(self, reason):
+        self._clientDisconnected = True
+        if self._responseDeferred is not None:
+            self._responseDeferred.cancel()
+        elif self.transport is not None:
+            self.transport.stopProducing()
+
+
+    def connectionMade(self):
+        if self._clientDisconnected:
+            self.transport.stopProducing()
+        else:
+            self._request.registerProducer(self.transport, True)
+
+
+    def dataReceived(self, data):
+        if not self._clientDisconnected:
+            self._request.write(data)
+
+
+    def connectionLost(self, reason):
+        complete = reason.check(ResponseDone, PotentialDataLoss)
+        self._upstream._requestFinished(not complete)
+        if self._clientDisconnected:
+            return
+        self._request.unregisterProducer()
+        if complete:
+            self._request.finish()
+        else:
+            # The response was cut short; so is the one to the client.
+            self._request.channel.transport.loseConnection()
+
+
+
+@implementer(IStreamingResource)
+class PooledReverseProxyResource(Resource):
+    """
+    Resource that renders the results gotten from other servers, keeping
+    persistent connections to them.
+
+    Put this resource in the tree to cause everything below it to be relayed
+    to one of the servers given.  Requests are made with an L{Agent} sharing
+    an L{HTTPConnectionPool}, and the response is relayed as it is received.
+    On a L{twisted.web.server.Site} which streams request bodies, the request
+    body is also relayed as it is received.
+
+    @ivar upstreams: The L{ProxyUpstream}s requests are proxied to.
+
+    @ivar path: The base path requests are proxied to.
+
+    @ivar balancing: The L{LoadBalancing} constant giving how the upstream a
+        request is proxied to is chosen.
+
+    @ivar healthCheckTimeout: The seconds a health check waits for a response
+        before the upstream is considered unhealthy.
+
+    @ivar reactor: the reactor used to create connections and measure latency.
+
+    @ivar _agent: The L{Agent} requests are made with.
+
+    @ivar _next: The index in C{upstreams} of the next upstream to consider.
+
+    @ivar _healthChecks: The L{LoopingCall} running health checks, or C{None}.
+    """
+    isLeaf = True
+    healthCheckTimeout = 10
+
+    def __init__(self, upstreams, path='', balancing=None, pool=None,
+                 reactor=reactor):
+        """
+        @param upstreams: The servers to proxy to, as L{ProxyUpstream}
+            instances or C{(host, port)} tuples.
+        @type upstreams: C{list}
+
+        @param path: the base path to fetch data from.  A request on B{/bar}
+            below this resource is proxied to B{/foo/bar} if C{path} is
+            B{/foo}.
+        @type path: C{str}
+
+        @param balancing: How to choose the upstream a request is proxied
+            to.  Defaults to L{LoadBalancing.LEAST_CONNECTIONS}.
+
+        @param pool: The L{HTTPConnectionPool} to use, or C{None} to create a
+            persistent one.
+        """
+        Resource.__init__(self)
+        if not upstreams:
+            raise ValueError("At least one upstream is needed.")
+        self.upstreams = [
+            u if isinstance(u, ProxyUpstream) else ProxyUpstream(*u)
+            for u in upstreams]
+        self.path = path
+        if balancing is None:
+            balancing = LoadBalancing.LEAST_CONNECTIONS
+        self.balancing = balancing
+        if pool is None:
+            pool = HTTPConnectionPool(reactor)
+        self.reactor = reactor
+        self._agent = Agent(reactor, pool=pool)
+        self._next = 0
+        self._healthChecks = None
+
+
+    def chooseUpstream(self):
+        """
+        Choose the upstream to proxy the next request to.
+
+        @return: A healthy L{ProxyUpstream}, or C{None} if there is none.
+        """
+        count = len(self.upstreams)
+        candidates = [self.upstreams[(self._next + i) % count]
+                      for i in range(count)]
+        candidates = [u for u in candidates if u.healthy]
+        if not candidates:
+            return None
+        if self.balancing is LoadBalancing.LEAST_CONNECTIONS:
+            # min keeps the first of the upstreams with as few requests.
+            chosen = min(candidates, key=lambda u: u.active)
+        else:
+            chosen = candidates[0]
+        self._next = (self.upstreams.index(chosen) + 1) % count
+        return chosen
+
+
+    def getMetrics(self):
+        """
+        @return: A C{dict} mapping C{"host:port"} to the result of
+            L{ProxyUpstream.getMetrics} for each upstream.
+        """
+        return dict([('%s:%d' % (u.host, u.port), u.getMetrics())
+                     for u in self.upstreams])
+
+
+    def startHealthChecks(self, interval, path='/'):
+        """
+        Request C{path} from every upstream every C{interval} seconds, and
+        only proxy to those which responded with a status below 500 the last
+        time.
+        """
+        self.stopHealthChecks()
+        self._healthChecks = LoopingCall(self._checkHealth, path)
+        self._healthChecks.clock = self.reactor
+        self._healthChecks.start(interval)
+
+
+    def stopHealthChecks(self):
+        """
+        Stop the health checks started by L{startHealthChecks}.
+        """
+        if self._healthChecks is not None:
+            self._healthChecks.stop()
+            self._healthChecks = None
+
+
+    def _checkHealth(self, path):
+        for upstream in self.upstreams:
+            self._checkUpstream(upstream, path)
+
+
+    def _checkUpstream(self, upstream, path):
+        """
+        Check the health of C{upstream} by requesting C{path}.
+        """
+        d = self._agent.request(
+            'GET', 'http://%s:%d%s' % (upstream.host, upstream.port, path))
+        timeout = self.reactor.callLater(self.healthCheckTimeout, d.cancel)
+
+        def cbResponse(response):
+            if timeout.active():
+                timeout.cancel()
+            upstream.healthy = response.code < 500
+            # Read the body, so that the connection can be reused.
+            return readBody(response)
+
+        def ebResponse(reason):
+            if timeout.active():
+                timeout.cancel()
+            upstream.healthy = False
+
+        d.addCallbacks(cbResponse, ebResponse)
+        d.addErrback(lambda reason: None)
+        return d
+
+
+    def _bodyProducer(self, request):
+        """
+        @return: The L{IBodyProducer} for the body of C{request}, or C{None}
+            if it has none.
+        """
+        headers = request.requestHeaders
+        if headers.hasHeader('transfer-encoding'):
+            length = UNKNOWN_LENGTH
+        elif headers.hasHeader('content-length'):
+            length = int(headers.getRawHeaders('content-length')[0])
+        else:
+            return None
+        if request.content is None:
+            return _StreamedBodyProducer(request, length)
+        request.content.seek(0, 0)
+        return FileBodyProducer(request.content)
+
+
+    def render(self, request):
+        """
+        Render a request by forwarding it to one of the proxied servers.
+        """
+        upstream = self.chooseUpstream()
+        if upstream is None:
+            request.setResponseCode(SERVICE_UNAVAILABLE)
+            request.setHeader('content-type', 'text/html')
+            return "<H1>No server available</H1>"
+        rest = self.path + ''.join([
+            '/' + urlquote(segment, safe='') for segment in request.postpath])
+        qs = urlparse.urlparse(request.uri)[4]
+        if qs:
+            rest = rest + '?' + qs
+        uri = 'http://%s:%d%s' % (upstream.host, upstream.port, rest)
+        headers = Headers(dict(
+            _forwardedHeaders(request.requestHeaders, _AGENT_HEADERS)))
+        proxied = _ProxiedRequest(request, upstream, self.reactor)
+        proxied.start(self._agent, uri, headers, self._bodyProducer(request))
+        return NOT_DONE_YET
@@ -9,7 +9,7 @@ Implementation of the lowest-level Resource class.
 from __future__ import division, absolute_import
 
 __all__ = [
-    'IResource', 'getChildForRequest',
+    'IResource', 'IStreamingResource', 'getChildForRequest',
     'Resource', 'ErrorPage', 'NoResource', 'ForbiddenResource',
     'EncodingResourceWrapper']
 
@@ -88,6 +88,18 @@ class IResource(Interface):
 
 
 
+class IStreamingResource(IResource):
+    """
+    A resource which reads request bodies as they are received.
+
+    On a L{twisted.web.server.Site} with C{streamRequestBodies} set, such a
+    resource is rendered as soon as the request headers are received.  The
+    request's C{content} is C{None}, and the body is read by passing a
+    protocol to C{request.deliverBody}.
+    """
+
+
+
 def getChildForRequest(resource, request):
     """
     Traverse resource tree to find who will handle the request.
@@ -110,6 +110,7 @@ class Request(Copyable, http.Request, components.Componentized):
     __pychecker__ = 'unusednames=issuer'
     _inFakeHead = False
     _encoder = None
+    _resource = None
 
     def __init__(self, *args, **kw):
         http.Request.__init__(self, *args, **kw)
@@ -164,11 +165,13 @@ class Request(Copyable, http.Request, components.Componentized):
                 return name
 
 
-    def process(self):
-        """
-        Process a request.
+    def _findResource(self):
         """
+        Set the default response headers and find the resource to render
+        this request.
 
+        @return: The L{IResource} provider to render.
+        """
         # get site from channel
         self.site = self.channel.site
 
@@ -180,12 +183,62 @@ class Request(Copyable, http.Request, components.Componentized):
         self.prepath = []
         self.postpath = list(map(unquote, self.path[1:].split(b'/')))
 
+        resrc = self.site.getResourceFor(self)
+        if resource._IEncodingResource.providedBy(resrc):
+            encoder = resrc.getEncoder(self)
+            if encoder is not None:
+                self._encoder = encoder
+        return resrc
+
+
+    def headersReceived(self, command, path, version):
+        """
+        Called by channel when the request line and headers have been
+        received.
+
+        If the site streams request bodies, find the resource for this
+        request now, and stream the body to it if it provides
+        L{resource.IStreamingResource}.
+        """
+        http.Request.headersReceived(self, command, path, version)
+        site = getattr(self.channel, 'site', None)
+        if not getattr(site, 'streamRequestBodies', False):
+            return
         try:
-            resrc = self.site.getResourceFor(self)
-            if resource._IEncodingResource.providedBy(resrc):
-                encoder = resrc.getEncoder(self)
-                if encoder is not None:
-                    self._encoder = encoder
+            resrc = self._findResource()
+        except:
+            # process finds the resource again, and reports the error.
+            return
+        self._resource = resrc
+        if resource.IStreamingResource.providedBy(resrc):
+            self._startStreaming()
+
+
+    def gotLength(self, length):
+        """
+        Called when HTTP channel got length of content in this request.
+
+        A resource which the body is streamed to is rendered at once.
+        """
+        http.Request.gotLength(self, length)
+        if self._bodyStream is not None:
+            try:
+                self.render(self._resource)
+            except:
+                self.processingFailed(failure.Failure())
+
+
+    def process(self):
+        """
+        Process a request.
+        """
+        try:
+            resrc = self._resource
+            if resrc is None:
+                resrc = self._findResource()
+            else:
+                # The resource was found before the body was received.
+                self.setHeader(b'date', http.datetimeToString())
             self.render(resrc)
         except:
             self.processingFailed(failure.Failure())
@@ -610,10 +663,17 @@ class Site(http.HTTPFactory):
         rendered pages. Default to C{True}.
     @ivar sessionFactory: factory for sessions objects. Default to L{Session}.
     @ivar sessionCheckTime: Deprecated.  See L{Session.sessionTimeout} instead.
+    @ivar streamRequestBodies: if set, resources are looked up as soon as the
+        request headers are received, before the body, so arguments from a
+        form in the body are not available to C{getChild}.  The body is then
+        streamed to resources providing L{resource.IStreamingResource}
+        instead of being buffered in C{request.content}.  Default to
+        C{False}.
     """
     counter = 0
     requestFactory = Request
     displayTracebacks = True
+    streamRequestBodies = False
     sessionFactory = Session
     sessionCheckTime = 1800
 
@@ -14,6 +14,10 @@ import itertools
 import cgi
 import time
 import mimetypes
+import zlib
+from collections import OrderedDict
+from stat import S_ISREG
+from StringIO import StringIO
 
 from zope.interface import implements
 
@@ -24,6 +28,7 @@ from twisted.web.util import redirectTo
 
 from twisted.python import components, filepath, log
 from twisted.internet import abstract, interfaces
+from twisted.protocols import basic
 from twisted.persisted import styles
 from twisted.python.util import InsensitiveDict
 from twisted.python.runtime import platformType
@@ -166,6 +171,9 @@ class File(resource.Resource, styles.Versioned, filepath.FilePath):
     return the contents of /tmp/foo/bar.html .
 
     @cvar childNotFound: L{Resource} used to render 404 Not Found error pages.
+
+    @ivar cache: The L{FileCache} to serve small files from, shared with the
+        L{File}s created for children, or C{None} to always read files.
     """
 
     contentTypes = loadMimeTypes()
@@ -180,6 +188,8 @@ class File(resource.Resource, styles.Versioned, filepath.FilePath):
     indexNames = ["index", "index.html", "index.htm", "index.rpy"]
 
     type = None
+    encoding = None
+    cache = None
 
     ### Versioning
 
@@ -594,6 +604,11 @@ class File(resource.Resource, styles.Versioned, filepath.FilePath):
         Begin sending the contents of this L{File} (or a subset of the
         contents, based on the 'range' header) to the given request.
         """
+        if self.cache is not None:
+            entry = self.cache.lookup(self)
+            if entry is not None:
+                return self._renderCached(request, entry)
+
         self.restat(False)
 
         if self.type is None:
@@ -634,6 +649,44 @@ class File(resource.Resource, styles.Versioned, filepath.FilePath):
     render_HEAD = render_GET
 
 
+    def _renderCached(self, request, entry):
+        """
+        Respond to C{request} with the contents of this file held by
+        C{self.cache}.
+
+        @type entry: L{_CachedFile}
+        """
+        request.setHeader('accept-ranges', 'bytes')
+        if request.setLastModified(entry.stat.st_mtime) is http.CACHED:
+            return ''
+
+        if request.getHeader('range') is not None:
+            # Let the usual producers deal with the range, reading from
+            # memory.
+            self.statinfo = entry.stat
+            self.type, self.encoding = entry.type, entry.encoding
+            producer = self.makeProducer(request, StringIO(entry.data))
+            if request.method == 'HEAD':
+                return ''
+            producer.start()
+            return server.NOT_DONE_YET
+
+        data, headers, etag = entry.data, entry.headers, entry.etag
+        if entry.gzipData is not None:
+            accepted = (request.getHeader('accept-encoding') or '').split(',')
+            if 'gzip' in [encoding.split(';')[0].strip()
+                          for encoding in accepted]:
+                data, headers = entry.gzipData, entry.gzipHeaders
+                etag = etag[:-1] + '-gzip"'
+        for name, value in headers:
+            request.setHeader(name, value)
+        if request.setETag(etag) is http.CACHED:
+            return ''
+        if request.method == 'HEAD':
+            return ''
+        return data
+
+
     def redirect(self, request):
         return redirectTo(addSlash(request), request)
 
@@ -655,10 +708,272 @@ class File(resource.Resource, styles.Versioned, filepath.FilePath):
         f.processors = self.processors
         f.indexNames = self.indexNames[:]
         f.childNotFound = self.childNotFound
+        f.cache = self.cache
         return f
 
 
 
+class _CachedFile(object):
+    """
+    The contents of a file held by a L{FileCache}, with everything else needed
+    to serve them.
+
+    @ivar stat: The result of C{os.stat} for the file when it was read.
+    @ivar type: The I{Content-Type} of the file.
+    @ivar encoding: The I{Content-Encoding} of the file, or C{None}.
+    @ivar etag: The entity tag of the file.
+    @ivar data: The contents of the file.
+    @ivar headers: A C{list} of C{(name, value)} tuples giving the headers to
+        serve C{data} with.
+    @ivar gzipData: The contents of the file compressed with gzip, or C{None}
+        if they are not kept.
+    @ivar gzipHeaders: A C{list} of C{(name, value)} tuples giving the headers
+        to serve C{gzipData} with.
+    @ivar checked: The time at which the file was last known to be unchanged.
+    """
+    gzipData = None
+    gzipHeaders = None
+
+    def __init__(self, stat, type, encoding, data, checked):
+        self.stat = stat
+        self.type = type
+        self.encoding = encoding
+        self.data = data
+        self.checked = checked
+        self.etag = '"%x-%x-%x"' % (stat.st_ino, stat.st_size,
+                                     int(stat.st_mtime))
+        self.headers = [('content-type', type),
+                        ('content-length', str(len(data)))]
+        if encoding:
+            self.headers.append(('content-encoding', encoding))
+
+
+    def size(self):
+        """
+        Return the number of bytes of file data held by this entry.
+        """
+        return len(self.data) + len(self.gzipData or '')
+
+
+
+class FileCache(object):
+    """
+    An in-memory cache of small, frequently requested files, for L{File}.
+
+    Set a L{FileCache} as the C{cache} attribute of a L{File}; the L{File}s
+    created for its children share it.  A file found in the cache is served
+    without being stat'ed, opened or read, and with the headers which were
+    worked out when it was loaded.  Its response also carries an I{ETag} which
+    conditional requests can refer to.  The least recently used files are
+    evicted when there are more than C{maxEntries} of them or more than
+    C{maxSize} bytes of them.
+
+    A cached file is stat'ed again once at least C{checkInterval} seconds have
+    passed since it was last found unchanged, and is loaded again if its size,
+    modification time or inode have changed.  If a C{notifier} is given
+    instead, cached files are watched with it and dropped from the cache as
+    soon as they change, and are never stat'ed again while cached.
+
+    @ivar hits: The number of requests served from the cache.
+    @type hits: C{int}
+
+    @ivar misses: The number of requests for files which were not in the
+        cache or had changed.
+    @type misses: C{int}
+
+    @ivar compressibleTypes: The types, besides the I{text/} ones, of the files
+        of which a gzip-compressed copy is kept if C{compress} is true.
+
+    @ivar _entries: A L{OrderedDict} mapping the paths of cached files to
+        their L{_CachedFile}s, least recently used first.
+
+    @ivar _size: The number of bytes held by the entries in C{_entries}.
+    """
+
+    compressibleTypes = frozenset([
+            'application/javascript', 'application/x-javascript',
+            'application/json', 'application/xml', 'application/xhtml+xml',
+            'image/svg+xml'])
+
+    def __init__(self, maxEntries=1024, maxFileSize=2 ** 16,
+                 maxSize=2 ** 26, checkInterval=1.0, compress=False,
+                 notifier=None, reactor=None):
+        """
+        @param maxEntries: The largest number of files to cache.
+        @type maxEntries: C{int}
+
+        @param maxFileSize: The size, in bytes, of the largest file to cache.
+        @type maxFileSize: C{int}
+
+        @param maxSize: The largest number of bytes to keep in the cache,
+            counting the compressed copies of files.
+        @type maxSize: C{int}
+
+        @param checkInterval: The number of seconds for which a cached file is
+            served without checking whether it has changed.
+        @type checkInterval: C{float}
+
+        @param compress: If true, keep a gzip-compressed copy of the text files
+            in the cache, and serve it to clients which accept gzip.
+        @type compress: C{bool}
+
+        @param notifier: A started L{twisted.internet.inotify.INotify} to watch
+            cached files with, or C{None} to check them with C{os.stat}.
+
+        @param reactor: An L{IReactorTime} provider used to tell when files
+            need to be checked.  Defaults to the global reactor.
+        """
+        if reactor is None:
+            from twisted.internet import reactor
+        self.maxEntries = maxEntries
+        self.maxFileSize = maxFileSize
+        self.maxSize = maxSize
+        self.checkInterval = checkInterval
+        self.compress = compress
+        self._notifier = notifier
+        self._reactor = reactor
+        self._entries = OrderedDict()
+        self._size = 0
+        self.hits = 0
+        self.misses = 0
+
+
+    def lookup(self, fileResource):
+        """
+        Get the cache entry for the file of a L{File}, loading it into the
+        cache if it is not there yet and is small enough.
+
+        @type fileResource: L{File}
+
+        @return: A L{_CachedFile}, or C{None} if the file cannot be served
+            from the cache.
+        """
+        path = fileResource.path
+        now = self._reactor.seconds()
+        entry = self._entries.pop(path, None)
+        if entry is not None and not self._isFresh(path, entry, now):
+            self._discard(path, entry)
+            entry = None
+        if entry is not None:
+            self._entries[path] = entry
+            self.hits += 1
+            return entry
+
+        self.misses += 1
+        entry = self._load(fileResource, now)
+        if entry is not None:
+            self._add(path, entry)
+        return entry
+
+
+    def invalidate(self, path):
+        """
+        Drop the file at C{path} from the cache, if it is there.
+
+        @type path: C{str}
+        """
+        entry = self._entries.pop(path, None)
+        if entry is not None:
+            self._discard(path, entry)
+
+
+    def _isFresh(self, path, entry, now):
+        """
+        Determine whether the file of C{entry} is known not to have changed
+        since it was loaded, stat'ing it if it has not been checked recently.
+        """
+        if self._notifier is not None:
+            return True
+        if now - entry.checked < self.checkInterval:
+            return True
+        try:
+            st = os.stat(path)
+        except OSError:
+            return False
+        old = entry.stat
+        if (st.st_mtime, st.st_size, st.st_ino) != (
+                old.st_mtime, old.st_size, old.st_ino):
+            return False
+        entry.checked = now
+        return True
+
+
+    def _load(self, fileResource, now):
+        """
+        Read the file of C{fileResource}, if it is a regular file no larger
+        than C{maxFileSize}, into a new L{_CachedFile}.
+        """
+        path = fileResource.path
+        try:
+            st = os.stat(path)
+            if not S_ISREG(st.st_mode) or st.st_size > self.maxFileSize:
+                return None
+            with open(path, 'rb') as f:
+                data = f.read(self.maxFileSize + 1)
+        except EnvironmentError:
+            return None
+        if len(data) != st.st_size:
+            # It changed while it was being read.
+            return None
+
+        type, encoding = fileResource.type, fileResource.encoding
+        if type is None:
+            type, encoding = getTypeAndEncoding(
+                fileResource.basename(), fileResource.contentTypes,
+                fileResource.contentEncodings, fileResource.defaultType)
+        entry = _CachedFile(st, type, encoding, data, now)
+        if self.compress and encoding is None and (
+                type.startswith('text/') or type in self.compressibleTypes):
+            compressor = zlib.compressobj(9, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+            gzipData = compressor.compress(data) + compressor.flush()
+            if len(gzipData) < len(data):
+                entry.gzipData = gzipData
+                entry.gzipHeaders = [
+                    ('content-type', type),
+                    ('content-length', str(len(gzipData))),
+                    ('content-encoding', 'gzip'),
+                    ('vary', 'accept-encoding')]
+                entry.headers.append(('vary', 'accept-encoding'))
+        return entry
+
+
+    def _add(self, path, entry):
+        """
+        Add C{entry} to the cache, and evict the least recently used entries
+        until the cache is within its limits again.
+        """
+        self._entries[path] = entry
+        self._size += entry.size()
+        if self._notifier is not None:
+            from twisted.internet import inotify
+            self._notifier.watch(
+                filepath.FilePath(path),
+                mask=(inotify.IN_MODIFY | inotify.IN_ATTRIB |
+                      inotify.IN_DELETE_SELF | inotify.IN_MOVE_SELF),
+                callbacks=[self._changed])
+        while self._entries and (len(self._entries) > self.maxEntries or
+                                 self._size > self.maxSize):
+            oldPath, oldEntry = self._entries.popitem(last=False)
+            self._discard(oldPath, oldEntry)
+
+
+    def _discard(self, path, entry):
+        """
+        Forget about C{entry}, which has been removed from C{_entries}.
+        """
+        self._size -= entry.size()
+        if self._notifier is not None:
+            self._notifier.ignore(filepath.FilePath(path))
+
+
+    def _changed(self, ignored, path, mask):
+        """
+        Drop a file from the cache when the notifier reports a change to it.
+        """
+        self.invalidate(path.path)
+
+
+
 class StaticProducer(object):
     """
     Superclass for classes that implement the business of producing.
@@ -700,6 +1015,73 @@ class StaticProducer(object):
         self.request = None
 
 
+    def _startSendfile(self, parts):
+        """
+        Write the response with L{basic.SendfileProducer}s instead of reading
+        the file, if the request's transport supports it.
+
+        @param parts: A list of tuples C{[(prefix, offset, size)]}, in the
+            format of the C{rangeInfo} of L{MultipleRangeStaticProducer},
+            except that C{size} may be C{None} to send everything from
+            C{offset} up to the end of the file.
+
+        @return: C{True} if the response is being written, or C{False} if the
+            file must be read instead.
+        """
+        transport = getattr(self.request, 'transport', None)
+        if not basic.canSendfile(self.fileObject, transport):
+            return False
+        # Write the headers now, so they are sent before the file.  If they
+        # make the response chunked, the body has to be written through the
+        # request after all.
+        self.request.write('')
+        if self.request.chunked:
+            return False
+        self._parts = iter(parts)
+        self._sendNextPart()
+        return True
+
+
+    def _sendNextPart(self):
+        """
+        Write the prefix of the next part of the response and start sending
+        its data, or finish the request if there are no more parts.
+        """
+        for prefix, offset, size in self._parts:
+            if prefix:
+                self.request.write(prefix)
+            if size != 0:
+                producer = basic.SendfileProducer(
+                    self.fileObject, self.request.transport, offset, size)
+                d = producer.beginFileTransfer(self.request)
+                d.addCallbacks(self._partSent, self._sendfileFailed)
+                return
+        self.request.finish()
+        self.stopProducing()
+
+
+    def _partSent(self, sent):
+        """
+        Account for the bytes of a part sent by a L{basic.SendfileProducer}
+        and go on to the next one.
+        """
+        self.request.sentLength += sent
+        self._sendNextPart()
+
+
+    def _sendfileFailed(self, reason):
+        """
+        Give up on the response after a L{basic.SendfileProducer} failed or
+        was stopped because the connection was lost.
+        """
+        if self.request is None:
+            return
+        if reason.check(EnvironmentError):
+            log.err(reason, "Sending %r failed" % (self.fileObject,))
+            self.request.transport.loseConnection()
+        self.stopProducing()
+
+
 
 class NoRangeStaticProducer(StaticProducer):
     """
@@ -707,6 +1089,8 @@ class NoRangeStaticProducer(StaticProducer):
     """
 
     def start(self):
+        if self._startSendfile([('', 0, None)]):
+            return
         self.request.registerProducer(self, False)
 
 
@@ -745,8 +1129,10 @@ class SingleRangeStaticProducer(StaticProducer):
 
 
     def start(self):
-        self.fileObject.seek(self.offset)
         self.bytesWritten = 0
+        if self._startSendfile([('', self.offset, self.size)]):
+            return
+        self.fileObject.seek(self.offset)
         self.request.registerProducer(self, 0)
 
 
@@ -789,6 +1175,8 @@ class MultipleRangeStaticProducer(StaticProducer):
 
 
     def start(self):
+        if self._startSendfile(self.rangeInfo):
+            return
         self.rangeIter = iter(self.rangeInfo)
         self._nextRange()
         self.request.registerProducer(self, 0)
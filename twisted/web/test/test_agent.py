@@ -668,6 +668,278 @@ class HTTPConnectionPoolTests(TestCase, FakeReactorAndConnectMixin):
                          CancelledError)
 
 
+    def test_metrics(self):
+        """
+        L{HTTPConnectionPool} counts the connections retrieved from the cache
+        as C{hits}, the new connections as C{misses}, and the cached
+        connections closed because of C{maxPersistentPerHost} or
+        C{cachedConnectionTimeout} as C{evictions}.
+        """
+        key = ("http", "example.com", 80)
+        self.assertEqual(
+            (self.pool.hits, self.pool.misses, self.pool.evictions), (0, 0, 0))
+        first = self.successResultOf(
+            self.pool.getConnection(key, DummyEndpoint()))
+        self.assertEqual((self.pool.hits, self.pool.misses), (0, 1))
+
+        self.pool._putConnection(key, first)
+        self.assertIdentical(
+            self.successResultOf(self.pool.getConnection(key, BadEndpoint())),
+            first)
+        self.assertEqual((self.pool.hits, self.pool.misses), (1, 1))
+
+        for i in range(3):
+            protocol = StubHTTPProtocol()
+            protocol.makeConnection(StringTransport())
+            self.pool._putConnection(key, protocol)
+        self.assertEqual(self.pool.evictions, 1)
+        self.fakeReactor.advance(self.pool.cachedConnectionTimeout)
+        self.assertEqual(self.pool.evictions, 3)
+        self.assertEqual(self.pool.waits, 0)
+
+
+
+class LostCallbackProtocol(StubHTTPProtocol):
+    """
+    A L{StubHTTPProtocol} which calls C{lostCallback} when its connection is
+    lost, like L{HTTP11ClientProtocol}.
+    """
+    def __init__(self, lostCallback):
+        StubHTTPProtocol.__init__(self)
+        self.lostCallback = lostCallback
+
+
+    def connectionLost(self, reason):
+        self.state = 'CONNECTION_LOST'
+        self.lostCallback(self)
+
+
+
+class LostCallbackFactory(Factory):
+    """
+    Create L{LostCallbackProtocol} instances.
+    """
+    def __init__(self, quiescentCallback, lostCallback):
+        self.lostCallback = lostCallback
+
+
+    def buildProtocol(self, addr):
+        return LostCallbackProtocol(self.lostCallback)
+
+
+
+class BoundedHTTPConnectionPoolTests(TestCase, FakeReactorAndConnectMixin):
+    """
+    Tests for L{HTTPConnectionPool} with C{maxActivePerHost} set.
+    """
+    key = ("http", "example.com", 80)
+
+    def setUp(self):
+        self.fakeReactor = self.Reactor()
+        self.pool = HTTPConnectionPool(self.fakeReactor)
+        self.pool._factory = LostCallbackFactory
+        self.pool.retryAutomatically = False
+        self.pool.maxActivePerHost = 2
+
+
+    def getConnection(self, endpoint=None):
+        """
+        Call L{HTTPConnectionPool.getConnection} for C{self.key}.
+        """
+        if endpoint is None:
+            endpoint = DummyEndpoint()
+        return self.pool.getConnection(self.key, endpoint)
+
+
+    def test_waitForConnection(self):
+        """
+        Once C{maxActivePerHost} connections are in use,
+        L{HTTPConnectionPool.getConnection} waits for one of them to be
+        returned to the pool, and then reuses it, from a later reactor
+        iteration so that the connection is done with its last response.
+        """
+        first = self.successResultOf(self.getConnection())
+        self.successResultOf(self.getConnection())
+        waiting = self.getConnection(BadEndpoint())
+        self.assertNoResult(waiting)
+        self.assertEqual(self.pool.waits, 1)
+
+        self.pool._putConnection(self.key, first)
+        self.assertNoResult(waiting)
+        self.fakeReactor.advance(0)
+        self.assertIdentical(self.successResultOf(waiting), first)
+        self.assertEqual((self.pool.hits, self.pool.misses), (1, 2))
+        self.assertEqual(self.pool._active, {self.key: 2})
+        self.assertEqual(self.pool._waiting, {})
+
+
+    def test_limitPerKey(self):
+        """
+        C{maxActivePerHost} is enforced separately for each key.
+        """
+        self.successResultOf(self.getConnection())
+        self.successResultOf(self.getConnection())
+        self.successResultOf(
+            self.pool.getConnection(("http", "example.org", 80),
+                                    DummyEndpoint()))
+        self.assertEqual(self.pool.waits, 0)
+
+
+    def test_connectionLostReleases(self):
+        """
+        When a connection in use is lost, a call waiting in line gets a new
+        connection.
+        """
+        first = self.successResultOf(self.getConnection())
+        self.successResultOf(self.getConnection())
+        waiting = self.getConnection()
+        first.connectionLost(Failure(ConnectionDone()))
+        second = self.successResultOf(waiting)
+        self.assertNotIdentical(second, first)
+        self.assertEqual(self.pool.misses, 3)
+        self.assertEqual(self.pool._active, {self.key: 2})
+
+
+    def test_connectFailedReleases(self):
+        """
+        When a new connection cannot be made, it no longer counts against
+        C{maxActivePerHost}.
+        """
+        class FailingEndpoint(object):
+            def connect(self, factory):
+                return defer.fail(ConnectionRefusedError())
+
+        self.failureResultOf(self.getConnection(FailingEndpoint()),
+                             ConnectionRefusedError)
+        self.assertEqual(self.pool._active, {})
+
+
+    def test_firstComeFirstServed(self):
+        """
+        Calls waiting in line get connections in the order they were made.
+        """
+        connections = [self.successResultOf(self.getConnection())
+                       for i in range(2)]
+        first = self.getConnection()
+        second = self.getConnection()
+        self.pool._putConnection(self.key, connections[1])
+        self.fakeReactor.advance(0)
+        self.assertIdentical(self.successResultOf(first), connections[1])
+        self.assertNoResult(second)
+        self.pool._putConnection(self.key, connections[0])
+        self.fakeReactor.advance(0)
+        self.assertIdentical(self.successResultOf(second), connections[0])
+
+
+    def test_reuseMostRecent(self):
+        """
+        The connection most recently returned to the pool is reused first.
+        """
+        connections = [self.successResultOf(self.getConnection())
+                       for i in range(2)]
+        for connection in connections:
+            self.pool._putConnection(self.key, connection)
+        self.fakeReactor.advance(0)
+        self.assertIdentical(
+            self.successResultOf(self.getConnection(BadEndpoint())),
+            connections[1])
+
+
+    def test_waitTimeout(self):
+        """
+        A call which waited in line for C{waitTimeout} seconds fails with
+        L{defer.TimeoutError}.
+        """
+        self.pool.waitTimeout = 10
+        connection = self.successResultOf(self.getConnection())
+        self.successResultOf(self.getConnection())
+        waiting = self.getConnection()
+        self.fakeReactor.advance(9)
+        self.assertNoResult(waiting)
+        self.fakeReactor.advance(1)
+        self.failureResultOf(waiting, defer.TimeoutError)
+        self.assertEqual(self.pool._waiting, {})
+
+        self.pool._putConnection(self.key, connection)
+        self.fakeReactor.advance(0)
+        self.assertEqual(self.pool._active, {self.key: 1})
+
+
+    def test_cancelWaiting(self):
+        """
+        Cancelling a call waiting in line removes it from the line and
+        cancels its timeout.
+        """
+        self.pool.waitTimeout = 10
+        self.successResultOf(self.getConnection())
+        self.successResultOf(self.getConnection())
+        waiting = self.getConnection()
+        waiting.cancel()
+        self.failureResultOf(waiting, CancelledError)
+        self.assertEqual(self.pool._waiting, {})
+        self.assertEqual(self.fakeReactor.getDelayedCalls(), [])
+
+
+    def test_cancelAfterWaiting(self):
+        """
+        Cancelling a call which waited in line and is now making a new
+        connection cancels the connection attempt, which no longer counts
+        against C{maxActivePerHost}.
+        """
+        self.pool.maxActivePerHost = 1
+        attempts = []
+        cancelled = []
+        class PendingEndpoint(object):
+            def connect(self, factory):
+                attempts.append(Deferred(cancelled.append))
+                return attempts[-1]
+
+        first = self.getConnection(PendingEndpoint())
+        second = self.getConnection(PendingEndpoint())
+        self.assertEqual(len(attempts), 1)
+        attempts[0].errback(ConnectionRefusedError())
+        self.failureResultOf(first, ConnectionRefusedError)
+        self.assertEqual(len(attempts), 2)
+
+        second.cancel()
+        self.assertEqual(cancelled, [attempts[1]])
+        self.failureResultOf(second, CancelledError)
+        self.assertEqual(self.pool._active, {})
+        self.assertEqual(self.pool._waiting, {})
+
+
+    def test_reuseAfterResponse(self):
+        """
+        A call which waited in line gets an L{HTTP11ClientProtocol} once it
+        has finished handling the response which made it quiescent, so that
+        a request made as soon as the connection is handed over succeeds.
+        """
+        self.pool._factory = _HTTP11ClientFactory
+        self.pool.maxActivePerHost = 1
+        response = (
+            "HTTP/1.1 200 OK\r\n"
+            "Content-Length: 0\r\n"
+            "\r\n")
+        def request(protocol):
+            return protocol.request(
+                Request('GET', '/', Headers({'host': ['example.com']}), None,
+                        persistent=True))
+
+        protocol = self.successResultOf(self.getConnection())
+        firstResponse = request(protocol)
+        secondResponse = self.getConnection(BadEndpoint())
+        secondResponse.addCallback(request)
+
+        protocol.dataReceived(response)
+        self.assertEqual(self.successResultOf(firstResponse).code, 200)
+        self.assertNoResult(secondResponse)
+        self.fakeReactor.advance(0)
+        self.assertNoResult(secondResponse)
+        protocol.dataReceived(response)
+        self.assertEqual(self.successResultOf(secondResponse).code, 200)
+        self.assertEqual(self.pool.hits, 1)
+
+
 
 class AgentTestsMixin(object):
     """
@@ -16,13 +16,16 @@ except ImportError:
 
 from twisted.python.compat import _PY3, iterbytes, networkString, unicode, intToBytes
 from twisted.python.failure import Failure
+from twisted.python import util
 from twisted.trial import unittest
 from twisted.trial.unittest import TestCase
 from twisted.web import http, http_headers
 from twisted.web.http import PotentialDataLoss, _DataLoss
 from twisted.web.http import _IdentityTransferDecoder
 from twisted.internet.task import Clock
-from twisted.internet.error import ConnectionLost
+from twisted.internet.error import ConnectionDone, ConnectionLost
+from twisted.internet.interfaces import IPushProducer
+from twisted.internet.protocol import Protocol
 from twisted.protocols import loopback
 from twisted.test.proto_helpers import StringTransport
 from twisted.test.test_internet import DummyProducer
@@ -41,6 +44,54 @@ class DateTimeTest(unittest.TestCase):
             self.assertEqual(time, time2)
 
 
+    def _fakeTime(self, now):
+        """
+        Make L{http} see C{now} as the current time, with fresh caches of the
+        current time's strings.
+        """
+        gmtime = http.time.gmtime
+        class FakeTime(object):
+            def time(self):
+                return now[0]
+        fakeTime = FakeTime()
+        fakeTime.gmtime = gmtime
+        self.patch(http, "time", fakeTime)
+        self.patch(http, "_currentDateTime", util._SecondCache())
+        self.patch(http, "_currentLogDateTime", util._SecondCache())
+
+
+    def test_currentDateTimeCached(self):
+        """
+        L{http.datetimeToString} without an argument formats the current time
+        and returns the same string until the second changes.
+        """
+        now = [1000000000.25]
+        self._fakeTime(now)
+        first = http.datetimeToString()
+        self.assertEqual(first, http.datetimeToString(1000000000))
+        now[0] = 1000000000.75
+        self.assertIdentical(http.datetimeToString(), first)
+        now[0] = 1000000001.0
+        self.assertEqual(http.datetimeToString(),
+                         http.datetimeToString(1000000001))
+
+
+    def test_currentLogDateTimeCached(self):
+        """
+        L{http.datetimeToLogString} without an argument formats the current
+        time and returns the same string until the second changes.
+        """
+        now = [1000000000.25]
+        self._fakeTime(now)
+        first = http.datetimeToLogString()
+        self.assertEqual(first, http.datetimeToLogString(1000000000))
+        now[0] = 1000000000.75
+        self.assertIdentical(http.datetimeToLogString(), first)
+        now[0] = 1000000001.0
+        self.assertEqual(http.datetimeToLogString(),
+                         http.datetimeToLogString(1000000001))
+
+
 class DummyHTTPHandler(http.Request):
 
     def process(self):
@@ -106,6 +157,8 @@ class ResponseTestMixin(object):
 
 
 class HTTP1_0TestCase(unittest.TestCase, ResponseTestMixin):
+    channelFactory = http.HTTPChannel
+
     requests = (
         b"GET / HTTP/1.0\r\n"
         b"\r\n"
@@ -126,7 +179,7 @@ class HTTP1_0TestCase(unittest.TestCase, ResponseTestMixin):
         Send requests over a channel and check responses match what is expected.
         """
         b = StringTransport()
-        a = http.HTTPChannel()
+        a = self.channelFactory()
         a.requestFactory = DummyHTTPHandler
         a.makeConnection(b)
         # one byte at a time, to stress it.
@@ -144,7 +197,7 @@ class HTTP1_0TestCase(unittest.TestCase, ResponseTestMixin):
         """
         clock = Clock()
         transport = StringTransport()
-        protocol = http.HTTPChannel()
+        protocol = self.channelFactory()
         protocol.timeOut = 100
         protocol.callLater = clock.callLater
         protocol.makeConnection(transport)
@@ -235,6 +288,39 @@ class HTTP0_9TestCase(HTTP1_0TestCase):
         self.assertEqual(response, expectedResponse)
 
 
+
+class BlockHTTP1_0TestCase(HTTP1_0TestCase):
+    """
+    L{HTTP1_0TestCase} for L{http.BlockHTTPChannel}.
+    """
+    channelFactory = http.BlockHTTPChannel
+
+
+
+class BlockHTTP1_1TestCase(HTTP1_1TestCase):
+    """
+    L{HTTP1_1TestCase} for L{http.BlockHTTPChannel}.
+    """
+    channelFactory = http.BlockHTTPChannel
+
+
+
+class BlockHTTP1_1_close_TestCase(HTTP1_1_close_TestCase):
+    """
+    L{HTTP1_1_close_TestCase} for L{http.BlockHTTPChannel}.
+    """
+    channelFactory = http.BlockHTTPChannel
+
+
+
+class BlockHTTP0_9TestCase(HTTP0_9TestCase):
+    """
+    L{HTTP0_9TestCase} for L{http.BlockHTTPChannel}.
+    """
+    channelFactory = http.BlockHTTPChannel
+
+
+
 class HTTPLoopbackTestCase(unittest.TestCase):
 
     expectedHeaders = {b'request': b'/foo/bar',
@@ -656,6 +742,8 @@ class ParsingTestCase(unittest.TestCase):
     """
     Tests for protocol parsing in L{HTTPChannel}.
     """
+    channelFactory = http.HTTPChannel
+
     def setUp(self):
         self.didRequest = False
 
@@ -663,7 +751,7 @@ class ParsingTestCase(unittest.TestCase):
     def runRequest(self, httpRequest, requestClass, success=1):
         httpRequest = httpRequest.replace(b"\n", b"\r\n")
         b = StringTransport()
-        a = http.HTTPChannel()
+        a = self.channelFactory()
         a.requestFactory = requestClass
         a.makeConnection(b)
         # one byte at a time, to stress it.
@@ -1020,6 +1108,152 @@ Hello,
 
 
 
+class BlockParsingTestCase(ParsingTestCase):
+    """
+    L{ParsingTestCase} for L{http.BlockHTTPChannel}, and tests for the
+    parsing done by it only.
+    """
+    channelFactory = http.BlockHTTPChannel
+
+    def deliver(self, data, requestClass):
+        """
+        Deliver C{data} in one chunk to a new L{http.BlockHTTPChannel}.
+
+        @return: The channel.
+        """
+        channel = http.BlockHTTPChannel()
+        channel.requestFactory = requestClass
+        channel.makeConnection(StringTransport())
+        channel.dataReceived(data)
+        return channel
+
+
+    def test_pipelinedBlock(self):
+        """
+        Several pipelined requests received in one chunk, with and without
+        bodies, are all processed in order.
+        """
+        processed = []
+        class MyRequest(http.Request):
+            def process(self):
+                processed.append(
+                    (self.method, self.uri, self.content.read(),
+                     self.requestHeaders.getRawHeaders(b'x-foo')))
+                self.finish()
+
+        self.deliver(
+            b"GET /a HTTP/1.1\r\nX-Foo: 1\r\nX-Foo: 2\r\n\r\n"
+            b"POST /b HTTP/1.1\r\nContent-Length: 3\r\n\r\nabc"
+            b"POST /c HTTP/1.1\r\nTransfer-Encoding: chunked\r\n\r\n"
+            b"2\r\nde\r\n0\r\n\r\n"
+            b"GET /d HTTP/1.1\r\n\r\n", MyRequest)
+        self.assertEqual(processed, [
+                (b"GET", b"/a", b"", [b"1", b"2"]),
+                (b"POST", b"/b", b"abc", None),
+                (b"POST", b"/c", b"de", None),
+                (b"GET", b"/d", b"", None)])
+
+
+    def test_headersSetOncePerName(self):
+        """
+        All the values of a header are set on the request headers at once.
+        """
+        calls = []
+        class MyRequest(http.Request):
+            def __init__(self, *args, **kwargs):
+                http.Request.__init__(self, *args, **kwargs)
+                setRawHeaders = self.requestHeaders.setRawHeaders
+                def record(name, values):
+                    calls.append((name, values))
+                    setRawHeaders(name, values)
+                self.requestHeaders.setRawHeaders = record
+
+        self.deliver(
+            b"GET / HTTP/1.0\r\nFoo: a\r\nBar: b\r\nFOO: c\r\n\r\n",
+            MyRequest)
+        self.assertEqual(sorted(calls),
+                         [(b"bar", [b"b"]), (b"foo", [b"a", b"c"])])
+
+
+    def test_continuationLines(self):
+        """
+        A header line starting with a space or a tab continues the value of
+        the previous header, as with L{http.HTTPChannel}.
+        """
+        processed = []
+        class MyRequest(http.Request):
+            def process(self):
+                processed.append(self)
+                self.finish()
+
+        self.deliver(
+            b"GET / HTTP/1.0\r\nFoo: a\r\n b\r\n\tc\r\nBar: d\r\n\r\n",
+            MyRequest)
+        [request] = processed
+        self.assertEqual(request.requestHeaders.getRawHeaders(b"foo"),
+                         [b"a\n b\n\tc"])
+        self.assertEqual(request.requestHeaders.getRawHeaders(b"bar"),
+                         [b"d"])
+
+
+    def test_headerWithoutColon(self):
+        """
+        A header line without a colon gets a I{Bad Request} response.
+        """
+        channel = self.deliver(
+            b"GET / HTTP/1.0\r\nFoo\r\n\r\n", http.Request)
+        self.assertEqual(channel.transport.value(),
+                         b"HTTP/1.1 400 Bad Request\r\n\r\n")
+        self.assertTrue(channel.transport.disconnecting)
+
+
+    def test_lineTooLong(self):
+        """
+        A request line or header line longer than C{MAX_LENGTH} closes the
+        connection, whether or not the end of the headers was received.
+        """
+        line = b"X-Long: " + b"x" * http.BlockHTTPChannel.MAX_LENGTH
+        for data in [b"GET / HTTP/1.0\r\n" + line,
+                     b"GET / HTTP/1.0\r\n" + line + b"\r\n\r\n"]:
+            channel = self.deliver(data, http.Request)
+            self.assertTrue(channel.transport.disconnecting)
+            self.assertEqual(channel.requests, [])
+
+
+    def test_tooManyHeadersIncomplete(self):
+        """
+        Too many headers get a I{Bad Request} response before the end of the
+        headers is received.
+        """
+        self.patch(http.BlockHTTPChannel, 'maxHeaders', 2)
+        channel = self.deliver(
+            b"GET / HTTP/1.0\r\nA: 1\r\nB: 2\r\nC: 3\r\nD: 4\r\n",
+            http.Request)
+        self.assertEqual(channel.transport.value(),
+                         b"HTTP/1.1 400 Bad Request\r\n\r\n")
+        self.assertTrue(channel.transport.disconnecting)
+
+
+    def test_emptyLineBeforeRequest(self):
+        """
+        One empty line before a request line is ignored, but not two.
+        """
+        processed = []
+        class MyRequest(http.Request):
+            def process(self):
+                processed.append(self)
+                self.finish()
+
+        channel = self.deliver(b"\r\nGET / HTTP/1.1\r\n\r\n", MyRequest)
+        self.assertEqual(len(processed), 1)
+        channel.dataReceived(b"\r\n\r\nGET / HTTP/1.1\r\n\r\n")
+        self.assertEqual(len(processed), 1)
+        self.assertTrue(
+            channel.transport.value().endswith(
+                b"HTTP/1.1 400 Bad Request\r\n\r\n"))
+
+
+
 class QueryArgumentsTestCase(unittest.TestCase):
     def testParseqs(self):
         self.assertEqual(
@@ -1405,6 +1639,130 @@ class RequestTests(unittest.TestCase, ResponseTestMixin):
             "Twisted 12.3. Pass only bytes instead.")
 
 
+    def test_statusLineCached(self):
+        """
+        The status line encoded for a version, code and message is reused by
+        later responses.
+        """
+        self.patch(http, "_statusLines", {})
+        lines = []
+        for i in range(2):
+            req = http.Request(DummyChannel(), False)
+            req.transport = StringTransport()
+            req.setResponseCode(404, "Gone fishing")
+            req.clientproto = b"HTTP/1.0"
+            req.write(b'')
+            lines.append(req.transport.value().split(b"\r\n")[0])
+        self.assertEqual(lines[0], b"HTTP/1.0 404 Gone fishing")
+        self.assertEqual(list(http._statusLines),
+                         [(b"HTTP/1.0", 404, "Gone fishing")])
+        self.assertIdentical(
+            http._statusLine(b"HTTP/1.0", 404, "Gone fishing"),
+            http._statusLines[(b"HTTP/1.0", 404, "Gone fishing")])
+
+
+    def test_encodingCacheLimit(self):
+        """
+        Status lines and header names are not cached past
+        C{_MAX_CACHED_ENCODINGS} entries, but are still encoded.
+        """
+        self.patch(http, "_MAX_CACHED_ENCODINGS", 1)
+        self.patch(http, "_statusLines", {})
+        self.patch(http, "_headerPrefixes", {})
+        req = http.Request(DummyChannel(), False)
+        req.transport = StringTransport()
+        req.setResponseCode(200, "Fine")
+        req.clientproto = b"HTTP/1.0"
+        http._statusLine(b"HTTP/1.0", 200, "OK")
+        req.responseHeaders.setRawHeaders(b"x-one", [b"1"])
+        req.responseHeaders.setRawHeaders(b"x-two", [b"2"])
+        req.write(b'')
+        self.assertResponseEquals(
+            req.transport.value(),
+            [(b"HTTP/1.0 200 Fine", b"X-One: 1", b"X-Two: 2", b"")])
+        self.assertEqual(len(http._statusLines), 1)
+        self.assertEqual(len(http._headerPrefixes), 1)
+
+
+    def test_headerSubclassCapitalization(self):
+        """
+        Header names of a L{http_headers.Headers} subclass are capitalized by
+        it, and not cached for other responses.
+        """
+        self.patch(http, "_headerPrefixes", {})
+        class ShoutingHeaders(http_headers.Headers):
+            def _canonicalNameCaps(self, name):
+                return name.upper()
+
+        req = http.Request(DummyChannel(), False)
+        req.transport = StringTransport()
+        req.clientproto = b"HTTP/1.0"
+        req.responseHeaders = ShoutingHeaders({b"x-foo": [b"bar"]})
+        req.write(b'')
+        self.assertResponseEquals(
+            req.transport.value(), [(b"HTTP/1.0 200 OK", b"X-FOO: bar", b"")])
+        self.assertEqual(http._headerPrefixes, {})
+
+
+    def test_frozenHeaders(self):
+        """
+        L{http.FrozenHeaders} set with L{http.Request.setFrozenHeaders} are
+        sent with the response, in place of the C{responseHeaders} with the
+        same names.
+        """
+        frozen = http.FrozenHeaders({
+                b"Content-Type": [b"application/json"],
+                b"x-api": [b"1", b"2"]})
+        self.assertEqual(frozen.names, frozenset([b"content-type", b"x-api"]))
+        req = http.Request(DummyChannel(), False)
+        req.transport = StringTransport()
+        req.clientproto = b"HTTP/1.1"
+        req.setFrozenHeaders(frozen)
+        req.responseHeaders.setRawHeaders(b"content-type", [b"text/html"])
+        req.responseHeaders.setRawHeaders(b"x-other", [b"3"])
+        req.write(b'Hello')
+        self.assertResponseEquals(
+            req.transport.value(),
+            [(b"HTTP/1.1 200 OK",
+              b"Transfer-Encoding: chunked",
+              b"Content-Type: application/json",
+              b"X-Api: 1",
+              b"X-Api: 2",
+              b"X-Other: 3",
+              b"5\r\nHello\r\n")])
+
+
+    def test_frozenContentLength(self):
+        """
+        A I{Content-Length} in the frozen headers turns chunked encoding off.
+        """
+        req = http.Request(DummyChannel(), False)
+        req.transport = StringTransport()
+        req.clientproto = b"HTTP/1.1"
+        req.setFrozenHeaders(http.FrozenHeaders({b"content-length": [b"5"]}))
+        req.write(b'Hello')
+        self.assertResponseEquals(
+            req.transport.value(),
+            [(b"HTTP/1.1 200 OK", b"Content-Length: 5", b"Hello")])
+
+
+    def test_frozenHeadersDefaultContentType(self):
+        """
+        A I{Content-Type} in the frozen headers takes the place of the default
+        content type of L{server.Request}.
+        """
+        from twisted.web import server
+        req = server.Request(DummyChannel(), False)
+        req.transport = StringTransport()
+        req.clientproto = b"HTTP/1.0"
+        req.setFrozenHeaders(
+            http.FrozenHeaders({b"content-type": [b"application/json"]}))
+        req.write(b'{}')
+        self.assertResponseEquals(
+            req.transport.value(),
+            [(b"HTTP/1.0 200 OK", b"Content-Type: application/json", b"{}")])
+
+
     def test_firstWriteHTTP11Chunked(self):
         """
         For an HTTP 1.1 request, L{http.Request.write} sends an HTTP 1.1
@@ -2075,6 +2433,218 @@ class Expect100ContinueServerTests(unittest.TestCase, ResponseTestMixin):
 
 
 
+class _BodyProtocol(Protocol):
+    """
+    A protocol recording the request body delivered to it.
+
+    @ivar data: The C{list} of chunks of the body received.
+    @ivar reason: The L{Failure} given to C{connectionLost}, or C{None}.
+    """
+    reason = None
+
+    def __init__(self):
+        self.data = []
+
+
+    def dataReceived(self, data):
+        self.data.append(data)
+
+
+    def connectionLost(self, reason):
+        self.reason = reason
+
+
+
+class StreamingBodyTests(unittest.TestCase):
+    """
+    Tests for request bodies streamed with L{http.Request._startStreaming} and
+    L{http.Request.deliverBody}.
+    """
+    channelFactory = http.HTTPChannel
+
+    def setUp(self):
+        self.requests = []
+        self.processed = []
+        test = self
+
+        class StreamingRequest(http.Request):
+            def headersReceived(self, command, path, version):
+                http.Request.headersReceived(self, command, path, version)
+                self._startStreaming()
+                test.requests.append(self)
+
+            def process(self):
+                test.processed.append(self)
+
+        self.transport = StringTransport()
+        self.channel = self.channelFactory()
+        self.channel.requestFactory = StreamingRequest
+        self.channel.makeConnection(self.transport)
+
+
+    def test_deliverBody(self):
+        """
+        The body is delivered to the protocol given to
+        L{http.Request.deliverBody} as it is received, and its end is
+        delivered as a L{ConnectionDone} failure.  C{content} is C{None} and
+        C{process} is not called.
+        """
+        self.channel.dataReceived(
+            b"POST /foo?a=b HTTP/1.1\r\nContent-Length: 10\r\n\r\n")
+        [request] = self.requests
+        self.assertEqual(request.path, b"/foo")
+        self.assertEqual(request.args, {b"a": [b"b"]})
+        self.assertIdentical(request.content, None)
+        protocol = _BodyProtocol()
+        request.deliverBody(protocol)
+        self.assertTrue(IPushProducer.providedBy(protocol.transport))
+        self.channel.dataReceived(b"hello")
+        self.assertEqual(protocol.data, [b"hello"])
+        self.assertIdentical(protocol.reason, None)
+        self.channel.dataReceived(b"world")
+        self.assertEqual(b"".join(protocol.data), b"helloworld")
+        protocol.reason.trap(ConnectionDone)
+        self.assertEqual(self.processed, [])
+
+
+    def test_chunked(self):
+        """
+        A body with the chunked transfer encoding is delivered decoded.
+        """
+        self.channel.dataReceived(
+            b"POST / HTTP/1.1\r\nTransfer-Encoding: chunked\r\n\r\n")
+        [request] = self.requests
+        protocol = _BodyProtocol()
+        request.deliverBody(protocol)
+        self.channel.dataReceived(b"3\r\nabc\r\n2\r\nde\r\n0\r\n\r\n")
+        self.assertEqual(b"".join(protocol.data), b"abcde")
+        protocol.reason.trap(ConnectionDone)
+
+
+    def test_bufferedUntilDelivered(self):
+        """
+        The body received before L{http.Request.deliverBody} is called is
+        buffered, and reading from the connection is paused until then.
+        """
+        self.channel.dataReceived(
+            b"POST / HTTP/1.1\r\nContent-Length: 3\r\n\r\nab")
+        [request] = self.requests
+        self.assertEqual(self.transport.producerState, 'paused')
+        protocol = _BodyProtocol()
+        request.deliverBody(protocol)
+        self.assertEqual(self.transport.producerState, 'producing')
+        self.assertEqual(protocol.data, [b"ab"])
+        self.channel.dataReceived(b"c")
+        self.assertEqual(protocol.data, [b"ab", b"c"])
+        protocol.reason.trap(ConnectionDone)
+
+
+    def test_deliveredAfterEnd(self):
+        """
+        If the whole body was received before L{http.Request.deliverBody} is
+        called, it is delivered followed by its end.
+        """
+        self.channel.dataReceived(
+            b"POST / HTTP/1.1\r\nContent-Length: 3\r\n\r\nabc")
+        [request] = self.requests
+        self.assertEqual(self.transport.producerState, 'producing')
+        protocol = _BodyProtocol()
+        request.deliverBody(protocol)
+        self.assertEqual(protocol.data, [b"abc"])
+        protocol.reason.trap(ConnectionDone)
+
+
+    def test_pauseProducing(self):
+        """
+        The protocol pauses and resumes reading from the connection with the
+        C{pauseProducing} and C{resumeProducing} methods of its transport.
+        Data received while paused is delivered once resumed.
+        """
+        self.channel.dataReceived(
+            b"POST / HTTP/1.1\r\nContent-Length: 6\r\n\r\n")
+        [request] = self.requests
+        protocol = _BodyProtocol()
+        request.deliverBody(protocol)
+        protocol.transport.pauseProducing()
+        self.assertEqual(self.transport.producerState, 'paused')
+        self.channel.dataReceived(b"abc")
+        self.assertEqual(protocol.data, [])
+        protocol.transport.resumeProducing()
+        self.assertEqual(self.transport.producerState, 'producing')
+        self.assertEqual(protocol.data, [b"abc"])
+
+
+    def test_finishDiscardsBody(self):
+        """
+        Once the response is finished, the protocol is told the rest of the
+        body is discarded, and the next request on the connection is handled.
+        """
+        self.channel.dataReceived(
+            b"POST / HTTP/1.1\r\nContent-Length: 6\r\n\r\nabc")
+        [request] = self.requests
+        protocol = _BodyProtocol()
+        request.deliverBody(protocol)
+        protocol.transport.pauseProducing()
+        request.finish()
+        protocol.reason.trap(ConnectionLost)
+        self.assertEqual(self.transport.producerState, 'producing')
+        self.channel.dataReceived(b"def")
+        self.assertEqual(protocol.data, [b"abc"])
+        self.assertTrue(self.transport.value().startswith(b"HTTP/1.1 200 OK"))
+
+        self.channel.dataReceived(
+            b"POST / HTTP/1.1\r\nContent-Length: 1\r\n\r\nx")
+        self.assertEqual(len(self.requests), 2)
+        protocol = _BodyProtocol()
+        self.requests[1].deliverBody(protocol)
+        self.assertEqual(protocol.data, [b"x"])
+
+
+    def test_connectionLost(self):
+        """
+        If the connection is lost before the whole body is received, the
+        protocol is given the reason.
+        """
+        self.channel.dataReceived(
+            b"POST / HTTP/1.1\r\nContent-Length: 6\r\n\r\nabc")
+        [request] = self.requests
+        protocol = _BodyProtocol()
+        request.deliverBody(protocol)
+        self.channel.connectionLost(Failure(ConnectionLost("gone")))
+        protocol.reason.trap(ConnectionLost)
+
+
+    def test_deliverTwice(self):
+        """
+        L{http.Request.deliverBody} raises L{RuntimeError} if the body was
+        already delivered.
+        """
+        self.channel.dataReceived(
+            b"POST / HTTP/1.1\r\nContent-Length: 6\r\n\r\n")
+        [request] = self.requests
+        request.deliverBody(_BodyProtocol())
+        self.assertRaises(RuntimeError, request.deliverBody, _BodyProtocol())
+
+
+    def test_notStreamed(self):
+        """
+        L{http.Request.deliverBody} raises L{RuntimeError} if the body of the
+        request is collected in C{content}.
+        """
+        request = http.Request(DummyChannel(), False)
+        request.gotLength(3)
+        self.assertRaises(RuntimeError, request.deliverBody, _BodyProtocol())
+
+
+
+class BlockStreamingBodyTests(StreamingBodyTests):
+    """
+    L{StreamingBodyTests} for L{http.BlockHTTPChannel}.
+    """
+    channelFactory = http.BlockHTTPChannel
+
+
+
 def sub(keys, d):
     """
     Create a new dict containing only a subset of the items of an existing
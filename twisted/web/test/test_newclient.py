@@ -1592,6 +1592,20 @@ class HTTP11ClientProtocolTests(TestCase):
         self.assertTrue(transport.disconnecting)
 
 
+    def test_lostCallbackCalled(self):
+        """
+        When the connection is lost, the C{lostCallback} passed to
+        L{HTTP11ClientProtocol} is called with the protocol instance.
+        """
+        lostResult = []
+        protocol = HTTP11ClientProtocol(lostCallback=lostResult.append)
+        protocol.makeConnection(StringTransport())
+        self.assertEqual(lostResult, [])
+        protocol.connectionLost(Failure(ConnectionDone()))
+        self.assertEqual(lostResult, [protocol])
+        self.assertEqual(protocol.state, 'CONNECTION_LOST')
+
+
     def test_cancelBeforeResponse(self):
         """
         The L{Deferred} returned by L{HTTP11ClientProtocol.request} will fire
@@ -6,13 +6,24 @@ Test for L{twisted.web.proxy}.
 """
 
 from twisted.trial.unittest import TestCase
+from twisted.python.failure import Failure
+from twisted.internet import reactor
+from twisted.internet.defer import Deferred, gatherResults
+from twisted.internet.error import ConnectionLost
+from twisted.internet.task import Clock
 from twisted.test.proto_helpers import StringTransportWithDisconnection
-from twisted.test.proto_helpers import MemoryReactor
+from twisted.test.proto_helpers import MemoryReactor, StringTransport
 
+from twisted.web.client import (
+    Agent, FileBodyProducer, HTTPConnectionPool, ResponseDone, readBody)
+from twisted.web.http_headers import Headers
+from twisted.web.iweb import UNKNOWN_LENGTH
 from twisted.web.resource import Resource
 from twisted.web.server import Site
 from twisted.web.proxy import ReverseProxyResource, ProxyClientFactory
 from twisted.web.proxy import ProxyClient, ProxyRequest, ReverseProxyRequest
+from twisted.web.proxy import (
+    PooledReverseProxyResource, ProxyUpstream, LoadBalancing)
 from twisted.web.test.test_web import DummyRequest
 
 
@@ -69,6 +80,62 @@ class ReverseProxyResourceTestCase(TestCase):
         return self._testRender("/index?foo=bar", "/path?foo=bar")
 
 
+    def _streamBody(self, headers, body):
+        """
+        Send a I{POST} request with C{headers} and C{body} to a
+        L{ReverseProxyResource} on a L{Site} which streams request bodies,
+        connecting the proxy client after the headers are received.
+
+        @return: The transports of the client connection and of the
+            connection to the proxied server, after the headers and after the
+            body have been sent.
+        """
+        reactor = MemoryReactor()
+        site = Site(ReverseProxyResource("127.0.0.1", 1234, "/path", reactor))
+        site.streamRequestBodies = True
+        transport = StringTransportWithDisconnection()
+        channel = site.buildProtocol(None)
+        channel.makeConnection(transport)
+        transport.protocol = channel
+        self.addCleanup(channel.connectionLost, Failure(ConnectionLost()))
+
+        channel.dataReceived("POST / HTTP/1.1\r\n%s\r\n" % (headers,))
+        factory = reactor.tcpClients[0][2]
+        self.assertIdentical(factory.data, None)
+        proxyTransport = StringTransport()
+        factory.buildProtocol(None).makeConnection(proxyTransport)
+        headersSent = proxyTransport.value()
+        self.assertTrue(headersSent.endswith("\r\n\r\n"))
+        proxyTransport.clear()
+        channel.dataReceived(body)
+        return transport, proxyTransport
+
+
+    def test_streamBody(self):
+        """
+        On a L{Site} which streams request bodies, L{ReverseProxyResource}
+        sends the body to the proxied server as it is received, reading from
+        the client only while the proxied server accepts more.
+        """
+        transport, proxyTransport = self._streamBody(
+            "Content-Length: 6\r\n", "abc")
+        self.assertEqual(proxyTransport.value(), "abc")
+        proxyTransport.producer.pauseProducing()
+        self.assertEqual(transport.producerState, "paused")
+        proxyTransport.producer.resumeProducing()
+        self.assertEqual(transport.producerState, "producing")
+
+
+    def test_streamChunkedBody(self):
+        """
+        A chunked request body is sent to the proxied server chunked.
+        """
+        transport, proxyTransport = self._streamBody(
+            "Transfer-Encoding: chunked\r\n", "3\r\nabc\r\n0\r\n\r\n")
+        self.assertEqual(proxyTransport.value(), "3\r\nabc\r\n0\r\n\r\n")
+        self.assertIdentical(proxyTransport.producer, None)
+
+
     def test_getChild(self):
         """
         The L{ReverseProxyResource.getChild} method should return a resource
@@ -542,3 +609,436 @@ class ReverseProxyRequestTestCase(TestCase):
         factory = reactor.tcpClients[0][2]
         self.assertIsInstance(factory, ProxyClientFactory)
         self.assertEqual(factory.headers, {'host': 'example.com'})
+
+
+
+class FakeAgent(object):
+    """
+    An agent recording the requests made with it.
+
+    @ivar requests: A C{list} of C{(method, uri, headers, bodyProducer,
+        deferred)} tuples, one for each request.
+    """
+
+    def __init__(self):
+        self.requests = []
+
+
+    def request(self, method, uri, headers=None, bodyProducer=None):
+        d = Deferred()
+        self.requests.append((method, uri, headers, bodyProducer, d))
+        return d
+
+
+
+class FakeResponse(object):
+    """
+    A response whose body is delivered by the test.
+
+    @ivar protocol: The protocol given to L{deliverBody}, or C{None}.
+    """
+    version = ('HTTP', 1, 1)
+    length = UNKNOWN_LENGTH
+
+    def __init__(self, code, headers, transport):
+        self.code = code
+        self.phrase = 'Phrase'
+        self.headers = Headers(headers)
+        self.transport = transport
+        self.protocol = None
+
+
+    def deliverBody(self, protocol):
+        self.protocol = protocol
+        protocol.makeConnection(self.transport)
+
+
+
+class PooledReverseProxyResourceTests(TestCase):
+    """
+    Tests for L{PooledReverseProxyResource}.
+    """
+
+    def setUp(self):
+        self.clock = Clock()
+        self.agent = FakeAgent()
+
+
+    def makeResource(self, upstreams=[('example.com', 8080)], **kwargs):
+        """
+        Create a L{PooledReverseProxyResource} using L{FakeAgent} and a
+        L{Clock}.
+        """
+        resource = PooledReverseProxyResource(
+            upstreams, reactor=self.clock, **kwargs)
+        resource._agent = self.agent
+        return resource
+
+
+    def connect(self, resource, streamRequestBodies=False):
+        """
+        Connect an HTTP channel for a site with C{resource} at I{/index}.
+
+        @return: The channel and its transport.
+        """
+        root = Resource()
+        root.putChild('index', resource)
+        site = Site(root)
+        site.streamRequestBodies = streamRequestBodies
+        channel = site.buildProtocol(None)
+        transport = StringTransportWithDisconnection()
+        transport.protocol = channel
+        channel.makeConnection(transport)
+        self.addCleanup(channel.connectionLost, Failure(ConnectionLost()))
+        return channel, transport
+
+
+    def test_defaults(self):
+        """
+        L{PooledReverseProxyResource} balances requests by least connections,
+        with an L{Agent} using a persistent L{HTTPConnectionPool}.
+        """
+        resource = PooledReverseProxyResource(
+            [('example.com', 80), ProxyUpstream('example.org', 81)])
+        self.assertEqual(
+            [(u.host, u.port) for u in resource.upstreams],
+            [('example.com', 80), ('example.org', 81)])
+        self.assertIdentical(
+            resource.balancing, LoadBalancing.LEAST_CONNECTIONS)
+        self.assertIsInstance(resource._agent, Agent)
+        self.assertTrue(resource._agent._pool.persistent)
+        self.assertRaises(ValueError, PooledReverseProxyResource, [])
+
+
+    def test_forwardRequest(self):
+        """
+        The request is made to the chosen upstream, below the base path and
+        with the query string, without the hop-by-hop headers and those the
+        agent sets.
+        """
+        channel, transport = self.connect(self.makeResource(path='/base'))
+        channel.dataReceived(
+            "GET /index/a%20b/?x=1 HTTP/1.1\r\n"
+            "Host: proxy\r\n"
+            "X-Foo: bar\r\n"
+            "Connection: keep-alive, X-Hop\r\n"
+            "X-Hop: 1\r\n"
+            "\r\n")
+        [(method, uri, headers, bodyProducer, d)] = self.agent.requests
+        self.assertEqual(method, 'GET')
+        self.assertEqual(uri, 'http://example.com:8080/base/a%20b/?x=1')
+        self.assertEqual(
+            sorted(name for (name, values) in headers.getAllRawHeaders()),
+            ['X-Foo'])
+        self.assertIdentical(bodyProducer, None)
+
+
+    def test_forwardResponse(self):
+        """
+        The response is written to the client as it is received, reading from
+        the upstream only while the client accepts more, and the latency of
+        the upstream is recorded.
+        """
+        resource = self.makeResource()
+        channel, transport = self.connect(resource)
+        channel.dataReceived("GET /index HTTP/1.1\r\n\r\n")
+        [(_, _, _, _, d)] = self.agent.requests
+        self.clock.advance(2)
+        upstreamTransport = StringTransport()
+        response = FakeResponse(
+            201, {'X-Foo': ['bar'], 'Content-Length': ['5'],
+                  'Connection': ['close']},
+            upstreamTransport)
+        d.callback(response)
+        self.assertIdentical(transport.producer, upstreamTransport)
+        response.protocol.dataReceived('hel')
+        transport.producer.pauseProducing()
+        self.assertEqual(upstreamTransport.producerState, 'paused')
+        response.protocol.dataReceived('lo')
+        response.protocol.connectionLost(Failure(ResponseDone()))
+        self.assertIdentical(transport.producer, None)
+
+        value = transport.value()
+        self.assertTrue(value.startswith('HTTP/1.1 201 Phrase\r\n'))
+        self.assertIn('\r\nX-Foo: bar\r\n', value)
+        self.assertIn('\r\nContent-Length: 5\r\n', value)
+        self.assertNotIn('Connection: close', value)
+        self.assertNotIn('Content-Type', value)
+        self.assertTrue(value.endswith('\r\n\r\nhello'))
+
+        [upstream] = resource.upstreams
+        self.assertEqual(
+            (upstream.active, upstream.requests, upstream.responses,
+             upstream.failures),
+            (0, 1, 1, 0))
+        self.assertEqual(upstream.lastLatency, 2)
+        self.assertEqual(upstream.averageLatency(), 2)
+        self.assertEqual(
+            resource.getMetrics()['example.com:8080']['maxLatency'], 2)
+
+
+    def test_truncatedResponse(self):
+        """
+        If the response from the upstream is cut short, the connection to the
+        client is closed and a failure is recorded.
+        """
+        resource = self.makeResource()
+        channel, transport = self.connect(resource)
+        channel.dataReceived("GET /index HTTP/1.1\r\n\r\n")
+        [(_, _, _, _, d)] = self.agent.requests
+        response = FakeResponse(200, {}, StringTransport())
+        d.callback(response)
+        response.protocol.connectionLost(Failure(ConnectionLost()))
+        self.assertFalse(transport.connected)
+        self.assertEqual(resource.upstreams[0].failures, 1)
+
+
+    def test_badGateway(self):
+        """
+        If no response is received from the upstream, the client gets a
+        I{Bad Gateway} response and a failure is recorded.
+        """
+        resource = self.makeResource()
+        channel, transport = self.connect(resource)
+        channel.dataReceived("GET /index HTTP/1.1\r\n\r\n")
+        [(_, _, _, _, d)] = self.agent.requests
+        d.errback(ConnectionLost())
+        self.assertTrue(transport.value().startswith('HTTP/1.1 502 '))
+        self.assertEqual(
+            resource.getMetrics()['example.com:8080']['failures'], 1)
+        self.assertEqual(resource.upstreams[0].active, 0)
+
+
+    def test_clientDisconnected(self):
+        """
+        If the client disconnects before the response is received, the request
+        to the upstream is cancelled.
+        """
+        resource = self.makeResource()
+        channel, transport = self.connect(resource)
+        channel.dataReceived("GET /index HTTP/1.1\r\n\r\n")
+        [(_, _, _, _, d)] = self.agent.requests
+        transport.loseConnection()
+        self.assertTrue(d.called)
+        self.assertEqual(
+            (resource.upstreams[0].active, resource.upstreams[0].failures),
+            (0, 0))
+
+
+    def test_noUpstream(self):
+        """
+        If no upstream is healthy, the client gets a I{Service Unavailable}
+        response.
+        """
+        resource = self.makeResource()
+        resource.upstreams[0].healthy = False
+        channel, transport = self.connect(resource)
+        channel.dataReceived("GET /index HTTP/1.1\r\n\r\n")
+        self.assertEqual(self.agent.requests, [])
+        self.assertTrue(transport.value().startswith('HTTP/1.1 503 '))
+
+
+    def test_bufferedBody(self):
+        """
+        A request body buffered by the site is sent with a
+        L{FileBodyProducer}.
+        """
+        channel, transport = self.connect(self.makeResource())
+        channel.dataReceived(
+            "POST /index HTTP/1.1\r\nContent-Length: 3\r\n\r\nabc")
+        [(_, _, _, bodyProducer, _)] = self.agent.requests
+        self.assertIsInstance(bodyProducer, FileBodyProducer)
+        self.assertEqual(bodyProducer.length, 3)
+
+
+    def test_streamedBody(self):
+        """
+        On a site which streams request bodies, the request body is sent as it
+        is received, reading from the client only while the upstream accepts
+        more.
+        """
+        channel, transport = self.connect(self.makeResource(), True)
+        channel.dataReceived(
+            "POST /index HTTP/1.1\r\nContent-Length: 6\r\n\r\nabc")
+        [(_, _, _, bodyProducer, _)] = self.agent.requests
+        self.assertEqual(bodyProducer.length, 6)
+        consumer = StringTransport()
+        finished = bodyProducer.startProducing(consumer)
+        self.assertEqual(consumer.value(), 'abc')
+        bodyProducer.pauseProducing()
+        self.assertEqual(transport.producerState, 'paused')
+        bodyProducer.resumeProducing()
+        self.assertEqual(transport.producerState, 'producing')
+        self.assertNoResult(finished)
+        channel.dataReceived("def")
+        self.assertEqual(consumer.value(), 'abcdef')
+        self.assertIdentical(self.successResultOf(finished), None)
+
+
+    def test_streamedChunkedBody(self):
+        """
+        A streamed chunked request body has an unknown length.
+        """
+        channel, transport = self.connect(self.makeResource(), True)
+        channel.dataReceived(
+            "POST /index HTTP/1.1\r\nTransfer-Encoding: chunked\r\n\r\n")
+        [(_, _, _, bodyProducer, _)] = self.agent.requests
+        self.assertIdentical(bodyProducer.length, UNKNOWN_LENGTH)
+
+
+    def test_roundRobin(self):
+        """
+        With L{LoadBalancing.ROUND_ROBIN}, each healthy upstream is chosen in
+        turn.
+        """
+        resource = self.makeResource(
+            [('a', 1), ('b', 2), ('c', 3)],
+            balancing=LoadBalancing.ROUND_ROBIN)
+        a, b, c = resource.upstreams
+        a.active = 5
+        self.assertEqual(
+            [resource.chooseUpstream() for i in range(4)], [a, b, c, a])
+        b.healthy = False
+        self.assertEqual(
+            [resource.chooseUpstream() for i in range(3)], [c, a, c])
+
+
+    def test_leastConnections(self):
+        """
+        With L{LoadBalancing.LEAST_CONNECTIONS}, the healthy upstream with the
+        fewest requests in progress is chosen, taking those with as few in
+        turn.
+        """
+        resource = self.makeResource([('a', 1), ('b', 2), ('c', 3)])
+        a, b, c = resource.upstreams
+        a.active = 2
+        b.active = 1
+        c.active = 1
+        self.assertEqual(
+            [resource.chooseUpstream() for i in range(3)], [b, c, b])
+        c.healthy = False
+        self.assertEqual(resource.chooseUpstream(), b)
+        b.healthy = False
+        self.assertEqual(resource.chooseUpstream(), a)
+        a.healthy = False
+        self.assertIdentical(resource.chooseUpstream(), None)
+
+
+    def test_healthChecks(self):
+        """
+        L{PooledReverseProxyResource.startHealthChecks} requests the given
+        path from every upstream every interval, and marks those which do not
+        respond with a status below 500 unhealthy until they do.
+        """
+        resource = self.makeResource([('a', 1), ('b', 2)])
+        a, b = resource.upstreams
+        resource.startHealthChecks(5, '/health')
+        self.addCleanup(resource.stopHealthChecks)
+        self.assertEqual(
+            [(method, uri) for (method, uri, _, _, _) in self.agent.requests],
+            [('GET', 'http://a:1/health'), ('GET', 'http://b:2/health')])
+
+        response = FakeResponse(503, {}, StringTransport())
+        self.agent.requests[0][4].callback(response)
+        response.protocol.connectionLost(Failure(ResponseDone()))
+        self.agent.requests[1][4].errback(ConnectionLost())
+        self.assertEqual((a.healthy, b.healthy), (False, False))
+
+        self.clock.advance(5)
+        self.assertEqual(len(self.agent.requests), 4)
+        response = FakeResponse(200, {}, StringTransport())
+        self.agent.requests[2][4].callback(response)
+        response.protocol.connectionLost(Failure(ResponseDone()))
+        self.assertEqual((a.healthy, b.healthy), (True, False))
+        self.assertEqual(resource.chooseUpstream(), a)
+
+
+    def test_healthCheckTimeout(self):
+        """
+        An upstream which does not respond to a health check within
+        C{healthCheckTimeout} seconds is unhealthy.
+        """
+        resource = self.makeResource()
+        resource.healthCheckTimeout = 3
+        resource.startHealthChecks(10)
+        self.addCleanup(resource.stopHealthChecks)
+        self.clock.advance(3)
+        self.assertFalse(resource.upstreams[0].healthy)
+
+
+
+class PooledReverseProxyConnectionTests(TestCase):
+    """
+    Tests for L{PooledReverseProxyResource} proxying to a real server.
+    """
+
+    def startProxy(self, pool):
+        """
+        Start an upstream server recording the client port of each request,
+        and a L{PooledReverseProxyResource} proxying to it with C{pool}.
+
+        @return: A 3-tuple of a function requesting a path through the proxy
+            and returning a L{Deferred} firing with the response body, the
+            L{PooledReverseProxyResource}, and the C{list} of client ports
+            the upstream saw.
+        """
+        peers = []
+        class Upstream(Resource):
+            isLeaf = True
+            def render(self, request):
+                peers.append(request.transport.getPeer().port)
+                return request.path
+
+        port = reactor.listenTCP(0, Site(Upstream()), interface='127.0.0.1')
+        self.addCleanup(port.stopListening)
+        self.addCleanup(pool.closeCachedConnections)
+        resource = PooledReverseProxyResource(
+            [('127.0.0.1', port.getHost().port)], '/base', pool=pool)
+        root = Resource()
+        root.putChild('index', resource)
+        proxyPort = reactor.listenTCP(0, Site(root), interface='127.0.0.1')
+        self.addCleanup(proxyPort.stopListening)
+        clientPool = HTTPConnectionPool(reactor)
+        self.addCleanup(clientPool.closeCachedConnections)
+        agent = Agent(reactor, pool=clientPool)
+        url = 'http://127.0.0.1:%d/index/' % (proxyPort.getHost().port,)
+
+        def get(name):
+            d = agent.request('GET', url + name)
+            return d.addCallback(readBody)
+        return get, resource, peers
+
+
+    def test_persistentConnection(self):
+        """
+        Requests are proxied to the upstream, and one connection is used for
+        consecutive requests.
+        """
+        get, resource, peers = self.startProxy(HTTPConnectionPool(reactor))
+        d = get('a')
+        d.addCallback(self.assertEqual, '/base/a')
+        d.addCallback(lambda ignored: get('b'))
+        d.addCallback(self.assertEqual, '/base/b')
+
+        def check(ignored):
+            self.assertEqual(len(peers), 2)
+            self.assertEqual(peers[0], peers[1])
+            self.assertEqual(resource.upstreams[0].responses, 2)
+        return d.addCallback(check)
+
+
+    def test_boundedPool(self):
+        """
+        With a pool allowing one connection per upstream, concurrent requests
+        are proxied one after the other over a single connection.
+        """
+        pool = HTTPConnectionPool(reactor)
+        pool.maxActivePerHost = 1
+        get, resource, peers = self.startProxy(pool)
+        d = gatherResults([get(name) for name in 'abc'])
+        d.addCallback(self.assertEqual, ['/base/a', '/base/b', '/base/c'])
+
+        def check(ignored):
+            self.assertEqual(len(peers), 3)
+            self.assertEqual(len(set(peers)), 1)
+        return d.addCallback(check)
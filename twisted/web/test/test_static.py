@@ -8,19 +8,24 @@ import inspect
 import mimetypes
 import os
 import re
+import zlib
 import StringIO
 
 from zope.interface.verify import verifyObject
 
-from twisted.internet import abstract, interfaces
+from twisted.internet import abstract, interfaces, protocol, reactor
+from twisted.internet.defer import Deferred
+from twisted.internet.task import Clock
 from twisted.python.runtime import platform
 from twisted.python.filepath import FilePath
 from twisted.python import log
 from twisted.trial.unittest import TestCase
-from twisted.web import static, http, script, resource
+from twisted.protocols import basic
+from twisted.web import static, http, script, resource, server
 from twisted.web.server import UnsupportedMethod
 from twisted.web.test.test_web import DummyRequest
 from twisted.web.test._util import _render
+from twisted.test.test_tpfile import FakeSendfile
 
 
 class StaticDataTests(TestCase):
@@ -605,6 +610,251 @@ class StaticMakeProducerTests(TestCase):
 
 
 
+class FakeNotifier(object):
+    """
+    A fake of L{twisted.internet.inotify.INotify} which records the paths
+    watched and ignored.
+
+    @ivar watches: A C{dict} mapping the watched paths to their callbacks.
+    """
+    def __init__(self):
+        self.watches = {}
+
+
+    def watch(self, path, mask, callbacks):
+        self.watches[path.path] = callbacks
+
+
+    def ignore(self, path):
+        del self.watches[path.path]
+
+
+    def notify(self, path):
+        """
+        Report a change to the watched C{path}.
+        """
+        for callback in self.watches[path]:
+            callback(None, FilePath(path), 0)
+
+
+
+class FileCacheTests(TestCase):
+    """
+    Tests for L{static.FileCache} and L{static.File} serving files from it.
+    """
+    def setUp(self):
+        self.clock = Clock()
+        self.base = FilePath(self.mktemp())
+        self.base.makedirs()
+        self.base.child('a.txt').setContent('a' * 1000)
+        self.base.child('b.txt').setContent('bb')
+        self.base.child('big.txt').setContent('c' * 100)
+        self.cache = static.FileCache(reactor=self.clock)
+        self.root = static.File(self.base.path)
+        self.root.cache = self.cache
+
+
+    def get(self, name, headers=None):
+        """
+        Render the child C{name} of C{self.root}.
+
+        @return: The L{DummyRequest} which was rendered.
+        """
+        request = DummyRequest([name])
+        request.headers.update(headers or {})
+        child = resource.getChildForRequest(self.root, request)
+        d = _render(child, request)
+        self.assertTrue(d.called)
+        return request
+
+
+    def test_hitAndMiss(self):
+        """
+        The first request for a file is a miss which loads it into the cache,
+        and the following ones are hits.
+        """
+        self.assertEqual(''.join(self.get('a.txt').written), 'a' * 1000)
+        self.assertEqual((self.cache.hits, self.cache.misses), (0, 1))
+        request = self.get('a.txt')
+        self.assertEqual(''.join(request.written), 'a' * 1000)
+        self.assertEqual((self.cache.hits, self.cache.misses), (1, 1))
+
+
+    def test_headers(self):
+        """
+        A file served from the cache has the same I{Content-Type} and
+        I{Content-Length} headers as one read from the filesystem, and an
+        I{ETag}.
+        """
+        self.get('a.txt')
+        request = self.get('a.txt')
+        self.assertEqual(request.outgoingHeaders['content-type'], 'text/plain')
+        self.assertEqual(request.outgoingHeaders['content-length'], '1000')
+        self.assertEqual(request.outgoingHeaders['accept-ranges'], 'bytes')
+        st = os.stat(self.base.child('a.txt').path)
+        self.assertEqual(
+            self.cache.lookup(self.root.child('a.txt')).etag,
+            '"%x-%x-%x"' % (st.st_ino, st.st_size, int(st.st_mtime)))
+
+
+    def test_tooBig(self):
+        """
+        A file larger than C{maxFileSize} is not cached, but is still served.
+        """
+        self.cache.maxFileSize = 50
+        for i in range(2):
+            self.assertEqual(''.join(self.get('big.txt').written), 'c' * 100)
+        self.assertEqual((self.cache.hits, self.cache.misses), (0, 2))
+        self.assertEqual(len(self.cache._entries), 0)
+
+
+    def test_notCheckedWithinInterval(self):
+        """
+        A cached file is served from the cache without being checked for
+        changes until C{checkInterval} seconds have passed.
+        """
+        self.get('b.txt')
+        self.base.child('b.txt').setContent('xyz')
+        self.assertEqual(''.join(self.get('b.txt').written), 'bb')
+        self.clock.advance(1)
+        self.assertEqual(''.join(self.get('b.txt').written), 'xyz')
+        self.assertEqual((self.cache.hits, self.cache.misses), (1, 2))
+
+
+    def test_unchangedAfterInterval(self):
+        """
+        A cached file which has not changed when it is checked is still
+        served from the cache.
+        """
+        self.get('b.txt')
+        self.clock.advance(1)
+        self.get('b.txt')
+        self.clock.advance(0.5)
+        self.get('b.txt')
+        self.assertEqual((self.cache.hits, self.cache.misses), (2, 1))
+
+
+    def test_removed(self):
+        """
+        A cached file which has been removed when it is checked is dropped
+        from the cache.
+        """
+        self.get('b.txt')
+        self.base.child('b.txt').remove()
+        self.clock.advance(1)
+        self.assertIdentical(
+            self.cache.lookup(self.root.child('b.txt')), None)
+        self.assertEqual(self.cache._entries, {})
+        self.assertEqual(self.cache._size, 0)
+
+
+    def test_maxEntries(self):
+        """
+        The least recently used file is evicted when there are more than
+        C{maxEntries} files in the cache.
+        """
+        self.cache.maxEntries = 2
+        self.base.child('c.txt').setContent('c')
+        self.get('a.txt')
+        self.get('b.txt')
+        self.get('a.txt')
+        self.get('c.txt')
+        self.assertEqual(
+            list(self.cache._entries),
+            [self.base.child('a.txt').path, self.base.child('c.txt').path])
+        self.assertEqual(self.cache._size, 1001)
+
+
+    def test_maxSize(self):
+        """
+        The least recently used files are evicted when the cache holds more
+        than C{maxSize} bytes.
+        """
+        self.cache.maxSize = 1001
+        self.get('b.txt')
+        self.get('a.txt')
+        self.assertEqual(
+            list(self.cache._entries), [self.base.child('a.txt').path])
+        self.assertEqual(self.cache._size, 1000)
+
+
+    def test_invalidate(self):
+        """
+        L{static.FileCache.invalidate} drops a file from the cache.
+        """
+        self.get('b.txt')
+        self.cache.invalidate(self.base.child('b.txt').path)
+        self.cache.invalidate(self.base.child('a.txt').path)
+        self.assertEqual(self.cache._entries, {})
+        self.assertEqual(self.cache._size, 0)
+
+
+    def test_notifier(self):
+        """
+        With a notifier, cached files are watched and dropped from the cache
+        when they change rather than being checked with C{os.stat}.
+        """
+        notifier = FakeNotifier()
+        self.root.cache = self.cache = static.FileCache(
+            notifier=notifier, reactor=self.clock)
+        path = self.base.child('b.txt').path
+        self.get('b.txt')
+        self.assertEqual(list(notifier.watches), [path])
+        self.base.child('b.txt').setContent('xyz')
+        self.clock.advance(10)
+        self.assertEqual(''.join(self.get('b.txt').written), 'bb')
+        notifier.notify(path)
+        self.assertEqual(notifier.watches, {})
+        self.assertEqual(''.join(self.get('b.txt').written), 'xyz')
+        self.assertEqual((self.cache.hits, self.cache.misses), (1, 2))
+
+
+    def test_compress(self):
+        """
+        If C{compress} is true, a gzip-compressed copy of a text file is
+        served to clients which accept it, with its own I{ETag}.
+        """
+        self.cache.compress = True
+        self.get('a.txt')
+        request = self.get('a.txt', {'accept-encoding': 'deflate, gzip;q=1'})
+        body = ''.join(request.written)
+        self.assertEqual(
+            zlib.decompress(body, 16 + zlib.MAX_WBITS), 'a' * 1000)
+        self.assertEqual(request.outgoingHeaders['content-encoding'], 'gzip')
+        self.assertEqual(
+            request.outgoingHeaders['content-length'], str(len(body)))
+        self.assertEqual(request.outgoingHeaders['vary'], 'accept-encoding')
+
+        request = self.get('a.txt')
+        self.assertEqual(''.join(request.written), 'a' * 1000)
+        self.assertNotIn('content-encoding', request.outgoingHeaders)
+        self.assertEqual(request.outgoingHeaders['vary'], 'accept-encoding')
+
+
+    def test_compressOnlyIfSmaller(self):
+        """
+        No compressed copy is kept of a file which gzip does not make smaller.
+        """
+        self.cache.compress = True
+        self.get('b.txt')
+        request = self.get('b.txt', {'accept-encoding': 'gzip'})
+        self.assertEqual(''.join(request.written), 'bb')
+        self.assertNotIn('content-encoding', request.outgoingHeaders)
+
+
+    def test_range(self):
+        """
+        A range request for a cached file is served from the cache.
+        """
+        self.get('a.txt')
+        self.base.child('a.txt').setContent('b' * 1000)
+        request = self.get('a.txt', {'range': 'bytes=10-19'})
+        self.assertEqual(''.join(request.written), 'a' * 10)
+        self.assertEqual(request.responseCode, http.PARTIAL_CONTENT)
+        self.assertEqual(self.cache.hits, 1)
+
+
+
 class StaticProducerTests(TestCase):
     """
     Tests for the abstract L{StaticProducer}.
@@ -850,6 +1100,130 @@ class MultipleRangeStaticProducerTests(TestCase):
 
 
 
+class SendfileClient(protocol.Protocol):
+    """
+    A client which sends an HTTP/1.0 request for C{/file} with the given
+    C{Range} header, and collects the response.
+
+    @ivar finished: A L{Deferred} which fires with the whole response when
+        the server closes the connection.
+    """
+    def __init__(self, byteRange):
+        self.byteRange = byteRange
+        self.data = []
+        self.finished = Deferred()
+
+
+    def connectionMade(self):
+        request = 'GET /file HTTP/1.0\r\n'
+        if self.byteRange is not None:
+            request += 'Range: %s\r\n' % (self.byteRange,)
+        self.transport.write(request + '\r\n')
+
+
+    def dataReceived(self, data):
+        self.data.append(data)
+
+
+    def connectionLost(self, reason):
+        self.finished.callback(''.join(self.data))
+
+
+
+class SendfileStaticProducerTests(TestCase):
+    """
+    Tests for the L{StaticProducer}s sending files over TCP connections with
+    L{basic.SendfileProducer}.
+    """
+    def setUp(self):
+        self.systemSendfile = basic._sendfile
+        self.sendfile = FakeSendfile()
+        self.patch(basic, "_sendfile", self.sendfile)
+        self.content = ''.join(chr(i % 256) for i in range(300000))
+        base = FilePath(self.mktemp())
+        base.makedirs()
+        base.child('file').setContent(self.content)
+        root = resource.Resource()
+        root.putChild('file', static.File(base.child('file').path))
+        self.port = reactor.listenTCP(
+            0, server.Site(root), interface='127.0.0.1')
+        self.addCleanup(self.port.stopListening)
+
+
+    def get(self, byteRange=None):
+        """
+        Request the file, and return a L{Deferred} firing with the response
+        headers and body.
+        """
+        client = SendfileClient(byteRange)
+        creator = protocol.ClientCreator(reactor, lambda: client)
+        d = creator.connectTCP('127.0.0.1', self.port.getHost().port)
+        d.addCallback(lambda ignored: client.finished)
+        d.addCallback(lambda response: response.split('\r\n\r\n', 1))
+        return d
+
+
+    def test_noRange(self):
+        """
+        The whole file is sent with C{os.sendfile} after the headers.
+        """
+        def check((headers, body)):
+            self.assertIn('200 OK', headers)
+            self.assertEqual(body, self.content)
+            self.assertTrue(self.sendfile.calls)
+        return self.get().addCallback(check)
+
+
+    def test_systemSendfile(self):
+        """
+        The file is sent with the system's sendfile(2) where there is one.
+        """
+        calls = []
+        def sendfile(*args):
+            calls.append(args)
+            return self.systemSendfile(*args)
+        self.patch(basic, "_sendfile", sendfile)
+        def check((headers, body)):
+            self.assertIn('200 OK', headers)
+            self.assertEqual(body, self.content)
+            self.assertTrue(calls)
+        return self.get().addCallback(check)
+
+    if basic._sendfile is None:
+        test_systemSendfile.skip = "sendfile(2) is not available."
+
+
+    def test_singleRange(self):
+        """
+        The requested part of the file is sent with C{os.sendfile}.
+        """
+        def check((headers, body)):
+            self.assertIn('206 Partial Content', headers)
+            self.assertEqual(body, self.content[1000:200001])
+            self.assertEqual(self.sendfile.calls[0][2], 1000)
+        return self.get('bytes=1000-200000').addCallback(check)
+
+
+    def test_multipleRanges(self):
+        """
+        Each of several requested parts of the file is sent with
+        C{os.sendfile}, with the part separators written between them.
+        """
+        def check((headers, body)):
+            self.assertIn('206 Partial Content', headers)
+            boundary = re.search(r'boundary="(.*)"', headers).group(1)
+            parts = body.split('\r\n--%s' % (boundary,))
+            self.assertEqual(parts[0], '')
+            self.assertEqual(parts[-1], '--\r\n')
+            self.assertEqual(
+                [part.split('\r\n\r\n', 1)[1] for part in parts[1:-1]],
+                [self.content[0:10], self.content[100000:250000]])
+            self.assertEqual(
+                [call[2] for call in self.sendfile.calls][:2], [0, 100000])
+        return self.get('bytes=0-9,100000-249999').addCallback(check)
+
+
+
 class RangeTests(TestCase):
     """
     Tests for I{Range-Header} support in L{twisted.web.static.File}.
@@ -15,6 +15,8 @@ from twisted.python.compat import (_PY3, networkString,
 from twisted.trial import unittest
 from twisted.internet import reactor
 from twisted.internet.address import IPv4Address
+from twisted.internet.protocol import Protocol
+from twisted.test.proto_helpers import StringTransport
 from twisted.web import server, resource
 from twisted.internet import task
 from twisted.web import iweb, http, error
@@ -85,6 +87,134 @@ class SiteTest(unittest.TestCase):
 
 
 
+@implementer(resource.IStreamingResource)
+class EchoStreamingResource(resource.Resource):
+    """
+    A L{resource.IStreamingResource} which responds with the request body,
+    read as it is received.
+
+    @ivar contents: The C{content} of each request rendered.
+    """
+    isLeaf = True
+
+    def __init__(self):
+        resource.Resource.__init__(self)
+        self.contents = []
+
+
+    def render(self, request):
+        self.contents.append(request.content)
+        if request.content is not None:
+            return request.content.read()
+
+        class Echo(Protocol):
+            def dataReceived(self, data):
+                request.write(data)
+
+            def connectionLost(self, reason):
+                request.finish()
+
+        request.deliverBody(Echo())
+        return server.NOT_DONE_YET
+
+
+
+class StreamRequestBodiesTests(unittest.TestCase):
+    """
+    Tests for L{server.Site.streamRequestBodies}.
+    """
+    request = (b"POST /foo HTTP/1.1\r\n"
+               b"Content-Length: 6\r\n"
+               b"Connection: close\r\n"
+               b"\r\n")
+
+    def connect(self, root, streamRequestBodies=True):
+        """
+        Connect an HTTP channel for a site for C{root} to a transport.
+
+        @return: The channel and transport.
+        """
+        site = server.Site(root)
+        site.streamRequestBodies = streamRequestBodies
+        channel = site.buildProtocol(None)
+        transport = StringTransport()
+        channel.makeConnection(transport)
+        return channel, transport
+
+
+    def test_streamingResource(self):
+        """
+        A resource providing L{resource.IStreamingResource} is rendered as soon
+        as the request headers are received, with a C{content} of C{None},
+        and reads the body as it is received.
+        """
+        root = EchoStreamingResource()
+        channel, transport = self.connect(root)
+        channel.dataReceived(self.request)
+        self.assertEqual(root.contents, [None])
+        channel.dataReceived(b"abc")
+        self.assertIn(b"abc", transport.value())
+        channel.dataReceived(b"def")
+        self.assertTrue(
+            transport.value().endswith(b"3\r\ndef\r\n0\r\n\r\n"))
+
+
+    def test_notStreamingResource(self):
+        """
+        A resource not providing L{resource.IStreamingResource} is looked up
+        once, and rendered with the whole body in C{content}.
+        """
+        lookups = []
+        class Root(resource.Resource):
+            def getChild(self, name, request):
+                lookups.append(name)
+                return SimpleResource()
+
+        channel, transport = self.connect(Root())
+        channel.dataReceived(self.request)
+        self.assertEqual(lookups, [b"foo"])
+        self.assertEqual(transport.value(), b"")
+        channel.dataReceived(b"abcdef")
+        self.assertEqual(lookups, [b"foo"])
+        self.assertIn(b"correct", transport.value())
+
+
+    def test_lookupFailed(self):
+        """
+        If looking up the resource fails before the body is received, it is
+        looked up again once the body is received.
+        """
+        lookups = []
+        class Root(resource.Resource):
+            def getChild(self, name, request):
+                lookups.append(request.content)
+                if request.content is None:
+                    raise RuntimeError("No content yet.")
+                return SimpleResource()
+
+        channel, transport = self.connect(Root())
+        channel.dataReceived(self.request + b"abcdef")
+        self.assertEqual(len(lookups), 2)
+        self.assertIdentical(lookups[0], None)
+        self.assertIn(b"correct", transport.value())
+
+
+    def test_notOptedIn(self):
+        """
+        By default, request bodies are not streamed, even to resources
+        providing L{resource.IStreamingResource}.
+        """
+        self.assertFalse(server.Site.streamRequestBodies)
+        root = EchoStreamingResource()
+        channel, transport = self.connect(root, False)
+        channel.dataReceived(self.request)
+        self.assertEqual(root.contents, [])
+        channel.dataReceived(b"abcdef")
+        self.assertNotIdentical(root.contents[0], None)
+        self.assertTrue(transport.value().endswith(b"abcdef"))
+
+
+
 class SessionTest(unittest.TestCase):
     """
     Tests for L{server.Session}.
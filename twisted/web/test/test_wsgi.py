@@ -17,14 +17,15 @@ from zope.interface.verify import verifyObject
 from twisted.python.log import addObserver, removeObserver, err
 from twisted.python.failure import Failure
 from twisted.python.threadpool import ThreadPool
-from twisted.internet.defer import Deferred, gatherResults
+from twisted.internet.defer import Deferred, gatherResults, succeed
 from twisted.internet import reactor
-from twisted.internet.error import ConnectionLost
+from twisted.internet.error import ConnectionDone, ConnectionLost
+from twisted.test.proto_helpers import StringTransport
 from twisted.trial.unittest import TestCase
 from twisted.web import http
-from twisted.web.resource import IResource, Resource
+from twisted.web.resource import IResource, IStreamingResource, Resource
 from twisted.web.server import Request, Site, version
-from twisted.web.wsgi import WSGIResource
+from twisted.web.wsgi import WSGIResource, _StreamingInput
 from twisted.web.test.test_web import DummyChannel
 
 
@@ -82,9 +83,11 @@ class WSGIResourceTests(TestCase):
 
     def test_interfaces(self):
         """
-        L{WSGIResource} implements L{IResource} and stops resource traversal.
+        L{WSGIResource} implements L{IResource} and L{IStreamingResource}, and
+        stops resource traversal.
         """
         verifyObject(IResource, self.resource)
+        self.assertTrue(IStreamingResource.providedBy(self.resource))
         self.assertTrue(self.resource.isLeaf)
 
 
@@ -886,6 +889,96 @@ class InputStreamTemporaryFileTests(InputStreamTestMixin, TestCase):
 
 
 
+class StreamingInputTests(InputStreamTestMixin, TestCase):
+    """
+    Tests for L{_StreamingInput}, reading a body received in small chunks.
+    """
+    def _renderAndReturnReaderResult(self, reader, content):
+        input = _StreamingInput(self.reactor)
+        input.makeConnection(StringTransport())
+        for i in range(0, len(content), 3):
+            input.dataReceived(content[i:i + 3])
+        input.connectionLost(Failure(ConnectionDone()))
+        return succeed(reader(input))
+
+
+    def test_pause(self):
+        """
+        Reading from the connection is paused once C{bufferSize} bytes are
+        buffered, and resumed once the application has read enough of them.
+        """
+        transport = StringTransport()
+        input = _StreamingInput(self.reactor)
+        input.bufferSize = 4
+        input.makeConnection(transport)
+        input.dataReceived("abc")
+        self.assertEqual(transport.producerState, 'producing')
+        input.dataReceived("de")
+        self.assertEqual(transport.producerState, 'paused')
+        self.assertEqual(input.read(1), "a")
+        self.assertEqual(transport.producerState, 'paused')
+        self.assertEqual(input.read(1), "b")
+        self.assertEqual(transport.producerState, 'producing')
+
+
+    def test_truncated(self):
+        """
+        If the connection is lost before the whole body is received, reading
+        returns the part of the body received.
+        """
+        input = _StreamingInput(self.reactor)
+        input.makeConnection(StringTransport())
+        input.dataReceived("abc")
+        input.connectionLost(Failure(ConnectionLost()))
+        self.assertEqual(input.read(10), "abc")
+        self.assertEqual(input.read(), "")
+
+
+    def test_streamedRequest(self):
+        """
+        On a L{Site} which streams request bodies, the application reads the
+        body in its thread as it is received in the I/O thread, even if the
+        body is larger than the buffer.
+        """
+        threadpool = ThreadPool(0, 1)
+        threadpool.start()
+        self.addCleanup(threadpool.stop)
+        size = _StreamingInput.bufferSize * 3
+
+        def application(environ, startResponse):
+            body = environ['wsgi.input'].read(size)
+            startResponse('200 OK', [])
+            return [str(len(body))]
+
+        site = Site(WSGIResource(reactor, threadpool, application))
+        site.streamRequestBodies = True
+        channel = site.buildProtocol(None)
+        transport = StringTransport()
+        channel.makeConnection(transport)
+        channel.dataReceived(
+            "POST / HTTP/1.0\r\nContent-Length: %d\r\n\r\n" % (size,))
+        request = channel.requests[0]
+        self.assertIdentical(request.content, None)
+        finished = request.notifyFinish()
+
+        def send(remaining):
+            # Send the body whenever reading is not paused.
+            if transport.producerState == 'producing':
+                chunk = min(remaining, 8192)
+                channel.dataReceived("x" * chunk)
+                remaining -= chunk
+            if remaining:
+                reactor.callLater(0, send, remaining)
+        send(size)
+
+        def cbFinished(ignored):
+            self.assertEqual(
+                self.getContentFromResponse(transport.value()), str(size))
+        finished.addCallback(cbFinished)
+        return finished
+
+
+
 class StartResponseTests(WSGITestsMixin, TestCase):
     """
     Tests for the I{start_response} parameter passed to the application object
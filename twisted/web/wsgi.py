@@ -9,12 +9,13 @@ U{Web Resource Gateway Interface<http://www.python.org/dev/peps/pep-0333/>}.
 __metaclass__ = type
 
 from sys import exc_info
+from threading import Condition
 
 from zope.interface import implements
 
 from twisted.python.log import msg, err
 from twisted.python.failure import Failure
-from twisted.web.resource import IResource
+from twisted.web.resource import IStreamingResource
 from twisted.web.server import NOT_DONE_YET
 from twisted.web.http import INTERNAL_SERVER_ERROR
 
@@ -130,6 +131,198 @@ class _InputStream:
 
 
 
+class _StreamingInput:
+    """
+    File-like object instances of which are used as the value for the
+    C{'wsgi.input'} key when the request body is streamed; see
+    L{twisted.web.server.Site.streamRequestBodies}.
+
+    It is also the protocol the request body is delivered to, in the I/O
+    thread.  Up to C{bufferSize} bytes of the body are buffered for the
+    application; past that, reading from the connection is paused until the
+    application has read enough of the body.
+
+    @ivar _reactor: An L{IReactorThreads} provider used to resume reading from
+        the connection in the I/O thread.
+
+    @ivar _condition: A L{Condition} guarding the attributes below, notified
+        when more of the body is received.
+
+    @ivar _data: The C{str} received and not read by the application yet.
+
+    @ivar _done: Whether the end of the body was received.
+
+    @ivar _paused: Whether reading from the connection is paused.
+
+    @ivar _resuming: Whether a call to L{_resume} is scheduled.
+    """
+    bufferSize = 2 ** 16
+
+    def __init__(self, reactor):
+        """
+        Initialize the instance.
+
+        This is called in the I/O thread, not a WSGI application thread.
+        """
+        self._reactor = reactor
+        self._condition = Condition()
+        self._data = ''
+        self._done = False
+        self._paused = False
+        self._resuming = False
+        self.transport = None
+
+
+    def makeConnection(self, transport):
+        """
+        Remember the producer of the request body.
+
+        This is called in the I/O thread, not a WSGI application thread.
+        """
+        self.transport = transport
+
+
+    def dataReceived(self, data):
+        """
+        Buffer part of the request body, and pause reading from the connection
+        if the buffer is full.
+
+        This is called in the I/O thread, not a WSGI application thread.
+        """
+        with self._condition:
+            self._data += data
+            self._condition.notify()
+            pause = len(self._data) >= self.bufferSize and not self._paused
+            if pause:
+                self._paused = True
+        if pause:
+            self.transport.pauseProducing()
+
+
+    def connectionLost(self, reason):
+        """
+        Record the end of the request body.  If it was not all received, the
+        application reads a truncated body.
+
+        This is called in the I/O thread, not a WSGI application thread.
+        """
+        with self._condition:
+            self._done = True
+            self._condition.notify()
+
+
+    def _resume(self):
+        """
+        Resume reading from the connection if the application has drained
+        the buffer.
+
+        This is called in the I/O thread, not a WSGI application thread.
+        """
+        with self._condition:
+            self._resuming = False
+            resume = self._paused and len(self._data) < self.bufferSize
+            if resume:
+                self._paused = False
+        if resume:
+            self.transport.resumeProducing()
+
+
+    def _take(self, size):
+        """
+        Remove and return up to C{size} bytes from the buffer, scheduling a
+        call to L{_resume} if reading from the connection is paused.  Must be
+        called with C{_condition} acquired.
+        """
+        data, self._data = self._data[:size], self._data[size:]
+        if self._paused and not self._resuming:
+            self._resuming = True
+            self._reactor.callFromThread(self._resume)
+        return data
+
+
+    def read(self, size=None):
+        """
+        Read C{size} bytes, or the rest of the body if C{size} is C{None} or
+        negative, waiting for them to be received.  Fewer bytes are returned
+        only at the end of the body.
+
+        This is called in a WSGI application thread, not the I/O thread.
+        """
+        return self._read(size, False)
+
+
+    def readline(self, size=None):
+        """
+        Read a line, or C{size} bytes of it if C{size} is not C{None} or
+        negative, waiting for it to be received.
+
+        This is called in a WSGI application thread, not the I/O thread.
+        """
+        return self._read(size, True)
+
+
+    def _read(self, size, line):
+        """
+        Read from the buffer, taking what was received so far each time so
+        that a large read cannot wait on reading from the connection it has
+        itself paused.
+
+        @param size: The most bytes to read, or C{None} or a negative number
+            to read to the end of the body.
+
+        @param line: Whether to stop after a newline.
+        """
+        if size is not None and size < 0:
+            size = None
+        chunks = []
+        with self._condition:
+            while size is None or size > 0:
+                if self._data:
+                    if size is None:
+                        limit = len(self._data)
+                    else:
+                        limit = size
+                    end = line and self._data.find('\n', 0, limit) + 1
+                    chunk = self._take(end or limit)
+                    chunks.append(chunk)
+                    if end:
+                        break
+                    if size is not None:
+                        size -= len(chunk)
+                elif self._done:
+                    break
+                else:
+                    self._condition.wait()
+        return ''.join(chunks)
+
+
+    def readlines(self, size=None):
+        """
+        Read lines until the end of the body, or until at least C{size} bytes
+        have been read.
+
+        This is called in a WSGI application thread, not the I/O thread.
+        """
+        lines = []
+        total = 0
+        for line in self:
+            lines.append(line)
+            total += len(line)
+            if size is not None and 0 < size <= total:
+                break
+        return lines
+
+
+    def __iter__(self):
+        """
+        Iterate over the lines of the body.
+
+        This is called in a WSGI application thread, not the I/O thread.
+        """
+        return iter(self.readline, '')
+
+
+
 class _WSGIResponse:
     """
     Helper for L{WSGIResource} which drives the WSGI application using a
@@ -214,6 +407,14 @@ class _WSGIResponse:
             self.environ[name] = ','.join([
                     v.replace('\n', ' ') for v in values])
 
+        if request.content is None:
+            # The body is streamed; it is received in the I/O thread and read
+            # in the WSGI thread through the buffer of _StreamingInput.
+            input = _StreamingInput(reactor)
+            request.deliverBody(input)
+        else:
+            input = _InputStream(request.content)
+
         self.environ.update({
                 'wsgi.version': (1, 0),
                 'wsgi.url_scheme': request.isSecure() and 'https' or 'http',
@@ -235,7 +436,7 @@ class _WSGIResponse:
                 # More likely than not, this will break.  This seems like an
                 # unlikely possibility to me, but if it is to be allowed,
                 # something here needs to change. -exarkun
-                'wsgi.input': _InputStream(request.content)})
+                'wsgi.input': input})
 
 
     def _finished(self, ignored):
@@ -354,7 +555,7 @@ class WSGIResource:
 
     @ivar _application: The WSGI application object.
     """
-    implements(IResource)
+    implements(IStreamingResource)
 
     # Further resource segments are left up to the WSGI application object to
     # handle.